@@ -15,6 +15,7 @@ from sqlalchemy import func, case, or_, desc, asc
 from typing import List
 from math import ceil
 from support.model import Chat, Message, SupportTicket, TicketStatus, TicketPriority
+from utils.patient_age import patient_age, age_at_least, age_at_most, age_between
 
 admin_router = APIRouter(
     prefix="/admin-api",
@@ -320,9 +321,9 @@ async def get_patients(
         if gender:
             query = query.filter(Patient.gender == gender)
         if age_min is not None:
-            query = query.filter(Patient.age >= age_min)
+            query = query.filter(age_at_least(age_min))
         if age_max is not None:
-            query = query.filter(Patient.age <= age_max)
+            query = query.filter(age_at_most(age_max))
 
         # Get total count before pagination
         total_count = query.count()
@@ -988,7 +989,7 @@ async def get_dashboard_stats(db: Session = Depends(get_db)):
 
         # Patient demographics
         total_patients = db.query(Patient).count()
-        avg_patient_age = db.query(func.avg(Patient.age)).scalar() or 0
+        avg_patient_age = db.query(func.avg(patient_age())).scalar() or 0
         patients_by_gender = db.query(
             Patient.gender,
             func.count(Patient.id).label('count')
@@ -996,10 +997,11 @@ async def get_dashboard_stats(db: Session = Depends(get_db)):
 
         patients_by_age_group = db.query(
             case(
-                (Patient.age < 18, 'Under 18'),
-                (Patient.age.between(18, 30), '18-30'),
-                (Patient.age.between(31, 50), '31-50'),
-                (Patient.age.between(51, 70), '51-70'),
+                (Patient.birth_year.is_(None), 'Unknown'),
+                (~age_at_least(18), 'Under 18'),
+                (age_between(18, 30), '18-30'),
+                (age_between(31, 50), '31-50'),
+                (age_between(51, 70), '51-70'),
                 else_='Over 70'
             ).label('age_group'),
             func.count(Patient.id).label('count')
@@ -21,10 +21,19 @@ from staff.routes import staff_router
 from catalog.routes import catalog_router
 from suggestion.routes import suggestion_router
 from lookup.routes import lookup_router
+from search.routes import search_router
+from chatbot.routes import chatbot_router
 
 # Prometheus metrics
 from prometheus_fastapi_instrumentator import Instrumentator
 
+from utils.notifications import gateway as notification_gateway
+from utils.entity_cache import listen_for_entity_invalidations
+from utils.chatbot import chatbot
+from utils.config import CHATBOT_WARMUP_ON_STARTUP
+from redis_client import init_redis, close_redis_connection
+import asyncio
+
 # Configure logging with more comprehensive settings
 logging.basicConfig(
     level=logging.INFO,
@@ -115,6 +124,22 @@ app.add_middleware(
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+@app.on_event("startup")
+async def startup():
+    await init_redis()
+    # Keep this worker's in-process entity cache in step with writes made by other workers
+    app.state.entity_invalidation_task = asyncio.create_task(listen_for_entity_invalidations())
+    if CHATBOT_WARMUP_ON_STARTUP:
+        # Load the chatbot model without holding up startup
+        app.state.chatbot_warmup_task = asyncio.create_task(chatbot.warm_up())
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.entity_invalidation_task.cancel()
+    # Let queued notifications go out before the worker exits
+    await notification_gateway.close()
+    await close_redis_connection()
+
 # Ensure uploads directory exists
 os.makedirs("uploads", exist_ok=True)
 
@@ -151,4 +176,10 @@ app.include_router(catalog_router, prefix=f"/catalog", tags=["catalog"])
 app.include_router(suggestion_router, prefix=f"/suggestion", tags=["suggestion"])
 
 # Include lookup routes
-app.include_router(lookup_router, prefix=f"/lookup", tags=["lookup"])
\ No newline at end of file
+app.include_router(lookup_router, prefix=f"/lookup", tags=["lookup"])
+
+# Include unified search across patients, appointments and billing
+app.include_router(search_router, prefix=f"/search", tags=["search"])
+
+# Include FAQ chatbot routes
+app.include_router(chatbot_router, prefix=f"/chatbot", tags=["chatbot"])
\ No newline at end of file
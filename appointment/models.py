@@ -1,6 +1,7 @@
 import enum
 from sqlalchemy import String, DateTime, ForeignKey, Boolean, Enum as SQLAlchemyEnum, Integer, Date
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.schema import Index
 from datetime import datetime, date
 from db.db import Base
 import uuid
@@ -42,6 +43,11 @@ class Appointment(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
 
+    __table_args__ = (
+        # Serves overlap checks and free-slot lookups, which range over one doctor's start times
+        Index("ix_appointments_doctor_start_end", "doctor_id", "start_time", "end_time"),
+    )
+
 
 class AppointmentFile(Base):
     __tablename__ =  "appointment_files"
@@ -12,32 +12,26 @@ from catalog.models import *
 from payment.models import *
 
 from utils.auth import verify_token
-from utils.appointment_msg import send_appointment_email
+from utils.notifications import queue_appointment_email
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta, time
 from sqlalchemy import or_, and_, func, select, case, asc, desc
 from typing import Optional
-from apscheduler.schedulers.background import BackgroundScheduler
 import asyncio
 from prediction.routes import update_image_url
 import re
 import calendar
-from redis_client import get_redis_client, close_redis_connection
-import json
+from redis_client import get_redis_client, get_redis_cache_client
 import hashlib
-import orjson, logging
+import logging
+from utils.reminders import schedule_reminder, cancel_reminder, sync_appointment_reminder
+from utils.entity_cache import get_authenticated_user, get_entities, get_entity
+from utils.availability import find_conflict, busy_intervals_by_day, free_slots, MAX_DURATION
+from utils.phone import normalize_phone
+from utils.config import AVAILABILITY_DAY_START, AVAILABILITY_DAY_END, AVAILABILITY_CACHE_SECONDS, APPOINTMENT_MAX_DURATION_MINUTES
+from utils.cache import invalidate_appointments, get_generations, doctor_tag, appointment_list_tag, ALL_APPOINTMENTS_TAG, cache_get, cache_get_many, cache_set
 
 
-scheduler = BackgroundScheduler()
-scheduler.start()
-
-def send_email_sync(db, appointment_id):
-    """Helper function to run async function inside sync context"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(send_appointment_email(db, appointment_id))
-    loop.close()
-
 appointment_router = APIRouter()
 
 @appointment_router.post("/create",
@@ -105,6 +99,14 @@ appointment_router = APIRouter()
                 }
             }
         },
+        409: {
+            "description": "The doctor already has an appointment overlapping the requested slot",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Doctor already has an appointment in this time slot", "conflicting_appointment_id": "uuid"}
+                }
+            }
+        },
         500: {
             "description": "Server error occurred",
             "content": {
@@ -124,132 +126,70 @@ async def create_appointment(request: Request, appointment: AppointmentCreate, b
 
         user_id = decoded_token.get("user_id")
         
-        # Get Redis client
+        # Get Redis clients
         redis_client = await get_redis_client()
-        
-        # Try to get user from cache
-        user_cache_key = f"user:{user_id}"
-        cached_user = await redis_client.get(user_cache_key)
-        
-        if cached_user:
-            user_data = json.loads(cached_user)
-            user = db.query(User).filter(User.id == user_id).first()
-        else:
-            user = db.query(User).filter(User.id == user_id).first()
-            if user:
-                # Cache user data as JSON
-                user_data = {
-                    "id": str(user.id),
-                    "user_type": str(user.user_type),
-                    "default_clinic_id": str(user.default_clinic_id) if user.default_clinic_id else None
-                }
-                await redis_client.setex(user_cache_key, 1800, json.dumps(user_data))
+        cache_client = await get_redis_cache_client()
 
-        if not user or str(user.user_type) != "doctor":
-            return JSONResponse(status_code=401, content={"message": "Unauthorized - doctor access required"})
-        
         # Validate patient
         if not appointment.patient_id:
             return JSONResponse(status_code=400, content={"message": "Patient ID is required"})
-        
-        # Try to get patient from cache
-        patient_cache_key = f"patient:{appointment.patient_id}"
-        cached_patient = await redis_client.get(patient_cache_key)
-        
-        if cached_patient:
-            patient_data = json.loads(cached_patient)
-            patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
-        else:
-            patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
-            if patient:
-                # Cache patient data as JSON
-                patient_data = {
-                    "id": str(patient.id),
-                    "name": patient.name,
-                    "patient_number": patient.patient_number if hasattr(patient, 'patient_number') else None
-                }
-                await redis_client.setex(patient_cache_key, 1800, json.dumps(patient_data))
-                
+
+        # Fetch the user, doctor, patient and clinic summaries in one cache round trip
+        entities = await get_entities(cache_client, db, {
+            "user": [user_id, appointment.doctor_id],
+            "patient": [appointment.patient_id],
+            "clinic": [appointment.clinic_id]
+        })
+        user = entities["user"].get(user_id)
+        if not user or user["user_type"] != "doctor":
+            return JSONResponse(status_code=401, content={"message": "Unauthorized - doctor access required"})
+
+        patient = entities["patient"].get(appointment.patient_id)
         if not patient:
             return JSONResponse(status_code=404, content={"message": "Patient not found"})
 
         # Validate/set doctor
         doctor = user
         if appointment.doctor_id:
-            # Try to get doctor from cache
-            doctor_cache_key = f"user:{appointment.doctor_id}"
-            cached_doctor = await redis_client.get(doctor_cache_key)
-            
-            if cached_doctor:
-                doctor_data = json.loads(cached_doctor)
-                doctor = db.query(User).filter(User.id == appointment.doctor_id).first()
-            else:
-                doctor = db.query(User).filter(User.id == appointment.doctor_id).first()
-                if doctor:
-                    # Cache doctor data as JSON
-                    doctor_data = {
-                        "id": str(doctor.id),
-                        "name": doctor.name,
-                        "user_type": str(doctor.user_type)
-                    }
-                    await redis_client.setex(doctor_cache_key, 1800, json.dumps(doctor_data))
-                    
-            if not doctor or str(doctor.user_type) != "doctor":
+            doctor = entities["user"].get(appointment.doctor_id)
+            if not doctor or doctor["user_type"] != "doctor":
                 return JSONResponse(status_code=404, content={"message": "Doctor not found"})
 
         # Validate/set clinic
         clinic = None
         if appointment.clinic_id:
-            clinic_id = appointment.clinic_id
-            # Try to get clinic from cache
-            clinic_cache_key = f"clinic:{clinic_id}"
-            cached_clinic = await redis_client.get(clinic_cache_key)
-            
-            if cached_clinic:
-                clinic_data = json.loads(cached_clinic)
-                clinic = db.query(Clinic).filter(Clinic.id == clinic_id).first()
-            else:
-                clinic = db.query(Clinic).filter(Clinic.id == clinic_id).first()
-                if clinic:
-                    # Cache clinic data as JSON
-                    clinic_data = {
-                        "id": str(clinic.id),
-                        "name": clinic.name
-                    }
-                    await redis_client.setex(clinic_cache_key, 1800, json.dumps(clinic_data))
-                    
+            clinic = entities["clinic"].get(appointment.clinic_id)
             if not clinic:
                 return JSONResponse(status_code=404, content={"message": "Clinic not found"})
-        elif user.default_clinic_id:
-            clinic_id = user.default_clinic_id
-            # Try to get clinic from cache
-            clinic_cache_key = f"clinic:{clinic_id}"
-            cached_clinic = await redis_client.get(clinic_cache_key)
-            
-            if cached_clinic:
-                clinic_data = json.loads(cached_clinic)
-                clinic = db.query(Clinic).filter(Clinic.id == clinic_id).first()
-            else:
-                clinic = db.query(Clinic).filter(Clinic.id == clinic_id).first()
-                if clinic:
-                    # Cache clinic data as JSON
-                    clinic_data = {
-                        "id": str(clinic.id),
-                        "name": clinic.name
-                    }
-                    await redis_client.setex(clinic_cache_key, 1800, json.dumps(clinic_data))
+        elif user["default_clinic_id"]:
+            clinic = await get_entity(cache_client, db, "clinic", user["default_clinic_id"])
 
         # Validate status
         status = appointment.status
         if status.upper() not in ["SCHEDULED", "CANCELLED", "CHECKED_IN", "COMPLETED"]:
             return JSONResponse(status_code=400, content={"message": "Invalid status. Must be either 'SCHEDULED', 'CANCELLED', 'CHECKED_IN' or 'COMPLETED'"})
 
+        # Reject slots that overlap another active appointment of the doctor
+        if appointment.start_time and appointment.end_time:
+            if appointment.end_time <= appointment.start_time:
+                return JSONResponse(status_code=400, content={"message": "End time must be after start time"})
+            # Conflict checks only look back MAX_DURATION, so longer appointments would go unseen
+            if appointment.end_time - appointment.start_time > MAX_DURATION:
+                return JSONResponse(status_code=400, content={"message": f"Appointments can't be longer than {APPOINTMENT_MAX_DURATION_MINUTES} minutes"})
+            if status.lower() != AppointmentStatus.CANCELLED.value:
+                conflict = find_conflict(db, doctor["id"], appointment.start_time, appointment.end_time, lock=True)
+                if conflict:
+                    return JSONResponse(status_code=409, content={
+                        "message": "Doctor already has an appointment in this time slot",
+                        "conflicting_appointment_id": conflict.id
+                    })
+
         new_appointment = Appointment(
-            patient_id=patient.id,
-            patient_number=patient.patient_number if hasattr(patient, 'patient_number') else None,
-            patient_name=patient.name,
-            doctor_id=doctor.id,
-            doctor_name=doctor.name,
+            patient_id=patient["id"],
+            patient_number=patient["patient_number"],
+            patient_name=patient["name"],
+            doctor_id=doctor["id"],
+            doctor_name=doctor["name"],
             notes=appointment.notes,
             appointment_date=appointment.appointment_date,
             start_time=appointment.start_time,
@@ -260,23 +200,17 @@ async def create_appointment(request: Request, appointment: AppointmentCreate, b
             share_on_whatsapp=appointment.share_on_whatsapp,
         )
         if clinic:
-            new_appointment.clinic_id = clinic.id
+            new_appointment.clinic_id = clinic["id"]
 
         db.add(new_appointment)
         db.commit()
         db.refresh(new_appointment)
 
-        # Invalidate relevant cache entries
-        await redis_client.delete(f"appointments:doctor:{doctor.id}")
-        await redis_client.delete(f"appointments:patient:{patient.id}")
-        if clinic:
-            await redis_client.delete(f"appointments:clinic:{clinic.id}")
-        
-        # Invalidate stats cache
-        await redis_client.delete(f"appointment_stats:doctor:{doctor.id}")
+        # Invalidate cached lists, stats and searches for this doctor and clinic
+        await invalidate_appointments(redis_client, [doctor["id"]], [new_appointment.clinic_id])
 
         if new_appointment.share_on_email:
-            background_tasks.add_task(send_appointment_email, db, new_appointment.id)
+            queue_appointment_email(new_appointment.id)
 
         return JSONResponse(status_code=201, content={"message": "Appointment created successfully", "appointment_id": new_appointment.id})
     except SQLAlchemyError as e:
@@ -284,9 +218,6 @@ async def create_appointment(request: Request, appointment: AppointmentCreate, b
         return JSONResponse(status_code=500, content={"message": f"Database error: {str(e)}"})
     except Exception as e:
         return JSONResponse(status_code=500, content={"message": str(e)})
-    finally:
-        # Close Redis connection
-        await close_redis_connection()
 
 @appointment_router.get("/all",
     response_model=dict,
@@ -420,38 +351,16 @@ async def get_all_appointments(
         
         user_id = decoded_token["user_id"]
         
-        # Get Redis client
+        # Get Redis clients
         redis_client = await get_redis_client()
+        cache_client = await get_redis_cache_client()
         
-        # Try to get user from cache
-        user_cache_key = f"user:{user_id}"
-        cached_user = await redis_client.get(user_cache_key)
-        
-        if cached_user:
-            user_data = json.loads(cached_user)
-            user_type = user_data.get("user_type")
-            default_clinic_id = user_data.get("default_clinic_id")
-        else:
-            # Fast user validation with minimal columns
-            user = db.execute(
-                select(User.id, User.user_type, User.default_clinic_id)
-                .where(User.id == user_id)
-                .limit(1)
-            ).first()
-            
-            if not user:
-                return JSONResponse(status_code=401, content={"message": "Unauthorized"})
-            
-            user_type = user.user_type
-            default_clinic_id = user.default_clinic_id
-            
-            # Cache user data as JSON
-            user_data = {
-                "id": str(user.id),
-                "user_type": str(user.user_type),
-                "default_clinic_id": str(user.default_clinic_id) if user.default_clinic_id else None
-            }
-            await redis_client.setex(user_cache_key, 1800, json.dumps(user_data))
+        user = await get_entity(cache_client, db, "user", user_id)
+        if not user:
+            return JSONResponse(status_code=401, content={"message": "Unauthorized"})
+
+        user_type = user["user_type"]
+        default_clinic_id = user["default_clinic_id"]
         
         if str(user_type) != "doctor":
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
@@ -478,23 +387,27 @@ async def get_all_appointments(
         _, last_day = calendar.monthrange(filter_year, filter_month)
         end_of_month = datetime(filter_year, filter_month, last_day, 23, 59, 59)
         
-        # Create cache keys
-        cache_key_base = f"appointments:doctor:{user_id}:month:{filter_month}-{filter_year}"
+        # Create cache keys. The list is per clinic and the stats per doctor; both embed
+        # their tag's generation so any appointment write makes them unreachable.
+        list_generation, stats_generation = await get_generations(
+            redis_client, [appointment_list_tag(user_id, default_clinic_id), doctor_tag(user_id)]
+        )
+        stats_cache_key = f"appointment_stats:doctor:{user_id}:v{stats_generation}"
+        cache_key_base = f"appointments:doctor:{user_id}:v{list_generation}:month:{filter_month}-{filter_year}"
         appointments_cache_key = f"{cache_key_base}:page:{page}:per_page:{per_page}:sort:{sort_by}:{sort_order}"
         total_cache_key = f"{cache_key_base}:total"
         
         # Try to get cached data
-        cached_appointments = await redis_client.get(appointments_cache_key)
-        cached_total = await redis_client.get(total_cache_key)
+        cached_appointments, cached_total = await cache_get_many(cache_client, [appointments_cache_key, total_cache_key])
         
         appointment_list = []
         total = 0
         
         if cached_total:
-            total = int(cached_total)
+            total = cached_total
         
-        if cached_appointments and cached_total:
-            appointment_list = json.loads(cached_appointments)
+        if cached_appointments is not None and cached_total is not None:
+            appointment_list = cached_appointments
         else:
             # Prepare sort column
             valid_sort_fields = {col.name: col for col in Appointment.__table__.columns}
@@ -521,12 +434,11 @@ async def get_all_appointments(
             # If no appointments exist, return early with empty results
             if not has_appointments:
                 # Cache empty results for 5 minutes
-                await redis_client.setex(appointments_cache_key, 300, json.dumps([]))
-                await redis_client.setex(total_cache_key, 300, "0")
+                await cache_set(cache_client, appointments_cache_key, [], 300)
+                await cache_set(cache_client, total_cache_key, 0, 300)
                 
-                stats_cache_key = f"appointment_stats:doctor:{user_id}"
-                empty_stats = json.dumps({"today": 0, "this_month": 0, "this_year": 0, "overall": 0})
-                await redis_client.setex(stats_cache_key, 300, empty_stats)
+                empty_stats = {"today": 0, "this_month": 0, "this_year": 0, "overall": 0}
+                await cache_set(cache_client, stats_cache_key, empty_stats, 300)
                 
                 return JSONResponse(status_code=200, content={
                     "appointments": [],
@@ -552,7 +464,7 @@ async def get_all_appointments(
             ) or 0
             
             # Cache the total for 5 minutes
-            await redis_client.setex(total_cache_key, 300, str(total))
+            await cache_set(cache_client, total_cache_key, total, 300)
             
             # Only fetch appointments if we have results and they're on a valid page
             if total > 0 and (page - 1) * per_page < total:
@@ -570,66 +482,16 @@ async def get_all_appointments(
                     patient_ids = {a.patient_id for a in appointments if a.patient_id}
                     doctor_ids = {a.doctor_id for a in appointments if a.doctor_id}
                     
-                    # Fetch all related patients and doctors in bulk if needed
-                    patients = {}
-                    if patient_ids:
-                        # Try to get patients from cache first
-                        for patient_id in patient_ids:
-                            patient_cache_key = f"patient:{patient_id}"
-                            cached_patient = await redis_client.get(patient_cache_key)
-                            if cached_patient:
-                                patients[patient_id] = json.loads(cached_patient)
-                        
-                        # Fetch missing patients from database
-                        missing_patient_ids = [pid for pid in patient_ids if pid not in patients]
-                        if missing_patient_ids:
-                            db_patients = db.execute(
-                                select(Patient)
-                                .where(Patient.id.in_(missing_patient_ids))
-                                .execution_options(populate_existing=True)
-                            ).scalars().all()
-                            
-                            for patient in db_patients:
-                                patient_data = {
-                                    "id": str(patient.id),
-                                    "name": patient.name,
-                                    "email": patient.email,
-                                    "mobile_number": patient.mobile_number,
-                                    "date_of_birth": patient.date_of_birth.isoformat() if patient.date_of_birth else None,
-                                    "gender": patient.gender.value if hasattr(patient.gender, 'value') else str(patient.gender)
-                                }
-                                patients[patient.id] = patient_data
-                                # Cache patient for 30 minutes
-                                await redis_client.setex(f"patient:{patient.id}", 1800, json.dumps(patient_data))
-                    
-                    doctors = {}
-                    if doctor_ids:
-                        # Try to get doctors from cache first
-                        for doctor_id in doctor_ids:
-                            doctor_cache_key = f"user:{doctor_id}"
-                            cached_doctor = await redis_client.get(doctor_cache_key)
-                            if cached_doctor:
-                                doctors[doctor_id] = json.loads(cached_doctor)
-                        
-                        # Fetch missing doctors from database
-                        missing_doctor_ids = [did for did in doctor_ids if did not in doctors]
-                        if missing_doctor_ids:
-                            db_doctors = db.execute(
-                                select(User)
-                                .where(User.id.in_(missing_doctor_ids))
-                                .execution_options(populate_existing=True)
-                            ).scalars().all()
-                            
-                            for doctor in db_doctors:
-                                doctor_data = {
-                                    "id": str(doctor.id),
-                                    "name": doctor.name,
-                                    "email": doctor.email,
-                                    "phone": doctor.phone
-                                }
-                                doctors[doctor.id] = doctor_data
-                                # Cache doctor for 30 minutes
-                                await redis_client.setex(f"user:{doctor.id}", 1800, json.dumps(doctor_data))
+                    # Fetch all related patients and doctors in one cache round trip
+                    entities = await get_entities(cache_client, db, {"patient": patient_ids, "user": doctor_ids})
+                    patients = {
+                        patient_id: {field: patient[field] for field in ["id", "name", "email", "mobile_number", "date_of_birth", "gender"]}
+                        for patient_id, patient in entities["patient"].items()
+                    }
+                    doctors = {
+                        doctor_id: {field: doctor[field] for field in ["id", "name", "email", "phone"]}
+                        for doctor_id, doctor in entities["user"].items()
+                    }
                     
                     # Build response with pre-fetched related data
                     for appointment in appointments:
@@ -662,14 +524,13 @@ async def get_all_appointments(
                         appointment_list.append(appointment_data)
                 
                 # Cache the appointments for 5 minutes
-                await redis_client.setex(appointments_cache_key, 300, json.dumps(appointment_list))
+                await cache_set(cache_client, appointments_cache_key, appointment_list, 300)
         
         # Get stats from cache or database
-        stats_cache_key = f"appointment_stats:doctor:{user_id}"
-        cached_stats = await redis_client.get(stats_cache_key)
+        cached_stats = await cache_get(cache_client, stats_cache_key)
         
         if cached_stats:
-            stats = json.loads(cached_stats)
+            stats = cached_stats
         else:
             today = now.date()
             today_start = datetime.combine(today, time.min)
@@ -696,7 +557,7 @@ async def get_all_appointments(
             }
             
             # Cache stats for 5 minutes
-            await redis_client.setex(stats_cache_key, 300, json.dumps(stats))
+            await cache_set(cache_client, stats_cache_key, stats, 300)
 
         # Calculate pagination once
         pages = (total + per_page - 1) // per_page if total else 0
@@ -715,9 +576,6 @@ async def get_all_appointments(
         import traceback
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"message": str(e)})
-    finally:
-        # Close Redis connection
-        await close_redis_connection()
 
 @appointment_router.get("/patient-appointments/{patient_id}",
     response_model=dict,
@@ -834,8 +692,8 @@ async def get_patient_appointments(
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id") if decoded_token else None
         
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, user_id)
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
         patient = db.query(Patient).filter(Patient.id == patient_id).first()
@@ -882,6 +740,10 @@ async def get_patient_appointments(
         appointments = query.order_by(Appointment.appointment_date.desc(), Appointment.created_at.desc()).offset(offset).limit(per_page).all()
 
         appointment_list = []
+        entities = await get_entities(await get_redis_cache_client(), db, {
+            "user": [appointment.doctor_id for appointment in appointments],
+            "patient": [appointment.patient_id for appointment in appointments]
+        })
         
         for appointment in appointments:
             # Get related records with optimized queries
@@ -938,29 +800,29 @@ async def get_patient_appointments(
                 .all()
             )
 
-            doctor = db.query(User).filter(User.id == appointment.doctor_id).first()
-            patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
+            doctor = entities["user"].get(appointment.doctor_id)
+            patient = entities["patient"].get(appointment.patient_id)
 
             doctor_data = None
             patient_data = None
 
             if doctor:
                 doctor_data = {
-                    "id": doctor.id,
-                    "name": doctor.name,
-                    "email": doctor.email,
-                    "phone": doctor.phone,
-                    "color_code": doctor.color_code
+                    "id": doctor["id"],
+                    "name": doctor["name"],
+                    "email": doctor["email"],
+                    "phone": doctor["phone"],
+                    "color_code": doctor["color_code"]
                 }
 
             if patient:
                 patient_data = {
-                    "id": patient.id,
-                    "name": patient.name,
-                    "email": patient.email,
-                    "mobile_number": patient.mobile_number,
-                    "date_of_birth": patient.date_of_birth.isoformat() if patient.date_of_birth else None,
-                    "gender": patient.gender.value
+                    "id": patient["id"],
+                    "name": patient["name"],
+                    "email": patient["email"],
+                    "mobile_number": patient["mobile_number"],
+                    "date_of_birth": patient["date_of_birth"],
+                    "gender": patient["gender"]
                 }
             # Format response data
             appointment_data = {
@@ -1250,29 +1112,25 @@ async def search_appointments(
             f"{user_id}:{doctor_id}:{patient_name}:{patient_email}:{patient_phone}:{doctor_name}:{doctor_email}:{doctor_phone}:{patient_gender}:{clinic_id}:{status}:{appointment_date}:{today}:{recent}:{month}:{page}:{per_page}:{sort_by}:{sort_order}".encode()
         ).hexdigest()
         
-        cache_key = f"appointments:search:{params_hash}"
-        stats_cache_key = f"appointments:stats:{user_id}"
-        
         # Use Redis directly without connection pool
         redis = await get_redis_client()
+
+        # Searches can span doctors and clinics, so they follow the global appointment generation
+        search_generation, stats_generation = await get_generations(redis, [ALL_APPOINTMENTS_TAG, doctor_tag(user_id)])
+        cache_key = f"appointments:search:v{search_generation}:{params_hash}"
+        stats_cache_key = f"appointments:stats:{user_id}:v{stats_generation}"
         
-        # Try to get cached result
-        cached_result = await redis.get(cache_key)
-        cached_stats = await redis.get(stats_cache_key)
+        # Try to get cached result; unreadable entries come back as misses
+        cache_client = await get_redis_cache_client()
+        cached_result, cached_stats = await cache_get_many(cache_client, [cache_key, stats_cache_key])
         
         if cached_result:
-            try:
-                # Handle bytes to string conversion properly
-                cached_result_str = cached_result.decode('utf-8') if isinstance(cached_result, bytes) else cached_result
-                return JSONResponse(status_code=200, content=orjson.loads(cached_result_str))
-            except Exception as e:
-                logging.error(f"Error parsing cached result: {str(e)}")
-                # Continue with normal flow if cache parsing fails
+            return JSONResponse(status_code=200, content=cached_result)
         
-        # Check user type with optimized query
-        user = db.execute(select(User.user_type).where(User.id == user_id)).scalar_one_or_none()
+        # Check user type against the cached user summary
+        user = await get_entity(cache_client, db, "user", user_id)
         
-        if not user or str(user) != "doctor":
+        if not user or user["user_type"] != "doctor":
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
         # Build optimized query with specific column selection and prefetching
@@ -1324,13 +1182,16 @@ async def search_appointments(
         if patient_email:
             conditions.append(func.lower(Patient.email).contains(patient_email.lower()))
         if patient_phone:
-            conditions.append(Patient.mobile_number.contains(patient_phone))
+            # A complete number is an exact indexed lookup; partial input still matches anywhere
+            patient_e164 = normalize_phone(patient_phone)
+            conditions.append(Patient.mobile_e164 == patient_e164 if patient_e164 else Patient.mobile_number.contains(patient_phone))
         if doctor_name:
             conditions.append(func.lower(User.name).contains(doctor_name.lower()))
         if doctor_email:
             conditions.append(func.lower(User.email).contains(doctor_email.lower()))
         if doctor_phone:
-            conditions.append(User.phone.contains(doctor_phone))
+            doctor_e164 = normalize_phone(doctor_phone)
+            conditions.append(User.phone_e164 == doctor_e164 if doctor_e164 else User.phone.contains(doctor_phone))
         if doctor_id:
             conditions.append(Appointment.doctor_id == doctor_id)
         if patient_gender:
@@ -1443,16 +1304,7 @@ async def search_appointments(
             appointment_list.append(appointment_data)
 
         # Get stats from cache or compute them
-        stats = None
-        if cached_stats:
-            try:
-                # Handle bytes to string conversion properly
-                cached_stats_str = cached_stats.decode('utf-8') if isinstance(cached_stats, bytes) else cached_stats
-                stats = orjson.loads(cached_stats_str)
-            except Exception as e:
-                logging.error(f"Error parsing cached stats: {str(e)}")
-                # Continue with stats computation if cache parsing fails
-                stats = None
+        stats = cached_stats
         
         if not stats:
             now = datetime.now()
@@ -1496,7 +1348,7 @@ async def search_appointments(
             
             # Cache stats for 30 minutes
             try:
-                await redis.set(stats_cache_key, orjson.dumps(stats), ex=1800)
+                await cache_set(cache_client, stats_cache_key, stats, 1800)
             except Exception as e:
                 logging.error(f"Error caching stats: {str(e)}")
 
@@ -1512,9 +1364,9 @@ async def search_appointments(
             "stats": stats
         }
         
-        # Cache the result for 10 minutes with orjson for faster serialization
+        # Cache the result for 10 minutes
         try:
-            await redis.set(cache_key, orjson.dumps(response_data), ex=600)
+            await cache_set(cache_client, cache_key, response_data, 600)
         except Exception as e:
             logging.error(f"Error caching response: {str(e)}")
         
@@ -1525,6 +1377,166 @@ async def search_appointments(
         logging.error(f"Error in search_appointments: {str(e)}", exc_info=True)
         return JSONResponse(status_code=500, content={"message": str(e)})
 
+@appointment_router.get("/availability",
+    response_model=dict,
+    status_code=200,
+    summary="Get free appointment slots for a doctor",
+    description="""
+    List the free slots of a doctor for each day in a date range. A slot is free when it does not
+    overlap any appointment of the doctor that isn't cancelled.
+
+    **Query parameters:**
+    - doctor_id (str): Doctor's unique identifier (defaults to the authenticated doctor)
+    - start_date (date): First day, YYYY-MM-DD (default: today)
+    - end_date (date): Last day, YYYY-MM-DD (default: start_date, at most 31 days after it)
+    - slot_minutes (int): Slot length in minutes, 5-240 (default: 30)
+    - day_start (str): Start of the working day, HH:MM (default: AVAILABILITY_DAY_START)
+    - day_end (str): End of the working day, HH:MM (default: AVAILABILITY_DAY_END)
+
+    **Authentication:**
+    - Requires valid doctor Bearer token
+
+    **Response:**
+    ```json
+    {
+        "doctor_id": "uuid",
+        "slot_minutes": 30,
+        "days": [
+            {
+                "date": "2025-04-10",
+                "free_slots": [
+                    {"start": "2025-04-10T09:00:00", "end": "2025-04-10T09:30:00"}
+                ]
+            }
+        ]
+    }
+    ```
+    """,
+    responses={
+        200: {"description": "Free slots per day"},
+        400: {
+            "description": "Invalid date range, slot length or working hours",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Invalid date format. Use YYYY-MM-DD"}
+                }
+            }
+        },
+        401: {
+            "description": "Authentication failed or non-doctor user",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Unauthorized"}
+                }
+            }
+        },
+        404: {
+            "description": "Doctor not found",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Doctor not found"}
+                }
+            }
+        },
+        500: {
+            "description": "Server error occurred",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error message"}
+                }
+            }
+        }
+    }
+)
+async def get_availability(
+    request: Request,
+    doctor_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    slot_minutes: int = 30,
+    day_start: str = AVAILABILITY_DAY_START,
+    day_end: str = AVAILABILITY_DAY_END,
+    db: Session = Depends(get_db)
+):
+    try:
+        decoded_token = verify_token(request)
+        if not decoded_token or "user_id" not in decoded_token:
+            return JSONResponse(status_code=401, content={"message": "Unauthorized"})
+
+        user_id = decoded_token["user_id"]
+        redis_client = await get_redis_client()
+        cache_client = await get_redis_cache_client()
+
+        users = (await get_entities(cache_client, db, {"user": [user_id, doctor_id]}))["user"]
+        user = users.get(user_id)
+        if not user or user["user_type"] != "doctor":
+            return JSONResponse(status_code=401, content={"message": "Unauthorized"})
+
+        doctor = users.get(doctor_id) if doctor_id else user
+        if not doctor or doctor["user_type"] != "doctor":
+            return JSONResponse(status_code=404, content={"message": "Doctor not found"})
+
+        try:
+            first_day = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else datetime.now().date()
+            last_day = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else first_day
+        except ValueError:
+            return JSONResponse(status_code=400, content={"message": "Invalid date format. Use YYYY-MM-DD"})
+        if last_day < first_day or (last_day - first_day).days > 31:
+            return JSONResponse(status_code=400, content={"message": "end_date must be on or after start_date and at most 31 days later"})
+
+        try:
+            opens = datetime.strptime(day_start, "%H:%M").time()
+            closes = datetime.strptime(day_end, "%H:%M").time()
+        except ValueError:
+            return JSONResponse(status_code=400, content={"message": "Invalid working hours. Use HH:MM"})
+        if closes <= opens or not 5 <= slot_minutes <= 240:
+            return JSONResponse(status_code=400, content={"message": "Working day must end after it starts and slot_minutes must be between 5 and 240"})
+
+        days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+
+        # Busy intervals are cached per day under the doctor's generation, so any
+        # appointment write for the doctor refreshes them. Slot length and working
+        # hours are applied afterwards and don't fragment the cache.
+        (generation,) = await get_generations(redis_client, [doctor_tag(doctor["id"])])
+        cache_keys = [f"availability:doctor:{doctor['id']}:v{generation}:{day.isoformat()}" for day in days]
+        cached_days = await cache_get_many(cache_client, cache_keys)
+
+        busy = {}
+        missing = []
+        for day, cached in zip(days, cached_days):
+            if cached is None:
+                missing.append(day)
+            else:
+                busy[day] = [(datetime.fromisoformat(start), datetime.fromisoformat(end)) for start, end in cached]
+
+        if missing:
+            loaded = busy_intervals_by_day(db, doctor["id"], missing)
+            busy.update(loaded)
+            for day, intervals in loaded.items():
+                await cache_set(
+                    cache_client,
+                    f"availability:doctor:{doctor['id']}:v{generation}:{day.isoformat()}",
+                    [[start.isoformat(), end.isoformat()] for start, end in intervals],
+                    AVAILABILITY_CACHE_SECONDS
+                )
+
+        return JSONResponse(status_code=200, content={
+            "doctor_id": doctor["id"],
+            "slot_minutes": slot_minutes,
+            "days": [
+                {
+                    "date": day.isoformat(),
+                    "free_slots": [
+                        {"start": start.isoformat(), "end": end.isoformat()}
+                        for start, end in free_slots(busy[day], day, opens, closes, slot_minutes)
+                    ]
+                }
+                for day in days
+            ]
+        })
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"message": str(e)})
+
 @appointment_router.get("/details/{appointment_id}",
     response_model=dict,
     status_code=200,
@@ -1661,8 +1673,8 @@ async def get_appointment_details(
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id")
         
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, user_id)
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
         # Get appointment with patient and doctor in single query
@@ -1955,8 +1967,8 @@ async def update_appointment(request: Request, appointment_id: str, appointment_
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, user_id)
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=401, content={"message": "Unauthorized - doctor access required"})
 
         # Get appointment
@@ -1964,6 +1976,9 @@ async def update_appointment(request: Request, appointment_id: str, appointment_
         if not appointment:
             return JSONResponse(status_code=404, content={"message": "Appointment not found"})
 
+        # Doctor or clinic may change below; both the old and new owners' caches go stale
+        previous_doctor_id, previous_clinic_id = appointment.doctor_id, appointment.clinic_id
+
         # Validate status if provided
         if appointment_update.status:
             status = appointment_update.status.upper()
@@ -1974,12 +1989,12 @@ async def update_appointment(request: Request, appointment_id: str, appointment_
             appointment.status = AppointmentStatus(status.lower())
 
         if appointment_update.doctor_id is not None:
-            doctor = db.query(User).filter(User.id == appointment_update.doctor_id).first()
+            doctor = await get_entity(await get_redis_cache_client(), db, "user", appointment_update.doctor_id)
             if not doctor:
                 return JSONResponse(status_code=404, content={"message": "Doctor not found"})
             appointment.doctor_id = appointment_update.doctor_id
         if appointment_update.clinic_id is not None:
-            clinic = db.query(Clinic).filter(Clinic.id == appointment_update.clinic_id).first()
+            clinic = await get_entity(await get_redis_cache_client(), db, "clinic", appointment_update.clinic_id)
             if not clinic:
                 return JSONResponse(status_code=404, content={"message": "Clinic not found"})
             appointment.clinic_id = appointment_update.clinic_id
@@ -2003,13 +2018,44 @@ async def update_appointment(request: Request, appointment_id: str, appointment_
             appointment.share_on_sms = appointment_update.share_on_sms
         if appointment_update.share_on_whatsapp is not None:
             appointment.share_on_whatsapp = appointment_update.share_on_whatsapp
+
+        # Only new times are validated: imported appointments can have no length and
+        # older ones can be longer than the limit, and other edits must keep working
+        retimed = appointment_update.start_time is not None or appointment_update.end_time is not None
+        if retimed:
+            if appointment.end_time <= appointment.start_time:
+                db.rollback()
+                return JSONResponse(status_code=400, content={"message": "End time must be after start time"})
+            if appointment.end_time - appointment.start_time > MAX_DURATION:
+                db.rollback()
+                return JSONResponse(status_code=400, content={"message": f"Appointments can't be longer than {APPOINTMENT_MAX_DURATION_MINUTES} minutes"})
+
+        # Moving the appointment, reassigning it or reactivating it must not double-book the doctor
+        rescheduled = retimed or appointment_update.doctor_id is not None or appointment_update.status is not None
+        if rescheduled and appointment.status != AppointmentStatus.CANCELLED:
+            conflict = find_conflict(db, appointment.doctor_id, appointment.start_time, appointment.end_time, exclude_id=appointment.id, lock=True)
+            if conflict:
+                db.rollback()
+                return JSONResponse(status_code=409, content={
+                    "message": "Doctor already has an appointment in this time slot",
+                    "conflicting_appointment_id": conflict.id
+                })
         
         db.commit()
         db.refresh(appointment)
 
+        await invalidate_appointments(
+            await get_redis_client(),
+            [previous_doctor_id, appointment.doctor_id],
+            [previous_clinic_id, appointment.clinic_id]
+        )
+
+        # Date or status changes move or drop the pending reminder
+        await sync_appointment_reminder(await get_redis_client(), appointment)
+
         # Send email notification if enabled
         if appointment.share_on_email:
-            background_tasks.add_task(send_appointment_email, db, appointment.id)
+            queue_appointment_email(appointment.id)
 
         return JSONResponse(status_code=200, content={
             "message": "Appointment updated successfully",
@@ -2082,8 +2128,8 @@ async def delete_appointment(request: Request, appointment_id: str, db: Session
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id") if decoded_token else None
         
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, user_id)
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
         appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
@@ -2093,6 +2139,9 @@ async def delete_appointment(request: Request, appointment_id: str, db: Session
 
         db.delete(appointment)
         db.commit()
+
+        await cancel_reminder(await get_redis_client(), appointment_id)
+        await invalidate_appointments(await get_redis_client(), [appointment.doctor_id], [appointment.clinic_id])
         
         return JSONResponse(status_code=200, content={"message": "Appointment deleted successfully"})
     except Exception as e:
@@ -2165,8 +2214,8 @@ async def check_in_appointment(request: Request, appointment_id: str, db: Sessio
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, user_id)
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
         # Find appointment
@@ -2186,6 +2235,8 @@ async def check_in_appointment(request: Request, appointment_id: str, db: Sessio
         appointment.status = AppointmentStatus.CHECKED_IN
         db.commit()
         db.refresh(appointment)
+
+        await invalidate_appointments(await get_redis_client(), [appointment.doctor_id], [appointment.clinic_id])
         
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": "Appointment checked in successfully",
@@ -2265,8 +2316,8 @@ async def check_out_appointment(request: Request, appointment_id: str, db: Sessi
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, user_id)
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
         # Find appointment
@@ -2286,6 +2337,8 @@ async def check_out_appointment(request: Request, appointment_id: str, db: Sessi
         appointment.status = AppointmentStatus.COMPLETED
         db.commit()
         db.refresh(appointment)
+
+        await invalidate_appointments(await get_redis_client(), [appointment.doctor_id], [appointment.clinic_id])
         
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": "Appointment checked out successfully",
@@ -2325,8 +2378,8 @@ async def update_appointment_status(request: Request, appointment_id: str, db: S
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
     
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, user_id)
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
         appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
@@ -2364,6 +2417,8 @@ async def update_appointment_status(request: Request, appointment_id: str, db: S
         
         db.commit()
         db.refresh(appointment)
+
+        await invalidate_appointments(await get_redis_client(), [appointment.doctor_id], [appointment.clinic_id])
         
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": status_message,
@@ -2446,8 +2501,8 @@ async def cancel_appointment(request: Request, appointment_id: str, db: Session
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, user_id)
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
         # Find appointment
@@ -2463,6 +2518,9 @@ async def cancel_appointment(request: Request, appointment_id: str, db: Session
         appointment.status = AppointmentStatus.CANCELLED
         db.commit()
         db.refresh(appointment)
+
+        await cancel_reminder(await get_redis_client(), appointment.id)
+        await invalidate_appointments(await get_redis_client(), [appointment.doctor_id], [appointment.clinic_id])
         
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": "Appointment cancelled successfully",
@@ -2554,8 +2612,8 @@ async def add_appointment_reminder(request: Request, appointment_id: str, appoin
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, user_id)
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
         # Find appointment
@@ -2578,6 +2636,8 @@ async def add_appointment_reminder(request: Request, appointment_id: str, appoin
         # If not sending reminder, just save the preferences
         if not appointment_reminder.send_reminder:
             db.commit()
+            await cancel_reminder(await get_redis_client(), appointment.id)
+            await invalidate_appointments(await get_redis_client(), [appointment.doctor_id], [appointment.clinic_id])
             return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Reminder preferences updated"})
         
         # Calculate reminder time
@@ -2590,25 +2650,14 @@ async def add_appointment_reminder(request: Request, appointment_id: str, appoin
                 content={"message": "Reminder time is in the past. Please choose a shorter reminder time."}
             )
         
-        # Remove any existing scheduled reminders for this appointment
-        for job in scheduler.get_jobs():
-            if job.id and job.id.startswith(f"reminder_{appointment.id}_"):
-                scheduler.remove_job(job.id)
-        
-        # Schedule the reminder
-        job_id = f"reminder_{appointment.id}_{reminder_time.timestamp()}"
-        scheduler.add_job(
-            send_email_sync, 
-            'date', 
-            run_date=reminder_time, 
-            args=[db, appointment.id],
-            id=job_id,
-            replace_existing=True
-        )
-        
         # Save changes to database
         db.commit()
         db.refresh(appointment)
+
+        # Schedule the reminder; an existing reminder for this appointment is replaced
+        await schedule_reminder(await get_redis_client(), appointment.id, reminder_time)
+        await invalidate_appointments(await get_redis_client(), [appointment.doctor_id], [appointment.clinic_id])
+        job_id = f"reminder_{appointment.id}_{reminder_time.timestamp()}"
         
         return JSONResponse(
             status_code=status.HTTP_200_OK, 
@@ -2694,7 +2743,7 @@ async def cancel_appointment_reminder(request: Request, appointment_id: str, db:
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id") if decoded_token else None
         
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
@@ -2707,18 +2756,15 @@ async def cancel_appointment_reminder(request: Request, appointment_id: str, db:
         if not appointment.send_reminder:
             return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "No reminder scheduled for this appointment"})
         
-        # Remove any existing scheduled reminders for this appointment
-        jobs_removed = 0
-        for job in scheduler.get_jobs():
-            if job.id and job.id.startswith(f"reminder_{appointment.id}_"):
-                scheduler.remove_job(job.id)
-                jobs_removed += 1
-        
         # Update appointment to remove reminder
         appointment.send_reminder = False
         appointment.remind_time_before = 0
         db.commit()
         db.refresh(appointment)
+
+        # Remove the scheduled reminder for this appointment
+        jobs_removed = await cancel_reminder(await get_redis_client(), appointment.id)
+        await invalidate_appointments(await get_redis_client(), [appointment.doctor_id], [appointment.clinic_id])
         
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": "Appointment reminder cancelled successfully",
@@ -2800,7 +2846,7 @@ async def add_file_to_appointment(
                 content={"message": "Authentication required"}
             )
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -2891,7 +2937,7 @@ async def get_files_for_appointment(request: Request, appointment_id: str, db: S
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
@@ -2959,7 +3005,7 @@ async def search_appointment_files(request: Request, remark: str, db: Session =
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
@@ -3029,7 +3075,7 @@ async def update_appointment_file(request: Request, appointment_file_id: str, fi
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
@@ -3103,7 +3149,7 @@ async def delete_appointment_file(request: Request, appointment_file_id: str, db
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized - doctor access required"})
         
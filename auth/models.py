@@ -1,4 +1,4 @@
-from sqlalchemy import String, DateTime, Boolean, Table, ForeignKey, Column, Float, Text, Enum as SQLAlchemyEnum, Integer
+from sqlalchemy import String, DateTime, Boolean, Table, ForeignKey, Column, Float, Text, Enum as SQLAlchemyEnum, Integer, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from db.db import Base
 from datetime import datetime
@@ -56,6 +56,8 @@ class User(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     email: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
     phone: Mapped[Optional[str]] = mapped_column(String(255), nullable=True, unique=True)
+    # E.164 form of phone, kept in step by utils/phone_columns.py; used for every phone lookup
+    phone_e164: Mapped[Optional[str]] = mapped_column(String(16), nullable=True, unique=True)
     password: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     bio: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     profile_pic: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
@@ -132,6 +134,9 @@ class ImportStatus(enum.Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    # Existing databases need: ALTER TABLE import_logs MODIFY status
+    # ENUM('PENDING', 'PROCESSING', 'COMPLETED', 'FAILED', 'CANCELLED') NOT NULL
+    CANCELLED = "cancelled"
 
 class ImportLog(Base):
     __tablename__ = "import_logs"
@@ -148,6 +153,8 @@ class ImportLog(Base):
     files_processed: Mapped[int] = mapped_column(Integer, nullable=True, default=0)
     total_files: Mapped[int] = mapped_column(Integer, nullable=True, default=0)
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Existing databases need: ALTER TABLE import_logs ADD COLUMN stage_timings JSON NULL
+    stage_timings: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True, comment="Per-stage start/finish times and durations keyed by stage")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
 
@@ -10,8 +10,7 @@ from utils.auth import (
     validate_email, validate_phone, validate_password, signJWT, decodeJWT,
     verify_password, get_password_hash, generate_reset_token, verify_token, decode_token
 )
-from utils.email import send_forgot_password_email
-from utils.send_otp import send_otp, send_otp_email
+from utils.send_otp import send_otp, send_otp_email, send_forgot_password_email
 from gauthuserinfo import get_user_info
 import zipfile
 import os
@@ -27,7 +26,36 @@ from sqlalchemy import func, desc, asc
 from suggestion.models import *
 import random
 import asyncio
-from multiprocessing import Process
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.availability import MAX_DURATION
+from utils.config import (
+    IMPORT_MAX_WORKERS, IMPORT_CHUNK_ROWS, IMPORT_CHUNK_RETRIES, IMPORT_PROGRESS_HEARTBEAT_SECONDS,
+    IMPORT_DRY_RUN_ROWS_PER_SECOND, IMPORT_MAX_UPLOAD_BYTES
+)
+from utils.import_queue import (
+    ImportCancelled, build_import_job, enqueue_import_job, cancel_import_job,
+    is_import_cancelled, record_chunk_retry, observed_rows_per_second
+)
+from utils.import_validation import profile_import_upload
+from utils.cache import bump_generations_sync, doctor_tag, ALL_APPOINTMENTS_TAG
+from utils.import_files import (
+    UploadTooLarge, save_upload, list_import_csvs, count_csv_rows, iter_csv_chunks, csv_text, csv_float, csv_int
+)
+from redis_client import get_redis_client, get_redis_cache_client, get_redis_pubsub_client, get_sync_redis_client
+from utils.entity_cache import get_authenticated_user, get_entity
+from utils.suggestion_store import upsert_suggestions, upsert_suggestion_sets
+import utils.suggestion_index  # registers the hooks that refresh autocomplete indexes after imports
+from utils.patient_index import patients_changed
+from utils.patient_age import birth_year_from
+from utils.phone import normalize_phone
+import utils.phone_columns  # registers the hooks that keep normalised phone columns in step
+from utils.suggestion_usage import record_usage
+from redis.exceptions import RedisError
+from utils.import_progress import (
+    serialize_import_log, publish_import_progress, import_progress_channel, diff_import_log
+)
 
 user_router = APIRouter()
 
@@ -122,7 +150,8 @@ async def register(user: UserCreateSchema, db: Session = Depends(get_db)):
         if db.query(User).filter(User.email == user.email).first():
             return JSONResponse(status_code=400, content={"error": "User already exists with this email"})
 
-        if db.query(User).filter(User.phone == user.phone).first():
+        phone_e164 = normalize_phone(user.phone)
+        if phone_e164 and db.query(User).filter(User.phone_e164 == phone_e164).first():
             return JSONResponse(status_code=400, content={"error": "User already exists with this phone number"})
         
         # Create new user
@@ -259,7 +288,8 @@ async def login(user: UserLoginSchema, db: Session = Depends(get_db)):
         
         # Phone login flow - trigger OTP
         if user.phone:
-            db_user = db.query(User).filter(User.phone == user.phone).first()
+            phone_e164 = normalize_phone(user.phone)
+            db_user = db.query(User).filter(User.phone_e164 == phone_e164).first() if phone_e164 else None
             if not db_user:
                 return JSONResponse(status_code=401, content={"error": "Invalid credentials"})
             
@@ -390,7 +420,8 @@ async def resend_otp(user: OtpLoginSchema, db: Session = Depends(get_db)):
         if not user.phone:
             return JSONResponse(status_code=400, content={"error": "Phone number is required"})
         
-        db_user = db.query(User).filter(User.phone == user.phone).first()
+        phone_e164 = normalize_phone(user.phone)
+        db_user = db.query(User).filter(User.phone_e164 == phone_e164).first() if phone_e164 else None
         if not db_user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         
@@ -830,7 +861,7 @@ async def search_clinic(
     try:
         # Verify user token
         decoded_token = verify_token(request)
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
 
@@ -838,7 +869,7 @@ async def search_clinic(
         from sqlalchemy import or_
         from auth.models import doctor_clinics
         
-        clinic_query = db.query(Clinic).join(doctor_clinics).filter(doctor_clinics.c.doctor_id == user.id)
+        clinic_query = db.query(Clinic).join(doctor_clinics).filter(doctor_clinics.c.doctor_id == user["id"])
 
         # Apply search if query parameter is provided
         if query:
@@ -872,7 +903,7 @@ async def search_clinic(
         clinics = clinic_query.all()
         clinics_data = []
         for clinic in clinics:
-            is_default = clinic.id == user.default_clinic_id
+            is_default = clinic.id == user["default_clinic_id"]
             clinics_data.append({
                 "id": str(clinic.id),
                 "name": clinic.name,
@@ -1019,7 +1050,7 @@ async def set_default_clinic(request: Request, clinic_id: str, db: Session = Dep
 async def update_clinic(request: Request,clinic_id: str, clinic: ClinicUpdateSchema, db: Session = Depends(get_db)):
     try:
         decoded_token = verify_token(request)
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         
@@ -1303,17 +1334,11 @@ async def forgot_password(user: ForgotPasswordSchema, request: Request, db: Sess
         db.commit()
         db.refresh(db_user)
 
-        # Create background tasks instance
-        background_tasks = BackgroundTasks()
+        send_forgot_password_email(user.email, reset_link)
         
-        # Add email sending task to background tasks
-        background_tasks.add_task(send_forgot_password_email, user.email, reset_link)
-        
-        # Return response with background tasks
         return JSONResponse(
             status_code=200,
-            content={"message": "Password reset email sent, please check your email for the reset link"},
-            background=background_tasks
+            content={"message": "Password reset email sent, please check your email for the reset link"}
         )
             
     except Exception as e:
@@ -1630,11 +1655,11 @@ async def update_profile(request: Request, image: UploadFile = File(None), db: S
         if phone:
             # Add phone validation logic here if needed
             # For example: check if it matches a specific format
-            if not isinstance(phone, str) or len(phone) < 8:
+            if not isinstance(phone, str) or not normalize_phone(phone):
                 return JSONResponse(status_code=400, content={"error": "Invalid phone number format"})
             
-            # Check if phone number is already taken by another user
-            existing_user = db.query(User).filter(User.phone == phone, User.id != db_user.id).first()
+            # Check if phone number is already taken by another user, in any format
+            existing_user = db.query(User).filter(User.phone_e164 == normalize_phone(phone), User.id != db_user.id).first()
             if existing_user:
                 return JSONResponse(status_code=400, content={"error": "Phone number already registered"})
 
@@ -2108,21 +2133,35 @@ rows_processed = 0
 percentage_completed = 0
 total_progress = 100
 
+progress_lock = threading.Lock()
+
 def update_progress(processed, total, importLog, db: Session):
     global percentage_completed, rows_processed
-    rows_processed += processed
-    
-    # Calculate new percentage
-    new_percentage = min((rows_processed / total) * 100, 100)
-    
-    # Only update if percentage has increased by at least 1%
-    if int(new_percentage) > int(percentage_completed) or new_percentage >= 100:
-        percentage_completed = new_percentage
-        importLog.progress = percentage_completed
-        db.commit()
-    else:
+    # Stages run concurrently on worker threads, so the shared counters are guarded
+    with progress_lock:
+        rows_processed += processed
+        
+        # Calculate new percentage
+        new_percentage = min((rows_processed / total) * 100, 100)
+        
+        # Only update if percentage has increased by at least 1%
+        should_commit = int(new_percentage) > int(percentage_completed) or new_percentage >= 100
         percentage_completed = new_percentage
 
+    if should_commit:
+        # Written on a separate short-lived session so progress commits never
+        # commit a half-processed chunk on the stage's own session
+        progress_db = SessionLocal()
+        try:
+            progress_db.query(ImportLog).filter(ImportLog.id == importLog.id).update(
+                {ImportLog.progress: int(new_percentage)}, synchronize_session=False
+            )
+            progress_db.commit()
+        finally:
+            progress_db.close()
+        # Bulk updates bypass the ORM events, so publish the new progress directly
+        publish_import_progress(importLog.user_id, importLog.id, {"progress": int(new_percentage)})
+
 async def process_patient_data(import_log: ImportLog, df: pd.DataFrame, db: Session, user: User):
     print("Processing patient data")
     
@@ -2140,6 +2179,16 @@ async def process_patient_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
 
     # Prepare bulk insert
     new_patients = []
+
+    # The doctor's existing patients, by number and by (E.164 mobile, name), loaded
+    # once so each row is checked in memory; rows added below join the sets, which
+    # also drops duplicates within the file. Blank numbers never identify a patient.
+    known_numbers, known_contacts = set(), set()
+    for number, mobile_e164, name in db.query(Patient.patient_number, Patient.mobile_e164, Patient.name).filter(Patient.doctor_id == user.id):
+        if number:
+            known_numbers.add(number)
+        if mobile_e164:
+            known_contacts.add((mobile_e164, (name or "").casefold()))
     
     for idx in range(len(df)):
         try:
@@ -2148,23 +2197,31 @@ async def process_patient_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
             
             row = df.iloc[idx]
             patient_number = str(row.get("Patient Number", "")).strip("'")
+            name = str(row.get("Patient Name", "")).strip("'")[:255]
+            mobile_number = str(row.get("Mobile Number", "")).strip("'")[:255]
+            mobile_e164 = normalize_phone(mobile_number)
             
             # Handle NaT values for dates by converting to None - use integer index
             dob = None if pd.isna(dob_series.iloc[idx]) else dob_series.iloc[idx].to_pydatetime()
             anniversary = None if pd.isna(anniversary_series.iloc[idx]) else anniversary_series.iloc[idx].to_pydatetime()
 
-            # Check if patient already exists for this doctor
-            existing_patient = db.query(Patient).filter(Patient.patient_number == patient_number, Patient.doctor_id == user.id).first()
-            if existing_patient:
-                # Skip this patient if already exists for this doctor
+            # Skip patients this doctor already has, under the same number or the same mobile and name
+            contact = (mobile_e164, name.casefold())
+            if (patient_number and patient_number in known_numbers) or (mobile_e164 and contact in known_contacts):
                 continue
+            if patient_number:
+                known_numbers.add(patient_number)
+            if mobile_e164:
+                known_contacts.add(contact)
                 
             new_patient = Patient(
                 doctor_id=user.id,
                 # clinic_id=clinic.id,
                 patient_number=patient_number,
-                name=str(row.get("Patient Name", "")).strip("'")[:255],
-                mobile_number=str(row.get("Mobile Number", "")).strip("'")[:255],
+                name=name,
+                mobile_number=mobile_number,
+                # bulk_save_objects skips the mapper hooks that derive this
+                mobile_e164=mobile_e164,
                 contact_number=str(row.get("Contact Number", ""))[:255],
                 email=str(row.get("Email Address", "")).strip("'")[:255],
                 secondary_mobile=str(row.get("Secondary Mobile", ""))[:255],
@@ -2176,6 +2233,8 @@ async def process_patient_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
                 national_id=str(row.get("National Id", ""))[:255],
                 date_of_birth=dob,
                 age=str(row.get("Age", ""))[:5],
+                # bulk_save_objects skips the mapper hooks that derive this
+                birth_year=birth_year_from(dob, row.get("Age", "")),
                 anniversary_date=anniversary,
                 blood_group=str(row.get("Blood Group", ""))[:50],
                 medical_history=str(row.get("Medical History", "")),
@@ -2189,8 +2248,6 @@ async def process_patient_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
         except Exception as e:
             print(f"Error processing patient row {idx}: {str(e)}")
             db.rollback()
-            import_log.status = ImportStatus.FAILED
-            db.commit()
             return JSONResponse(status_code=400, content={"error": f"Error processing patient row {idx}: {str(e)}"})
     
     # Bulk insert all patients at once
@@ -2199,17 +2256,18 @@ async def process_patient_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
             # Create a new session for bulk operations to avoid "Command Out of Sync" error
             db.bulk_save_objects(new_patients)
             db.flush()  # Flush changes to DB without committing transaction
-            
-            # Update import log status
-            import_log.status = ImportStatus.COMPLETED
             db.commit()
         except Exception as e:
             print(f"Error during bulk insert: {str(e)}")
             db.rollback()
-            import_log.status = ImportStatus.FAILED
-            db.commit()
             return JSONResponse(status_code=400, content={"error": f"Error during bulk insert: {str(e)}"})
 
+        # bulk_save_objects bypasses the session events that refresh patient search
+        try:
+            patients_changed([user.id])
+        except Exception as e:
+            print(f"Error bumping patient index version: {e}")
+
 async def process_appointment_data(import_log: ImportLog, df: pd.DataFrame, db: Session, user: User):
     print("Processing appointment data")
     try:
@@ -2278,14 +2336,20 @@ async def process_appointment_data(import_log: ImportLog, df: pd.DataFrame, db:
             except ValueError:
                 status = AppointmentStatus.SCHEDULED
             
+            start_time = row.get("Checked In At") if pd.notna(row.get("Checked In At")) else appointment_date
+            end_time = row.get("Checked Out At") if pd.notna(row.get("Checked Out At")) else appointment_date
+            # Conflict checks only look back MAX_DURATION; the real check-out time is kept in checked_out_at
+            if end_time - start_time > MAX_DURATION:
+                end_time = start_time + MAX_DURATION
+            
             # Create appointment object
             new_appointment = Appointment(
                 patient_id=patient.id,
                 patient_number=patient.patient_number,
                 patient_name=patient.name,
                 appointment_date=appointment_date,
-                start_time=row.get("Checked In At") if pd.notna(row.get("Checked In At")) else appointment_date,
-                end_time=row.get("Checked Out At") if pd.notna(row.get("Checked Out At")) else appointment_date,
+                start_time=start_time,
+                end_time=end_time,
                 checked_in_at=row.get("Checked In At") if pd.notna(row.get("Checked In At")) else None,
                 checked_out_at=row.get("Checked Out At") if pd.notna(row.get("Checked Out At")) else None,
                 status=status,
@@ -2304,8 +2368,6 @@ async def process_appointment_data(import_log: ImportLog, df: pd.DataFrame, db:
             # Use bulk_save_objects to avoid Command Out of Sync error
             db.bulk_save_objects(appointments)
             db.flush()  # Flush changes to DB without committing transaction yet
-            
-        import_log.status = ImportStatus.COMPLETED
         db.commit()
         return True
     except Exception as e:
@@ -2313,8 +2375,6 @@ async def process_appointment_data(import_log: ImportLog, df: pd.DataFrame, db:
         import traceback
         traceback.print_exc()
         db.rollback()
-        import_log.status = ImportStatus.FAILED
-        db.commit()
         return JSONResponse(status_code=400, content={"error": f"Error during appointment processing: {str(e)}"})
 
 async def process_treatment_data(import_log: ImportLog, df: pd.DataFrame, db: Session, user: User):
@@ -2448,85 +2508,10 @@ async def process_treatment_data(import_log: ImportLog, df: pd.DataFrame, db: Se
                 
                 # Clean and convert numeric fields
                 try:
-                    # Handle quantity
-                    quantity = treatment.get("Quantity")
-                    if quantity is not None:
-                        if isinstance(quantity, str):
-                            # Remove quotes and convert to integer
-                            quantity = quantity.strip().strip("'").strip('"')
-                            try:
-                                quantity = int(quantity)
-                            except ValueError:
-                                quantity = 1
-                        elif pd.isna(quantity):
-                            quantity = 1
-                        else:
-                            try:
-                                quantity = int(quantity)
-                            except ValueError:
-                                quantity = 1
-                    else:
-                        quantity = 1
-                    
-                    # Handle unit_cost
-                    unit_cost = treatment.get("Treatment Cost")
-                    if unit_cost is not None:
-                        if isinstance(unit_cost, str):
-                            unit_cost = unit_cost.strip().strip("'").strip('"')
-                            try:
-                                unit_cost = float(unit_cost)
-                            except ValueError:
-                                unit_cost = 0
-                        elif pd.isna(unit_cost):
-                            unit_cost = 0
-                        else:
-                            try:
-                                unit_cost = float(unit_cost)
-                            except ValueError:
-                                unit_cost = 0
-                    else:
-                        unit_cost = 0
-                    
-                    # Handle amount
-                    amount = treatment.get("Amount")
-                    if amount is not None:
-                        if isinstance(amount, str):
-                            amount = amount.strip().strip("'").strip('"')
-                            try:
-                                amount = float(amount)
-                            except ValueError:
-                                amount = 0
-                        elif pd.isna(amount):
-                            amount = 0
-                        else:
-                            try:
-                                amount = float(amount)
-                            except ValueError:
-                                amount = 0
-                    else:
-                        amount = 0
-                    
-                    # Handle discount
-                    discount = treatment.get("Discount")
-                    if discount is not None:
-                        if isinstance(discount, str):
-                            discount = discount.strip().strip("'").strip('"')
-                            if discount:
-                                try:
-                                    discount = float(discount)
-                                except ValueError:
-                                    discount = 0
-                            else:
-                                discount = 0
-                        elif pd.isna(discount):
-                            discount = 0
-                        else:
-                            try:
-                                discount = float(discount)
-                            except ValueError:
-                                discount = 0
-                    else:
-                        discount = 0
+                    quantity = csv_int(treatment.get("Quantity"), 1)
+                    unit_cost = csv_float(treatment.get("Treatment Cost"), 0)
+                    amount = csv_float(treatment.get("Amount"), 0)
+                    discount = csv_float(treatment.get("Discount"), 0)
                     
                     # Handle discount_type
                     discount_type = treatment.get("DiscountType")
@@ -2540,21 +2525,8 @@ async def process_treatment_data(import_log: ImportLog, df: pd.DataFrame, db: Se
                     else:
                         discount_type = "PERCENT"
                     
-                    # Handle tooth_number
-                    tooth_number = treatment.get("Tooth Number")
-                    if tooth_number is not None:
-                        if isinstance(tooth_number, str):
-                            tooth_number = tooth_number.strip().strip("'").strip('"')
-                        elif pd.isna(tooth_number):
-                            tooth_number = None
-                    
-                    # Handle treatment_notes
-                    treatment_notes = treatment.get("Treatment Notes")
-                    if treatment_notes is not None:
-                        if isinstance(treatment_notes, str):
-                            treatment_notes = treatment_notes.strip().strip("'").strip('"')
-                        elif pd.isna(treatment_notes):
-                            treatment_notes = None
+                    tooth_number = csv_text(treatment.get("Tooth Number"))
+                    treatment_notes = csv_text(treatment.get("Treatment Notes"))
                     
                     # Clean treatment name
                     if isinstance(treatment_name, str):
@@ -2589,29 +2561,13 @@ async def process_treatment_data(import_log: ImportLog, df: pd.DataFrame, db: Se
         # Bulk save all treatments
         if treatments:
             db.bulk_save_objects(treatments)
+            record_usage(db, treatments)
             db.flush()  # Flush changes to DB without committing transaction yet
         
         # Add treatment suggestions that don't already exist
-        existing_suggestions = {
-            s.treatment_name for s in 
-            db.query(TreatmentNameSuggestion.treatment_name)
-            .all()
-        }
-        new_suggestions = []
-        
-        for treatment_name in treatment_suggestions:
-            if treatment_name not in existing_suggestions:
-                new_suggestions.append(TreatmentNameSuggestion(
-                    treatment_name=treatment_name,
-                ))
-        
-        if new_suggestions:
-            db.bulk_save_objects(new_suggestions)
-            db.flush()  # Flush changes to DB without committing transaction yet
+        upsert_suggestions(db, "treatment", treatment_suggestions)
         
         print(f"Processed {len(treatments)} treatments.")
-        
-        import_log.status = ImportStatus.COMPLETED
         db.commit()
         return True
     except Exception as e:
@@ -2619,8 +2575,6 @@ async def process_treatment_data(import_log: ImportLog, df: pd.DataFrame, db: Se
         import traceback
         traceback.print_exc()
         db.rollback()
-        import_log.status = ImportStatus.FAILED
-        db.commit()
         return JSONResponse(status_code=400, content={"error": f"Error during treatment processing: {str(e)}"})
 
 def normalize_string(s: str) -> str:
@@ -2816,76 +2770,23 @@ async def process_clinical_note_data(import_log: ImportLog, df: pd.DataFrame, db
             db.bulk_save_objects(investigations)
         if notes:
             db.bulk_save_objects(notes)
+
+        # Bulk saves skip the session hooks that keep suggestion usage counts
+        record_usage(db, complaints + diagnoses + vital_signs + observations + investigations)
         
-        # Process suggestions in bulk
-        # Complaint suggestions
-        existing_complaints = {
-            s.complaint for s in 
-            db.query(ComplaintSuggestion.complaint).all()
-        }
-        new_complaint_suggestions = []
-        for complaint in complaint_suggestions:
-            if complaint not in existing_complaints:
-                new_complaint_suggestions.append(ComplaintSuggestion(complaint=complaint))
-        if new_complaint_suggestions:
-            db.bulk_save_objects(new_complaint_suggestions)
-        
-        # Diagnosis suggestions
-        existing_diagnoses = {
-            s.diagnosis for s in 
-            db.query(DiagnosisSuggestion.diagnosis).all()
-        }
-        new_diagnosis_suggestions = []
-        for diagnosis in diagnosis_suggestions:
-            if diagnosis not in existing_diagnoses:
-                new_diagnosis_suggestions.append(DiagnosisSuggestion(diagnosis=diagnosis))
-        if new_diagnosis_suggestions:
-            db.bulk_save_objects(new_diagnosis_suggestions)
-        
-        # Vital sign suggestions
-        existing_vital_signs = {
-            s.vital_sign for s in 
-            db.query(VitalSignSuggestion.vital_sign).all()
-        }
-        new_vital_sign_suggestions = []
-        for vital_sign in vital_sign_suggestions:
-            if vital_sign not in existing_vital_signs:
-                new_vital_sign_suggestions.append(VitalSignSuggestion(vital_sign=vital_sign))
-        if new_vital_sign_suggestions:
-            db.bulk_save_objects(new_vital_sign_suggestions)
-        
-        # Observation suggestions
-        existing_observations = {
-            s.observation for s in 
-            db.query(ObservationSuggestion.observation).all()
-        }
-        new_observation_suggestions = []
-        for observation in observation_suggestions:
-            if observation not in existing_observations:
-                new_observation_suggestions.append(ObservationSuggestion(observation=observation))
-        if new_observation_suggestions:
-            db.bulk_save_objects(new_observation_suggestions)
-        
-        # Investigation suggestions
-        existing_investigations = {
-            s.investigation for s in 
-            db.query(InvestigationSuggestion.investigation).all()
-        }
-        new_investigation_suggestions = []
-        for investigation in investigation_suggestions:
-            if investigation not in existing_investigations:
-                new_investigation_suggestions.append(InvestigationSuggestion(investigation=investigation))
-        if new_investigation_suggestions:
-            db.bulk_save_objects(new_investigation_suggestions)
+        # Add suggestions that don't already exist, one INSERT IGNORE per family
+        upsert_suggestion_sets(db, {
+            "complaint": complaint_suggestions,
+            "diagnosis": diagnosis_suggestions,
+            "vital_sign": vital_sign_suggestions,
+            "observation": observation_suggestions,
+            "investigation": investigation_suggestions
+        })
         
         # Commit all changes
         db.flush()
         db.commit()
         
-        # Update import log status
-        import_log.status = ImportStatus.COMPLETED
-        db.commit()
-        
         print(f"Clinical note data processed successfully. Created {clinical_notes_created} clinical notes. Skipped {skipped_notes} entries.")
         return True
         
@@ -2894,8 +2795,6 @@ async def process_clinical_note_data(import_log: ImportLog, df: pd.DataFrame, db
         import traceback
         traceback.print_exc()
         db.rollback()
-        import_log.status = ImportStatus.FAILED
-        db.commit()
         return JSONResponse(status_code=400, content={"error": f"Error during clinical notes processing: {str(e)}"})
 
 async def process_treatment_plan_data(import_log: ImportLog, df: pd.DataFrame, db: Session, user: User):
@@ -2922,7 +2821,7 @@ async def process_treatment_plan_data(import_log: ImportLog, df: pd.DataFrame, d
                 break
                 
         if cost_column:
-            df["UnitCost"] = pd.to_numeric(df[cost_column].astype(str).str.strip("'"), errors="coerce").fillna(0)
+            df["UnitCost"] = df[cost_column]
         else:
             # If no cost column exists, add a default UnitCost column
             df["UnitCost"] = 0
@@ -2941,17 +2840,6 @@ async def process_treatment_plan_data(import_log: ImportLog, df: pd.DataFrame, d
             df["Treatment Name"] = "Unknown Treatment"
             print("Warning: No treatment name column found. Using 'Unknown Treatment' as default.")
             
-        # Handle other numeric columns
-        for col, default in [
-            ("Quantity", 1),
-            ("Discount", 0),
-            ("Amount", 0)
-        ]:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col].astype(str).str.strip("'"), errors="coerce").fillna(default)
-            else:
-                df[col] = default
-        
         # Handle optional text columns
         for col, default in [
             ("Tooth Number", ""),
@@ -3055,9 +2943,9 @@ async def process_treatment_plan_data(import_log: ImportLog, df: pd.DataFrame, d
                     try:
                         # Clean data before using
                         treatment_name = str(row.get("Treatment Name", "Unknown Treatment")).strip()
-                        unit_cost = float(row.get("UnitCost", 0.0))
-                        quantity = int(row.get("Quantity", 1))
-                        discount = float(row.get("Discount", 0))
+                        unit_cost = csv_float(row.get("UnitCost"), 0.0)
+                        quantity = csv_int(row.get("Quantity"), 1)
+                        discount = csv_float(row.get("Discount"), 0)
                         discount_type = str(row.get("DiscountType", "")).strip()
                         tooth_number = str(row.get("Tooth Number", "")).strip()
                         treatment_notes = str(row.get("Treatment Notes", "")).strip()
@@ -3067,7 +2955,7 @@ async def process_treatment_plan_data(import_log: ImportLog, df: pd.DataFrame, d
                             amount = unit_cost * quantity * (1 - discount / 100)
                         else:
                             # If Amount is provided, use it, otherwise calculate
-                            amount = float(row.get("Amount", unit_cost * quantity))
+                            amount = csv_float(row.get("Amount"), unit_cost * quantity)
                         
                         treatment = Treatment(
                             treatment_plan_id=treatment_plan.id,
@@ -3100,25 +2988,12 @@ async def process_treatment_plan_data(import_log: ImportLog, df: pd.DataFrame, d
                 continue
         
         # Add treatment name suggestions that don't already exist
-        existing_suggestions_query = db.query(TreatmentNameSuggestion.treatment_name)
-        existing_suggestions = {s.treatment_name for s in existing_suggestions_query.all()}
-        new_suggestions = []
-        
-        for treatment_name in treatment_suggestions:
-            if treatment_name and treatment_name not in existing_suggestions:
-                new_suggestions.append(TreatmentNameSuggestion(treatment_name=treatment_name))
-        
-        if new_suggestions:
-            db.bulk_save_objects(new_suggestions)
+        upsert_suggestions(db, "treatment", treatment_suggestions)
         
         # Commit all changes
         db.flush()
         db.commit()
         
-        # Update import log status
-        import_log.status = ImportStatus.COMPLETED
-        db.commit()
-        
         print(f"Treatment plan data processed successfully. Created {plans_created} plans with {treatments_created} treatments. Skipped {skipped_entries} entries.")
         return True
         
@@ -3127,8 +3002,6 @@ async def process_treatment_plan_data(import_log: ImportLog, df: pd.DataFrame, d
         import traceback
         traceback.print_exc()
         db.rollback()
-        import_log.status = ImportStatus.FAILED
-        db.commit()
         return JSONResponse(status_code=400, content={"error": f"Error during treatment plan processing: {str(e)}"})
 
 async def process_expense_data(import_log: ImportLog, df: pd.DataFrame, db: Session, user: User):
@@ -3149,13 +3022,7 @@ async def process_expense_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
             return result
         
         def safe_float_convert(value):
-            try:
-                cleaned = clean_string(value)
-                if not cleaned:
-                    return 0.0
-                return float(cleaned)
-            except (ValueError, TypeError):
-                return 0.0
+            return csv_float(value, 0.0)
         
         def safe_date_convert(value):
             if pd.isna(value):
@@ -3196,10 +3063,6 @@ async def process_expense_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
             db.flush()
             db.commit()
             
-            # Update import log status in a separate transaction
-            import_log.status = ImportStatus.COMPLETED
-            db.commit()
-            
         print(f"Expense data processed successfully. Created {len(expenses)} expense records.")
         return True
             
@@ -3208,8 +3071,6 @@ async def process_expense_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
         import traceback
         traceback.print_exc()
         db.rollback()
-        import_log.status = ImportStatus.FAILED
-        db.commit()
         return JSONResponse(status_code=400, content={"error": f"Error processing expenses: {str(e)}"})
 
 async def process_payment_data(import_log: ImportLog, df: pd.DataFrame, db: Session, user: User):
@@ -3230,13 +3091,7 @@ async def process_payment_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
             return result
         
         def safe_float_convert(value):
-            try:
-                cleaned = clean_string(value)
-                if not cleaned:
-                    return 0.0
-                return float(cleaned)
-            except (ValueError, TypeError):
-                return 0.0
+            return csv_float(value, 0.0)
         
         def safe_bool_convert(value):
             cleaned = clean_string(value)
@@ -3369,7 +3224,7 @@ async def process_payment_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
             
             # Get refund information
             refunded_amount = group["Refunded amount"].sum() if "Refunded amount" in group.columns else 0.0
-            is_refund = any(group["Refund"]) if "Refund" in group.columns else False
+            is_refund = any(group["Refund"].apply(safe_bool_convert)) if "Refund" in group.columns else False
             refund_receipt_number = next((row["Refund Receipt Number"] for _, row in group.iterrows() 
                                          if "Refund Receipt Number" in row and row["Refund Receipt Number"]), "")
             
@@ -3405,9 +3260,6 @@ async def process_payment_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
             db.bulk_save_objects(payments)
             # Flush changes to DB without committing transaction yet
             db.flush()
-            
-        # Update import log status in a separate transaction
-        import_log.status = ImportStatus.COMPLETED
         db.commit()
             
         print(f"Payment data processed successfully. Created {processed_count} payment records. Skipped {skipped_count} entries.")
@@ -3417,8 +3269,6 @@ async def process_payment_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
         import traceback
         traceback.print_exc()
         db.rollback()
-        import_log.status = ImportStatus.FAILED
-        db.commit()
         return JSONResponse(status_code=400, content={"error": f"Error processing payments: {str(e)}"})
 
 async def process_invoice_data(import_log: ImportLog, df: pd.DataFrame, db: Session, user: User):
@@ -3439,13 +3289,8 @@ async def process_invoice_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
             return result
         
         def safe_parse_number(value, convert_func, default=None):
-            if pd.isna(value):
-                return default
-            try:
-                val_str = str(value).strip("'")
-                return convert_func(val_str)
-            except (ValueError, TypeError):
-                return default
+            number = csv_float(value, None)
+            return default if number is None else convert_func(number)
         
         # Convert and clean data
         df["Date"] = pd.to_datetime(df["Date"].apply(clean_string), errors='coerce')
@@ -3454,7 +3299,7 @@ async def process_invoice_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
         df["Doctor Name"] = df["Doctor Name"].apply(lambda x: clean_string(x, 255))
         df["Invoice Number"] = df["Invoice Number"].apply(lambda x: clean_string(x, 255))
         df["Treatment Name"] = df["Treatment Name"].apply(lambda x: clean_string(x, 255))
-        df["Cancelled"] = df["Cancelled"].fillna(False).astype(bool)
+        df["Cancelled"] = df["Cancelled"].apply(lambda x: clean_string(x).lower() in ("1", "true"))
         df["Notes"] = df["Notes"].apply(lambda x: clean_string(x)) if "Notes" in df.columns else ""
         df["Description"] = df["Description"].apply(lambda x: clean_string(x)) if "Description" in df.columns else ""
         
@@ -3498,8 +3343,9 @@ async def process_invoice_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
                     all_appointments_by_patient[appt.patient_id] = []
                 all_appointments_by_patient[appt.patient_id].append(appt)
         
-        # Get all existing payments to link with invoices
-        all_payments = db.query(Payment).all()
+        # Get existing payments for these invoice numbers to link with invoices
+        invoice_numbers = [n for n in df["Invoice Number"].unique() if n]
+        all_payments = db.query(Payment).filter(Payment.invoice_number.in_(invoice_numbers)).all() if invoice_numbers else []
         payments_by_invoice_number = {
             p.invoice_number: p for p in all_payments if p.invoice_number
         }
@@ -3589,7 +3435,8 @@ async def process_invoice_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
             
             for _, row in group.iterrows():
                 # Parse discount type
-                discount_type = row.get("DiscountType", "").upper() if pd.notna(row.get("DiscountType")) else None
+                discount_type = csv_text(row.get("DiscountType"))
+                discount_type = discount_type.upper() if discount_type else None
                 
                 # Get values
                 unit_cost = safe_parse_number(row["Unit Cost"], float, 0.0)
@@ -3644,7 +3491,6 @@ async def process_invoice_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
         print(f"Number of invoices to process: {invoices_created}")
         if invoices_created > 0:
             db.flush()
-            import_log.status = ImportStatus.COMPLETED
             db.commit()
             return JSONResponse(
                 status_code=200, 
@@ -3660,8 +3506,6 @@ async def process_invoice_data(import_log: ImportLog, df: pd.DataFrame, db: Sess
         import traceback
         traceback.print_exc()
         db.rollback()
-        import_log.status = ImportStatus.FAILED
-        db.commit()
         return JSONResponse(status_code=400, content={"error": f"Error during invoice processing: {str(e)}"})
 
 async def process_procedure_catalog_data(import_log: ImportLog, df: pd.DataFrame, db: Session, user: User):
@@ -3709,22 +3553,10 @@ async def process_procedure_catalog_data(import_log: ImportLog, df: pd.DataFrame
             db.bulk_save_objects(procedures)
             db.flush()  # Ensure procedures are flushed to DB before querying
             
-        # Get existing treatment name suggestions to avoid duplicates
-        existing_suggestions_query = db.query(TreatmentNameSuggestion.treatment_name)
-        existing_suggestions = {s.treatment_name for s in existing_suggestions_query.all()}
-        
-        # Create new suggestion objects for names that don't exist yet
-        new_suggestions = []
-        for treatment_name in treatment_suggestions:
-            if treatment_name not in existing_suggestions:
-                new_suggestions.append(TreatmentNameSuggestion(treatment_name=treatment_name))
-        
-        # Bulk insert new treatment name suggestions
-        if new_suggestions:
-            db.bulk_save_objects(new_suggestions)
+        # Add treatment name suggestions that don't exist yet
+        upsert_suggestions(db, "treatment", treatment_suggestions)
             
         # Commit all changes
-        import_log.status = ImportStatus.COMPLETED
         db.commit()
         
         return JSONResponse(
@@ -3737,10 +3569,264 @@ async def process_procedure_catalog_data(import_log: ImportLog, df: pd.DataFrame
         import traceback
         traceback.print_exc()
         db.rollback()
-        import_log.status = ImportStatus.FAILED
-        db.commit()
         return JSONResponse(status_code=400, content={"error": f"Error processing procedure catalog data: {str(e)}"})
 
+# Import stages as a dependency DAG. Each stage only waits for the stages whose
+# rows it looks up (patients before anything keyed by patient number, appointments
+# before anything linked to the nearest appointment, invoices before payments).
+# chunk_key keeps rows the processor groups together in the same chunk; the
+# column lists are what the processor reads and are checked by dry-run imports.
+IMPORT_STAGES = {
+    "patients": {
+        "patterns": ["patients", "patient"],
+        "processor": process_patient_data,
+        "stage_name": "Processing Patient Data",
+        "depends_on": [],
+        "chunk_key": "Patient Number",
+        "required_columns": ["Patient Number", "Patient Name", "Date of Birth", "Anniversary Date"],
+        "date_columns": ["Date of Birth", "Anniversary Date"],
+        "numeric_columns": []
+    },
+    "appointments": {
+        "patterns": ["appointments", "appointment"],
+        "processor": process_appointment_data,
+        "stage_name": "Processing Appointment Data",
+        "depends_on": ["patients"],
+        "chunk_key": None,
+        "required_columns": ["Patient Number", "Date"],
+        "date_columns": ["Date", "Checked In At", "Checked Out At"],
+        "numeric_columns": []
+    },
+    "treatments": {
+        "patterns": ["treatment.csv"],
+        "processor": process_treatment_data,
+        "stage_name": "Processing Treatment Data",
+        "depends_on": ["patients", "appointments"],
+        "chunk_key": "Patient Number",
+        "required_columns": ["Patient Number", "Date", "Treatment Name"],
+        "date_columns": ["Date"],
+        "numeric_columns": ["Quantity", "Treatment Cost", "Amount", "Discount"]
+    },
+    "clinical_notes": {
+        "patterns": ["clinicalnotes", "clinical-notes", "clinical_notes"],
+        "processor": process_clinical_note_data,
+        "stage_name": "Processing Clinical Notes",
+        "depends_on": ["patients", "appointments"],
+        "chunk_key": "Patient Number",
+        "required_columns": ["Patient Number", "Patient Name", "Doctor", "Type", "Description", "Date"],
+        "date_columns": ["Date"],
+        "numeric_columns": []
+    },
+    "treatment_plans": {
+        "patterns": ["treatmentplans", "treatment-plans", "treatment_plans"],
+        "processor": process_treatment_plan_data,
+        "stage_name": "Processing Treatment Plans",
+        "depends_on": ["patients", "appointments"],
+        "chunk_key": "Patient Number",
+        "required_columns": ["Patient Number", "Date"],
+        "date_columns": ["Date"],
+        "numeric_columns": ["Quantity", "Discount", "Amount", "UnitCost", "Treatment Cost"]
+    },
+    "expenses": {
+        "patterns": ["expenses", "expense"],
+        "processor": process_expense_data,
+        "stage_name": "Processing Expense Data",
+        "depends_on": [],
+        "chunk_key": None,
+        "required_columns": ["Date", "Expense Type", "Description", "Amount", "Vendor Name"],
+        "date_columns": ["Date"],
+        "numeric_columns": ["Amount"]
+    },
+    "invoices": {
+        "patterns": ["invoices", "invoice"],
+        "processor": process_invoice_data,
+        "stage_name": "Processing Invoice Data",
+        "depends_on": ["patients", "appointments"],
+        "chunk_key": "Patient Number",
+        "required_columns": ["Date", "Patient Number", "Patient Name", "Doctor Name", "Invoice Number", "Treatment Name", "Cancelled", "Unit Cost", "Quantity", "Discount", "Tax Percent", "Invoice Level Tax Discount"],
+        "date_columns": ["Date"],
+        "numeric_columns": ["Unit Cost", "Quantity", "Discount", "Tax Percent", "Invoice Level Tax Discount"]
+    },
+    "payments": {
+        "patterns": ["payments", "payment"],
+        "processor": process_payment_data,
+        "stage_name": "Processing Payment Data",
+        "depends_on": ["patients", "appointments", "invoices"],
+        "chunk_key": "Patient Number",
+        "required_columns": ["Date", "Patient Number", "Patient Name", "Receipt Number", "Treatment name", "Amount Paid", "Invoice Number", "Payment Mode", "Card Number", "Cancelled", "Refunded amount"],
+        "date_columns": ["Date"],
+        "numeric_columns": ["Amount Paid", "Refunded amount"]
+    },
+    "procedure_catalog": {
+        "patterns": ["procedure catalog", "procedure-catalog", "procedure_catalog", "procedurecatalog"],
+        "processor": process_procedure_catalog_data,
+        "stage_name": "Processing Procedure Catalog",
+        "depends_on": [],
+        "chunk_key": None,
+        "required_columns": ["Treatment Name", "Treatment Cost", "Treatment Notes", "Locale"],
+        "date_columns": [],
+        "numeric_columns": ["Treatment Cost"]
+    }
+}
+
+def match_stage_files(csv_files: list) -> dict:
+    """Map each import stage to the CSV files whose names match its patterns."""
+    stage_files = {}
+    for stage_key, stage in IMPORT_STAGES.items():
+        matched = []
+        for filename in csv_files:
+            normalized_filename = filename.lower().replace(" ", "")
+            if any(pattern.replace(" ", "").lower() in normalized_filename for pattern in stage["patterns"]):
+                matched.append(filename)
+        if matched:
+            stage_files[stage_key] = matched
+    return stage_files
+
+def run_import_stage(stage_key: str, filenames: list, user_id: str, import_log_id: str, file_path: str, file_rows: dict) -> dict:
+    """
+    Run one import stage on its own session. Executed on a worker thread so
+    independent stages can progress at the same time. Files are streamed from the
+    upload in chunks; a failed chunk is rolled back and retried up to IMPORT_CHUNK_RETRIES times.
+    """
+    stage = IMPORT_STAGES[stage_key]
+    redis_client = get_sync_redis_client()
+    db = SessionLocal()
+    started_at = datetime.now()
+    started = time.perf_counter()
+    files_processed = 0
+    errors = []
+    cancelled = False
+    try:
+        import_log = db.query(ImportLog).filter(ImportLog.id == import_log_id).first()
+        user = db.query(User).filter(User.id == user_id).first()
+        for filename in filenames:
+            print(f"\nProcessing file: {filename}")
+            try:
+                print(f"Streaming CSV file: {filename} ({file_rows.get(filename, 0)} rows)")
+                chunks = iter_csv_chunks(
+                    file_path, filename, IMPORT_CHUNK_ROWS, stage["chunk_key"],
+                    expected_rows=file_rows.get(filename, 0),
+                    spill_dir=os.path.join(os.path.dirname(file_path), "spill", stage_key)
+                )
+                for chunk_number, chunk in enumerate(chunks, start=1):
+                    if is_import_cancelled(redis_client, import_log_id):
+                        raise ImportCancelled()
+
+                    for attempt in range(1, IMPORT_CHUNK_RETRIES + 2):
+                        try:
+                            # Processors mutate their frame, so every attempt gets a fresh copy
+                            result = asyncio.run(stage["processor"](import_log, chunk.copy(), db, user))
+                            error = json.loads(result.body).get("error") if isinstance(result, JSONResponse) and result.status_code >= 400 else None
+                        except Exception as e:
+                            db.rollback()
+                            error = str(e)
+
+                        if not error:
+                            break
+                        if attempt <= IMPORT_CHUNK_RETRIES:
+                            print(f"Chunk {chunk_number} of {filename} failed (attempt {attempt}), retrying: {error}")
+                            record_chunk_retry(redis_client)
+                            time.sleep(2 ** (attempt - 1))
+                        else:
+                            errors.append(f"Error in {filename} chunk {chunk_number}: {error}")
+                files_processed += 1
+            except ImportCancelled:
+                cancelled = True
+                break
+            except Exception as e:
+                print(f"Error processing file {filename}: {str(e)}")
+                db.rollback()
+                errors.append(f"Error in {filename}: {str(e)}")
+    finally:
+        db.close()
+
+    return {
+        "stage": stage_key,
+        "files_processed": files_processed,
+        "errors": errors,
+        "cancelled": cancelled,
+        "timing": {
+            "stage_name": stage["stage_name"],
+            "files": filenames,
+            "started_at": started_at.isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "duration_seconds": round(time.perf_counter() - started, 3),
+            "status": "cancelled" if cancelled else "failed" if errors else "completed"
+        }
+    }
+
+async def run_import_stages(file_path: str, file_rows: dict, user_id: str, import_log: ImportLog, db: Session):
+    """
+    Schedule the import stages over IMPORT_STAGES. A stage is submitted to the
+    bounded worker pool as soon as every stage it depends on has committed, so
+    independent stages (e.g. expenses, procedure catalog) run alongside patients.
+    """
+    stage_files = match_stage_files(list(file_rows))
+    pending = {
+        stage_key: set(IMPORT_STAGES[stage_key]["depends_on"]) & set(stage_files)
+        for stage_key in stage_files
+    }
+    finished = set()
+    running = {}
+    files_processed = 0
+    stage_timings = {}
+    # Errors of every stage so far; each failing stage adds to them
+    errors = []
+
+    cancelled = False
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=IMPORT_MAX_WORKERS, thread_name_prefix="import-stage") as executor:
+        while pending or running:
+            if not cancelled and is_import_cancelled(get_sync_redis_client(), import_log.id):
+                # Let running stages stop at their next chunk, start nothing new
+                cancelled = True
+                pending.clear()
+            if cancelled and not running:
+                break
+
+            ready = [stage_key for stage_key, deps in pending.items() if deps <= finished]
+            for stage_key in ready:
+                del pending[stage_key]
+                print(f"\nStarting stage {stage_key}: {stage_files[stage_key]}")
+                future = loop.run_in_executor(
+                    executor, run_import_stage, stage_key, stage_files[stage_key], user_id, import_log.id,
+                    file_path, file_rows
+                )
+                running[future] = stage_key
+
+            if running:
+                import_log.current_stage = ", ".join(IMPORT_STAGES[key]["stage_name"] for key in running.values())
+                import_log.current_file = ", ".join(f for key in running.values() for f in stage_files[key])[:255]
+                db.commit()
+
+            if not running:
+                # Remaining stages wait on each other; nothing can make progress
+                raise RuntimeError(f"Import stages have unresolved dependencies: {sorted(pending)}")
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                stage_key = running.pop(future)
+                finished.add(stage_key)
+                result = future.result()
+                files_processed += result["files_processed"]
+                stage_timings[stage_key] = result["timing"]
+                print(f"Stage {stage_key} finished in {result['timing']['duration_seconds']}s")
+
+                import_log.files_processed = files_processed
+                import_log.stage_timings = dict(stage_timings)
+                if result["errors"]:
+                    errors.extend(result["errors"])
+                    import_log.error_message = "; ".join(errors)
+                db.commit()
+
+                if result["cancelled"]:
+                    cancelled = True
+                    pending.clear()
+
+    if cancelled:
+        raise ImportCancelled()
+
 async def process_data_in_background(file_path: str, user_id: str, import_log_id: str, db: Session, uuid: str):
     try:
         print(f"Starting background processing for file: {file_path}")
@@ -3758,35 +3844,20 @@ async def process_data_in_background(file_path: str, user_id: str, import_log_id
         #     print(f"Clinic with id {clinic_id} not found")
         #     return
 
-        file_ext = os.path.splitext(file_path)[1].lower()
-        print(f"File extension: {file_ext}")
-        
-        # Extract if zip file
-        if file_ext == '.zip':
-            try:
-                print("Extracting zip file...")
-                import_log.current_stage = "Extracting ZIP file"
-                db.commit()
-                
-                with zipfile.ZipFile(file_path, "r") as zip_ref:
-                    zip_ref.extractall(f"uploads/imports/{uuid}")
-                print("Zip file extracted successfully")
-                
-                db.commit()
-            except Exception as e:
-                print(f"Error extracting zip file: {str(e)}")
-                import_log.status = ImportStatus.FAILED
-                import_log.error_message = f"Failed to extract ZIP: {str(e)}"
-                db.commit()
-                return
-
         # Update status to processing
         import_log.status = ImportStatus.PROCESSING
         import_log.current_stage = "Analyzing files"
         db.commit()
 
-        # Process each CSV file
-        csv_files = [f for f in os.listdir(f"uploads/imports/{uuid}") if f.endswith('.csv')]
+        # CSVs are streamed straight out of the upload; ZIPs are never extracted to disk
+        try:
+            csv_files = list_import_csvs(file_path)
+        except zipfile.BadZipFile as e:
+            print(f"Error reading zip file: {str(e)}")
+            import_log.status = ImportStatus.FAILED
+            import_log.error_message = f"Failed to read ZIP: {str(e)}"
+            db.commit()
+            return
         print(f"Found CSV files: {csv_files}")
         if not csv_files:
             print("No CSV files found")
@@ -3794,98 +3865,25 @@ async def process_data_in_background(file_path: str, user_id: str, import_log_id
             import_log.error_message = "No CSV files found in upload"
             db.commit()
             return
-        global total_rows
-        for file in csv_files:
-            total_rows += len(pd.read_csv(f"uploads/imports/{uuid}/{file}"))
-
-        # Define processing order and file name patterns
-        file_types = [
-            {
-                "patterns": ["patients", "patient"],
-                "processor": process_patient_data,
-                "stage_name": "Processing Patient Data"
-            },
-            {
-                "patterns": ["appointments", "appointment"],
-                "processor": process_appointment_data,
-                "stage_name": "Processing Appointment Data"
-            },
-            {
-                "patterns": ["treatment.csv"],
-                "processor": process_treatment_data,
-                "stage_name": "Processing Treatment Data"
-            },
-            {
-                "patterns": ["clinicalnotes", "clinical-notes", "clinical_notes"],
-                "processor": process_clinical_note_data,
-                "stage_name": "Processing Clinical Notes"
-            },
-            {
-                "patterns": ["treatmentplans", "treatment-plans", "treatment_plans"],
-                "processor": process_treatment_plan_data,
-                "stage_name": "Processing Treatment Plans"
-            },
-            {
-                "patterns": ["expenses", "expense"],
-                "processor": process_expense_data,
-                "stage_name": "Processing Expense Data"
-            },
-            {
-                "patterns": ["invoices", "invoice"],
-                "processor": process_invoice_data,
-                "stage_name": "Processing Invoice Data"
-            },
-            {
-                "patterns": ["payments", "payment"],
-                "processor": process_payment_data,
-                "stage_name": "Processing Payment Data"
-            },
-            {
-                "patterns": ["procedure catalog", "procedure-catalog", "procedure_catalog", "procedurecatalog"],
-                "processor": process_procedure_catalog_data,
-                "stage_name": "Processing Procedure Catalog"
-            }
-        ]
+        # Workers are long-lived, so progress counters start fresh for every import
+        global total_rows, rows_processed, percentage_completed
+        total_rows = rows_processed = percentage_completed = 0
+        file_rows = {file: count_csv_rows(file_path, file, IMPORT_CHUNK_ROWS) for file in csv_files}
+        total_rows = sum(file_rows.values())
 
         total_files = len(csv_files)
-        files_processed = 0
         import_log.total_files = total_files
+        import_log.stage_timings = {}
+        db.commit()
+
+        await run_import_stages(file_path, file_rows, user_id, import_log, db)
+
+        # Imported appointments change this doctor's calendars and stats
+        try:
+            bump_generations_sync(get_sync_redis_client(), [ALL_APPOINTMENTS_TAG, doctor_tag(user_id)])
+        except RedisError as e:
+            print(f"Error invalidating appointment cache: {e}")
 
-        # Process files in order
-        for file_type in file_types:
-            print(f"\nProcessing file type: {file_type['patterns']}")
-            for filename in csv_files:
-                normalized_filename = filename.lower().replace(" ", "")
-                
-                # Check if current file matches any pattern for this type
-                if any(pattern.replace(" ", "").lower() in normalized_filename for pattern in file_type["patterns"]):
-                    print(f"\nProcessing file: {filename}")
-                    try:
-                        import_log.current_stage = f"{file_type['stage_name']} ({filename})"
-                        import_log.current_file = filename
-                        db.commit()
-                        
-                        print(f"Reading CSV file: {filename}")
-                        df = pd.read_csv(f"uploads/imports/{uuid}/{filename}", keep_default_na=False)
-                        df = df.fillna("")
-                        print(f"Successfully read CSV with {len(df)} rows")
-                        
-                        # Call appropriate processor function
-                        processor = file_type["processor"]
-                        if processor in [process_patient_data, process_appointment_data, process_expense_data, 
-                                      process_invoice_data, process_payment_data, process_procedure_catalog_data, process_treatment_data, process_clinical_note_data, process_treatment_plan_data]:
-                            await processor(import_log, df, db, user)
-                        else:
-                            await processor(import_log, df, db)
-                            
-                        files_processed += 1
-                        import_log.files_processed = files_processed
-                        db.commit()
-                            
-                    except Exception as e:
-                        print(f"Error processing file {filename}: {str(e)}")
-                        import_log.error_message = f"Error in {filename}: {str(e)}"
-                        continue
 
         # Update import log status to completed
         import_log.status = ImportStatus.COMPLETED
@@ -3894,7 +3892,15 @@ async def process_data_in_background(file_path: str, user_id: str, import_log_id
         import_log.progress = 100
         db.commit()
         print(f"Import completed successfully. Total rows processed: {total_rows}")
+        return total_rows
         
+    except ImportCancelled:
+        print(f"Import {import_log_id} cancelled")
+        import_log.status = ImportStatus.CANCELLED
+        import_log.current_file = None
+        import_log.current_stage = "Import Cancelled"
+        db.commit()
+        raise
     except Exception as e:
         print(f"Error in background processing: {str(e)}")
         if 'import_log' in locals():
@@ -3905,7 +3911,7 @@ async def process_data_in_background(file_path: str, user_id: str, import_log_id
                 print("Updated import status to FAILED")
     finally:
         db.close()
-        shutil.rmtree(f"uploads/imports/{uuid}")
+        shutil.rmtree(f"uploads/imports/{uuid}", ignore_errors=True)
         print("Database connection closed")
 
         
@@ -3938,7 +3944,8 @@ async def process_data_in_background(file_path: str, user_id: str, import_log_id
     
     **Processing details:**
     - Files are validated before processing
-    - Data is imported in order to maintain referential integrity 
+    - Data is imported as a dependency graph to maintain referential integrity;
+      independent data types (e.g. expenses, procedure catalog) are imported concurrently
     - Duplicate records are skipped based on unique identifiers
     - Processing happens asynchronously in background
     - Progress can be monitored via import_log_id
@@ -3949,6 +3956,7 @@ async def process_data_in_background(file_path: str, user_id: str, import_log_id
     - Current file being processed
     - Files processed count
     - Total files count
+    - Per-stage timings
     - Any error messages
     
     **Authentication:**
@@ -3956,6 +3964,13 @@ async def process_data_in_background(file_path: str, user_id: str, import_log_id
     
     **Request body:**
     - file: CSV or ZIP file (form-data)
+    
+    **Dry run (`dry_run=true`):**
+    - Streams through each CSV once without writing to the database
+    - Checks headers against the columns each importer expects
+    - Reports unparseable dates and numbers with sample line numbers
+    - Reports duplicate patient numbers
+    - Returns row counts and the projected import time (200 if valid, 400 otherwise)
     """,
     responses={
         200: {
@@ -4013,13 +4028,19 @@ async def process_data_in_background(file_path: str, user_id: str, import_log_id
         }
     }
 )
-async def import_data(background_tasks: BackgroundTasks, request: Request, file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def import_data(
+    background_tasks: BackgroundTasks,
+    request: Request,
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False, description="Validate the upload and project import time without importing anything"),
+    db: Session = Depends(get_db)
+):
     try:
         decoded_token = verify_token(request)
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
 
@@ -4032,15 +4053,35 @@ async def import_data(background_tasks: BackgroundTasks, request: Request, file:
         file_ext = os.path.splitext(str(file.filename))[1].lower()
         if file_ext not in allowed_extensions:
             return JSONResponse(status_code=400, content={"error": "Invalid file format. Only CSV and ZIP files are allowed."})
+
+        if file.size is not None and file.size > IMPORT_MAX_UPLOAD_BYTES:
+            return JSONResponse(status_code=413, content={"error": f"File too large. Maximum upload size is {IMPORT_MAX_UPLOAD_BYTES // (1024 * 1024)}MB."})
+
+        if dry_run:
+            redis_client = await get_redis_client()
+            rows_per_second = await observed_rows_per_second(redis_client, IMPORT_DRY_RUN_ROWS_PER_SECOND)
+            report = await asyncio.to_thread(
+                profile_import_upload, file.file, str(file.filename), IMPORT_STAGES, match_stage_files,
+                IMPORT_CHUNK_ROWS, rows_per_second
+            )
+            return JSONResponse(status_code=200 if report["valid"] else 400, content=report)
     
         uuid = generate_uuid()
         # Create uploads directory if it doesn't exist
         upload_dir = os.path.join("uploads", "imports", uuid)
         os.makedirs(upload_dir, exist_ok=True)
-        
+
+        # Copy the upload to disk in chunks rather than reading it into memory
+        file_path = os.path.join(upload_dir, os.path.basename(str(file.filename)))
+        try:
+            await save_upload(file, file_path, IMPORT_MAX_UPLOAD_BYTES)
+        except UploadTooLarge:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            return JSONResponse(status_code=413, content={"error": f"File too large. Maximum upload size is {IMPORT_MAX_UPLOAD_BYTES // (1024 * 1024)}MB."})
+
         # Create import log entry
         import_log = ImportLog(
-            user_id=user.id,
+            user_id=user["id"],
             # clinic_id=clinic.id,
             file_name=file.filename,
             status=ImportStatus.PENDING,
@@ -4055,25 +4096,18 @@ async def import_data(background_tasks: BackgroundTasks, request: Request, file:
         db.commit()
         db.refresh(import_log)
         
-        # Read and save file
-        file_contents = await file.read()
-        file_path = f"uploads/imports/{uuid}/{file.filename}"
-        with open(file_path, "wb") as f:
-            f.write(file_contents)
-            
         if file_ext == '.zip':
             import_log.zip_file = file_path
             db.commit()
 
-        # Start background processing without using scheduler
-        # This avoids timezone and scheduler issues
-        process = Process(target=run_process_data_in_background, args=(file_path, user.id, import_log.id, uuid))
-        process.daemon = True
-        process.start()
+        # Hand the job to the import worker pool (see import_worker.py)
+        redis_client = await get_redis_client()
+        queued_jobs = await enqueue_import_job(redis_client, build_import_job(import_log.id, user["id"], file_path, uuid))
 
         return JSONResponse(status_code=200, content={
             "message": "Data import started",
-            "import_log_id": import_log.id
+            "import_log_id": import_log.id,
+            "queued_jobs": queued_jobs
         })
 
     except Exception as e:
@@ -4083,16 +4117,86 @@ async def import_data(background_tasks: BackgroundTasks, request: Request, file:
             db.commit()
         return JSONResponse(status_code=500, content={"error": f"Unexpected error: {str(e)}"})
 
-# Helper function to run in a separate process
-def run_process_data_in_background(file_path, user_id, import_log_id, uuid):
-    from db.db import SessionLocal
-    db = SessionLocal()
+@user_router.post("/cancel-import/{import_log_id}",
+    response_model=dict,
+    status_code=200,
+    summary="Cancel a data import",
+    description="""
+    Cancel a pending or running data import.
+    
+    - Pending imports are marked as cancelled and skipped by the import workers
+    - Running imports stop at the next chunk; rows already committed are kept
+    
+    **Authentication:**
+    - Requires valid Bearer token
+    """,
+    responses={
+        200: {
+            "description": "Import cancellation requested",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Import cancellation requested", "status": "processing"}
+                }
+            }
+        },
+        400: {
+            "description": "Import already finished",
+            "content": {
+                "application/json": {
+                    "example": {"error": "Import has already finished"}
+                }
+            }
+        },
+        401: {
+            "description": "Unauthorized",
+            "content": {
+                "application/json": {
+                    "example": {"error": "Unauthorized"}
+                }
+            }
+        },
+        404: {
+            "description": "Import log not found",
+            "content": {
+                "application/json": {
+                    "example": {"error": "Import log not found"}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"error": "Unexpected error message"}
+                }
+            }
+        }
+    }
+)
+async def cancel_import(request: Request, import_log_id: str, db: Session = Depends(get_db)):
     try:
-        # Use asyncio to properly await the async function
-        import asyncio
-        asyncio.run(process_data_in_background(file_path, user_id, import_log_id, db, uuid))
-    finally:
-        db.close()
+        decoded_token = verify_token(request)
+        if not decoded_token:
+            return JSONResponse(status_code=401, content={"error": "Unauthorized"})
+
+        import_log = db.query(ImportLog).filter(ImportLog.id == import_log_id, ImportLog.user_id == decoded_token["user_id"]).first()
+        if not import_log:
+            return JSONResponse(status_code=404, content={"error": "Import log not found"})
+
+        if import_log.status not in [ImportStatus.PENDING, ImportStatus.PROCESSING]:
+            return JSONResponse(status_code=400, content={"error": "Import has already finished"})
+
+        redis_client = await get_redis_client()
+        await cancel_import_job(redis_client, import_log.id)
+
+        if import_log.status == ImportStatus.PENDING:
+            import_log.status = ImportStatus.CANCELLED
+            import_log.current_stage = "Import Cancelled"
+            db.commit()
+
+        return JSONResponse(status_code=200, content={"message": "Import cancellation requested", "status": import_log.status.value})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": f"Unexpected error: {str(e)}"})
 
 @user_router.get("/get-import-logs",
     response_model=dict,
@@ -4111,6 +4215,7 @@ def run_process_data_in_background(file_path, user_id, import_log_id, uuid):
     - Files processed count
     - Total files count
     - Error message (if any)
+    - Per-stage timings
     - Creation timestamp
     
     Results are sorted by creation date in descending order (newest first).
@@ -4139,6 +4244,16 @@ def run_process_data_in_background(file_path, user_id, import_log_id, uuid):
                                 "files_processed": 5,
                                 "total_files": 5,
                                 "error_message": None,
+                                "stage_timings": {
+                                    "patients": {
+                                        "stage_name": "Processing Patient Data",
+                                        "files": ["patients.csv"],
+                                        "started_at": "2024-01-01T00:00:00",
+                                        "finished_at": "2024-01-01T00:00:04",
+                                        "duration_seconds": 4.2,
+                                        "status": "completed"
+                                    }
+                                },
                                 "created_at": "2024-01-01T00:00:00"
                             }
                         ],
@@ -4189,7 +4304,7 @@ async def get_import_logs(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
 
@@ -4198,7 +4313,7 @@ async def get_import_logs(
         page = max(page, 1)  # Ensure page is at least 1
         
         # Get total count
-        total = db.query(ImportLog).filter(ImportLog.user_id == user.id).count()
+        total = db.query(ImportLog).filter(ImportLog.user_id == user["id"]).count()
         
         # Calculate pagination
         total_pages = (total + per_page - 1) // per_page
@@ -4206,26 +4321,13 @@ async def get_import_logs(
         
         # Get paginated logs
         import_logs = db.query(ImportLog)\
-            .filter(ImportLog.user_id == user.id)\
+            .filter(ImportLog.user_id == user["id"])\
             .order_by(ImportLog.created_at.desc())\
             .offset(offset)\
             .limit(per_page)\
             .all()
 
-        return JSONResponse(status_code=200, content=[
-                {
-                    "id": log.id,
-                    "file_name": log.file_name,
-                    "status": log.status.value,
-                    "progress": log.progress,
-                    "current_stage": log.current_stage,
-                    "current_file": log.current_file,
-                    "files_processed": log.files_processed,
-                    "total_files": log.total_files,
-                    "error_message": log.error_message,
-                    "created_at": log.created_at.isoformat()
-                } for log in import_logs
-            ])
+        return JSONResponse(status_code=200, content=[serialize_import_log(log) for log in import_logs])
         
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": f"Unexpected error: {str(e)}"})
@@ -4253,33 +4355,55 @@ async def websocket_endpoint(websocket: WebSocket):
             await websocket.close()
             return
             
-        # Start sending log updates
+        # Push progress instead of polling: one snapshot from the database, then
+        # only the fields that changed, as published by the importers
         while True:
-            db = SessionLocal()
+            pubsub = (await get_redis_pubsub_client()).pubsub()
             try:
-                logs = db.query(ImportLog)\
-                    .filter(ImportLog.user_id == user_id)\
-                    .order_by(ImportLog.created_at.desc())\
-                    .all()
-                    
-                log_list = [{
-                    "id": log.id,
-                    "file_name": log.file_name, 
-                    "status": log.status.value,
-                    "progress": log.progress,
-                    "current_stage": log.current_stage,
-                    "current_file": log.current_file,
-                    "files_processed": log.files_processed,
-                    "total_files": log.total_files,
-                    "error_message": log.error_message,
-                    "created_at": log.created_at.isoformat()
-                } for log in logs]
-                
-                await websocket.send_json(log_list)
+                # Subscribe before taking the snapshot so no update falls in between
+                await pubsub.subscribe(import_progress_channel(user_id))
+
+                db = SessionLocal()
+                try:
+                    logs = db.query(ImportLog)\
+                        .filter(ImportLog.user_id == user_id)\
+                        .order_by(ImportLog.created_at.desc())\
+                        .all()
+                    state = {log.id: serialize_import_log(log) for log in logs}
+                finally:
+                    db.close()
+
+                await websocket.send_json({"type": "snapshot", "logs": list(state.values())})
+                last_sent = time.monotonic()
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message:
+                        update = json.loads(message["data"])
+                        log_id = update["id"]
+                        if log_id not in state:
+                            state[log_id] = update["changes"]
+                            await websocket.send_json({"type": "created", "log": state[log_id]})
+                            last_sent = time.monotonic()
+                        else:
+                            changes = diff_import_log(state[log_id], update["changes"])
+                            if changes:
+                                state[log_id].update(changes)
+                                await websocket.send_json({"type": "update", "id": log_id, "changes": changes})
+                                last_sent = time.monotonic()
+
+                    if time.monotonic() - last_sent >= IMPORT_PROGRESS_HEARTBEAT_SECONDS:
+                        await websocket.send_json({"type": "heartbeat"})
+                        last_sent = time.monotonic()
+            except (RedisError, OSError) as e:
+                # Lost the subscription; resubscribe and resend a fresh snapshot
+                print(f"WebSocket progress subscription lost: {str(e)}")
                 await asyncio.sleep(1)
-                
             finally:
-                db.close()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
                 
     except Exception as e:
         print(f"WebSocket error: {str(e)}")
@@ -4353,12 +4477,12 @@ async def add_procedure_catalog(request: Request, procedure: ProcedureCatalogSch
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         
         procedure_catalog = ProcedureCatalog(
-            user_id=user.id,
+            user_id=user["id"],
             treatment_name=procedure.treatment_name,
             treatment_cost=procedure.treatment_cost,
             treatment_notes=procedure.treatment_notes,
@@ -4487,12 +4611,12 @@ async def get_procedure_catalogs(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         
         # Get total count
-        total = db.query(ProcedureCatalog).filter(ProcedureCatalog.user_id == user.id).count()
+        total = db.query(ProcedureCatalog).filter(ProcedureCatalog.user_id == user["id"]).count()
         
         # Calculate pagination
         total_pages = ceil(total / per_page)
@@ -4507,7 +4631,7 @@ async def get_procedure_catalogs(
             func.count(ProcedureCatalog.id).label('count'),
             func.sum(ProcedureCatalog.treatment_cost).label('total_cost')
         ).filter(
-            ProcedureCatalog.user_id == user.id,
+            ProcedureCatalog.user_id == user["id"],
             func.date(ProcedureCatalog.created_at) == today
         ).first()
 
@@ -4515,7 +4639,7 @@ async def get_procedure_catalogs(
             func.count(ProcedureCatalog.id).label('count'),
             func.sum(ProcedureCatalog.treatment_cost).label('total_cost')
         ).filter(
-            ProcedureCatalog.user_id == user.id,
+            ProcedureCatalog.user_id == user["id"],
             ProcedureCatalog.created_at >= first_day_of_month
         ).first()
 
@@ -4523,7 +4647,7 @@ async def get_procedure_catalogs(
             func.count(ProcedureCatalog.id).label('count'),
             func.sum(ProcedureCatalog.treatment_cost).label('total_cost')
         ).filter(
-            ProcedureCatalog.user_id == user.id,
+            ProcedureCatalog.user_id == user["id"],
             ProcedureCatalog.created_at >= first_day_of_year
         ).first()
 
@@ -4531,11 +4655,11 @@ async def get_procedure_catalogs(
             func.count(ProcedureCatalog.id).label('count'),
             func.sum(ProcedureCatalog.treatment_cost).label('total_cost')
         ).filter(
-            ProcedureCatalog.user_id == user.id
+            ProcedureCatalog.user_id == user["id"]
         ).first()
         
         # Get paginated results with sorting
-        query = db.query(ProcedureCatalog).filter(ProcedureCatalog.user_id == user.id)
+        query = db.query(ProcedureCatalog).filter(ProcedureCatalog.user_id == user["id"])
         
         if hasattr(ProcedureCatalog, sort_by):
             sort_column = getattr(ProcedureCatalog, sort_by)
@@ -4662,12 +4786,12 @@ async def get_procedure_catalog(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         procedure_catalog = db.query(ProcedureCatalog).filter(
             ProcedureCatalog.id == procedure_id,
-            ProcedureCatalog.user_id == user.id
+            ProcedureCatalog.user_id == user["id"]
         ).first()
         
         if not procedure_catalog:
@@ -4801,12 +4925,12 @@ async def search_procedure_catalog(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
     
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         
         # Build base query
-        query = db.query(ProcedureCatalog).filter(ProcedureCatalog.user_id == user.id).order_by(ProcedureCatalog.created_at.desc())
+        query = db.query(ProcedureCatalog).filter(ProcedureCatalog.user_id == user["id"]).order_by(ProcedureCatalog.created_at.desc())
         
         # Add search filter if search_query provided
         if search_query:
@@ -4839,7 +4963,7 @@ async def search_procedure_catalog(
         stats_query = db.query(
             func.count().label('count'),
             func.sum(func.cast(ProcedureCatalog.treatment_cost, Float)).label('total_cost')
-        ).filter(ProcedureCatalog.user_id == user.id)
+        ).filter(ProcedureCatalog.user_id == user["id"])
         
         today_stats = stats_query.filter(func.date(ProcedureCatalog.created_at) == today).first()
         month_stats = stats_query.filter(func.date(ProcedureCatalog.created_at) >= first_day_of_month).first()
@@ -4969,13 +5093,13 @@ async def update_procedure_catalog(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         
         procedure_catalog = db.query(ProcedureCatalog).filter(
             ProcedureCatalog.id == procedure_id,
-            ProcedureCatalog.user_id == user.id
+            ProcedureCatalog.user_id == user["id"]
         ).first()
         if not procedure_catalog:
             return JSONResponse(status_code=404, content={"error": "Procedure catalog not found"})
@@ -5064,13 +5188,13 @@ async def delete_procedure_catalog(request: Request, procedure_id: str, db: Sess
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         
         procedure_catalog = db.query(ProcedureCatalog).filter(
             ProcedureCatalog.id == procedure_id,
-            ProcedureCatalog.user_id == user.id
+            ProcedureCatalog.user_id == user["id"]
         ).first()
         if not procedure_catalog:
             return JSONResponse(status_code=404, content={"error": "Procedure catalog not found"})
@@ -5439,12 +5563,14 @@ async def get_doctor_list(
         if email:
             query = query.filter(User.email.ilike(f"%{email}%"))
         if phone:
-            query = query.filter(User.phone.ilike(f"%{phone}%"))
+            # A complete number is an exact indexed lookup; partial input still matches anywhere
+            phone_e164 = normalize_phone(phone)
+            query = query.filter(User.phone_e164 == phone_e164 if phone_e164 else User.phone.ilike(f"%{phone}%"))
         if doctor_id:
             query = query.filter(User.id == doctor_id)
         if clinic_id:
             # Filter doctors by clinic_id using the association table
-            clinic = db.query(Clinic).filter(Clinic.id == clinic_id).first()
+            clinic = await get_entity(await get_redis_cache_client(), db, "clinic", clinic_id)
             if not clinic:
                 return JSONResponse(status_code=404, content={"error": "Clinic not found"})
             # Import the doctor_clinics table from models
@@ -5538,17 +5664,17 @@ async def get_dashboard(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=404, content={"error": "User not found"})
         
         if clinic_id:
-            clinic = db.query(Clinic).filter(Clinic.id == clinic_id).first()
+            clinic = await get_entity(await get_redis_cache_client(), db, "clinic", clinic_id)
             if not clinic:
                 return JSONResponse(status_code=404, content={"error": "Clinic not found"})
 
         # Base query filters
-        base_filters = [Patient.doctor_id == user.id]
+        base_filters = [Patient.doctor_id == user["id"]]
         if clinic_id:
             base_filters.append(Patient.clinic_id == clinic_id)
 
@@ -5666,7 +5792,7 @@ async def get_dashboard(
 
         # Appointment Statistics
         appointment_base_filters = [
-            Appointment.doctor_id == user.id,
+            Appointment.doctor_id == user["id"],
             *([Appointment.clinic_id == clinic_id] if clinic_id else [])
         ]
         
@@ -5718,7 +5844,7 @@ async def get_dashboard(
 
         # Prescription Statistics
         prescription_base_filters = [
-            ClinicalNote.doctor_id == user.id,
+            ClinicalNote.doctor_id == user["id"],
             *([ClinicalNote.clinic_id == clinic_id] if clinic_id else [])
         ]
         
@@ -5758,7 +5884,7 @@ async def get_dashboard(
 
         # Financial Statistics
         payment_base_filters = [
-            Payment.doctor_id == user.id,
+            Payment.doctor_id == user["id"],
             Payment.cancelled == False,
             *([Payment.clinic_id == clinic_id] if clinic_id else [])
         ]
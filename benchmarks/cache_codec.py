@@ -0,0 +1,96 @@
+"""
+Compare the cache codec (utils/cache_codec.py) with the json.dumps/json.loads
+path it replaced, on a payload shaped like a cached month of appointments.
+
+    python -m benchmarks.cache_codec [--rows 300] [--repeat 200]
+
+Prints payload size and mean encode/decode time for each. Run it from the
+repository root with the usual environment, as utils/config.py is read.
+"""
+import argparse
+import json
+import random
+import timeit
+import uuid
+from datetime import datetime, timedelta
+from enum import Enum
+
+from utils.cache_codec import encode, decode, zstandard
+from utils.config import CACHE_COMPRESS_MIN_BYTES
+
+
+class Status(str, Enum):
+    SCHEDULED = "scheduled"
+    CONFIRMED = "confirmed"
+    CANCELLED = "cancelled"
+    COMPLETED = "completed"
+
+
+def month_view(rows: int) -> dict:
+    """A page of appointments as get_all_appointments caches it, with nested patient and doctor summaries."""
+    random.seed(rows)
+    start = datetime(2025, 4, 1, 9)
+    appointments = []
+    for i in range(rows):
+        at = start + timedelta(days=i % 30, minutes=15 * (i % 36))
+        appointments.append({
+            "id": str(uuid.uuid4()),
+            "appointment_date": at,
+            "start_time": at,
+            "end_time": at + timedelta(minutes=30),
+            "status": random.choice(list(Status)),
+            "notes": "Follow-up after scaling; check sensitivity on lower left molars." if i % 3 else None,
+            "send_reminder": bool(i % 2),
+            "remind_time_before": 60,
+            "patient": {
+                "id": str(uuid.uuid4()),
+                "name": f"Patient {i}",
+                "email": f"patient{i}@example.com",
+                "mobile_number": f"+9198{i:08d}",
+                "patient_number": f"P{i:06d}",
+                "date_of_birth": datetime(1960 + i % 50, 1 + i % 12, 1 + i % 28).date(),
+                "gender": random.choice(["male", "female"]),
+            },
+            "doctor": {
+                "id": "5f0c6a1e-2d7b-4b8e-9a55-0c1d2e3f4a5b",
+                "name": "Dr. Mehta",
+                "email": "mehta@example.com",
+                "phone": "+919800000000",
+                "color_code": "#3f51b5",
+            },
+        })
+    return {"appointments": appointments, "total": rows, "stats": {"today": 4, "this_month": rows}}
+
+
+def json_encode(value) -> str:
+    # The previous path: datetimes and enums stringified through default=str
+    return json.dumps(value, default=str)
+
+
+def mean_ms(function, repeat: int) -> float:
+    return min(timeit.repeat(function, number=repeat, repeat=3)) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    value = month_view(args.rows)
+    as_json = json_encode(value)
+    as_codec = encode(value)
+
+    print(f"{args.rows} appointments, zstd {'on' if zstandard else 'not installed'}, "
+          f"compression above {CACHE_COMPRESS_MIN_BYTES} bytes")
+    print(f"{'':8}{'bytes':>10}{'encode ms':>12}{'decode ms':>12}")
+    print(f"{'json':8}{len(as_json.encode()):>10}"
+          f"{mean_ms(lambda: json_encode(value), args.repeat):>12.3f}"
+          f"{mean_ms(lambda: json.loads(as_json), args.repeat):>12.3f}")
+    print(f"{'codec':8}{len(as_codec):>10}"
+          f"{mean_ms(lambda: encode(value), args.repeat):>12.3f}"
+          f"{mean_ms(lambda: decode(as_codec), args.repeat):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ from db.db import get_db
 from auth.models import User, Clinic
 from fastapi.responses import JSONResponse
 from utils.auth import verify_token
+from utils.entity_cache import get_authenticated_user, get_entity
+from redis_client import get_redis_cache_client
 from sqlalchemy import func, asc, desc, case
 import os
 from sqlalchemy.exc import SQLAlchemyError
@@ -95,12 +97,12 @@ async def create_treatment(request: Request, treatment: TreatmentCreate, db: Ses
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
         if treatment.clinic_id:
-            clinic = db.query(Clinic).filter(Clinic.id == treatment.clinic_id).first()
+            clinic = await get_entity(await get_redis_cache_client(), db, "clinic", treatment.clinic_id)
             if not clinic:
                 return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "Invalid clinic ID"})
         
@@ -131,7 +133,7 @@ async def create_treatment(request: Request, treatment: TreatmentCreate, db: Ses
                 amount = treatment.quantity * treatment.unit_cost
         
         new_treatment = Treatment(
-            doctor_id=user.id,
+            doctor_id=user["id"],
             patient_id=patient.id,
             appointment_id=appointment.id,
             treatment_date=treatment.treatment_date,
@@ -251,12 +253,12 @@ async def get_treatments(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
     
         # Get total count
-        total = db.query(func.count(Treatment.id)).filter(Treatment.doctor_id == user.id).scalar()
+        total = db.query(func.count(Treatment.id)).filter(Treatment.doctor_id == user["id"]).scalar()
         total_pages = ceil(total / per_page)
         
         # Calculate date ranges for statistics
@@ -274,7 +276,7 @@ async def get_treatments(
             func.coalesce(func.sum(case((Treatment.treatment_date >= first_day_of_month, Treatment.amount), else_=0)), 0).label('month_amount'),
             func.sum(case((Treatment.treatment_date >= first_day_of_year, 1), else_=0)).label('year_count'),
             func.coalesce(func.sum(case((Treatment.treatment_date >= first_day_of_year, Treatment.amount), else_=0)), 0).label('year_amount')
-        ).filter(Treatment.doctor_id == user.id).first()
+        ).filter(Treatment.doctor_id == user["id"]).first()
         
         # Get paginated treatments with sorting
         sort_column = getattr(Treatment, sort_by)
@@ -282,7 +284,7 @@ async def get_treatments(
             sort_column = sort_column.desc()
             
         treatments = db.query(Treatment)\
-            .filter(Treatment.doctor_id == user.id)\
+            .filter(Treatment.doctor_id == user["id"])\
             .order_by(sort_column)\
             .offset((page - 1) * per_page)\
             .limit(per_page)\
@@ -391,12 +393,12 @@ async def search_treatments(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
         # Build base query
-        query = db.query(Treatment).filter(Treatment.doctor_id == user.id)
+        query = db.query(Treatment).filter(Treatment.doctor_id == user["id"])
         
         # Apply filters
         if treatment_name:
@@ -526,14 +528,14 @@ async def get_treatment(treatment_id: str, request: Request, db: Session = Depen
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
         # Get treatment
         treatment = db.query(Treatment).filter(
             Treatment.id == treatment_id,
-            Treatment.doctor_id == user.id
+            Treatment.doctor_id == user["id"]
         ).first()
         
         if not treatment:
@@ -606,14 +608,14 @@ async def update_treatment(treatment_id: str, request: Request, treatment: Treat
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
         # Get and update treatment
         existing_treatment = db.query(Treatment).filter(
             Treatment.id == treatment_id,
-            Treatment.doctor_id == user.id
+            Treatment.doctor_id == user["id"]
         ).first()
         
         if not existing_treatment:
@@ -677,14 +679,14 @@ async def delete_treatment(treatment_id: str, request: Request, db: Session = De
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
         # Get and delete treatment
         treatment = db.query(Treatment).filter(
             Treatment.id == treatment_id,
-            Treatment.doctor_id == user.id
+            Treatment.doctor_id == user["id"]
         ).first()
         
         if not treatment:
@@ -735,12 +737,12 @@ async def create_treatment_plan(request: Request, treatment_plan: TreatmentPlanC
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
         if treatment_plan.clinic_id:
-            clinic = db.query(Clinic).filter(Clinic.id == treatment_plan.clinic_id).first()
+            clinic = await get_entity(await get_redis_cache_client(), db, "clinic", treatment_plan.clinic_id)
             if not clinic:
                 return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "Invalid clinic ID"})
         
@@ -766,7 +768,7 @@ async def create_treatment_plan(request: Request, treatment_plan: TreatmentPlanC
         
         # Create treatment plan
         new_treatment_plan = TreatmentPlan(
-            doctor_id=user.id,
+            doctor_id=user["id"],
             patient_id=patient.id,
             appointment_id=appointment.id,
             date=treatment_plan.date or datetime.now(),
@@ -792,7 +794,7 @@ async def create_treatment_plan(request: Request, treatment_plan: TreatmentPlanC
                 treatment_plan_id=new_treatment_plan.id,
                 patient_id=patient.id,
                 appointment_id=appointment.id,
-                doctor_id=user.id,
+                doctor_id=user["id"],
                 treatment_date=item.treatment_date,
                 treatment_name=item.treatment_name,
                 tooth_number=item.tooth_number,
@@ -855,7 +857,7 @@ async def get_treatment_plans(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
 
@@ -866,24 +868,24 @@ async def get_treatment_plans(
         
         stats = {
             "today": db.query(TreatmentPlan).filter(
-                TreatmentPlan.doctor_id == user.id,
+                TreatmentPlan.doctor_id == user["id"],
                 func.date(TreatmentPlan.created_at) == today
             ).count(),
             "month": db.query(TreatmentPlan).filter(
-                TreatmentPlan.doctor_id == user.id,
+                TreatmentPlan.doctor_id == user["id"],
                 TreatmentPlan.created_at >= month_start
             ).count(),
             "year": db.query(TreatmentPlan).filter(
-                TreatmentPlan.doctor_id == user.id,
+                TreatmentPlan.doctor_id == user["id"],
                 TreatmentPlan.created_at >= year_start
             ).count(),
             "total": db.query(TreatmentPlan).filter(
-                TreatmentPlan.doctor_id == user.id
+                TreatmentPlan.doctor_id == user["id"]
             ).count()
         }
 
         # Build query with sorting
-        query = db.query(TreatmentPlan).filter(TreatmentPlan.doctor_id == user.id)
+        query = db.query(TreatmentPlan).filter(TreatmentPlan.doctor_id == user["id"])
         if hasattr(TreatmentPlan, sort_by):
             sort_column = getattr(TreatmentPlan, sort_by)
             if sort_order.lower() == "desc":
@@ -995,7 +997,7 @@ async def search_treatment_plans(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
             
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
@@ -1003,7 +1005,7 @@ async def search_treatment_plans(
         query = db.query(TreatmentPlan).distinct()
         
         # Apply base filters
-        query = query.filter(TreatmentPlan.doctor_id == user.id)
+        query = query.filter(TreatmentPlan.doctor_id == user["id"])
         
         if patient_id:
             query = query.filter(TreatmentPlan.patient_id == patient_id)
@@ -1122,14 +1124,14 @@ async def get_treatment_plan(treatment_plan_id: str, request: Request, db: Sessi
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
         # Get treatment plan
         treatment_plan = db.query(TreatmentPlan).filter(
             TreatmentPlan.id == treatment_plan_id,
-            TreatmentPlan.doctor_id == user.id
+            TreatmentPlan.doctor_id == user["id"]
         ).first()
         
         if not treatment_plan:
@@ -1191,14 +1193,14 @@ async def update_treatment_plan(treatment_plan_id: str, request: Request, treatm
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
 
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
         # Get treatment plan
         existing_treatment_plan = db.query(TreatmentPlan).filter(
             TreatmentPlan.id == treatment_plan_id,
-            TreatmentPlan.doctor_id == user.id
+            TreatmentPlan.doctor_id == user["id"]
         ).first()
         
         if not existing_treatment_plan:
@@ -1268,14 +1270,14 @@ async def delete_treatment_plan(treatment_plan_id: str, request: Request, db: Se
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
 
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
 
         # Get treatment plan
         treatment_plan = db.query(TreatmentPlan).filter(
             TreatmentPlan.id == treatment_plan_id,
-            TreatmentPlan.doctor_id == user.id
+            TreatmentPlan.doctor_id == user["id"]
         ).first()
         
         if not treatment_plan:
@@ -1345,7 +1347,7 @@ async def create_completed_procedure(
                 content={"message": "Authentication required"}
             )
 
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED, 
@@ -1355,13 +1357,13 @@ async def create_completed_procedure(
         # Validate clinic if provided
         clinic_id = None
         if completed_procedure.clinic_id:
-            clinic = db.query(Clinic).filter(Clinic.id == completed_procedure.clinic_id).first()
+            clinic = await get_entity(await get_redis_cache_client(), db, "clinic", completed_procedure.clinic_id)
             if not clinic:
                 return JSONResponse(
                     status_code=status.HTTP_404_NOT_FOUND, 
                     content={"message": "Clinic not found"}
                 )
-            clinic_id = clinic.id
+            clinic_id = clinic["id"]
         
         # Validate appointment if provided
         appointment_id = None
@@ -1383,7 +1385,7 @@ async def create_completed_procedure(
             
         # Create completed procedure
         new_completed_procedure = CompletedProcedure(
-            doctor_id=user.id,
+            doctor_id=user["id"],
             clinic_id=clinic_id,
             appointment_id=appointment_id
         )
@@ -1483,12 +1485,12 @@ async def get_completed_procedures_by_doctor(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
 
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "User not found"})
         
         # Build base query
-        base_query = db.query(CompletedProcedure).filter(CompletedProcedure.doctor_id == user.id)
+        base_query = db.query(CompletedProcedure).filter(CompletedProcedure.doctor_id == user["id"])
         
         # Get total count for pagination
         total_procedures = base_query.count()
@@ -1615,7 +1617,7 @@ async def get_completed_procedures_by_appointment(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "User not found"})
         
@@ -1718,14 +1720,14 @@ async def get_completed_procedure_by_id(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid token"})
         
         # Get the completed procedure
         completed_procedure = db.query(CompletedProcedure).filter(
             CompletedProcedure.id == procedure_id,
-            CompletedProcedure.doctor_id == user.id
+            CompletedProcedure.doctor_id == user["id"]
         ).first()
         
         if not completed_procedure:
@@ -1805,7 +1807,7 @@ async def search_completed_procedures(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "User not found"})
 
@@ -1815,7 +1817,7 @@ async def search_completed_procedures(
             sort_by = "created_at"
 
         # Build base query for completed procedures
-        base_query = db.query(CompletedProcedure).filter(CompletedProcedure.doctor_id == user.id)
+        base_query = db.query(CompletedProcedure).filter(CompletedProcedure.doctor_id == user["id"])
 
         # Apply appointment filter if provided
         if appointment_id:
@@ -1953,14 +1955,14 @@ async def update_completed_procedure(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "User not found"})
         
         # Find the completed procedure and verify ownership
         completed_procedure = db.query(CompletedProcedure).filter(
             CompletedProcedure.id == procedure_id,
-            CompletedProcedure.doctor_id == user.id
+            CompletedProcedure.doctor_id == user["id"]
         ).first()
         
         if not completed_procedure:
@@ -2089,7 +2091,7 @@ async def delete_completed_procedure_item(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "User not found"})
         
@@ -2143,14 +2145,14 @@ async def delete_completed_procedure(
         if not decoded_token:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Authentication required"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "User not found"})
         
         # First check if the procedure exists
         completed_procedure = db.query(CompletedProcedure).filter(
             CompletedProcedure.id == procedure_id,
-            CompletedProcedure.doctor_id == user.id
+            CompletedProcedure.doctor_id == user["id"]
         ).first()
         
         if not completed_procedure:
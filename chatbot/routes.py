@@ -0,0 +1,72 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from .schemas import ChatbotQuestion
+from utils.chatbot import chatbot, ChatbotBusy
+
+chatbot_router = APIRouter()
+
+@chatbot_router.post(
+    "/ask",
+    status_code=status.HTTP_200_OK,
+    summary="Ask the FAQ chatbot a question",
+    description="""
+    Find the FAQ entries closest in meaning to a question.
+
+    Request body:
+    - question: The user's question (1-500 characters)
+    - top_k: Number of matches to return (default: 1, max: 10)
+    - min_score: Minimum cosine similarity for a match, between 0 and 1 (default: CHATBOT_MIN_SCORE)
+
+    answer is the best match's answer, or null when no entry is similar enough.
+    The model loads on first use, so the first question after a restart can take a few seconds.
+    """,
+    responses={
+        200: {
+            "description": "Matching FAQ entries, best first",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "answer": "Backupdoc.ai is an AI-powered platform designed to assist dentists...",
+                        "matches": [
+                            {
+                                "question": "What is Backupdoc.ai?",
+                                "answer": "Backupdoc.ai is an AI-powered platform designed to assist dentists...",
+                                "score": 0.8731
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        503: {
+            "description": "Too many questions are waiting for the model",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Chatbot is busy, please try again"}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: [error details]"}
+                }
+            }
+        }
+    }
+)
+async def ask_chatbot(body: ChatbotQuestion):
+    try:
+        matches = await chatbot.ask(body.question, body.top_k, body.min_score)
+        return {"answer": matches[0]["answer"] if matches else None, "matches": matches}
+    except ChatbotBusy:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"message": "Chatbot is busy, please try again"}
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": f"Internal server error: {str(e)}"}
+        )
@@ -0,0 +1,18 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from utils.config import CHATBOT_MIN_SCORE
+from utils.chatbot import MAX_TOP_K
+
+class ChatbotQuestion(BaseModel):
+    question: str = Field(..., min_length=1, max_length=500)
+    top_k: int = Field(1, ge=1, le=MAX_TOP_K)
+    min_score: float = Field(CHATBOT_MIN_SCORE, ge=0, le=1)
+
+class ChatbotAnswer(BaseModel):
+    question: str
+    answer: str
+    score: float
+
+class ChatbotResponse(BaseModel):
+    answer: Optional[str]
+    matches: List[ChatbotAnswer]
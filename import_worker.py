@@ -0,0 +1,170 @@
+"""
+Import worker pool.
+
+Runs a fixed number of long-lived worker processes that consume data import
+jobs queued by /user/import-data. Start it next to the API:
+
+    python import_worker.py
+
+Workers need the same uploads/ directory and database as the API. Pool size,
+chunking and retries are configured through the IMPORT_* settings in utils/config.py.
+"""
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+from multiprocessing import Process, Event
+
+from prometheus_client import start_http_server
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily, REGISTRY
+
+from redis_client import get_sync_redis_client
+from utils.config import IMPORT_WORKER_CONCURRENCY, IMPORT_WORKER_METRICS_PORT, IMPORT_JOB_MAX_ATTEMPTS
+from utils.import_queue import ImportJobQueue, ImportCancelled, is_import_cancelled, queue_depths, METRICS_KEY, INFLIGHT_KEY
+
+IDLE_POLL_SECONDS = 1.0
+
+
+def worker_id_for(slot: int) -> str:
+    return f"{socket.gethostname()}:{slot}"
+
+
+def fail_import(import_log_id: str, message: str):
+    """Mark an import as failed from outside the import itself."""
+    from db.db import SessionLocal
+    from auth.models import ImportLog, ImportStatus
+
+    db = SessionLocal()
+    try:
+        import_log = db.query(ImportLog).filter(ImportLog.id == import_log_id).first()
+        if import_log and import_log.status in [ImportStatus.PENDING, ImportStatus.PROCESSING]:
+            import_log.status = ImportStatus.FAILED
+            import_log.error_message = message
+            db.commit()
+    finally:
+        db.close()
+
+
+def run_worker(slot: int, stop_event):
+    """Consume jobs one at a time until the supervisor asks us to stop."""
+    # Imported here so only the worker processes load pandas and the importers
+    from db.db import SessionLocal
+    from auth.routes import process_data_in_background
+
+    redis_client = get_sync_redis_client()
+    queue = ImportJobQueue(redis_client, worker_id_for(slot))
+    print(f"Import worker {queue.worker_id} started (pid {os.getpid()})")
+
+    while not stop_event.is_set():
+        try:
+            job = queue.dequeue()
+        except Exception as e:
+            print(f"Import worker {queue.worker_id} could not reach Redis: {e}")
+            time.sleep(5)
+            continue
+
+        if not job:
+            time.sleep(IDLE_POLL_SECONDS)
+            continue
+
+        import_log_id = job["import_log_id"]
+        if is_import_cancelled(redis_client, import_log_id):
+            print(f"Skipping cancelled import {import_log_id}")
+            queue.finish()
+            queue.record_job("cancelled", 0, 0)
+            continue
+
+        print(f"Import worker {queue.worker_id} picked up import {import_log_id} (attempt {job['attempt']})")
+        started = time.perf_counter()
+        status = "completed"
+        rows = 0
+        try:
+            rows = asyncio.run(process_data_in_background(
+                job["file_path"], job["user_id"], import_log_id, SessionLocal(), job["uuid"]
+            ))
+            if rows is None:
+                # The importer records its own failure on the import log
+                status = "failed"
+                rows = 0
+        except ImportCancelled:
+            status = "cancelled"
+        except Exception as e:
+            print(f"Import {import_log_id} failed: {e}")
+            status = "failed"
+        finally:
+            queue.finish()
+            queue.record_job(status, rows, time.perf_counter() - started)
+
+
+class ImportQueueCollector:
+    """Prometheus collector reading queue depth and worker counters from Redis at scrape time."""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    def collect(self):
+        depth = GaugeMetricFamily("import_queue_depth", "Import jobs waiting per tenant", labels=["tenant"])
+        total_depth = 0
+        for tenant, waiting in queue_depths(self.redis).items():
+            depth.add_metric([tenant], waiting)
+            total_depth += waiting
+        yield depth
+        yield GaugeMetricFamily("import_queue_depth_total", "Import jobs waiting across all tenants", value=total_depth)
+        yield GaugeMetricFamily("import_jobs_in_flight", "Import jobs currently running", value=self.redis.hlen(INFLIGHT_KEY))
+
+        counters = self.redis.hgetall(METRICS_KEY)
+        for name in ["jobs_completed_total", "jobs_failed_total", "jobs_cancelled_total", "rows_processed_total", "chunks_retried_total", "job_seconds_total"]:
+            # CounterMetricFamily appends the _total suffix itself
+            yield CounterMetricFamily(f"import_{name[:-len('_total')]}", f"Import worker {name.replace('_', ' ')}", value=float(counters.get(name, 0)))
+        yield GaugeMetricFamily("import_last_rows_per_second", "Rows per second of the most recent import", value=float(counters.get("last_rows_per_second", 0)))
+
+
+def start_worker(slot: int, stop_event) -> Process:
+    process = Process(target=run_worker, args=(slot, stop_event), name=f"import-worker-{slot}")
+    process.start()
+    return process
+
+
+def main():
+    redis_client = get_sync_redis_client()
+    REGISTRY.register(ImportQueueCollector(redis_client))
+    start_http_server(IMPORT_WORKER_METRICS_PORT)
+    print(f"Import worker metrics on :{IMPORT_WORKER_METRICS_PORT}/metrics")
+
+    stop_event = Event()
+
+    def handle_stop(signum, frame):
+        print("Stopping import workers after their current job...")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    # Requeue anything left in flight by a previous run of this host
+    for slot in range(IMPORT_WORKER_CONCURRENCY):
+        expired = ImportJobQueue(redis_client, worker_id_for(slot)).requeue_inflight(IMPORT_JOB_MAX_ATTEMPTS)
+        if expired:
+            fail_import(expired["import_log_id"], "Import worker stopped unexpectedly")
+
+    workers = {slot: start_worker(slot, stop_event) for slot in range(IMPORT_WORKER_CONCURRENCY)}
+
+    while not stop_event.is_set():
+        for slot, process in list(workers.items()):
+            if process.is_alive():
+                continue
+            print(f"Import worker {slot} exited with code {process.exitcode}, restarting")
+            expired = ImportJobQueue(redis_client, worker_id_for(slot)).requeue_inflight(IMPORT_JOB_MAX_ATTEMPTS)
+            if expired:
+                fail_import(expired["import_log_id"], "Import worker crashed repeatedly while processing this file")
+            workers[slot] = start_worker(slot, stop_event)
+        time.sleep(1)
+
+    for process in workers.values():
+        process.join()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from sqlalchemy import Float, String, DateTime, ForeignKey, Enum as SQLAlchemyEnum, Integer, Boolean, null, Date, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.schema import Index
 from db.db import Base
 from datetime import datetime
 import uuid
@@ -23,6 +24,8 @@ class Patient(Base):
     patient_number: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     mobile_number: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # E.164 form of mobile_number, kept in step by utils/phone_columns.py
+    mobile_e164: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
     contact_number: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     email: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     secondary_mobile: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
@@ -35,6 +38,8 @@ class Patient(Base):
     abha_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     date_of_birth: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     age: Mapped[Optional[str]] = mapped_column(String(5), nullable=True)
+    # Derived from date_of_birth, else from age, by utils/patient_age.py; age = current year - birth_year
+    birth_year: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     anniversary_date: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     blood_group: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     occupation: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
@@ -49,6 +54,13 @@ class Patient(Base):
     patient_notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
 
+    __table_args__ = (
+        # Serves age-range filters within one doctor's patients
+        Index("ix_patients_doctor_birth_year", "doctor_id", "birth_year"),
+        # Serves exact phone lookups; family members may share a number, so not unique
+        Index("ix_patients_doctor_mobile_e164", "doctor_id", "mobile_e164"),
+    )
+
 
 class ClinicalNote(Base):
     __tablename__ = "clinical_notes"
@@ -26,6 +26,12 @@ from prediction.models import *
 from auth.models import Clinic
 from datetime import date
 from prediction.routes import update_image_url
+from utils.suggestion_store import upsert_suggestion_sets
+from utils.patient_age import age_at_least, age_at_most
+from utils.patient_index import patient_indexes, ALL_FIELDS, NAME, PHONE, PHONE_SUFFIX, ABHA
+from utils.config import PATIENT_TYPEAHEAD_MAX_CANDIDATES, PATIENT_SEARCH_MAX_IN_IDS
+from redis_client import get_redis_client
+from utils.entity_cache import get_authenticated_user
 
 
 patient_router = APIRouter()
@@ -756,7 +762,7 @@ async def get_patient_by_id(
                 content={"message": "Unauthorized"}
             )
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -773,7 +779,7 @@ async def get_patient_by_id(
         patient = db.execute(
             select(Patient).filter(
                 Patient.id == patient_id,
-                Patient.doctor_id == user.id
+                Patient.doctor_id == user["id"]
             )
         ).scalar_one_or_none()
 
@@ -829,7 +835,7 @@ async def get_patient_by_id(
         db_appointments = db.execute(
             select(Appointment).filter(
                 Appointment.patient_id == patient_id
-                # Appointment.doctor_id == user.id
+                # Appointment.doctor_id == user["id"]
             )
         ).scalars().all()
 
@@ -1130,15 +1136,16 @@ async def get_patient_by_id(
     Search and filter patients using various criteria.
     
     Available search filters:
-    - name: Partial match on patient name
-    - mobile_number: Partial match on mobile number 
+    - q: Matches name words, phone numbers (by leading or last digits), patient number, email and ABHA ID
+    - name: Prefix match on any word of the patient name
+    - mobile_number: Leading or last digits of the mobile, contact or secondary number
     - min_age: Minimum age for filtering
     - max_age: Maximum age for filtering
     - date_of_birth: Exact date of birth (YYYY-MM-DD)
     - date_of_birth_after: Filter patients born after this date
     - date_of_birth_before: Filter patients born before this date
     - gender: Exact match (male/female/other)
-    - abha_id: Partial match on ABHA ID
+    - abha_id: Prefix match on ABHA ID
     - created_at_date: Filter patients created on a specific date (YYYY-MM-DD)
     - today: Boolean flag to filter patients created today (default: false)
     - recent: Boolean flag to get patients created in the last 7 days (default: false)
@@ -1146,8 +1153,12 @@ async def get_patient_by_id(
     Pagination parameters:
     - page: Page number (default: 1)
     - per_page: Results per page (default: 10, max: 100)
-    - sort_by: Field to sort by (default: created_at)
+    - sort_by: Field to sort by, or "relevance" (default: relevance when q, name, mobile_number or abha_id is given, else created_at)
     - sort_order: Sort direction (asc/desc, default: desc)
+
+    Typeahead:
+    - typeahead: When true, returns only the best `per_page` matches for q, name, mobile_number and
+      abha_id as compact summaries, without pagination, statistics or the other filters
     
     Required headers:
     - Authorization: Bearer {access_token}
@@ -1204,6 +1215,7 @@ async def get_patient_by_id(
 )
 async def search_patients(
     request: Request,
+    q: Optional[str] = None,
     name: Optional[str] = None,
     mobile_number: Optional[str] = None,
     min_age: Optional[int] = None,
@@ -1216,9 +1228,10 @@ async def search_patients(
     created_at_date: Optional[date] = None,
     today: bool = False,
     recent: bool = False,
+    typeahead: bool = False,
     page: int = Query(default=1, ge=1, description="Page number"),
     per_page: int = Query(default=10, ge=1, le=100, description="Items per page"),
-    sort_by: str = Query(default="created_at", description="Field to sort by"),
+    sort_by: Optional[str] = Query(default=None, description="Field to sort by, or relevance"),
     sort_order: str = Query(default="desc", description="Sort direction (asc/desc)"),
     db: Session = Depends(get_db)
 ):
@@ -1227,36 +1240,42 @@ async def search_patients(
         decoded_token = verify_token(request)
         doctor_id = decoded_token.get("user_id")
         
+        # Text filters are answered from the doctor's in-memory patient index
+        criteria = []
+        if q:
+            criteria.append((q, ALL_FIELDS))
+        if name:
+            criteria.append((name, (NAME,)))
+        if mobile_number:
+            criteria.append((mobile_number, (PHONE, PHONE_SUFFIX)))
+        if abha_id:
+            criteria.append((abha_id, (ABHA,)))
+        ranked_ids = None
+        if criteria:
+            index = await patient_indexes.get(await get_redis_client(), db, doctor_id)
+            if typeahead:
+                scores = index.match_all(criteria, PATIENT_TYPEAHEAD_MAX_CANDIDATES)
+                return {"items": [index.entries[position] for position in index.rank(scores, q or name or "", per_page)]}
+            scores = index.match_all(criteria)
+            ranked_ids = index.ids(index.rank(scores, q or name or ""))
+        elif typeahead:
+            return {"items": []}
+
+        if sort_by is None:
+            sort_by = "relevance" if criteria else "created_at"
+
         # Base query - use a join to ensure we get all patient fields
         query = select(Patient).where(Patient.doctor_id == doctor_id)
         
         # Add filters for each field if provided
-        if name:
-            query = query.where(func.lower(Patient.name).contains(func.lower(name)))
-        if mobile_number:
-            query = query.where(Patient.mobile_number.contains(mobile_number))
         if gender:
             query = query.where(Patient.gender == gender)
-        if abha_id:
-            query = query.where(Patient.abha_id.contains(abha_id))
 
-        # Add age range filter - handle both string and integer age values
+        # Add age range filter on the normalised birth year
         if min_age is not None:
-            # Try both numeric comparison and string pattern matching
-            query = query.where(
-                or_(
-                    cast(Patient.age, Integer) >= min_age,
-                    Patient.age.like(f"{min_age}%"),
-                    Patient.age.like(f"%{min_age}%")
-                )
-            )
+            query = query.where(age_at_least(min_age))
         if max_age is not None:
-            query = query.where(
-                or_(
-                    cast(Patient.age, Integer) <= max_age,
-                    func.length(Patient.age) <= len(str(max_age))
-                )
-            )
+            query = query.where(age_at_most(max_age))
 
         # Add date of birth filters
         if date_of_birth:
@@ -1284,29 +1303,66 @@ async def search_patients(
             date_end = datetime.combine(created_at_date, time.max)
             query = query.where(Patient.created_at.between(date_start, date_end))
 
-        # Get total count for pagination before applying sorting and pagination
-        count_query = select(func.count()).select_from(query.subquery())
-        total = db.execute(count_query).scalar() or 0
-        
-        # Add sorting
-        if recent:
-            # Override sort settings for recent patients
-            query = query.order_by(Patient.created_at.desc())
-        elif hasattr(Patient, sort_by):
-            sort_column = getattr(Patient, sort_by)
-            if sort_order.lower() == "desc":
-                query = query.order_by(sort_column.desc())
-            else:
-                query = query.order_by(sort_column.asc())
+        sql_filtered = any([
+            gender, min_age is not None, max_age is not None, date_of_birth, date_of_birth_after,
+            date_of_birth_before, today, recent, created_at_date
+        ])
+
+        def load_page(ordered_ids):
+            page_ids = ordered_ids[(page - 1) * per_page:page * per_page]
+            by_id = {}
+            if page_ids:
+                by_id = {patient.id: patient for patient in db.execute(select(Patient).where(Patient.id.in_(page_ids))).scalars()}
+            return [by_id[patient_id] for patient_id in page_ids if patient_id in by_id]
+
+        # Index matches beyond PATIENT_SEARCH_MAX_IN_IDS are filtered in memory
+        # against the SQL filters' ids instead of being sent as one huge IN list
+        many_matches = ranked_ids is not None and len(ranked_ids) > PATIENT_SEARCH_MAX_IN_IDS
+
+        if ranked_ids is not None and sort_by == "relevance" and not recent:
+            # Keep the index's ranking and page through it, dropping matches the other filters exclude
+            if sql_filtered:
+                id_query = query.with_only_columns(Patient.id)
+                if not many_matches:
+                    id_query = id_query.where(Patient.id.in_(ranked_ids))
+                allowed = set(db.execute(id_query).scalars())
+                ranked_ids = [patient_id for patient_id in ranked_ids if patient_id in allowed]
+            total = len(ranked_ids)
+            patients = load_page(ranked_ids)
         else:
-            # Default sort if invalid column specified
-            query = query.order_by(Patient.created_at.desc())
-            
-        # Add pagination
-        query = query.offset((page - 1) * per_page).limit(per_page)
-            
-        # Execute query
-        patients = db.execute(query).scalars().all()
+            if ranked_ids is not None and not many_matches:
+                query = query.where(Patient.id.in_(ranked_ids))
+
+            # Get total count for pagination before applying sorting and pagination
+            if not many_matches:
+                count_query = select(func.count()).select_from(query.subquery())
+                total = db.execute(count_query).scalar() or 0
+
+            # Add sorting
+            if recent:
+                # Override sort settings for recent patients
+                query = query.order_by(Patient.created_at.desc())
+            elif hasattr(Patient, sort_by):
+                sort_column = getattr(Patient, sort_by)
+                if sort_order.lower() == "desc":
+                    query = query.order_by(sort_column.desc())
+                else:
+                    query = query.order_by(sort_column.asc())
+            else:
+                # Default sort if invalid column specified
+                query = query.order_by(Patient.created_at.desc())
+
+            if many_matches:
+                matched = set(ranked_ids)
+                sorted_ids = [patient_id for patient_id in db.execute(query.with_only_columns(Patient.id)).scalars() if patient_id in matched]
+                total = len(sorted_ids)
+                patients = load_page(sorted_ids)
+            else:
+                # Add pagination
+                query = query.offset((page - 1) * per_page).limit(per_page)
+
+                # Execute query
+                patients = db.execute(query).scalars().all()
         
         # Format patient data for response
         patient_list = []
@@ -2060,7 +2116,7 @@ async def create_clinical_note(
     try:
         # Verify user and get patient
         decoded_token = verify_token(request)
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -2070,7 +2126,7 @@ async def create_clinical_note(
         patient = db.execute(
             select(Patient).filter(
                 Patient.id == patient_id,
-                Patient.doctor_id == user.id
+                Patient.doctor_id == user["id"]
             )
         ).scalar_one_or_none()
 
@@ -2084,7 +2140,7 @@ async def create_clinical_note(
         # check if clinic is associated with the doctor
         clinic = None
         if clinic_id:
-            clinic = db.execute(select(Clinic).filter(Clinic.id == clinic_id, Clinic.doctors.any(User.id == user.id))).scalar_one_or_none()
+            clinic = db.execute(select(Clinic).filter(Clinic.id == clinic_id, Clinic.doctors.any(User.id == user["id"]))).scalar_one_or_none()
             if not clinic:
                 return JSONResponse(
                     status_code=status.HTTP_401_UNAUTHORIZED, 
@@ -2105,7 +2161,7 @@ async def create_clinical_note(
         clinical_note_db = ClinicalNote(
             patient_id=patient.id,
             clinic_id=clinic.id if clinic else None,
-            doctor_id=user.id,
+            doctor_id=user["id"],
             appointment_id=appointment.id if appointment else None,
             date=datetime.now().date()
         )
@@ -2276,6 +2332,16 @@ async def create_clinical_note(
             if notes_db:
                 db.add_all(notes_db)
 
+        # Offer what was just written as suggestions next time
+        upsert_suggestion_sets(db, {
+            "complaint": complaints_list,
+            "diagnosis": diagnoses_list,
+            "vital_sign": vital_signs_list,
+            "observation": observations_list,
+            "investigation": investigations_list,
+            "treatment": [treatment.get("name") for treatment in treatments_list]
+        })
+
         db.commit()
         
         return {
@@ -2492,7 +2558,7 @@ async def add_patient_file(
             )
 
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -2619,7 +2685,7 @@ async def get_patient_files(
             )
 
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -2740,7 +2806,7 @@ async def get_patient_file(
             )
 
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -2864,7 +2930,7 @@ async def delete_patient_file(
             )
         
         user_id = decoded_token.get("user_id")
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(
                 status_code=status.HTTP_401_UNAUTHORIZED,
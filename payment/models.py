@@ -1,6 +1,7 @@
 from sqlalchemy import String, DateTime, ForeignKey, Float, Boolean, Text, JSON, Integer, Enum as SQLAlchemyEnum
 from sqlalchemy.dialects.mysql import LONGTEXT
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.schema import Index
 from db.db import Base
 from datetime import datetime
 import uuid
@@ -58,6 +59,11 @@ class Payment(Base):
     created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.now, nullable=True)
     updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=True)
 
+    __table_args__ = (
+        # Serves receipt number lookups from the unified search
+        Index("ix_payments_doctor_receipt_number", "doctor_id", "receipt_number"),
+    )
+
 
 class Invoice(Base):
     __tablename__ = "invoices"
@@ -83,6 +89,10 @@ class Invoice(Base):
     updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=True)
     invoice_items: Mapped[list["InvoiceItem"]] = relationship("InvoiceItem", back_populates="invoice")
 
+    __table_args__ = (
+        # Serves invoice number lookups from the unified search
+        Index("ix_invoices_doctor_invoice_number", "doctor_id", "invoice_number"),
+    )
 
 
 class InvoiceItem(Base):
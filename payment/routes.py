@@ -7,6 +7,8 @@ from db.db import get_db
 from auth.models import User
 from patient.models import Patient
 from utils.auth import verify_token
+from utils.entity_cache import get_authenticated_user, get_entities, get_entity
+from redis_client import get_redis_cache_client
 from typing import Optional
 from utils.generate_invoice import create_professional_invoice
 import uuid
@@ -100,12 +102,12 @@ async def create_expense(request: Request, expense: ExpenseCreate, db: Session =
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
         expense_data = expense.model_dump()
-        expense_data["doctor_id"] = user.id
+        expense_data["doctor_id"] = user["id"]
 
         new_expense = Expense(**expense_data)
         db.add(new_expense)
@@ -220,12 +222,12 @@ async def get_expenses(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
         # Base query
-        query = db.query(Expense).filter(Expense.doctor_id == user.id).order_by(Expense.created_at.desc())
+        query = db.query(Expense).filter(Expense.doctor_id == user["id"]).order_by(Expense.created_at.desc())
 
         # Date filters if provided
         if start_date:
@@ -256,22 +258,22 @@ async def get_expenses(
 
         stats = {
             "today_total": db.query(func.sum(Expense.amount)).filter(
-                Expense.doctor_id == user.id,
+                Expense.doctor_id == user["id"],
                 func.date(Expense.date) == today
             ).scalar() or 0,
             
             "month_total": db.query(func.sum(Expense.amount)).filter(
-                Expense.doctor_id == user.id,
+                Expense.doctor_id == user["id"],
                 Expense.date >= month_start
             ).scalar() or 0,
             
             "year_total": db.query(func.sum(Expense.amount)).filter(
-                Expense.doctor_id == user.id,
+                Expense.doctor_id == user["id"],
                 Expense.date >= year_start
             ).scalar() or 0,
             
             "overall_total": db.query(func.sum(Expense.amount)).filter(
-                Expense.doctor_id == user.id
+                Expense.doctor_id == user["id"]
             ).scalar() or 0
         }
         
@@ -379,7 +381,7 @@ async def get_expense(request: Request, expense_id: str, db: Session = Depends(g
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
@@ -489,12 +491,12 @@ async def update_expense(request: Request, expense_id: str, expense: ExpenseUpda
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
         expense_data = expense.model_dump()
-        expense_data["doctor_id"] = user.id
+        expense_data["doctor_id"] = user["id"]
 
         existing_expense = db.query(Expense).filter(Expense.id == expense_id).first()
         if not existing_expense:
@@ -572,7 +574,7 @@ async def delete_expense(request: Request, expense_id: str, db: Session = Depend
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
@@ -702,20 +704,20 @@ async def create_payment(request: Request, patient_id: str, payment: PaymentCrea
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
             
-        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        patient = await get_entity(await get_redis_cache_client(), db, "patient", patient_id)
         if not patient:
             return JSONResponse(status_code=404, content={"message": "Patient not found"})
             
         payment_data = payment.model_dump()
         
-        payment_data["doctor_id"] = user.id
+        payment_data["doctor_id"] = user["id"]
         payment_data["patient_id"] = patient_id
-        payment_data["patient_name"] = patient.name
-        payment_data["patient_number"] = patient.patient_number
+        payment_data["patient_name"] = patient["name"]
+        payment_data["patient_number"] = patient["patient_number"]
 
         new_payment = Payment(**payment_data)
         db.add(new_payment)
@@ -730,10 +732,10 @@ async def create_payment(request: Request, patient_id: str, payment: PaymentCrea
             invoice_data = {
                 "date": new_payment.date,
                 "patient_id": patient_id,
-                "doctor_id": user.id,
-                "patient_number": patient.patient_number,
-                "patient_name": patient.name,
-                "doctor_name": f"{user.name}",
+                "doctor_id": user["id"],
+                "patient_number": patient["patient_number"],
+                "patient_name": patient["name"],
+                "doctor_name": f"{user['name']}",
                 "invoice_number": f"INV-{datetime.now().strftime('%Y%m%d')}-{new_payment.receipt_number}",
                 "notes": new_payment.notes,
                 "description": new_payment.treatment_name,
@@ -931,7 +933,7 @@ async def get_payments(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
@@ -939,11 +941,11 @@ async def get_payments(
         offset = (page - 1) * per_page
         
         # Get total count
-        total_count = db.query(Payment).filter(Payment.doctor_id == user.id).count()
+        total_count = db.query(Payment).filter(Payment.doctor_id == user["id"]).count()
 
         # Get paginated payments
         payments = db.query(Payment)\
-            .filter(Payment.doctor_id == user.id)\
+            .filter(Payment.doctor_id == user["id"])\
             .order_by(Payment.created_at.desc())\
             .offset(offset)\
             .limit(per_page)\
@@ -956,32 +958,31 @@ async def get_payments(
 
         stats = {
             "today_total": db.query(func.sum(Payment.amount_paid)).filter(
-                Payment.doctor_id == user.id,
+                Payment.doctor_id == user["id"],
                 func.date(Payment.date) == today
             ).scalar() or 0,
             
             "month_total": db.query(func.sum(Payment.amount_paid)).filter(
-                Payment.doctor_id == user.id,
+                Payment.doctor_id == user["id"],
                 Payment.date >= month_start
             ).scalar() or 0,
             
             "year_total": db.query(func.sum(Payment.amount_paid)).filter(
-                Payment.doctor_id == user.id,
+                Payment.doctor_id == user["id"],
                 Payment.date >= year_start
             ).scalar() or 0,
             
             "overall_total": db.query(func.sum(Payment.amount_paid)).filter(
-                Payment.doctor_id == user.id
+                Payment.doctor_id == user["id"]
             ).scalar() or 0
         }
         
         # Convert payments to dict for JSON serialization
         payments_list = []
+        doctors = (await get_entities(await get_redis_cache_client(), db, {"user": [payment.doctor_id for payment in payments]}))["user"]
         for payment in payments:
-            doctor_name = None
-            doctor = db.query(User).filter(User.id == payment.doctor_id).first()
-            if doctor:
-                doctor_name = doctor.name
+            doctor = doctors.get(payment.doctor_id)
+            doctor_name = doctor["name"] if doctor else None
             payment_dict = {
                 "id": payment.id,
                 "date": payment.date.isoformat() if payment.date else None,
@@ -1126,12 +1127,12 @@ async def get_payments_by_patient_id(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
         # Check if patient exists
-        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        patient = await get_entity(await get_redis_cache_client(), db, "patient", patient_id)
         if not patient:
             return JSONResponse(status_code=404, content={"message": "Patient not found"})
             
@@ -1177,11 +1178,10 @@ async def get_payments_by_patient_id(
         
         # Convert payments to dict for JSON serialization
         payments_list = []
+        doctors = (await get_entities(await get_redis_cache_client(), db, {"user": [payment.doctor_id for payment in payments]}))["user"]
         for payment in payments:
-            doctor_name = None
-            doctor = db.query(User).filter(User.id == payment.doctor_id).first()
-            if doctor:
-                doctor_name = doctor.name
+            doctor = doctors.get(payment.doctor_id)
+            doctor_name = doctor["name"] if doctor else None
             payment_dict = {
                 "id": payment.id,
                 "date": payment.date.isoformat() if payment.date else None,
@@ -1272,7 +1272,7 @@ async def get_payment(request: Request, payment_id: str, db: Session = Depends(g
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
@@ -1280,10 +1280,8 @@ async def get_payment(request: Request, payment_id: str, db: Session = Depends(g
         if not payment:
             return JSONResponse(status_code=404, content={"message": "Payment not found"})
         
-        doctor_name = None
-        doctor = db.query(User).filter(User.id == payment.doctor_id).first()
-        if doctor:
-            doctor_name = doctor.name
+        doctor = await get_entity(await get_redis_cache_client(), db, "user", payment.doctor_id)
+        doctor_name = doctor["name"] if doctor else None
         
         # Convert payment to dict for JSON serialization
         payment_dict = {
@@ -1516,12 +1514,12 @@ async def search_payments(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
         # Base query
-        query = db.query(Payment).filter(Payment.doctor_id == user.id)
+        query = db.query(Payment).filter(Payment.doctor_id == user["id"])
 
         # Apply independent filters
         if payment_id:
@@ -1580,19 +1578,19 @@ async def search_payments(
 
         stats = {
             "today": db.query(func.sum(Payment.amount_paid)).filter(
-                Payment.doctor_id == user.id,
+                Payment.doctor_id == user["id"],
                 func.date(Payment.date) == today
             ).scalar() or 0,
             "month": db.query(func.sum(Payment.amount_paid)).filter(
-                Payment.doctor_id == user.id,
+                Payment.doctor_id == user["id"],
                 Payment.date >= month_start
             ).scalar() or 0,
             "year": db.query(func.sum(Payment.amount_paid)).filter(
-                Payment.doctor_id == user.id,
+                Payment.doctor_id == user["id"],
                 Payment.date >= year_start
             ).scalar() or 0,
             "overall": db.query(func.sum(Payment.amount_paid)).filter(
-                Payment.doctor_id == user.id
+                Payment.doctor_id == user["id"]
             ).scalar() or 0
         }
 
@@ -1610,11 +1608,10 @@ async def search_payments(
         
         # Format response
         payments_list = []
+        doctors = (await get_entities(await get_redis_cache_client(), db, {"user": [payment.doctor_id for payment in payments]}))["user"]
         for payment in payments:
-            doctor_name = None
-            doctor = db.query(User).filter(User.id == payment.doctor_id).first()
-            if doctor:
-                doctor_name = doctor.name
+            doctor = doctors.get(payment.doctor_id)
+            doctor_name = doctor["name"] if doctor else None
             payment_dict = {
                 "id": payment.id,
                 "date": payment.date.isoformat() if payment.date else None,
@@ -1729,7 +1726,7 @@ async def update_payment(request: Request, payment_id: str, payment: PaymentUpda
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
@@ -1761,8 +1758,8 @@ async def update_payment(request: Request, payment_id: str, payment: PaymentUpda
                         "invoice_number": invoice.invoice_number,
                         "notes": invoice.notes,
                         "description": invoice.description,
-                        "doctor_phone": user.phone,
-                        "doctor_email": user.email,
+                        "doctor_phone": user["phone"],
+                        "doctor_email": user["email"],
 
                     }
 
@@ -1841,7 +1838,7 @@ async def delete_payment(request: Request, payment_id: str, db: Session = Depend
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
@@ -1930,12 +1927,12 @@ async def create_invoice(request: Request, invoice: InvoiceCreate, db: Session =
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
             
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
         # Get patient details
-        patient = db.query(Patient).filter(Patient.id == invoice.patient_id).first()
+        patient = await get_entity(await get_redis_cache_client(), db, "patient", invoice.patient_id)
         if not patient:
             return JSONResponse(status_code=404, content={"message": "Patient not found"})
         
@@ -1946,13 +1943,13 @@ async def create_invoice(request: Request, invoice: InvoiceCreate, db: Session =
         # Create payment record first
         new_payment = Payment(
             id=str(uuid.uuid4()),
-            patient_id=patient.id,
-            doctor_id=user.id,
+            patient_id=patient["id"],
+            doctor_id=user["id"],
             amount_paid=0,  # Will update after calculating total
             payment_mode="invoice",
             status="pending",
-            patient_number=patient.patient_number,
-            patient_name=patient.name,
+            patient_number=patient["patient_number"],
+            patient_name=patient["name"],
             invoice_number=invoice_number,
             date=current_time
         )
@@ -1964,12 +1961,12 @@ async def create_invoice(request: Request, invoice: InvoiceCreate, db: Session =
         new_invoice = Invoice(
             id=str(uuid.uuid4()),
             date=invoice.date or current_time,
-            patient_id=patient.id,
-            doctor_id=user.id,
+            patient_id=patient["id"],
+            doctor_id=user["id"],
             payment_id=new_payment.id,  # Set payment_id from the start
-            patient_name=patient.name,
-            patient_number=patient.patient_number,
-            doctor_name=user.name,
+            patient_name=patient["name"],
+            patient_number=patient["patient_number"],
+            doctor_name=user["name"],
             invoice_number=invoice_number,
             notes=invoice.notes,
             description=invoice.description,
@@ -2035,10 +2032,10 @@ async def create_invoice(request: Request, invoice: InvoiceCreate, db: Session =
         # Generate PDF with contact details
         invoice_data = {
             **new_invoice.__dict__,
-            "doctor_phone": user.phone,
-            "doctor_email": user.email,
-            "patient_phone": patient.mobile_number,
-            "patient_email": patient.email
+            "doctor_phone": user["phone"],
+            "doctor_email": user["email"],
+            "patient_phone": patient["mobile_number"],
+            "patient_email": patient["email"]
         }
         
         try:
@@ -2188,12 +2185,12 @@ async def get_invoices(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
         # Base query
-        query = db.query(Invoice).filter(Invoice.doctor_id == user.id)
+        query = db.query(Invoice).filter(Invoice.doctor_id == user["id"])
         
         # Apply filters
         if cancelled is not None:
@@ -2212,7 +2209,7 @@ async def get_invoices(
             total_query = db.query(
                 func.sum(InvoiceItem.unit_cost * InvoiceItem.quantity)
             ).join(Invoice).filter(
-                Invoice.doctor_id == user.id,
+                Invoice.doctor_id == user["id"],
                 Invoice.cancelled.is_(False)  # Only include non-cancelled invoices
             )
             
@@ -2418,7 +2415,7 @@ async def get_invoices_by_patient(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
@@ -2712,12 +2709,12 @@ async def search_invoices(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
         # Base query
-        query = db.query(Invoice).filter(Invoice.doctor_id == user.id)
+        query = db.query(Invoice).filter(Invoice.doctor_id == user["id"])
         
         # Apply independent searches
         if patient_name_search:
@@ -2749,7 +2746,7 @@ async def search_invoices(
             total_query = db.query(
                 func.sum(InvoiceItem.unit_cost * InvoiceItem.quantity)
             ).join(Invoice).filter(
-                Invoice.doctor_id == user.id,
+                Invoice.doctor_id == user["id"],
                 Invoice.cancelled.is_(False)
             )
             
@@ -2927,7 +2924,7 @@ async def get_invoice(request: Request, invoice_id: str, db: Session = Depends(g
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
@@ -3075,7 +3072,7 @@ async def update_invoice(request: Request, invoice_id: str, invoice: InvoiceUpda
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
@@ -3166,8 +3163,8 @@ async def update_invoice(request: Request, invoice_id: str, invoice: InvoiceUpda
         try:
             invoice_data = {
                 **existing_invoice.__dict__,
-                "doctor_phone": user.phone,
-                "doctor_email": user.email,
+                "doctor_phone": user["phone"],
+                "doctor_email": user["email"],
                 "total_amount": existing_invoice.total_amount
             }
 
@@ -3313,7 +3310,7 @@ async def delete_invoice(request: Request, invoice_id: str, db: Session = Depend
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
         
-        user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        user = await get_authenticated_user(db, decoded_token['user_id'])
         if not user:
             return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
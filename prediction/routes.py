@@ -6,6 +6,8 @@ from sqlalchemy.orm import Session
 from .schemas import XRayResponse, AddNotesRequest, LabelCreateAndUpdate, NewImageAnnotation
 from typing import List
 from utils.auth import verify_token
+from utils.entity_cache import get_authenticated_user, get_entity
+from redis_client import get_redis_cache_client
 from utils.prediction import calculate_class_percentage, hex_to_bgr, colormap
 from auth.models import User
 from patient.models import Patient
@@ -100,11 +102,11 @@ async def upload_xray(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Invalid or missing authentication token"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=401, content={"message": "User not found"})
         
-        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        patient = await get_entity(await get_redis_cache_client(), db, "patient", patient_id)
         if not patient:
             return JSONResponse(status_code=404, content={"message": "Patient not found"})
         
@@ -123,7 +125,7 @@ async def upload_xray(
         xray = XRay(
             patient=patient_id,
             original_image=file_path,
-            doctor=user.id,
+            doctor=user["id"],
         )
         db.add(xray)
         db.commit()
@@ -241,16 +243,16 @@ async def get_xrays(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Invalid or missing authentication token"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=401, content={"message": "User not found"})
         
-        patient = db.query(Patient).filter(Patient.id == patient_id).first()
+        patient = await get_entity(await get_redis_cache_client(), db, "patient", patient_id)
         if not patient:
             return JSONResponse(status_code=404, content={"message": "Patient not found"})
         
         # Get total count
-        total_count = db.query(XRay).filter(XRay.patient == patient.id).count()
+        total_count = db.query(XRay).filter(XRay.patient == patient["id"]).count()
         
         # Calculate offset for pagination
         offset = (page - 1) * per_page
@@ -258,7 +260,7 @@ async def get_xrays(
         # Get paginated xrays
         xrays = (
             db.query(XRay)
-            .filter(XRay.patient == patient.id)
+            .filter(XRay.patient == patient["id"])
             .order_by(XRay.created_at.desc())
             .offset(offset)
             .limit(per_page)
@@ -363,7 +365,7 @@ async def delete_xray(request: Request, xray_id: str, db: Session = Depends(get_
         if not decoded_token:
             return JSONResponse(status_code=401, content={"message": "Invalid or missing authentication token"})
         
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
         if not user:
             return JSONResponse(status_code=401, content={"message": "User not found"})
         
@@ -771,7 +773,7 @@ async def get_prediction(request: Request, prediction_id: str, db: Session = Dep
         # Validate user
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id")  if decoded_token else None
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
 
@@ -786,7 +788,7 @@ async def get_prediction(request: Request, prediction_id: str, db: Session = Dep
         if not xray:
             return JSONResponse(status_code=400, content={"error": "X-ray not found"})
         
-        patient = db.query(Patient).filter(Patient.id == xray.patient).first()
+        patient = await get_entity(await get_redis_cache_client(), db, "patient", xray.patient)
         if not patient:
             return JSONResponse(status_code=400, content={"error": "Patient not found"})
         
@@ -805,7 +807,7 @@ async def get_prediction(request: Request, prediction_id: str, db: Session = Dep
 
         # Get previous predictions for this patient
         previous_xrays = db.query(XRay).filter(
-            XRay.patient == patient.id,
+            XRay.patient == patient["id"],
             XRay.id != prediction.xray_id
         ).all()
         
@@ -827,10 +829,10 @@ async def get_prediction(request: Request, prediction_id: str, db: Session = Dep
             "predicted_image": update_image_url(str(xray.predicted_image), request) if xray.predicted_image else None,
             "legends": legend_details,
             "patient":{
-                "name": patient.name,
-                "gender": patient.gender.value,
-                "phone": patient.mobile_number,
-                "email": patient.email,
+                "name": patient["name"],
+                "gender": patient["gender"],
+                "phone": patient["mobile_number"],
+                "email": patient["email"],
             },
             "previous_predictions": previous_predictions,
             "created_at": prediction.created_at.isoformat() if prediction.created_at else None,
@@ -879,7 +881,7 @@ async def add_notes(request: Request, prediction_id: str, notes: AddNotesRequest
         # Validate user
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id") if decoded_token else None
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
@@ -935,7 +937,7 @@ async def delete_prediction(request: Request, prediction_id: str, db: Session =
         # Validate user
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id") if decoded_token else None
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
 
@@ -1003,7 +1005,7 @@ async def reset_prediction(request: Request, prediction_id: str, db: Session = D
         # Validate user
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id") if decoded_token else None
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
 
@@ -1132,7 +1134,7 @@ async def include_legend(request: Request, legend_id: str, db: Session = Depends
         # Validate user
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id") if decoded_token else None
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
 
@@ -1183,7 +1185,7 @@ async def exclude_legend(request: Request, legend_id: str, db: Session = Depends
         # Validate user
         decoded_token = verify_token(request)
         user_id = decoded_token.get("user_id") if decoded_token else None
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_authenticated_user(db, user_id)
         if not user:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
@@ -1313,8 +1315,8 @@ async def update_legend(request: Request, legend_id: str, legend: LabelCreateAnd
             return JSONResponse(status_code=401, content={"error": "Invalid or missing token"})
             
         # Check if user is a doctor
-        user = db.query(User).filter(User.id == decoded_token.get("user_id")).first()
-        if not user or str(user.user_type) != "doctor":
+        user = await get_authenticated_user(db, decoded_token.get('user_id'))
+        if not user or str(user["user_type"]) != "doctor":
             return JSONResponse(status_code=401, content={"error": "Unauthorized - must be a doctor"})
 
         # Get existing legend
@@ -1475,12 +1477,9 @@ async def add_missing_legends(
             return JSONResponse(status_code=401, content={"error": "Invalid or missing token"})
             
         # Check if user is a doctor
-        user = db.query(User).filter(
-            User.id == decoded_token.get("user_id"),
-            User.user_type == "doctor"
-        ).first()
+        user = await get_authenticated_user(db, decoded_token.get("user_id"))
         
-        if not user:
+        if not user or user["user_type"] != "doctor":
             return JSONResponse(status_code=401, content={"error": "Unauthorized - must be a doctor"})
         
         # Get prediction
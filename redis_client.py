@@ -1,6 +1,10 @@
 import redis.asyncio as redis
+import redis as sync_redis
+from prometheus_client import Gauge
 from typing import Optional
 import os
+import time
+import threading
 
 # Get Redis configuration from environment variables with fallbacks
 REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
@@ -8,33 +12,191 @@ REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
 REDIS_DB = int(os.environ.get("REDIS_DB", 0))
 REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD", None)
 
+# Pool sizing and timeouts. Timeouts are kept short so a slow Redis fails fast and
+# requests fall back to MySQL instead of hanging on the cache.
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 50))
+# Pub/sub subscriptions hold a connection each for as long as they last (one per
+# open import-progress WebSocket plus the entity invalidation listener), so they
+# get a pool of their own sized for a few hundred dashboards per worker
+REDIS_PUBSUB_MAX_CONNECTIONS = int(os.environ.get("REDIS_PUBSUB_MAX_CONNECTIONS", 256))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 1.0))
+REDIS_CONNECT_TIMEOUT = float(os.environ.get("REDIS_CONNECT_TIMEOUT", 1.0))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", 30))
+
+# Circuit breaker: after this many consecutive cache failures, skip the cache for
+# the reset period, then let a trial request through
+REDIS_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("REDIS_BREAKER_FAILURE_THRESHOLD", 5))
+REDIS_BREAKER_RESET_SECONDS = float(os.environ.get("REDIS_BREAKER_RESET_SECONDS", 30))
+
+REDIS_CIRCUIT_OPEN = Gauge(
+    "redis_cache_circuit_open", "1 while the cache circuit breaker is bypassing Redis"
+)
+
 # Global Redis client instance
 _redis_client: Optional[redis.Redis] = None
 
+# Binary client for cache payloads, which are stored in the encoded form from utils/cache_codec.py
+_redis_cache_client: Optional[redis.Redis] = None
+
+# Client for pub/sub subscriptions only, on its own pool
+_redis_pubsub_client: Optional[redis.Redis] = None
+
+# Synchronous client used by worker processes (import workers, schedulers)
+_sync_redis_client: Optional[sync_redis.Redis] = None
+
+
+class CircuitBreaker:
+    """
+    Counts consecutive failures of an optional dependency. Once the threshold is
+    reached the circuit opens and allow() returns False until the reset period
+    has passed; the next call is then a trial that closes the circuit on success
+    or reopens it on failure.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                # Half-open: push the reopen time forward so only one trial goes through
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.opened_at is not None:
+                self.opened_at = None
+                REDIS_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"Redis cache circuit opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                REDIS_CIRCUIT_OPEN.set(1)
+
+
+# Shared by every cache read and write in the API process
+cache_breaker = CircuitBreaker(REDIS_BREAKER_FAILURE_THRESHOLD, REDIS_BREAKER_RESET_SECONDS)
+
+
+def _connection_kwargs() -> dict:
+    return {
+        "host": REDIS_HOST,
+        "port": REDIS_PORT,
+        "db": REDIS_DB,
+        "password": REDIS_PASSWORD,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_CONNECT_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        "retry_on_timeout": False,
+    }
+
+
+def _create_client(decode_responses: bool, max_connections: int = REDIS_MAX_CONNECTIONS) -> redis.Redis:
+    # Once max_connections are in use the pool raises straight away rather than
+    # waiting, so the caller falls back to MySQL. Subscriptions use their own
+    # client (get_redis_pubsub_client) so they can never exhaust this pool.
+    return redis.Redis(
+        max_connections=max_connections,
+        decode_responses=decode_responses,
+        **_connection_kwargs()
+    )
+
+
+async def init_redis():
+    """Create the connection pools. Called once from the app's startup hook."""
+    await get_redis_client()
+    await get_redis_cache_client()
+
+
 async def get_redis_client() -> redis.Redis:
     """
     Returns a Redis client instance, creating it if it doesn't exist.
-    
+
     Returns:
         redis.Redis: An async Redis client instance
     """
     global _redis_client
-    
+
     if _redis_client is None:
-        _redis_client = redis.Redis(
-            host=REDIS_HOST,
-            port=REDIS_PORT,
-            db=REDIS_DB,
-            password=REDIS_PASSWORD,
-            decode_responses=True
-        )
-    
+        _redis_client = _create_client(decode_responses=True)
+
     return _redis_client
 
+async def get_redis_cache_client() -> redis.Redis:
+    """
+    Returns a Redis client that leaves responses as bytes, for reading and
+    writing encoded cache payloads.
+
+    Returns:
+        redis.Redis: An async Redis client instance
+    """
+    global _redis_cache_client
+
+    if _redis_cache_client is None:
+        _redis_cache_client = _create_client(decode_responses=False)
+
+    return _redis_cache_client
+
+async def get_redis_pubsub_client() -> redis.Redis:
+    """
+    Returns the Redis client to create pub/sub subscriptions from. Its pool is
+    separate from the one cache reads and writes use, since every subscription
+    keeps a connection for its whole life.
+
+    Returns:
+        redis.Redis: An async Redis client instance
+    """
+    global _redis_pubsub_client
+
+    if _redis_pubsub_client is None:
+        _redis_pubsub_client = _create_client(decode_responses=True, max_connections=REDIS_PUBSUB_MAX_CONNECTIONS)
+
+    return _redis_pubsub_client
+
 async def close_redis_connection():
-    """Closes the Redis connection if it exists."""
-    global _redis_client
-    
+    """Closes the Redis clients and their pools. Called once from the app's shutdown hook."""
+    global _redis_client, _redis_cache_client, _redis_pubsub_client
+
     if _redis_client is not None:
-        await _redis_client.close()
+        await _redis_client.aclose(close_connection_pool=True)
         _redis_client = None
+
+    if _redis_cache_client is not None:
+        await _redis_cache_client.aclose(close_connection_pool=True)
+        _redis_cache_client = None
+
+    if _redis_pubsub_client is not None:
+        await _redis_pubsub_client.aclose(close_connection_pool=True)
+        _redis_pubsub_client = None
+
+def get_sync_redis_client() -> sync_redis.Redis:
+    """
+    Returns a synchronous Redis client for code that runs outside the event loop,
+    such as the import worker processes.
+
+    Returns:
+        redis.Redis: A blocking Redis client instance
+    """
+    global _sync_redis_client
+
+    if _sync_redis_client is None:
+        _sync_redis_client = sync_redis.Redis(
+            max_connections=REDIS_MAX_CONNECTIONS,
+            decode_responses=True,
+            **_connection_kwargs()
+        )
+
+    return _sync_redis_client
@@ -0,0 +1,152 @@
+"""
+Appointment reminder dispatcher.
+
+Reminders are kept in a Redis sorted set scored by fire time (see
+utils/reminders.py). Any number of these processes can run; they elect a single
+leader through a Redis lease and only the leader sends reminders. Claimed
+reminders are held under a lease until they are acknowledged, so a batch lost
+to a crash is sent again, and failed sends are retried REMINDER_MAX_ATTEMPTS
+times. Appointments shared on SMS also get a reminder SMS, sent in batched
+MSG91 flow requests through the notification gateway. Start it next to the API:
+
+    python reminder_worker.py
+
+Polling, lease and batch sizes are configured through the REMINDER_* settings
+in utils/config.py.
+"""
+import asyncio
+import os
+import signal
+import socket
+import sys
+import time
+from typing import List
+
+from db.db import SessionLocal
+from redis_client import get_sync_redis_client
+from appointment.models import Appointment
+from utils.appointment_msg import send_appointment_emails, send_appointment_sms
+from utils.config import (
+    REMINDER_POLL_SECONDS, REMINDER_LEADER_TTL_SECONDS, REMINDER_BATCH_SIZE, REMINDER_LEASE_SECONDS,
+    REMINDER_RETRY_SECONDS, REMINDER_MAX_ATTEMPTS
+)
+from utils.notifications import gateway
+from utils.reminders import ReminderScheduler, reminder_time_for
+
+# The notification gateway's workers live on this loop between batches
+notify_loop = asyncio.new_event_loop()
+
+
+# Outcomes that sending the same email again would not change
+FINAL_OUTCOMES = ("sent", "skipped", "Recipient refused", "Error rendering email")
+
+
+def dispatch_reminders(scheduler: ReminderScheduler, appointment_ids: List[str]) -> List[str]:
+    """
+    Send a batch of claimed reminders on a fresh session. Appointments are
+    re-checked first, then every email goes out over one SMTP connection and
+    the SMS in as few MSG91 requests as the batch size allows.
+
+    Returns:
+        list: Ids whose email could not be sent and is worth retrying
+    """
+    failed = []
+    db = SessionLocal()
+    try:
+        appointments = db.query(Appointment).filter(Appointment.id.in_(appointment_ids)).all()
+        due = []
+        for appointment in appointments:
+            fire_at = reminder_time_for(appointment)
+            if not fire_at:
+                continue
+            if fire_at.timestamp() > time.time() + REMINDER_POLL_SECONDS:
+                # The appointment moved later without the schedule being updated
+                scheduler.schedule(appointment.id, fire_at)
+                continue
+            due.append(appointment.id)
+
+        if due:
+            for appointment_id, outcome in send_appointment_emails(db, due).items():
+                if outcome not in ["sent", "skipped"]:
+                    print(f"Reminder for appointment {appointment_id} not sent: {outcome}")
+                if not outcome.startswith(FINAL_OUTCOMES):
+                    failed.append(appointment_id)
+            # Reminders retried for their email get their SMS on the retry. The gateway
+            # already retries transient SMS failures, so SMS outcomes are only logged
+            finished = [appointment_id for appointment_id in due if appointment_id not in failed]
+            for appointment_id, outcome in notify_loop.run_until_complete(send_appointment_sms(db, finished)).items():
+                if outcome not in ["sent", "skipped"]:
+                    print(f"Reminder SMS for appointment {appointment_id} not sent: {outcome}")
+    finally:
+        db.close()
+    return failed
+
+
+def main():
+    redis_client = get_sync_redis_client()
+    scheduler = ReminderScheduler(redis_client, f"{socket.gethostname()}:{os.getpid()}")
+    stopping = False
+
+    def handle_stop(signum, frame):
+        nonlocal stopping
+        print("Stopping reminder dispatcher...")
+        stopping = True
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    leader = False
+    while not stopping:
+        try:
+            is_leader = scheduler.acquire_leadership(REMINDER_LEADER_TTL_SECONDS)
+        except Exception as e:
+            print(f"Reminder dispatcher could not reach Redis: {e}")
+            leader = False
+            time.sleep(REMINDER_POLL_SECONDS)
+            continue
+
+        if is_leader and not leader:
+            print(f"Reminder dispatcher {scheduler.node_id} is now the leader")
+            db = SessionLocal()
+            try:
+                print(f"Rebuilt {scheduler.rebuild(db)} pending reminders from the database")
+            finally:
+                db.close()
+        leader = is_leader
+
+        if not leader:
+            time.sleep(REMINDER_POLL_SECONDS)
+            continue
+
+        try:
+            due = scheduler.claim_due(REMINDER_BATCH_SIZE, REMINDER_LEASE_SECONDS)
+        except Exception as e:
+            print(f"Reminder dispatcher could not claim reminders: {e}")
+            time.sleep(REMINDER_POLL_SECONDS)
+            continue
+        if due:
+            try:
+                failed = dispatch_reminders(scheduler, due)
+            except Exception as e:
+                print(f"Error sending {len(due)} reminders: {e}")
+                failed = due
+            try:
+                scheduler.acknowledge([appointment_id for appointment_id in due if appointment_id not in failed])
+                for appointment_id in scheduler.retry(failed, REMINDER_RETRY_SECONDS, REMINDER_MAX_ATTEMPTS):
+                    print(f"Giving up on reminder for appointment {appointment_id} after {REMINDER_MAX_ATTEMPTS} attempts")
+            except Exception as e:
+                # The lease runs out and the reminders become due again
+                print(f"Error acknowledging {len(due)} reminders: {e}")
+
+        # A full batch means more reminders are probably due right now
+        if len(due) < REMINDER_BATCH_SIZE:
+            time.sleep(REMINDER_POLL_SECONDS)
+
+    if leader:
+        scheduler.release_leadership()
+    notify_loop.run_until_complete(gateway.close())
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
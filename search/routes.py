@@ -0,0 +1,131 @@
+from fastapi import APIRouter, Request, Depends, Query, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from typing import Optional
+from db.db import get_db
+from auth.models import User, Clinic
+from utils.auth import verify_token
+from utils.patient_index import patient_indexes
+from utils.unified_search import unified_search, GROUPS
+from redis_client import get_redis_client
+
+search_router = APIRouter()
+
+
+@search_router.get(
+    "",
+    status_code=status.HTTP_200_OK,
+    summary="Search patients, appointments, invoices, payments and treatment plans at once",
+    description="""
+    One search box for the front desk. The query is matched once against the doctor's patient
+    index (name words, phone numbers by leading or last digits, patient number, email, ABHA ID);
+    appointments, invoices, payments and treatment plans of the matched patients are then looked
+    up concurrently, along with invoices and payments whose number starts with the query.
+
+    Query parameters:
+    - q: Search text (required)
+    - clinic_id: Restrict results to one of the doctor's clinics (optional)
+    - groups: Comma-separated groups to search (default: all of patients, appointments, invoices,
+      payments, treatment_plans)
+    - limit: Maximum results per group (default: 5, max: 50)
+
+    Each group is ranked best first: number matches, then by how well the patient matched,
+    then most recent. has_more is true when the group had more results than the limit.
+
+    Required headers:
+    - Authorization: Bearer {access_token}
+    """,
+    responses={
+        200: {
+            "description": "Grouped search results",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "query": "john 3210",
+                        "groups": {
+                            "patients": {"items": [{"id": "uuid", "name": "John Doe", "mobile_number": "9876543210"}], "has_more": False},
+                            "appointments": {"items": [], "has_more": False},
+                            "invoices": {"items": [], "has_more": False},
+                            "payments": {"items": [], "has_more": False},
+                            "treatment_plans": {"items": [], "has_more": False}
+                        }
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Unknown group requested",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Unknown search groups: notes"}
+                }
+            }
+        },
+        401: {
+            "description": "Unauthorized - Invalid or missing authentication token, or clinic not associated with the doctor",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Unauthorized"}
+                }
+            }
+        },
+        500: {
+            "description": "Internal server error",
+            "content": {
+                "application/json": {
+                    "example": {"message": "Internal server error: [error details]"}
+                }
+            }
+        }
+    }
+)
+async def search_all(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Search text"),
+    clinic_id: Optional[str] = None,
+    groups: Optional[str] = Query(default=None, description="Comma-separated groups to search"),
+    limit: int = Query(default=5, ge=1, le=50, description="Maximum results per group"),
+    db: Session = Depends(get_db)
+):
+    try:
+        decoded_token = verify_token(request)
+        if not decoded_token or "user_id" not in decoded_token:
+            return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized"})
+        doctor_id = decoded_token["user_id"]
+
+        wanted = GROUPS
+        if groups:
+            wanted = tuple(dict.fromkeys(group.strip() for group in groups.split(",") if group.strip()))
+            unknown = [group for group in wanted if group not in GROUPS]
+            if unknown:
+                return JSONResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    content={"message": f"Unknown search groups: {', '.join(unknown)}"}
+                )
+
+        if clinic_id:
+            clinic = db.execute(
+                select(Clinic.id).filter(Clinic.id == clinic_id, Clinic.doctors.any(User.id == doctor_id))
+            ).scalar_one_or_none()
+            if not clinic:
+                return JSONResponse(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    content={"message": "You are not authorized to access this clinic"}
+                )
+
+        index = await patient_indexes.get(await get_redis_client(), db, doctor_id)
+        found = await unified_search(index, doctor_id, clinic_id, q, limit, wanted)
+        return {"query": q, "groups": found}
+
+    except SQLAlchemyError as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": f"Database error: {str(e)}"}
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"message": f"Internal server error: {str(e)}"}
+        )
@@ -7,6 +7,7 @@ from auth.schemas import UserSchema
 from .schemas import UserCreateWithPermissions, UserUpdateSchema
 from utils.auth import verify_token, get_password_hash
 from utils.permissions import has_permission, add_permission_to_user, remove_permission_from_user
+from utils.entity_cache import get_authenticated_user
 from typing import List
 
 staff_router = APIRouter()
@@ -654,7 +655,7 @@ async def get_staff_by_id(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
 
-        current_user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        current_user = await get_authenticated_user(db, decoded_token['user_id'])
         if not current_user:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
@@ -832,7 +833,7 @@ async def update_staff(
         if not decoded_token:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
-        current_user = db.query(User).filter(User.id == decoded_token["user_id"]).first()
+        current_user = await get_authenticated_user(db, decoded_token['user_id'])
         if not current_user:
             return JSONResponse(status_code=401, content={"error": "Unauthorized"})
         
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.schema import Index
-from sqlalchemy import String, DateTime, Text, ForeignKey, Integer, Float, Boolean
+from sqlalchemy import String, DateTime, Text, ForeignKey, Integer, Float, Boolean, LargeBinary
 from db.db import Base
 from typing import Optional
 from datetime import datetime
@@ -15,16 +15,26 @@ class TreatmentNameSuggestion(Base):
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, unique=True, default=generate_uuid, nullable=False)
     treatment_name: Mapped[str] = mapped_column(String(1000), nullable=False)
+    text_hash: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, comment="SHA-1 of the normalized text, for deduplication")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
 
+    __table_args__ = (
+        Index("ux_treatment_name_suggestions_text_hash", "text_hash", unique=True),
+    )
+
 
 class ComplaintSuggestion(Base):
     __tablename__ = "complaint_suggestions"
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, unique=True, default=generate_uuid, nullable=False)
     complaint: Mapped[str] = mapped_column(String(1000), nullable=False)
+    text_hash: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, comment="SHA-1 of the normalized text, for deduplication")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
 
+    __table_args__ = (
+        Index("ux_complaint_suggestions_text_hash", "text_hash", unique=True),
+    )
+
 
 
 class DiagnosisSuggestion(Base):
@@ -32,8 +42,13 @@ class DiagnosisSuggestion(Base):
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, unique=True, default=generate_uuid, nullable=False)
     diagnosis: Mapped[str] = mapped_column(String(1000), nullable=False)
+    text_hash: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, comment="SHA-1 of the normalized text, for deduplication")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
 
+    __table_args__ = (
+        Index("ux_diagnosis_suggestions_text_hash", "text_hash", unique=True),
+    )
+
 
 
 class VitalSignSuggestion(Base):
@@ -41,19 +56,62 @@ class VitalSignSuggestion(Base):
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, unique=True, default=generate_uuid, nullable=False)
     vital_sign: Mapped[str] = mapped_column(String(1000), nullable=False)
+    text_hash: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, comment="SHA-1 of the normalized text, for deduplication")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
 
+    __table_args__ = (
+        Index("ux_vital_sign_suggestions_text_hash", "text_hash", unique=True),
+    )
+
 class InvestigationSuggestion(Base):
     __tablename__ = "investigation_suggestions"
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, unique=True, default=generate_uuid, nullable=False)
     investigation: Mapped[str] = mapped_column(String(1000), nullable=False)
+    text_hash: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, comment="SHA-1 of the normalized text, for deduplication")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
 
+    __table_args__ = (
+        Index("ux_investigation_suggestions_text_hash", "text_hash", unique=True),
+    )
+
 class ObservationSuggestion(Base):
     __tablename__ = "observation_suggestions"
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, unique=True, default=generate_uuid, nullable=False)
     observation: Mapped[str] = mapped_column(String(1000), nullable=False)
+    text_hash: Mapped[Optional[str]] = mapped_column(String(40), nullable=True, comment="SHA-1 of the normalized text, for deduplication")
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
+
+    __table_args__ = (
+        Index("ux_observation_suggestions_text_hash", "text_hash", unique=True),
+    )
+
+
+
+class SuggestionUsage(Base):
+    __tablename__ = "suggestion_usage"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, unique=True, default=generate_uuid, nullable=False)
+    family: Mapped[str] = mapped_column(String(32), nullable=False)
+    text_hash: Mapped[str] = mapped_column(String(40), nullable=False, comment="SHA-1 of the normalized suggestion text")
+    usage_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+
+    __table_args__ = (
+        Index("ux_suggestion_usage_family_hash", "family", "text_hash", unique=True),
+    )
+
+
+class SuggestionEmbedding(Base):
+    __tablename__ = "suggestion_embeddings"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, unique=True, default=generate_uuid, nullable=False)
+    family: Mapped[str] = mapped_column(String(32), nullable=False)
+    text_hash: Mapped[str] = mapped_column(String(40), nullable=False, comment="SHA-1 of the normalized suggestion text")
+    embedding: Mapped[bytes] = mapped_column(LargeBinary, nullable=False, comment="Normalized float32 sentence embedding")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
 
+    __table_args__ = (
+        Index("ux_suggestion_embeddings_family_hash", "family", "text_hash", unique=True),
+    )
@@ -18,9 +18,21 @@ from datetime import datetime
 from typing import Optional, List, Dict
 from appointment.models import Appointment
 from math import ceil
+from redis_client import get_redis_client
+from utils.suggestion_index import suggestion_indexes
+from utils.suggestion_semantic import semantic_suggestions
+from utils.suggestion_store import suggestion_hash
 
 suggestion_router = APIRouter()
 
+
+async def find_suggestions(db, family: str, query: str, limit: int, semantic: bool):
+    """Matches from the family's autocomplete index, merged with matches by meaning when semantic is set."""
+    index = await suggestion_indexes.get(await get_redis_client(), db, family)
+    if semantic:
+        return await semantic_suggestions.search(family, index, query, limit)
+    return index.search(query, limit)
+
 @suggestion_router.post("/add-treatment-suggestion",response_model=Dict[str, str],
     status_code=status.HTTP_201_CREATED,
     summary="Add a new treatment suggestion",
@@ -64,7 +76,7 @@ suggestion_router = APIRouter()
     })
 async def add_treatment_suggestion(request: Request, treatment_suggestion: TreatmentNameSuggestionSchema, db: Session = Depends(get_db)):
     try:
-        existing_treatment_suggestion = db.query(TreatmentNameSuggestion).filter(TreatmentNameSuggestion.treatment_name == treatment_suggestion.treatment_name).first()
+        existing_treatment_suggestion = db.query(TreatmentNameSuggestion).filter(TreatmentNameSuggestion.text_hash == suggestion_hash(treatment_suggestion.treatment_name)).first()
         if existing_treatment_suggestion:
             return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "A treatment suggestion with the same name already exists"})
         treatment_suggestion = TreatmentNameSuggestion(
@@ -174,16 +186,14 @@ async def get_treatment_suggestions(request: Request, db: Session = Depends(get_
             }
         }
     })
-async def search_treatment_suggestion(request: Request, query: str, db: Session = Depends(get_db)):
+async def search_treatment_suggestion(request: Request, query: str, limit: int = Query(20, ge=1, le=100), semantic: bool = Query(False, description="Also match suggestions by meaning"), db: Session = Depends(get_db)):
     try:        
-        treatment_suggestions = db.query(TreatmentNameSuggestion).filter(TreatmentNameSuggestion.treatment_name.ilike(f"%{query}%")).order_by(TreatmentNameSuggestion.treatment_name.asc()).all()
-
         treatment_suggestions_list = []
 
-        for treatment_suggestion in treatment_suggestions:
+        for treatment_suggestion in await find_suggestions(db, "treatment", query, limit, semantic):
             treatment_suggestions_list.append({
-                "id": treatment_suggestion.id,
-                "treatment_name": treatment_suggestion.treatment_name
+                "id": treatment_suggestion["id"],
+                "treatment_name": treatment_suggestion["text"]
             })
         
         return JSONResponse(status_code=status.HTTP_200_OK, content={
@@ -245,6 +255,10 @@ async def update_treatment_suggestion(treatment_suggestion_id: str, request: Req
         if not existing_treatment_suggestion:
             return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": "Treatment suggestion not found"})
         
+        duplicate = db.query(TreatmentNameSuggestion).filter(TreatmentNameSuggestion.text_hash == suggestion_hash(treatment_suggestion_update.treatment_name), TreatmentNameSuggestion.id != treatment_suggestion_id).first()
+        if duplicate:
+            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "A treatment suggestion with the same name already exists"})
+        
         existing_treatment_suggestion.treatment_name = treatment_suggestion_update.treatment_name
         db.commit()
         db.refresh(existing_treatment_suggestion)  # Refresh the existing_treatment_suggestion with the latest data from the database
@@ -358,7 +372,7 @@ async def delete_treatment_suggestion(treatment_suggestion_id: str, request: Req
     })
 async def add_complaint_suggestion(complaint_suggestion: ComplaintSuggestionSchema, db: Session = Depends(get_db)):
     try:
-        existing_suggestion = db.query(ComplaintSuggestion).filter(ComplaintSuggestion.complaint == complaint_suggestion.complaint).first()
+        existing_suggestion = db.query(ComplaintSuggestion).filter(ComplaintSuggestion.text_hash == suggestion_hash(complaint_suggestion.complaint)).first()
         if existing_suggestion:
             return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"message": "Complaint suggestion already exists"})
         
@@ -462,15 +476,14 @@ async def get_complaint_suggestions(request: Request, db: Session = Depends(get_
         }
     }
 )
-async def search_complaint_suggestion(request: Request, query: str, db: Session = Depends(get_db)):
+async def search_complaint_suggestion(request: Request, query: str, limit: int = Query(20, ge=1, le=100), semantic: bool = Query(False, description="Also match suggestions by meaning"), db: Session = Depends(get_db)):
     try:        
-        complaint_suggestions = db.query(ComplaintSuggestion).filter(ComplaintSuggestion.complaint.ilike(f"%{query}%")).order_by(ComplaintSuggestion.complaint.asc()).all()
         complaint_suggestions_list = []
-        for suggestion in complaint_suggestions:
+        for suggestion in await find_suggestions(db, "complaint", query, limit, semantic):
             complaint_suggestions_list.append({
-                "id": suggestion.id,
-                "complaint": suggestion.complaint,
-                "created_at": suggestion.created_at.isoformat() if suggestion.created_at else None
+                "id": suggestion["id"],
+                "complaint": suggestion["text"],
+                "created_at": suggestion["created_at"]
             })
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": "Complaint suggestions retrieved successfully",
@@ -524,6 +537,10 @@ async def update_complaint_suggestion(complaint_suggestion_id: str, request: Req
         if not existing_suggestion:
             return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": "Complaint suggestion not found"})
         
+        duplicate = db.query(ComplaintSuggestion).filter(ComplaintSuggestion.text_hash == suggestion_hash(complaint_suggestion_update.complaint), ComplaintSuggestion.id != complaint_suggestion_id).first()
+        if duplicate:
+            return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"message": "Complaint suggestion already exists"})
+        
         existing_suggestion.complaint = complaint_suggestion_update.complaint
         db.commit()
         db.refresh(existing_suggestion)  # Refresh the existing_suggestion with the latest data from the database
@@ -628,7 +645,7 @@ async def delete_complaint_suggestion(complaint_suggestion_id: str, request: Req
     })
 async def add_diagnosis_suggestion(diagnosis_suggestion: DiagnosisSuggestionSchema, db: Session = Depends(get_db)):
     try:
-        existing_suggestion = db.query(DiagnosisSuggestion).filter(DiagnosisSuggestion.diagnosis == diagnosis_suggestion.diagnosis).first()
+        existing_suggestion = db.query(DiagnosisSuggestion).filter(DiagnosisSuggestion.text_hash == suggestion_hash(diagnosis_suggestion.diagnosis)).first()
         if existing_suggestion:
             return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"message": "Diagnosis suggestion already exists"})
         
@@ -732,15 +749,14 @@ async def get_diagnosis_suggestions(request: Request, db: Session = Depends(get_
             }
         }
     })
-async def search_diagnosis_suggestion(request: Request, query: str, db: Session = Depends(get_db)):
+async def search_diagnosis_suggestion(request: Request, query: str, limit: int = Query(20, ge=1, le=100), semantic: bool = Query(False, description="Also match suggestions by meaning"), db: Session = Depends(get_db)):
     try:        
-        diagnosis_suggestions = db.query(DiagnosisSuggestion).filter(DiagnosisSuggestion.diagnosis.ilike(f"%{query}%")).order_by(DiagnosisSuggestion.diagnosis.asc()).all()
         diagnosis_suggestions_list = []
-        for suggestion in diagnosis_suggestions:
+        for suggestion in await find_suggestions(db, "diagnosis", query, limit, semantic):
             diagnosis_suggestions_list.append({
-                "id": suggestion.id,
-                "diagnosis": suggestion.diagnosis,
-                "created_at": suggestion.created_at.isoformat() if suggestion.created_at else None
+                "id": suggestion["id"],
+                "diagnosis": suggestion["text"],
+                "created_at": suggestion["created_at"]
             })
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": "Diagnosis suggestions retrieved successfully",
@@ -794,6 +810,10 @@ async def update_diagnosis_suggestion(diagnosis_suggestion_id: str, request: Req
         if not existing_suggestion:
             return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": "Diagnosis suggestion not found"})
         
+        duplicate = db.query(DiagnosisSuggestion).filter(DiagnosisSuggestion.text_hash == suggestion_hash(diagnosis_suggestion_update.diagnosis), DiagnosisSuggestion.id != diagnosis_suggestion_id).first()
+        if duplicate:
+            return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"message": "Diagnosis suggestion already exists"})
+        
         existing_suggestion.diagnosis = diagnosis_suggestion_update.diagnosis
         db.commit()
         db.refresh(existing_suggestion)  # Refresh the existing_suggestion with the latest data from the database
@@ -901,7 +921,7 @@ async def delete_diagnosis_suggestion(diagnosis_suggestion_id: str, request: Req
 )
 async def add_vital_sign_suggestion(vital_sign_suggestion: VitalSignSuggestionSchema, db: Session = Depends(get_db)):
     try:
-        existing_suggestion = db.query(VitalSignSuggestion).filter(VitalSignSuggestion.vital_sign == vital_sign_suggestion.vital_sign).first()
+        existing_suggestion = db.query(VitalSignSuggestion).filter(VitalSignSuggestion.text_hash == suggestion_hash(vital_sign_suggestion.vital_sign)).first()
         if existing_suggestion:
             return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"message": "Vital sign suggestion already exists"})
         
@@ -1009,15 +1029,14 @@ async def get_vital_sign_suggestions(request: Request, db: Session = Depends(get
         }
     }
 )
-async def search_vital_sign_suggestion(request: Request, query: str, db: Session = Depends(get_db)):
+async def search_vital_sign_suggestion(request: Request, query: str, limit: int = Query(20, ge=1, le=100), semantic: bool = Query(False, description="Also match suggestions by meaning"), db: Session = Depends(get_db)):
     try:        
-        vital_sign_suggestions = db.query(VitalSignSuggestion).filter(VitalSignSuggestion.vital_sign.ilike(f"%{query}%")).order_by(VitalSignSuggestion.vital_sign.asc()).all()
         vital_sign_suggestions_list = []
-        for suggestion in vital_sign_suggestions:
+        for suggestion in await find_suggestions(db, "vital_sign", query, limit, semantic):
             vital_sign_suggestions_list.append({
-                "id": suggestion.id,
-                "vital_sign": suggestion.vital_sign,
-                "created_at": suggestion.created_at.isoformat() if suggestion.created_at else None
+                "id": suggestion["id"],
+                "vital_sign": suggestion["text"],
+                "created_at": suggestion["created_at"]
             })
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": "Vital sign suggestions retrieved successfully",
@@ -1073,6 +1092,10 @@ async def update_vital_sign_suggestion(vital_sign_suggestion_id: str, request: R
         if not existing_suggestion:
             return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": "Vital sign suggestion not found"})
         
+        duplicate = db.query(VitalSignSuggestion).filter(VitalSignSuggestion.text_hash == suggestion_hash(vital_sign_suggestion_update.vital_sign), VitalSignSuggestion.id != vital_sign_suggestion_id).first()
+        if duplicate:
+            return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"message": "Vital sign suggestion already exists"})
+        
         existing_suggestion.vital_sign = vital_sign_suggestion_update.vital_sign
         db.commit()
         db.refresh(existing_suggestion)
@@ -1176,7 +1199,7 @@ async def delete_vital_sign_suggestion(vital_sign_suggestion_id: str, request: R
 )
 async def add_observation_suggestion(observation_suggestion: ObservationSuggestionSchema, db: Session = Depends(get_db)):
     try:
-        existing_suggestion = db.query(ObservationSuggestion).filter(ObservationSuggestion.observation == observation_suggestion.observation).first()
+        existing_suggestion = db.query(ObservationSuggestion).filter(ObservationSuggestion.text_hash == suggestion_hash(observation_suggestion.observation)).first()
         if existing_suggestion:
             return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "Observation suggestion already exists"})
         
@@ -1277,12 +1300,11 @@ async def get_observation_suggestions(db: Session = Depends(get_db)):
         }
     }
 )
-async def search_observation_suggestions(observation: str, db: Session = Depends(get_db)):
+async def search_observation_suggestions(observation: str, limit: int = Query(20, ge=1, le=100), semantic: bool = Query(False, description="Also match suggestions by meaning"), db: Session = Depends(get_db)):
     try:
-        suggestions = db.query(ObservationSuggestion).filter(ObservationSuggestion.observation.ilike(f"%{observation}%")).all()
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": "Observation suggestions retrieved successfully",
-            "observation_suggestions": [{"id": s.id, "observation": s.observation, "created_at": s.created_at.isoformat() if s.created_at else None} for s in suggestions]
+            "observation_suggestions": [{"id": s["id"], "observation": s["text"], "created_at": s["created_at"]} for s in await find_suggestions(db, "observation", observation, limit, semantic)]
         })
     except SQLAlchemyError as e:
         db.rollback()
@@ -1332,6 +1354,10 @@ async def update_observation_suggestion(observation_suggestion_id: str, observat
         if not existing_suggestion:
             return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": "Observation suggestion not found"})
         
+        duplicate = db.query(ObservationSuggestion).filter(ObservationSuggestion.text_hash == suggestion_hash(observation_suggestion.observation), ObservationSuggestion.id != observation_suggestion_id).first()
+        if duplicate:
+            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "Observation suggestion already exists"})
+        
         existing_suggestion.observation = observation_suggestion.observation
         db.commit()
         db.refresh(existing_suggestion)
@@ -1430,7 +1456,7 @@ async def delete_observation_suggestion(observation_suggestion_id: str, db: Sess
 )
 async def add_investigation_suggestion(investigation_suggestion: InvestigationSuggestionSchema, db: Session = Depends(get_db)):
     try:
-        existing_suggestion = db.query(InvestigationSuggestion).filter(InvestigationSuggestion.investigation == investigation_suggestion.investigation).first()
+        existing_suggestion = db.query(InvestigationSuggestion).filter(InvestigationSuggestion.text_hash == suggestion_hash(investigation_suggestion.investigation)).first()
         if existing_suggestion:
             return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "Investigation suggestion already exists"})
         
@@ -1531,12 +1557,11 @@ async def get_investigation_suggestions(db: Session = Depends(get_db)):
         }
     }
 )
-async def search_investigation_suggestions(investigation: str, db: Session = Depends(get_db)):
+async def search_investigation_suggestions(investigation: str, limit: int = Query(20, ge=1, le=100), semantic: bool = Query(False, description="Also match suggestions by meaning"), db: Session = Depends(get_db)):
     try:
-        suggestions = db.query(InvestigationSuggestion).filter(InvestigationSuggestion.investigation.ilike(f"%{investigation}%")).all()
         return JSONResponse(status_code=status.HTTP_200_OK, content={
             "message": "Investigation suggestions retrieved successfully",
-            "investigation_suggestions": [{"id": s.id, "investigation": s.investigation, "created_at": s.created_at.isoformat() if s.created_at else None} for s in suggestions]
+            "investigation_suggestions": [{"id": s["id"], "investigation": s["text"], "created_at": s["created_at"]} for s in await find_suggestions(db, "investigation", investigation, limit, semantic)]
         })
     except SQLAlchemyError as e:
         db.rollback()
@@ -1586,6 +1611,10 @@ async def update_investigation_suggestion(investigation_suggestion_id: str, inve
         if not existing_suggestion:
             return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": "Investigation suggestion not found"})
         
+        duplicate = db.query(InvestigationSuggestion).filter(InvestigationSuggestion.text_hash == suggestion_hash(investigation_suggestion.investigation), InvestigationSuggestion.id != investigation_suggestion_id).first()
+        if duplicate:
+            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "Investigation suggestion already exists"})
+        
         existing_suggestion.investigation = investigation_suggestion.investigation
         db.commit()
         db.refresh(existing_suggestion)
@@ -0,0 +1,73 @@
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from appointment.models import Appointment, AppointmentStatus
+from patient.models import Patient  # noqa: F401  appointments reference the patients table
+from utils.availability import MAX_DURATION, busy_intervals_by_day, find_conflict, free_slots, merge_intervals, overlaps
+
+DAY = date(2025, 4, 10)
+
+
+def at(hour: int, minute: int = 0, day: date = DAY) -> datetime:
+    return datetime.combine(day, time(hour, minute))
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Appointment.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def book(db, start, end, doctor_id="doctor-1", status=AppointmentStatus.SCHEDULED) -> Appointment:
+    appointment = Appointment(
+        patient_id="patient-1", patient_name="Patient", doctor_id=doctor_id, doctor_name="Doctor",
+        appointment_date=start, start_time=start, end_time=end, status=status
+    )
+    db.add(appointment)
+    db.flush()
+    return appointment
+
+
+def test_overlapping_appointment_is_found(db):
+    existing = book(db, at(10), at(11))
+    assert find_conflict(db, "doctor-1", at(10, 30), at(11, 30)).id == existing.id
+    assert find_conflict(db, "doctor-1", at(9), at(10, 15)).id == existing.id
+
+
+def test_touching_cancelled_and_other_doctors_appointments_do_not_conflict(db):
+    existing = book(db, at(10), at(11))
+    book(db, at(12), at(13), status=AppointmentStatus.CANCELLED)
+    book(db, at(14), at(15), doctor_id="doctor-2")
+    assert find_conflict(db, "doctor-1", at(11), at(12)) is None
+    assert find_conflict(db, "doctor-1", at(12), at(13)) is None
+    assert find_conflict(db, "doctor-1", at(14), at(15)) is None
+    assert find_conflict(db, "doctor-1", at(10), at(11), exclude_id=existing.id) is None
+
+
+def test_appointment_of_max_duration_is_found_from_its_last_minute(db):
+    start = at(8)
+    existing = book(db, start, start + MAX_DURATION)
+    last_minute = start + MAX_DURATION - timedelta(minutes=1)
+    assert find_conflict(db, "doctor-1", last_minute, last_minute + timedelta(minutes=30)).id == existing.id
+
+
+def test_busy_intervals_are_clipped_to_each_day(db):
+    book(db, at(22), at(2, day=DAY + timedelta(days=1)))
+    book(db, at(9), at(10))
+    busy = busy_intervals_by_day(db, "doctor-1", [DAY, DAY + timedelta(days=1)])
+    assert busy[DAY] == [(at(9), at(10)), (at(22), at(0, day=DAY + timedelta(days=1)))]
+    assert busy[DAY + timedelta(days=1)] == [(at(0, day=DAY + timedelta(days=1)), at(2, day=DAY + timedelta(days=1)))]
+
+
+def test_free_slots_skip_busy_intervals():
+    busy = [(at(10, 15), at(10, 45)), (at(9), at(9, 30)), (at(9, 30), at(10))]
+    assert merge_intervals(sorted(busy)) == [(at(9), at(10)), (at(10, 15), at(10, 45))]
+    assert overlaps(merge_intervals(sorted(busy)), at(10), at(10, 30))
+    assert not overlaps(merge_intervals(sorted(busy)), at(10, 45), at(11))
+    slots = free_slots(busy, DAY, time(9), time(12), 30)
+    assert slots == [(at(11), at(11, 30)), (at(11, 30), at(12))]
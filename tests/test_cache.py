@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import utils.cache
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis_client import cache_breaker
+from utils.cache import (
+    appointment_list_tag, cache_get, cache_set, get_generations, invalidate_appointments, submit_after_commit
+)
+
+
+def wait_for_after_commit_writes():
+    utils.cache._after_commit_executor.submit(lambda: None).result(timeout=5)
+
+
+async def cached_list(redis_client, doctor_id, clinic_id):
+    """The cached appointment list a doctor would read right now, as get_all_appointments keys it."""
+    generation, = await get_generations(redis_client, [appointment_list_tag(doctor_id, clinic_id)])
+    return await cache_get(redis_client, f"appointments:doctor:{doctor_id}:v{generation}")
+
+
+async def cache_list(redis_client, doctor_id, clinic_id, appointments):
+    generation, = await get_generations(redis_client, [appointment_list_tag(doctor_id, clinic_id)])
+    await cache_set(redis_client, f"appointments:doctor:{doctor_id}:v{generation}", appointments, 300)
+
+
+@pytest.mark.parametrize("clinic_id", ["clinic-1", None])
+def test_appointment_write_is_visible_on_next_read(clinic_id):
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis()
+        await cache_list(redis_client, "doctor-1", clinic_id, ["before"])
+        assert await cached_list(redis_client, "doctor-1", clinic_id) == ["before"]
+
+        await invalidate_appointments(redis_client, ["doctor-1"], [clinic_id])
+        assert await cached_list(redis_client, "doctor-1", clinic_id) is None
+
+    asyncio.run(scenario())
+
+
+def test_other_clinics_keep_their_cached_lists():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis()
+        await cache_list(redis_client, "doctor-2", "clinic-2", ["unchanged"])
+        await invalidate_appointments(redis_client, ["doctor-1"], ["clinic-1"])
+        assert await cached_list(redis_client, "doctor-2", "clinic-2") == ["unchanged"]
+
+    asyncio.run(scenario())
+
+
+def test_after_commit_writes_run_in_order_and_respect_the_breaker():
+    done = []
+
+    def fail():
+        raise RedisConnectionError("down")
+
+    try:
+        submit_after_commit(lambda: done.append(1), "test")
+        submit_after_commit(lambda: done.append(2), "test")
+        for _ in range(cache_breaker.failure_threshold):
+            submit_after_commit(fail, "test")
+        submit_after_commit(lambda: done.append(3), "test")
+        wait_for_after_commit_writes()
+        assert done == [1, 2]
+    finally:
+        cache_breaker.record_success()
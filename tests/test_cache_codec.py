@@ -0,0 +1,31 @@
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+
+import pytest
+
+from utils.cache_codec import CacheDecodeError, ZSTD_MARKER, decode, encode, zstandard
+from utils.config import CACHE_COMPRESS_MIN_BYTES
+
+
+class Status(Enum):
+    SCHEDULED = "scheduled"
+
+
+def test_values_round_trip_as_the_api_returns_them():
+    value = {"at": datetime(2025, 4, 10, 15, 0), "status": Status.SCHEDULED, "amount": Decimal("12.50"), 1: {"a"}}
+    assert decode(encode(value)) == {"at": "2025-04-10T15:00:00", "status": "scheduled", "amount": 12.5, "1": ["a"]}
+
+
+@pytest.mark.skipif(zstandard is None, reason="zstandard not installed")
+def test_large_payloads_are_compressed():
+    value = ["appointment"] * CACHE_COMPRESS_MIN_BYTES
+    data = encode(value)
+    assert data[:1] == ZSTD_MARKER
+    assert decode(data) == value
+
+
+def test_unreadable_payloads_are_decode_errors():
+    assert decode(None) is None
+    with pytest.raises(CacheDecodeError):
+        decode(b'{"old": "json entry"}')
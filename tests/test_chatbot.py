@@ -0,0 +1,77 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from utils.chatbot import ChatbotBusy, ChatbotService
+
+FAQ = {
+    "how do i book an appointment?": "From the calendar.",
+    "can i export invoices?": "Yes, as PDF.",
+    "where are x-rays stored?": "With the patient record.",
+}
+QUESTIONS = list(FAQ)
+
+
+class StubModel:
+    """Embeds each FAQ question as its position, recording every encode call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[QUESTIONS.index(text)] for text in texts], dtype="float32")
+
+
+class StubIndex:
+    version = "v1"
+
+    def search(self, embeddings, top_k):
+        return [[(1.0, QUESTIONS[int(row[0])], FAQ[QUESTIONS[int(row[0])]])] for row in embeddings]
+
+
+def service(window_seconds=0.05, max_batch=8, max_pending=8):
+    chatbot = ChatbotService(
+        "unused", window_seconds, max_batch, max_pending, cache_size=16, index_check_seconds=3600
+    )
+    chatbot._model, chatbot._index = StubModel(), StubIndex()
+    return chatbot
+
+
+def test_concurrent_questions_share_one_encode_call():
+    chatbot = service()
+
+    async def scenario():
+        return await asyncio.gather(
+            chatbot.ask("How do I book an appointment?"),
+            chatbot.ask("can i export   invoices?"),
+            chatbot.ask("Where are X-rays stored?"),
+            chatbot.ask("how do i book an appointment?"),
+        )
+
+    answers = asyncio.run(scenario())
+
+    assert [hits[0]["answer"] for hits in answers] == [
+        "From the calendar.", "Yes, as PDF.", "With the patient record.", "From the calendar."
+    ]
+    # Duplicates within the batch are encoded once
+    assert chatbot._model.calls == [QUESTIONS]
+
+
+def test_full_queue_raises_busy():
+    chatbot = service(window_seconds=60, max_pending=2)
+
+    async def scenario():
+        waiting = [asyncio.create_task(chatbot.ask(question)) for question in QUESTIONS[:2]]
+        await asyncio.sleep(0)
+        with pytest.raises(ChatbotBusy):
+            await chatbot.ask(QUESTIONS[2])
+        # The queued questions are still answered once the window closes
+        chatbot._flush()
+        return await asyncio.gather(*waiting)
+
+    answers = asyncio.run(scenario())
+
+    assert [hits[0]["answer"] for hits in answers] == ["From the calendar.", "Yes, as PDF."]
+    assert chatbot._model.calls == [QUESTIONS[:2]]
@@ -0,0 +1,106 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis runs Lua scripts through lupa
+
+import utils.cache
+from utils import entity_cache
+from utils.entity_cache import (
+    LocalTTLCache, entity_key, get_authenticated_user, get_entity, invalidate_entities, local_cache
+)
+
+KEY = entity_key("user", "user-1")
+
+
+def user(name):
+    return SimpleNamespace(
+        id="user-1", name=name, email="doctor@example.com", phone=None, user_type="doctor",
+        default_clinic_id=None, color_code=None
+    )
+
+
+class FakeDB:
+    """Returns the given rows for every query, running on_query first."""
+
+    def __init__(self, rows, on_query=lambda: None):
+        self.rows = rows
+        self.on_query = on_query
+
+    def query(self, model):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def all(self):
+        self.on_query()
+        return self.rows
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(entity_cache, "get_sync_redis_client", lambda: fakeredis.FakeRedis(server=server))
+    local_cache.clear()
+    yield fakeredis.FakeAsyncRedis(server=server)
+    local_cache.clear()
+
+
+def test_row_read_before_an_invalidation_is_not_cached(redis):
+    def commit_rename():
+        # Another request commits a rename between this lookup's read and its write-back
+        invalidate_entities([KEY])
+        utils.cache._after_commit_executor.submit(lambda: None).result(timeout=5)
+
+    async def scenario():
+        stale = await get_entity(redis, FakeDB([user("Old name")], commit_rename), "user", "user-1")
+        assert stale["name"] == "Old name"
+        assert await redis.get(KEY) is None
+        assert local_cache.get(KEY) is None
+
+        fresh = await get_entity(redis, FakeDB([user("New name")]), "user", "user-1")
+        assert fresh["name"] == "New name"
+        assert await redis.get(KEY) is not None
+        assert local_cache.get(KEY)["name"] == "New name"
+
+    asyncio.run(scenario())
+
+
+def test_caller_is_revalidated_from_the_cache(redis, monkeypatch):
+    async def cache_client():
+        return redis
+
+    monkeypatch.setattr(entity_cache, "get_redis_cache_client", cache_client)
+    queries = []
+    db = FakeDB([user("Doctor")], lambda: queries.append(1))
+
+    async def scenario():
+        for _ in range(3):
+            assert (await get_authenticated_user(db, "user-1"))["name"] == "Doctor"
+        assert await get_authenticated_user(db, None) is None
+
+    asyncio.run(scenario())
+    assert len(queries) == 1
+
+
+def test_local_write_back_is_refused_after_an_eviction():
+    cache = LocalTTLCache(maxsize=2, ttl=60)
+    since = cache.sequence()
+    cache.evict(["a"])
+    cache.set("a", {"v": 1}, since)
+    cache.set("b", {"v": 1}, since)
+    assert cache.get("a") is None
+    assert cache.get("b") == {"v": 1}
+
+    # Once the eviction is no longer remembered, every older write-back is refused
+    since = cache.sequence()
+    cache.evict(["c"])
+    cache.evict(["d"])
+    cache.evict(["e"])
+    cache.set("b", {"v": 2}, since)
+    assert cache.get("b") == {"v": 1}
+    cache.set("b", {"v": 2}, cache.sequence())
+    assert cache.get("b") == {"v": 2}
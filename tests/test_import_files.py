@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+import zipfile
+
+import pytest
+
+from utils.import_files import csv_float, csv_int, csv_text
+
+# Size of the generated CSV and how far above the interpreter's baseline the
+# import reader's peak RSS may go while streaming it
+RSS_TEST_CSV_MB = int(os.environ.get("IMPORT_RSS_TEST_CSV_MB", 300))
+RSS_BUDGET_MB = int(os.environ.get("IMPORT_RSS_BUDGET_MB", 100))
+CHUNK_ROWS = 5000
+
+linux_only = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads RSS from /proc")
+
+ROW = "{i},'P{key:06d}',Patient {key},2024-01-{day:02d},Scaling and polishing,'1.0',1500.50,{notes}\n"
+HEADER = "Id,Patient Number,Patient Name,Date,Treatment Name,Quantity,Amount,Treatment Notes\n"
+
+# Streams the CSV in a fresh interpreter and reports rows seen and how far
+# peak RSS rose above the resident size before reading
+READER = """
+import json, resource, sys
+sys.path.insert(0, sys.argv[1])
+from utils.import_files import iter_csv_chunks
+with open("/proc/self/status") as status:
+    baseline = next(int(line.split()[1]) for line in status if line.startswith("VmRSS:"))
+path, name, chunk_rows, chunk_key, expected_rows, spill_dir = sys.argv[2:8]
+rows = 0
+for chunk in iter_csv_chunks(path, name, int(chunk_rows), chunk_key or None, int(expected_rows), spill_dir or None):
+    rows += len(chunk)
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"rows": rows, "rss_mb": (peak - baseline) / 1024}))
+"""
+
+
+def test_csv_text_blank_and_quoted():
+    assert csv_text("") is None
+    assert csv_text("  ") is None
+    assert csv_text(None) is None
+    assert csv_text(float("nan")) is None
+    assert csv_text(" 'A12' ") == "A12"
+
+
+def test_csv_numbers_from_text():
+    assert csv_int("2.0", 1) == 2
+    assert csv_int("'3'", 1) == 3
+    assert csv_int("", 1) == 1
+    assert csv_int("abc", 1) == 1
+    assert csv_float("1500.50") == 1500.5
+    assert csv_float("nan", 0.0) == 0.0
+    assert csv_float("", None) is None
+    assert csv_float(7) == 7.0
+
+
+@pytest.fixture(scope="module")
+def large_import(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("import")
+    path = str(directory / "upload.zip")
+    target = RSS_TEST_CSV_MB * 1024 * 1024
+    rows = written = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("treatment.csv", "w", force_zip64=True) as out:
+            out.write(HEADER.encode())
+            while written < target:
+                block = "".join(
+                    ROW.format(i=i, key=(i * 7919) % 50000, day=i % 28 + 1, notes="x" * (i % 40))
+                    for i in range(rows, rows + 10000)
+                ).encode()
+                out.write(block)
+                written += len(block)
+                rows += 10000
+    return path, rows, directory
+
+
+def _stream(path, chunk_key="", expected_rows=0, spill_dir=""):
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", READER, repo, path, "treatment.csv", str(CHUNK_ROWS), chunk_key,
+         str(expected_rows), spill_dir],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout)
+
+
+@linux_only
+def test_streaming_import_stays_within_rss_budget(large_import):
+    path, rows, _ = large_import
+    stats = _stream(path)
+    assert stats["rows"] == rows
+    assert stats["rss_mb"] < RSS_BUDGET_MB, stats
+
+
+@linux_only
+def test_keyed_import_spills_within_rss_budget(large_import):
+    path, rows, directory = large_import
+    stats = _stream(path, "Patient Number", rows, str(directory / "spill"))
+    assert stats["rows"] == rows
+    assert stats["rss_mb"] < RSS_BUDGET_MB, stats
+    assert not os.listdir(directory / "spill")
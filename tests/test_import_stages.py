@@ -0,0 +1,134 @@
+import asyncio
+import zipfile
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+fakeredis = pytest.importorskip("fakeredis")
+routes = pytest.importorskip("auth.routes")
+
+from auth.models import ImportLog, ImportStatus, User
+from db.db import Base
+from patient.models import Gender, Patient
+from utils.import_queue import CANCEL_PREFIX
+
+CHUNK_ROWS = 2
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    # Stages run on worker threads, so they all share the one in-memory connection
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[
+        Base.metadata.tables[name] for name in ("users", "clinics", "import_logs", "expenses", "patients")
+    ])
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(routes, "SessionLocal", factory)
+    return factory
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(routes, "get_sync_redis_client", lambda: client)
+    return client
+
+
+def expenses_csv(tmp_path, rows: int) -> str:
+    path = tmp_path / "expenses.csv"
+    lines = ["Date,Expense Type,Description,Amount,Vendor Name"]
+    lines += [f"2025-04-{day:02d},Supplies,Gloves,{day * 10},Vendor" for day in range(1, rows + 1)]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_cancel_after_first_chunk_stops_the_import_as_cancelled(tmp_path, monkeypatch, session_factory, redis):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(routes, "IMPORT_CHUNK_ROWS", CHUNK_ROWS)
+    db = session_factory()
+    user = User(name="Doctor", email="doctor@example.com")
+    db.add(user)
+    db.flush()
+    import_log = ImportLog(user_id=user.id, file_name="expenses.csv", status=ImportStatus.PENDING)
+    db.add(import_log)
+    db.commit()
+    user_id, import_log_id = user.id, import_log.id
+
+    process_expense_data = routes.IMPORT_STAGES["expenses"]["processor"]
+    statuses_after_chunk = []
+
+    async def cancel_after_chunk(import_log, df, db, user):
+        result = await process_expense_data(import_log, df, db, user)
+        check = session_factory()
+        statuses_after_chunk.append(check.get(ImportLog, import_log_id).status)
+        check.close()
+        redis.set(f"{CANCEL_PREFIX}{import_log_id}", "1")
+        return result
+
+    monkeypatch.setitem(routes.IMPORT_STAGES["expenses"], "processor", cancel_after_chunk)
+
+    with pytest.raises(routes.ImportCancelled):
+        asyncio.run(routes.process_data_in_background(
+            expenses_csv(tmp_path, CHUNK_ROWS * 3), user_id, import_log_id, session_factory(), "upload"
+        ))
+
+    # Still running after its first chunk, so cancel_import would have accepted it
+    assert statuses_after_chunk == [ImportStatus.PROCESSING]
+    check = session_factory()
+    assert check.get(ImportLog, import_log_id).status == ImportStatus.CANCELLED
+    assert check.query(routes.Expense).count() == CHUNK_ROWS
+
+
+def test_errors_of_every_failing_stage_are_kept(tmp_path, monkeypatch, session_factory, redis):
+    monkeypatch.setattr(routes, "IMPORT_CHUNK_RETRIES", 0)
+    db = session_factory()
+    user = User(name="Doctor", email="doctor@example.com")
+    db.add(user)
+    db.flush()
+    import_log = ImportLog(user_id=user.id, file_name="export.zip", status=ImportStatus.PROCESSING)
+    db.add(import_log)
+    db.commit()
+
+    for stage_key in ("expenses", "procedure_catalog"):
+        async def fail(import_log, df, db, user, stage_key=stage_key):
+            return routes.JSONResponse(status_code=400, content={"error": f"{stage_key} broke"})
+        monkeypatch.setitem(routes.IMPORT_STAGES[stage_key], "processor", fail)
+
+    archive = tmp_path / "export.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("expenses.csv", "Date,Amount\n2025-04-01,10\n")
+        zf.writestr("procedure_catalog.csv", "Treatment Name,Treatment Cost\nScaling,500\n")
+    file_rows = {"expenses.csv": 1, "procedure_catalog.csv": 1}
+
+    asyncio.run(routes.run_import_stages(str(archive), file_rows, user.id, import_log, db))
+
+    assert "expenses broke" in import_log.error_message
+    assert "procedure_catalog broke" in import_log.error_message
+
+
+def test_patients_without_a_number_are_not_deduplicated_by_it(monkeypatch, session_factory):
+    monkeypatch.setattr(routes, "total_rows", 10)
+    db = session_factory()
+    user = User(name="Doctor", email="doctor@example.com")
+    db.add(user)
+    db.flush()
+    db.add(Patient(doctor_id=user.id, patient_number="", name="Existing", mobile_number="9876500000", gender=Gender.MALE))
+    import_log = ImportLog(user_id=user.id, file_name="patients.csv", status=ImportStatus.PROCESSING)
+    db.add(import_log)
+    db.commit()
+
+    df = pd.DataFrame({
+        "Patient Number": ["", "", "P-1", "P-1"],
+        "Patient Name": ["Asha", "Ravi", "Meera", "Meera again"],
+        "Mobile Number": ["9876500001", "9876500002", "9876500003", "9876500004"],
+        "Date of Birth": [""] * 4,
+        "Anniversary Date": [""] * 4,
+    }, dtype=str)
+
+    asyncio.run(routes.process_patient_data(import_log, df, db, user))
+
+    names = {name for (name,) in session_factory().query(Patient.name)}
+    assert names == {"Existing", "Asha", "Ravi", "Meera"}
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("prometheus_client")
+
+from utils import notifications
+from utils.notifications import NotificationFailed, send_sms_batch
+
+
+def run_batch(monkeypatch, post_sms, recipients, max_recipients):
+    monkeypatch.setattr(notifications.gateway, "post_sms", post_sms)
+    monkeypatch.setattr(notifications.sms_batcher, "max_recipients", max_recipients)
+
+    async def send():
+        try:
+            return await send_sms_batch("template-1", recipients)
+        finally:
+            await notifications.gateway.close()
+
+    return asyncio.run(send())
+
+
+def test_recipients_share_flow_requests_and_get_their_own_outcome(monkeypatch):
+    calls = []
+
+    async def post_sms(template_id, recipients):
+        calls.append((template_id, [mobile for mobile, _ in recipients]))
+        return f"request-{len(calls)}"
+
+    recipients = [(f"98765432{i:02d}", {"name": f"Patient {i}"}) for i in range(3)]
+    outcomes = run_batch(monkeypatch, post_sms, recipients, max_recipients=2)
+
+    assert calls == [("template-1", ["9876543200", "9876543201"]), ("template-1", ["9876543202"])]
+    assert outcomes == [
+        {"mobile": "9876543200", "status": "sent", "request_id": "request-1"},
+        {"mobile": "9876543201", "status": "sent", "request_id": "request-1"},
+        {"mobile": "9876543202", "status": "sent", "request_id": "request-2"},
+    ]
+
+
+def test_rejected_request_fails_each_of_its_recipients(monkeypatch):
+    async def post_sms(template_id, recipients):
+        raise NotificationFailed("MSG91 rejected message", retryable=False)
+
+    outcomes = run_batch(monkeypatch, post_sms, [("9876543200", {}), ("9876543201", {})], max_recipients=10)
+
+    assert [outcome["status"] for outcome in outcomes] == ["failed", "failed"]
+    assert all(outcome["error"] == "MSG91 rejected message" for outcome in outcomes)
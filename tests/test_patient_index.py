@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from utils.patient_index import ALL_FIELDS, NAME, PHONE, PHONE_SUFFIX, PatientIndex
+
+
+def patient(i, name, mobile=None, patient_number=None, email=None):
+    return SimpleNamespace(
+        id=f"patient-{i}", clinic_id=None, name=name, patient_number=patient_number or f"P{i:05d}",
+        mobile_number=mobile, contact_number=None, secondary_mobile=None, email=email, abha_id=None,
+        gender="male", age=None, date_of_birth=None
+    )
+
+
+def names(index, positions):
+    return [index.entries[position]["name"] for position in positions]
+
+
+def test_terms_are_anded_across_fields():
+    index = PatientIndex([
+        patient(1, "Sunil Rao", "+91 98450 11111"),
+        patient(2, "Sunil Kumar", "+91 77000 22222"),
+        patient(3, "Ravi Shah", "+91 98450 33333"),
+    ])
+    assert names(index, index.match("sunil 98450")) == ["Sunil Rao"]
+    assert names(index, index.match_all([("sunil", (NAME,)), ("11111", (PHONE, PHONE_SUFFIX))])) == ["Sunil Rao"]
+    assert index.match("sunil 55555") == {}
+
+
+def test_broad_term_with_narrow_term_is_not_cut_by_the_candidate_cap():
+    rows = [patient(i, f"Sa{i:05d} Patel", f"+91 70000 {i:05d}") for i in range(5000)]
+    rows.append(patient(9999, "Suresh Menon", "+91 98111 22334"))
+    index = PatientIndex(rows)
+    scores = index.match("s 98111", limit=100)
+    assert names(index, scores) == ["Suresh Menon"]
+
+
+def test_cap_applies_after_intersection():
+    index = PatientIndex([patient(i, f"Sam {i}") for i in range(50)])
+    assert len(index.match("sam", limit=10)) == 10
+    assert len(index.match("sam")) == 50
+
+
+def test_rank_prefers_exact_then_name_prefix_then_shorter_names():
+    index = PatientIndex([
+        patient(1, "Anand Raj"),
+        patient(2, "Raj"),
+        patient(3, "Rajesh"),
+        patient(4, "Rajeshwari Iyer"),
+    ])
+    scores = index.match("raj", ALL_FIELDS)
+    assert names(index, index.rank(scores, "raj")) == ["Raj", "Anand Raj", "Rajesh", "Rajeshwari Iyer"]
+
+
+def test_phone_found_by_national_number_and_last_digits():
+    index = PatientIndex([patient(1, "Meera", "+91-98450-12345")])
+    assert index.match("9845012345", (PHONE,))
+    assert index.match("2345", (PHONE_SUFFIX,))
+    assert not index.match("2345", (PHONE,))
@@ -0,0 +1,38 @@
+import pytest
+
+from utils.phone import msg91_mobile, normalize_phone
+
+
+@pytest.mark.parametrize("phone", [
+    "9876543210",
+    "98765 43210",
+    "098765-43210",
+    "919876543210",
+    "+91 98765 43210",
+    "+91-(98765)-43210",
+    "0091 9876543210",
+    " 9876543210 ",
+])
+def test_ways_of_typing_one_number_agree(phone):
+    assert normalize_phone(phone) == "+919876543210"
+
+
+def test_numbers_without_country_code_use_the_given_one():
+    assert normalize_phone("2025550143", country_code="1") == "+12025550143"
+    assert normalize_phone("12025550143", country_code="1") == "+12025550143"
+
+
+def test_foreign_numbers_keep_their_country_code():
+    assert normalize_phone("+44 20 7946 0958") == "+442079460958"
+    assert normalize_phone("0044 20 7946 0958") == "+442079460958"
+
+
+@pytest.mark.parametrize("phone", [None, "", "   ", "12345", "98765432", "+0 9876543210", "+1234567890123456", "abc"])
+def test_incomplete_or_impossible_numbers_are_rejected(phone):
+    assert normalize_phone(phone) is None
+
+
+def test_msg91_mobile_drops_the_plus_and_falls_back_to_digits():
+    assert msg91_mobile("098765 43210") == "919876543210"
+    assert msg91_mobile("12-345") == "12345"
+    assert msg91_mobile(None) == ""
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis runs Lua scripts through lupa
+
+from utils.reminders import (
+    REMINDERS_DUE_KEY, REMINDERS_PROCESSING_KEY, REMINDER_ATTEMPTS_KEY, ReminderScheduler
+)
+
+
+@pytest.fixture
+def scheduler():
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    now = time.time()
+    redis_client.zadd(REMINDERS_DUE_KEY, {"due": now - 5, "also-due": now - 1, "later": now + 600})
+    return ReminderScheduler(redis_client, "test")
+
+
+def test_claimed_reminders_are_leased_until_acknowledged(scheduler):
+    assert sorted(scheduler.claim_due(10, 300)) == ["also-due", "due"]
+    assert scheduler.claim_due(10, 300) == []
+    scheduler.acknowledge(["due", "also-due"])
+    assert scheduler.redis.zcard(REMINDERS_PROCESSING_KEY) == 0
+    assert scheduler.redis.zrange(REMINDERS_DUE_KEY, 0, -1) == ["later"]
+
+
+def test_expired_lease_makes_reminder_due_again(scheduler):
+    claimed = scheduler.claim_due(10, 0)
+    time.sleep(0.01)
+    assert sorted(scheduler.claim_due(10, 300)) == sorted(claimed)
+
+
+def test_failed_reminders_are_retried_then_dropped(scheduler):
+    scheduler.claim_due(10, 300)
+    assert scheduler.retry(["due"], 0, 2) == []
+    assert scheduler.redis.hget(REMINDER_ATTEMPTS_KEY, "due") == "1"
+    assert "due" in scheduler.claim_due(10, 300)
+    assert scheduler.retry(["due"], 0, 2) == ["due"]
+    assert scheduler.redis.zscore(REMINDERS_DUE_KEY, "due") is None
+    assert scheduler.redis.hget(REMINDER_ATTEMPTS_KEY, "due") is None
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from utils.suggestion_index import AutocompleteIndex
+from utils.suggestion_store import suggestion_hash, normalize
+
+CREATED = datetime(2025, 1, 1)
+
+
+def index_of(texts):
+    return AutocompleteIndex([(f"id-{i}", text, CREATED) for i, text in enumerate(texts)])
+
+
+def test_popular_suggestion_that_sorts_late_is_ranked_for_short_query():
+    texts = [f"cavity {i:04d}" for i in range(2000)] + ["calculus removal"]
+    index = index_of(texts)
+    index.set_usage({suggestion_hash(normalize("calculus removal")): 50})
+    assert index.search("ca", 5)[0]["text"] == "calculus removal"
+
+
+def test_tiers_rank_exact_then_prefix_then_word_prefix_then_infix():
+    index = index_of(["root canal", "canal", "canal therapy", "recanalisation"])
+    assert [entry["text"] for entry in index.search("canal", 10)] == [
+        "canal", "canal therapy", "root canal", "recanalisation"
+    ]
+
+
+def test_short_query_results_follow_usage_updates():
+    index = index_of(["cap", "cast"])
+    assert index.search("ca", 1)[0]["text"] == "cap"
+    index.set_usage({suggestion_hash("cast"): 3})
+    assert index.search("ca", 1)[0]["text"] == "cast"
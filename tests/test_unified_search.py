@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# Invoices reference the users, clinics, appointments and patients tables
+from appointment.models import Appointment  # noqa: F401
+from auth.models import User  # noqa: F401
+from patient.models import Patient  # noqa: F401
+from payment.models import Invoice
+from utils.unified_search import CANDIDATE_FACTOR, SearchContext, search_invoices
+
+NOW = datetime(2025, 4, 10, 12)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Invoice.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def invoice(db, number, patient_id, date):
+    db.add(Invoice(doctor_id="doctor-1", patient_id=patient_id, invoice_number=number, date=date))
+
+
+def test_number_match_survives_a_matched_patients_recent_invoices(db):
+    limit = 5
+    invoice(db, "INV-42", "patient-2", NOW - timedelta(days=365))
+    for day in range(limit * CANDIDATE_FACTOR * 2):
+        invoice(db, f"B-{day}", "patient-1", NOW - timedelta(days=day))
+    db.flush()
+
+    context = SearchContext("doctor-1", None, "inv-4", {"patient-1": 0}, limit)
+    result = search_invoices(db, context)
+    assert result["items"][0]["invoice_number"] == "INV-42"
+    assert [item["invoice_number"] for item in result["items"][1:]] == ["B-0", "B-1", "B-2", "B-3"]
+    assert result["has_more"]
+
+
+def test_row_matching_both_ways_is_listed_once(db):
+    invoice(db, "INV-1", "patient-1", NOW)
+    db.flush()
+
+    result = search_invoices(db, SearchContext("doctor-1", None, "INV", {"patient-1": 0}, 5))
+    assert [item["invoice_number"] for item in result["items"]] == ["INV-1"]
+    assert not result["has_more"]
@@ -1,134 +1,164 @@
-from datetime import datetime
+from functools import lru_cache
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
 from sqlalchemy.orm import Session
 from appointment.models import Appointment, AppointmentStatus
 from patient.models import Patient
 from auth.models import User
-from utils.email import send_email
-import requests
-from utils.config import EMAIL_HOST, EMAIL_PORT, EMAIL_SENDER, EMAIL_PASSWORD
+from utils.config import EMAIL_HOST, EMAIL_PORT, EMAIL_SENDER, EMAIL_PASSWORD, SMTP_TIMEOUT_SECONDS, APPOINTMENT_TEMPLATE_ID
+from utils.notifications import send_sms_batch
 from pathlib import Path
 from jinja2 import Template
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-async def send_appointment_email(
-    db: Session,
-    appointment_id: str
-) -> tuple[bool, str]:
+APPOINTMENT_TEMPLATE_PATH = "utils/templates/appointment-email.html"
+
+
+@lru_cache(maxsize=None)
+def get_appointment_template() -> Template:
+    """Read and compile the appointment email template once per process."""
+    return Template(Path(APPOINTMENT_TEMPLATE_PATH).read_text())
+
+
+def build_appointment_email(appointment: Appointment, patient: Patient, doctor: User) -> MIMEMultipart:
+    """Render the appointment email for one appointment."""
+    template_data = {
+        "patient": {"name": patient.name},
+        "appointment": {
+            "status": {"value": appointment.status.value},
+            "notes": appointment.notes,
+            # e.g. "10 April 2025" and "03:00 PM"
+            "appointment_date": appointment.appointment_date.strftime('%d %B %Y'),
+            "start_time": appointment.start_time.strftime('%I:%M %p'),
+            "end_time": appointment.end_time.strftime('%I:%M %p')
+        },
+        "doctor": {
+            "name": doctor.name,
+            "email": doctor.email,
+            "phone": doctor.phone if doctor.phone else "Not provided"
+        }
+    }
+
+    # Create message container
+    msg = MIMEMultipart('alternative')
+    msg['From'] = EMAIL_SENDER
+    msg['To'] = patient.email if patient.email else ""
+    msg['Subject'] = f"Appointment {appointment.status.value.capitalize()} - {appointment.start_time.strftime('%B %d, %Y')}"
+    msg.attach(MIMEText(get_appointment_template().render(**template_data), 'html'))
+    return msg
+
+
+@contextmanager
+def smtp_session():
+    """One authenticated SMTP connection, reused for every message sent inside the block."""
+    server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+    try:
+        server.starttls()  # Secure the connection
+        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+        yield server
+    finally:
+        try:
+            server.quit()
+        except smtplib.SMTPException:
+            server.close()
+
+
+def load_appointment_details(db: Session, appointment_ids: List[str]) -> Dict[str, Tuple[Appointment, Patient, User]]:
+    """Fetch appointments with their patient and doctor in a single joined query."""
+    rows = db.query(Appointment, Patient, User).join(
+        Patient, Patient.id == Appointment.patient_id
+    ).join(
+        User, User.id == Appointment.doctor_id
+    ).filter(Appointment.id.in_(appointment_ids)).all()
+    return {appointment.id: (appointment, patient, doctor) for appointment, patient, doctor in rows}
+
+
+def send_appointment_emails(db: Session, appointment_ids: List[str]) -> Dict[str, str]:
+    """
+    Send appointment emails for a batch of appointments: one query for all the
+    details, the cached template, and a single SMTP connection for every message.
+    Cancelled appointments and patients without an email are skipped.
+
+    Returns:
+        dict: Outcome per appointment id ("sent", "skipped" or an error message)
+    """
+    results = {}
+    details = load_appointment_details(db, appointment_ids)
+    messages = []
+    for appointment_id in appointment_ids:
+        if appointment_id not in details:
+            results[appointment_id] = "skipped"
+            continue
+        appointment, patient, doctor = details[appointment_id]
+        if appointment.status == AppointmentStatus.CANCELLED or not patient.email:
+            results[appointment_id] = "skipped"
+            continue
+        try:
+            messages.append((appointment_id, build_appointment_email(appointment, patient, doctor)))
+        except Exception as e:
+            results[appointment_id] = f"Error rendering email: {str(e)}"
+
+    next_message = 0
+    while next_message < len(messages):
+        sent_before = next_message
+        try:
+            with smtp_session() as server:
+                for appointment_id, msg in messages[next_message:]:
+                    try:
+                        server.send_message(msg)
+                        results[appointment_id] = "sent"
+                    except smtplib.SMTPRecipientsRefused as e:
+                        results[appointment_id] = f"Recipient refused: {str(e)}"
+                    next_message += 1
+        except Exception as e:
+            # Servers cap messages per connection; reconnect as long as the last one made progress
+            if isinstance(e, smtplib.SMTPServerDisconnected) and next_message > sent_before:
+                continue
+            for appointment_id, _ in messages[next_message:]:
+                results[appointment_id] = str(e)
+            break
+
+    print(f"Sent {sum(1 for r in results.values() if r == 'sent')} of {len(appointment_ids)} appointment emails")
+    return results
+
+
+def appointment_sms_variables(appointment: Appointment, patient: Patient, doctor: User) -> Dict[str, str]:
+    """Variables of the MSG91 appointment template for one appointment."""
+    return {
+        "name": patient.name,
+        "doctor": doctor.name,
+        "date": appointment.appointment_date.strftime('%d %B %Y'),
+        "time": appointment.start_time.strftime('%I:%M %p')
+    }
+
+
+async def send_appointment_sms(db: Session, appointment_ids: List[str]) -> Dict[str, str]:
     """
-    Send appointment confirmation email using HTML template
-    Args:
-        db: Database session
-        appointment_id: ID of the appointment
+    Send the appointment SMS for a batch of appointments as batched MSG91 flow
+    requests. Appointments not shared on SMS, cancelled ones and patients
+    without a mobile number are skipped.
+
     Returns:
-        bool: True if email sent successfully, False otherwise
+        dict: Outcome per appointment id ("sent", "skipped" or an error message)
     """
-    try:
-        # Get appointment details with error handling
-        appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-        if not appointment:
-            print("Appointment not found")
-            return False, "Appointment not found"
-
-        # Get patient and doctor details with error handling
-        patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
-        if not patient:
-            print("Patient not found")
-            return False, "Patient not found"
-
-        doctor = db.query(User).filter(User.id == appointment.doctor_id).first()
-        if not doctor:
-            print("Doctor not found")
-            return False, "Doctor not found"
-
-        # Format email subject
-        subject = f"Appointment {appointment.status.value.capitalize()} - {appointment.start_time.strftime('%B %d, %Y')}"
-
-        # Prepare template data
-        template_data = {
-            "patient": {"name": patient.name},
-            "appointment": {
-                "status": {"value": appointment.status.value},
-                "notes": appointment.notes,
-                "appointment_date": appointment.appointment_date.strftime('%Y-%m-%d'),
-                "start_time": appointment.start_time.strftime('%I:%M %p'),
-                "end_time": appointment.end_time.strftime('%I:%M %p')
-            },
-            "doctor": {
-                "name": doctor.name,
-                "email": doctor.email,
-                "phone": doctor.phone if doctor.phone else "Not provided"
-            }
-        }        
-        # Path to HTML template
-        template_path = "utils/templates/appointment-email.html"
-
-        sender_email = EMAIL_SENDER
-        sender_password = EMAIL_PASSWORD
-        email_host = EMAIL_HOST
-        email_port = EMAIL_PORT
-        
-        # Create message container
-        msg = MIMEMultipart('alternative')
-        msg['From'] = sender_email
-        msg['To'] = patient.email if patient.email else ""
-        msg['Subject'] = subject
-        
-        # Read the HTML template
-        html_content = Path(template_path).read_text()
-        
-        # Convert string dates to datetime objects if they exist
-        if 'appointment' in template_data and 'appointment_date' in template_data['appointment']:
-            if isinstance(template_data['appointment']['appointment_date'], str):
-                try:
-                    date_obj = datetime.strptime(
-                        template_data['appointment']['appointment_date'], '%Y-%m-%d'
-                    )
-                    # Format date as "10 April 2025"
-                    template_data['appointment']['appointment_date'] = date_obj.strftime('%d %B %Y')
-                except ValueError:
-                    pass  # Keep as string if parsing fails
-        
-        # Format times if they exist
-        if 'appointment' in template_data:
-            if 'start_time' in template_data['appointment'] and isinstance(template_data['appointment']['start_time'], str):
-                try:
-                    # Try to parse and format the time as "03:00 PM"
-                    time_obj = datetime.strptime(template_data['appointment']['start_time'], '%I:%M %p')
-                    template_data['appointment']['start_time'] = time_obj.strftime('%I:%M %p')
-                except ValueError:
-                    pass  # Keep original format if parsing fails
-            
-            if 'end_time' in template_data['appointment'] and isinstance(template_data['appointment']['end_time'], str):
-                try:
-                    # Try to parse and format the time as "03:00 PM"
-                    time_obj = datetime.strptime(template_data['appointment']['end_time'], '%I:%M %p')
-                    template_data['appointment']['end_time'] = time_obj.strftime('%I:%M %p')
-                except ValueError:
-                    pass  # Keep original format if parsing fails
-        
-        template = Template(html_content)
-        html_content = template.render(**template_data)
-        
-        # Attach HTML content
-        part = MIMEText(html_content, 'html')
-        msg.attach(part)
-        
-        # Connect to SMTP server
-        server = smtplib.SMTP(email_host, email_port)
-        server.starttls()  # Secure the connection
-        
-        # Login to sender email
-        server.login(sender_email, sender_password)
-        
-        # Send email
-        server.send_message(msg)
-        server.quit()
-        
-        print(f"Email sent successfully to {patient.email}")
-        return True, "Appointment email sent successfully"
-    
-    except Exception as e:
-        print(f"Error sending appointment email: {str(e)}")
-        return False, str(e)
+    results = {}
+    details = load_appointment_details(db, appointment_ids)
+    recipients = []
+    for appointment_id in appointment_ids:
+        if appointment_id not in details:
+            results[appointment_id] = "skipped"
+            continue
+        appointment, patient, doctor = details[appointment_id]
+        if not appointment.share_on_sms or appointment.status == AppointmentStatus.CANCELLED or not patient.mobile_number:
+            results[appointment_id] = "skipped"
+            continue
+        recipients.append((appointment_id, patient.mobile_number, appointment_sms_variables(appointment, patient, doctor)))
+
+    outcomes = await send_sms_batch(str(APPOINTMENT_TEMPLATE_ID), [(mobile, variables) for _, mobile, variables in recipients])
+    for (appointment_id, _, _), outcome in zip(recipients, outcomes):
+        results[appointment_id] = outcome["status"] if outcome["status"] == "sent" else outcome["error"]
+
+    print(f"Sent {sum(1 for r in results.values() if r == 'sent')} of {len(appointment_ids)} appointment SMS")
+    return results
@@ -0,0 +1,109 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from appointment.models import Appointment, AppointmentStatus
+from auth.models import User
+from utils.config import APPOINTMENT_MAX_DURATION_MINUTES
+
+Interval = Tuple[datetime, datetime]
+
+# No appointment runs longer than this, so an overlap search only has to look this
+# far back from the requested start. That bounds the scan over the
+# (doctor_id, start_time, end_time) index to a small range. Create and update
+# reject longer appointments and the importer clamps them.
+MAX_DURATION = timedelta(minutes=APPOINTMENT_MAX_DURATION_MINUTES)
+
+
+def _active_for_doctor(doctor_id: str):
+    return [
+        Appointment.doctor_id == doctor_id,
+        Appointment.status != AppointmentStatus.CANCELLED
+    ]
+
+
+def find_conflict(db: Session, doctor_id: str, start: datetime, end: datetime, exclude_id: Optional[str] = None, lock: bool = False) -> Optional[Appointment]:
+    """
+    Return an active appointment of the doctor overlapping [start, end), if any.
+
+    With lock=True the doctor's row is locked first, so concurrent bookings for
+    the same doctor are checked one at a time until the transaction ends.
+    """
+    if lock:
+        db.execute(select(User.id).where(User.id == doctor_id).with_for_update())
+
+    conditions = _active_for_doctor(doctor_id) + [
+        Appointment.start_time < end,
+        Appointment.start_time > start - MAX_DURATION,
+        Appointment.end_time > start
+    ]
+    if exclude_id:
+        conditions.append(Appointment.id != exclude_id)
+    return db.execute(
+        select(Appointment).where(*conditions).order_by(Appointment.start_time).limit(1)
+    ).scalars().first()
+
+
+def busy_intervals_by_day(db: Session, doctor_id: str, days: List[date]) -> Dict[date, List[Interval]]:
+    """
+    Busy intervals of the doctor on each of the given days, sorted by start and
+    clipped to the day. One range query covers all the days.
+    """
+    busy = {day: [] for day in days}
+    if not days:
+        return busy
+    range_start = datetime.combine(min(days), time.min)
+    range_end = datetime.combine(max(days) + timedelta(days=1), time.min)
+
+    rows = db.execute(
+        select(Appointment.start_time, Appointment.end_time).where(
+            *_active_for_doctor(doctor_id),
+            Appointment.start_time < range_end,
+            Appointment.start_time > range_start - MAX_DURATION,
+            Appointment.end_time > range_start
+        ).order_by(Appointment.start_time)
+    ).all()
+
+    for start, end in rows:
+        day = start.date()
+        while day <= end.date():
+            if day in busy:
+                day_start = datetime.combine(day, time.min)
+                busy[day].append((max(start, day_start), min(end, day_start + timedelta(days=1))))
+            day += timedelta(days=1)
+    return busy
+
+
+def merge_intervals(intervals: List[Interval]) -> List[Interval]:
+    """Merge overlapping or touching intervals. Input must be sorted by start."""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def overlaps(merged: List[Interval], start: datetime, end: datetime) -> bool:
+    """Binary search over merged intervals for one that overlaps [start, end)."""
+    index = bisect_right(merged, (start, datetime.max)) - 1
+    if index >= 0 and merged[index][1] > start:
+        return True
+    index = bisect_left(merged, (start, datetime.min))
+    return index < len(merged) and merged[index][0] < end
+
+
+def free_slots(busy: List[Interval], day: date, day_start: time, day_end: time, slot_minutes: int) -> List[Interval]:
+    """Slots of slot_minutes between day_start and day_end that don't overlap a busy interval."""
+    merged = merge_intervals(sorted(busy))
+    step = timedelta(minutes=slot_minutes)
+    slot_start = datetime.combine(day, day_start)
+    close = datetime.combine(day, day_end)
+    slots = []
+    while slot_start + step <= close:
+        if not overlaps(merged, slot_start, slot_start + step):
+            slots.append((slot_start, slot_start + step))
+        slot_start += step
+    return slots
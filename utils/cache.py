@@ -0,0 +1,146 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+from redis.exceptions import RedisError
+from redis_client import cache_breaker
+from utils.cache_codec import encode, decode, CacheDecodeError
+
+# Generation counters live under this prefix. Cache keys embed the current
+# generation of every tag they depend on, so bumping a tag makes all of its
+# entries unreachable at once; they then age out through their TTL.
+GENERATION_PREFIX = "cache:gen:"
+
+# Tag covering every appointment, for caches that are not scoped to one doctor or clinic
+ALL_APPOINTMENTS_TAG = "appointments"
+
+# Redis writes that follow a commit run here, one at a time so they keep their order
+_after_commit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-after-commit")
+
+
+def _reset_after_commit_executor():
+    # A forked import worker inherits the executor but not its thread
+    global _after_commit_executor
+    _after_commit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-after-commit")
+
+
+os.register_at_fork(after_in_child=_reset_after_commit_executor)
+
+
+async def guarded(operation: Callable[[], Awaitable[Any]], fallback: Any = None) -> Any:
+    """
+    Run a cache operation through the circuit breaker. While the circuit is open,
+    or when the operation fails or times out, return the fallback so the caller
+    carries on without the cache.
+    """
+    if not cache_breaker.allow():
+        return fallback
+    try:
+        result = await operation()
+    except (RedisError, OSError, asyncio.TimeoutError) as e:
+        cache_breaker.record_failure()
+        print(f"Cache unavailable, falling back: {str(e)}")
+        return fallback
+    cache_breaker.record_success()
+    return result
+
+
+def submit_after_commit(operation: Callable[[], Any], description: str):
+    """
+    Run a blocking Redis write that follows a commit, such as an invalidation or
+    a publish, on a background thread, and skip it while the circuit is open.
+    Session events fire on the event loop for async routes, so they must never
+    wait on Redis themselves.
+    """
+    def run():
+        if not cache_breaker.allow():
+            return
+        try:
+            operation()
+        except (RedisError, OSError) as e:
+            cache_breaker.record_failure()
+            print(f"Error {description}: {str(e)}")
+            return
+        cache_breaker.record_success()
+
+    _after_commit_executor.submit(run)
+
+
+async def cache_get(redis_client, key: str) -> Any:
+    """Read and decode one cached value. Returns None on a miss or an unreadable entry."""
+    return (await cache_get_many(redis_client, [key]))[0]
+
+
+async def cache_get_many(redis_client, keys: List[str]) -> List[Any]:
+    """Read and decode several cached values with a single MGET, in order. All misses while Redis is unavailable."""
+    values = []
+    for data in await guarded(lambda: redis_client.mget(keys), [None] * len(keys)):
+        try:
+            values.append(decode(data))
+        except CacheDecodeError:
+            values.append(None)
+    return values
+
+
+async def cache_set(redis_client, key: str, value: Any, ttl: int):
+    """Encode and cache a value for ttl seconds. Skipped while Redis is unavailable."""
+    await guarded(lambda: redis_client.setex(key, ttl, encode(value)))
+
+
+def doctor_tag(doctor_id: str) -> str:
+    return f"doctor:{doctor_id}"
+
+
+def clinic_tag(clinic_id: str) -> str:
+    return f"clinic:{clinic_id}"
+
+
+def appointment_list_tag(doctor_id: str, clinic_id: Optional[str]) -> str:
+    """
+    Tag of a doctor's appointment list. Lists are per clinic, but a doctor without
+    a default clinic has no clinic tag that writes would bump, so theirs is per doctor.
+    """
+    return clinic_tag(clinic_id) if clinic_id else doctor_tag(doctor_id)
+
+
+async def get_generations(redis_client, tags: List[str]) -> List[int]:
+    """Current generation of each tag, in order, fetched with a single MGET."""
+    values = await guarded(lambda: redis_client.mget([f"{GENERATION_PREFIX}{tag}" for tag in tags]), [None] * len(tags))
+    return [int(value) if value else 0 for value in values]
+
+
+async def bump_generations(redis_client, tags: Iterable[str]):
+    """Invalidate everything cached under the given tags in one atomic step."""
+    tags = list(dict.fromkeys(tags))
+    if not tags:
+        return
+    pipe = redis_client.pipeline(transaction=True)
+    for tag in tags:
+        pipe.incr(f"{GENERATION_PREFIX}{tag}")
+    await pipe.execute()
+
+
+def bump_generations_sync(redis_client, tags: Iterable[str]):
+    """bump_generations for worker processes using the blocking client."""
+    pipe = redis_client.pipeline(transaction=True)
+    for tag in dict.fromkeys(tags):
+        pipe.incr(f"{GENERATION_PREFIX}{tag}")
+    pipe.execute()
+
+
+async def invalidate_appointments(redis_client, doctor_ids: Iterable[Optional[str]] = (), clinic_ids: Iterable[Optional[str]] = ()):
+    """
+    Invalidate cached appointment lists, stats and searches after a write. Must be
+    called after the write commits, so a reader can never cache pre-write data
+    under the new generation.
+    """
+    tags = [ALL_APPOINTMENTS_TAG]
+    tags += [doctor_tag(doctor_id) for doctor_id in doctor_ids if doctor_id]
+    tags += [clinic_tag(clinic_id) for clinic_id in clinic_ids if clinic_id]
+    # Always attempted, even with the circuit open: skipping a bump would leave
+    # stale entries readable once Redis recovers. The write has committed, so a
+    # failure here is logged rather than failing the request.
+    try:
+        await bump_generations(redis_client, tags)
+    except (RedisError, OSError, asyncio.TimeoutError) as e:
+        print(f"Error invalidating appointment caches: {str(e)}")
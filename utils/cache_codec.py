@@ -0,0 +1,60 @@
+from decimal import Decimal
+from typing import Any, Optional
+import orjson
+from utils.config import CACHE_COMPRESS_MIN_BYTES, CACHE_COMPRESS_LEVEL
+
+# zstandard is optional: without it payloads are stored uncompressed, and any
+# compressed entry written by another process reads as a cache miss.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Every cached payload starts with one byte naming its encoding
+RAW_MARKER = b"j"
+ZSTD_MARKER = b"z"
+
+_compressor = zstandard.ZstdCompressor(level=CACHE_COMPRESS_LEVEL) if zstandard else None
+_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+
+class CacheDecodeError(ValueError):
+    """Raised when a cached payload can't be decoded; callers treat it as a miss."""
+
+
+def _default(value: Any) -> Any:
+    # orjson already handles datetime, date, time, UUID and Enum members
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not cache serializable: {type(value).__name__}")
+
+
+def encode(value: Any) -> bytes:
+    """
+    Serialize a value for Redis with orjson, compressing it with zstd once it is
+    larger than CACHE_COMPRESS_MIN_BYTES. Datetimes come back as ISO strings and
+    enums as their values, matching what the API returns.
+    """
+    payload = orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    if _compressor and len(payload) >= CACHE_COMPRESS_MIN_BYTES:
+        return ZSTD_MARKER + _compressor.compress(payload)
+    return RAW_MARKER + payload
+
+
+def decode(data: Optional[bytes]) -> Any:
+    """Inverse of encode. Returns None for a missing key."""
+    if data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode()
+    marker, payload = data[:1], data[1:]
+    try:
+        if marker == RAW_MARKER:
+            return orjson.loads(payload)
+        if marker == ZSTD_MARKER and _decompressor:
+            return orjson.loads(_decompressor.decompress(payload))
+    except Exception as e:
+        raise CacheDecodeError(str(e)) from e
+    raise CacheDecodeError(f"Unknown cache payload marker {marker!r}")
@@ -1,30 +1,275 @@
-import faiss
-import pickle
-from sentence_transformers import SentenceTransformer
+"""
+FAQ chatbot service.
+
+The SentenceTransformer model, FAISS index and question/answer metadata are
+loaded on first use, or in the background at startup when
+CHATBOT_WARMUP_ON_STARTUP is set, so importing this module is cheap.
+
+Questions arriving within a short window are grouped into one encode call and
+one index search, which run off the event loop. Embeddings and search results
+are kept in LRU caches keyed by the normalised question, so repeated questions
+skip the model entirely.
+
+The index is versioned (see utils/chatbot_index.py). Each worker checks the
+active version every CHATBOT_INDEX_CHECK_SECONDS and swaps a newly activated
+one in without a restart; cached embeddings stay valid across swaps since the
+embedding model doesn't change.
+"""
+
+import asyncio
 import os
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from prometheus_client import Counter, Histogram
+from utils.config import (
+    CHATBOT_BATCH_WINDOW_SECONDS, CHATBOT_MAX_BATCH, CHATBOT_MAX_PENDING,
+    CHATBOT_CACHE_SIZE, CHATBOT_MIN_SCORE, CHATBOT_INDEX_CHECK_SECONDS
+)
+from utils.chatbot_index import ChatbotIndex, current_version
 
 # Get absolute path to chatbot model directory
 CHATBOT_MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "chatbot_model"))
 
-# Load the chatbot model
-def load_chatbot_model():
-    embedding_model = SentenceTransformer(os.path.join(CHATBOT_MODEL_DIR, "sentence_transformer"))
-    index = faiss.read_index(os.path.join(CHATBOT_MODEL_DIR, "faiss_index"))
+# Most matches kept per question; callers ask for up to this many
+MAX_TOP_K = 10
+
+CHATBOT_BATCH_SIZE = Histogram(
+    "chatbot_batch_questions", "Questions encoded per model call", buckets=[1, 2, 4, 8, 16, 32, 64]
+)
+CHATBOT_CACHE_LOOKUPS = Counter(
+    "chatbot_cache_lookups", "Chatbot cache lookups", ["cache", "outcome"]
+)
+
+
+class ChatbotBusy(Exception):
+    """Too many questions are already waiting for the model."""
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache of a fixed size."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(str(question).split()).casefold()
+
+
+class ChatbotModel:
+    """The sentence embedding model."""
+
+    def __init__(self, model_dir: str):
+        # Imported here so the API can start without loading torch
+        from sentence_transformers import SentenceTransformer
 
-    with open(os.path.join(CHATBOT_MODEL_DIR, "metadata.pkl"), "rb") as file:
-        metadata = pickle.load(file)
+        self.embedding_model = SentenceTransformer(os.path.join(model_dir, "sentence_transformer"))
+        self.dimension = self.embedding_model.get_sentence_embedding_dimension()
 
-    questions = metadata["questions"]
-    answers = metadata["answers"]
+    def encode(self, texts: List[str], batch_size: Optional[int] = None):
+        return self.embedding_model.encode(
+            texts, batch_size=batch_size or len(texts), normalize_embeddings=True, convert_to_numpy=True
+        ).astype("float32")
 
-    return embedding_model, index, questions, answers
 
-embedding_model, index, questions, answers = load_chatbot_model()
+def entry(hit: Tuple[float, str, str]) -> Dict[str, Any]:
+    score, question, answer = hit
+    return {"question": question, "answer": answer, "score": round(score, 4)}
+
+
+class ChatbotService:
+    """
+    Answers questions with a lazily loaded ChatbotModel. Concurrent questions
+    are batched: the first one opens a window of window_seconds, and the batch
+    is sent when the window closes or reaches max_batch questions. One batch
+    runs at a time; questions arriving meanwhile form the next one.
+    """
+
+    def __init__(
+        self, model_dir: str, window_seconds: float, max_batch: int, max_pending: int, cache_size: int,
+        index_check_seconds: float
+    ):
+        self.model_dir = model_dir
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.embeddings = LRUCache(cache_size)
+        self.results = LRUCache(cache_size)
+        self._model: Optional[ChatbotModel] = None
+        self._index: Optional[ChatbotIndex] = None
+        self._load_lock = threading.Lock()
+        self.index_check_seconds = index_check_seconds
+        self.index_checked_at = time.monotonic()
+        self.swapping: Optional[asyncio.Task] = None
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.running: Optional[asyncio.Task] = None
+
+    def model(self) -> ChatbotModel:
+        """The loaded model, loading it on first call. Blocks; call from a worker thread."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = ChatbotModel(self.model_dir)
+        return self._model
+
+    def index(self) -> ChatbotIndex:
+        """The active index, loading it on first call. Blocks; call from a worker thread."""
+        if self._index is None:
+            with self._load_lock:
+                if self._index is None:
+                    self._index = ChatbotIndex.load(self.model_dir)
+        return self._index
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None and self._index is not None
+
+    async def warm_up(self):
+        """Load the model in the background so the first question doesn't wait for it."""
+        try:
+            await asyncio.to_thread(self.model)
+            await asyncio.to_thread(self.index)
+            print(f"Chatbot model loaded with index {self._index.version}")
+        except Exception as e:
+            print(f"Error loading chatbot model: {e}")
+
+    def check_index(self):
+        """
+        Start loading the active index version in the background if it changed
+        since the last check. Questions keep using the previous index until the
+        new one is loaded.
+        """
+        now = time.monotonic()
+        if self._index is None or self.swapping or now - self.index_checked_at < self.index_check_seconds:
+            return
+        self.index_checked_at = now
+        version = current_version(self.model_dir)
+        if version != self._index.version:
+            self.swapping = asyncio.get_running_loop().create_task(self._swap_index(version))
+
+    async def _swap_index(self, version: str):
+        try:
+            index = await asyncio.to_thread(ChatbotIndex.load, self.model_dir, version)
+            self._index = index
+            # Results name entries of the old index; embeddings don't depend on it
+            self.results.clear()
+            print(f"Chatbot index swapped to {version}")
+        except Exception as e:
+            print(f"Error loading chatbot index {version}: {e}")
+        finally:
+            self.swapping = None
+
+    async def ask(self, question: str, top_k: int = 1, min_score: float = CHATBOT_MIN_SCORE) -> List[Dict[str, Any]]:
+        """
+        Up to top_k FAQ entries for the question with a cosine similarity of at
+        least min_score, best first. Raises ChatbotBusy when the queue is full.
+        """
+        key = normalize_question(question)
+        if not key:
+            return []
+        self.check_index()
+        cached = self.results.get(key)
+        # A batch that ran during a swap may have cached results from the previous index
+        current = cached is not None and self._index is not None and cached[0] == self._index.version
+        CHATBOT_CACHE_LOOKUPS.labels("results", "hit" if current else "miss").inc()
+        if current:
+            hits = cached[1]
+        else:
+            version, hits = await self._submit(key)
+            self.results.set(key, (version, hits))
+        return [entry(hit) for hit in hits[:top_k] if hit[0] >= min_score]
+
+    def _submit(self, key: str) -> asyncio.Future:
+        if len(self.pending) >= self.max_pending:
+            raise ChatbotBusy("Too many chatbot questions waiting")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((key, future))
+        if len(self.pending) >= self.max_batch:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window_seconds, self._flush)
+        return future
+
+    def _flush(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if self.running or not self.pending:
+            # The running batch flushes again when it finishes
+            return
+        batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+        self.running = asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            keys = list(dict.fromkeys(key for key, _ in batch))
+            CHATBOT_BATCH_SIZE.observe(len(keys))
+            hits = await asyncio.to_thread(self._search, keys)
+            for key, future in batch:
+                if not future.done():
+                    future.set_result(hits[key])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.running = None
+            if self.pending:
+                self._flush()
+
+    def _search(self, keys: List[str]) -> Dict[str, Tuple[str, List[Tuple[float, str, str]]]]:
+        """
+        Encode the questions not in the embedding cache in one call, then search
+        them all at once. Returns the index version and hits per question.
+        """
+        model, index = self.model(), self.index()
+        cached = {key: self.embeddings.get(key) for key in keys}
+        missing = [key for key, embedding in cached.items() if embedding is None]
+        CHATBOT_CACHE_LOOKUPS.labels("embeddings", "hit").inc(len(keys) - len(missing))
+        if missing:
+            CHATBOT_CACHE_LOOKUPS.labels("embeddings", "miss").inc(len(missing))
+            for key, embedding in zip(missing, model.encode(missing)):
+                cached[key] = embedding
+                self.embeddings.set(key, embedding)
+        results = index.search(np.stack([cached[key] for key in keys]), MAX_TOP_K)
+        return {key: (index.version, hits) for key, hits in zip(keys, results)}
+
+
+chatbot = ChatbotService(
+    CHATBOT_MODEL_DIR, CHATBOT_BATCH_WINDOW_SECONDS, CHATBOT_MAX_BATCH, CHATBOT_MAX_PENDING, CHATBOT_CACHE_SIZE,
+    CHATBOT_INDEX_CHECK_SECONDS
+)
+
 
 # Get the closest answer to a query
 def get_answer(query):
-    query_embedding = embedding_model.encode([query])
-    _, closest_idx = index.search(query_embedding, 1)
-
-    closest_question = questions[closest_idx[0][0]]
-    return answers[closest_question]
\ No newline at end of file
+    """Blocking single-question lookup, kept for scripts. Returns None when nothing is close enough."""
+    hits = chatbot.index().search(chatbot.model().encode([normalize_question(query)]), 1)[0]
+    if not hits or hits[0][0] < CHATBOT_MIN_SCORE:
+        return None
+    return hits[0][2]
@@ -0,0 +1,378 @@
+"""
+Versioned FAISS indexes for the FAQ chatbot.
+
+Each build is written to indexes/<version>/ under the chatbot model directory:
+faiss_index and metadata.pkl in the format the chatbot already reads, plus the
+question embeddings and a manifest.json describing the build. A version only
+goes live when the CURRENT pointer file is replaced to name it; running
+workers poll the pointer and swap the new index in without a restart. Version
+directories are never modified once published, so workers still serving the
+previous version are unaffected and rolling back is another `activate`.
+
+Without a CURRENT pointer the chatbot serves the index shipped at the top of
+the model directory, reported as version "legacy".
+
+Usage:
+    python -m utils.chatbot_index build faq.json [--index-type flat|hnsw|ivfpq] [--no-activate] [--no-reuse]
+    python -m utils.chatbot_index list
+    python -m utils.chatbot_index activate <version>
+
+The corpus is a JSON list of {"question", "answer"} objects or a JSON object
+mapping questions to answers, a CSV file with question and answer columns, or
+a metadata.pkl from an earlier build.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from utils.config import (
+    CHATBOT_INDEX_EMBED_BATCH, CHATBOT_INDEX_FLAT_MAX, CHATBOT_INDEX_HNSW_MAX, CHATBOT_INDEX_KEEP_VERSIONS
+)
+
+LEGACY_VERSION = "legacy"
+POINTER_FILE = "CURRENT"
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+# Graph degree and build/search breadth for HNSW indexes
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Bits per PQ code; faiss wants about 39 training points per centroid
+PQ_BITS = 8
+MIN_POINTS_PER_CENTROID = 39
+
+
+def indexes_dir(model_dir: str) -> str:
+    return os.path.join(model_dir, "indexes")
+
+
+def version_dir(model_dir: str, version: str) -> str:
+    if version == LEGACY_VERSION:
+        return model_dir
+    return os.path.join(indexes_dir(model_dir), version)
+
+
+def current_version(model_dir: str) -> str:
+    """The version named by the CURRENT pointer, or "legacy" when nothing has been activated."""
+    try:
+        with open(os.path.join(indexes_dir(model_dir), POINTER_FILE)) as file:
+            return file.read().strip() or LEGACY_VERSION
+    except FileNotFoundError:
+        return LEGACY_VERSION
+
+
+def list_versions(model_dir: str) -> List[str]:
+    """Published versions, oldest first. Version names sort by build time."""
+    root = indexes_dir(model_dir)
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if not name.startswith(".") and os.path.isdir(os.path.join(root, name))
+    )
+
+
+def read_faiss_index(path: str):
+    """Read an index memory-mapped where faiss supports it for the index type, else into memory."""
+    import faiss
+
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+class ChatbotIndex:
+    """One version of the FAQ index with its questions and answers."""
+
+    def __init__(self, index, questions: List[str], answers: Dict[str, str], version: str):
+        import faiss
+
+        self.index = index
+        self.questions = questions
+        self.answers = answers
+        self.version = version
+        # Embeddings are normalised; for L2 indexes, cosine similarity is 1 - d/2
+        self.l2 = index.metric_type == faiss.METRIC_L2
+
+    @classmethod
+    def load(cls, model_dir: str, version: Optional[str] = None) -> "ChatbotIndex":
+        version = version or current_version(model_dir)
+        directory = version_dir(model_dir, version)
+        index = read_faiss_index(os.path.join(directory, "faiss_index"))
+        with open(os.path.join(directory, "metadata.pkl"), "rb") as file:
+            metadata = pickle.load(file)
+        return cls(index, metadata["questions"], metadata["answers"], version)
+
+    def search(self, embeddings, k: int) -> List[List[Tuple[float, str, str]]]:
+        """(cosine similarity, question, answer) per embedding, best first."""
+        distances, ids = self.index.search(embeddings, min(k, self.index.ntotal))
+        results = []
+        for row_distances, row_ids in zip(distances, ids):
+            hits = []
+            for distance, question_id in zip(row_distances, row_ids):
+                if question_id < 0:
+                    continue
+                question = self.questions[question_id]
+                score = float(1 - distance / 2 if self.l2 else distance)
+                hits.append((score, question, self.answers[question]))
+            results.append(hits)
+        return results
+
+
+def load_corpus(path: str) -> List[Tuple[str, str]]:
+    """
+    (question, answer) pairs from a corpus file. Blank entries are skipped and
+    questions differing only in whitespace are merged, the last answer winning.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path, encoding="utf-8") as file:
+            data = json.load(file)
+        pairs = data.items() if isinstance(data, dict) else [(item["question"], item["answer"]) for item in data]
+    elif extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            pairs = [(row["question"], row["answer"]) for row in csv.DictReader(file)]
+    elif extension == ".pkl":
+        with open(path, "rb") as file:
+            metadata = pickle.load(file)
+        pairs = [(question, metadata["answers"][question]) for question in metadata["questions"]]
+    else:
+        raise ValueError(f"Unsupported corpus file type: {extension or path}")
+
+    corpus: Dict[str, str] = {}
+    for question, answer in pairs:
+        question = " ".join(str(question or "").split())
+        answer = str(answer or "").strip()
+        if question and answer:
+            corpus[question] = answer
+    return list(corpus.items())
+
+
+def corpus_digest(corpus: List[Tuple[str, str]]) -> str:
+    digest = hashlib.sha1()
+    for question, answer in corpus:
+        digest.update(question.encode("utf-8") + b"\x1f" + answer.encode("utf-8") + b"\x1e")
+    return digest.hexdigest()
+
+
+def previous_embeddings(model_dir: str, dimension: int) -> Dict[str, np.ndarray]:
+    """Embeddings of the current version by question, when it was built by this tool at this dimension."""
+    version = current_version(model_dir)
+    directory = version_dir(model_dir, version)
+    try:
+        with open(os.path.join(directory, "manifest.json")) as file:
+            manifest = json.load(file)
+        if manifest["dimension"] != dimension:
+            return {}
+        with open(os.path.join(directory, "metadata.pkl"), "rb") as file:
+            questions = pickle.load(file)["questions"]
+        embeddings = np.load(os.path.join(directory, "embeddings.npy"), mmap_mode="r")
+    except (FileNotFoundError, KeyError):
+        return {}
+    return dict(zip(questions, embeddings))
+
+
+def embed_questions(model, questions: List[str], batch_size: int, reuse: Dict[str, np.ndarray]) -> np.ndarray:
+    """Embeddings for all questions, encoding only those not in reuse, batch_size at a time."""
+    embeddings = np.zeros((len(questions), model.dimension), dtype="float32")
+    missing = []
+    for position, question in enumerate(questions):
+        if question in reuse:
+            embeddings[position] = reuse[question]
+        else:
+            missing.append(position)
+    print(f"Reusing {len(questions) - len(missing)} embeddings, encoding {len(missing)} questions")
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        embeddings[batch] = model.encode([questions[position] for position in batch], batch_size)
+        print(f"Encoded {min(start + batch_size, len(missing))}/{len(missing)}")
+    return embeddings
+
+
+def choose_index_type(count: int) -> str:
+    if count <= CHATBOT_INDEX_FLAT_MAX:
+        return "flat"
+    if count <= CHATBOT_INDEX_HNSW_MAX:
+        return "hnsw"
+    return "ivfpq"
+
+
+def build_faiss_index(embeddings: np.ndarray, index_type: str):
+    """
+    An inner-product index over normalised embeddings, so scores are cosine
+    similarities. Flat is exact; HNSW trades memory for sub-linear search;
+    IVF-PQ compresses each vector to one byte per sub-quantiser for corpora
+    too large to hold uncompressed. Returns the index and its parameters.
+    """
+    import faiss
+
+    count, dimension = embeddings.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dimension)
+        params = {}
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        params = {"m": HNSW_M, "ef_construction": HNSW_EF_CONSTRUCTION, "ef_search": HNSW_EF_SEARCH}
+    elif index_type == "ivfpq":
+        if count < MIN_POINTS_PER_CENTROID * 2 ** PQ_BITS:
+            raise ValueError(f"IVF-PQ needs at least {MIN_POINTS_PER_CENTROID * 2 ** PQ_BITS} questions to train")
+        # About 4 * sqrt(n) lists, rounded to a power of two, each with enough points to train
+        nlist = 2 ** round(math.log2(4 * math.sqrt(count)))
+        nlist = min(nlist, count // MIN_POINTS_PER_CENTROID)
+        # Sub-quantisers of about 8 dimensions each; the count must divide the dimension
+        subquantizers = next(m for m in range(min(dimension // 8, 64) or 1, 0, -1) if dimension % m == 0)
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, subquantizers, PQ_BITS, faiss.METRIC_INNER_PRODUCT)
+        sample_size = min(count, max(nlist * 64, 2 ** 16))
+        sample = embeddings[np.random.default_rng(0).choice(count, sample_size, replace=False)]
+        index.train(sample)
+        index.nprobe = max(1, nlist // 16)
+        params = {"nlist": nlist, "subquantizers": subquantizers, "bits": PQ_BITS, "nprobe": index.nprobe}
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+    index.add(embeddings)
+    return index, params
+
+
+def write_version(model_dir: str, corpus: List[Tuple[str, str]], embeddings: np.ndarray, index, manifest: dict) -> str:
+    """
+    Write a build to a staging directory and rename it into place, so a
+    version directory either holds a complete build or doesn't exist.
+    """
+    import faiss
+
+    root = indexes_dir(model_dir)
+    os.makedirs(root, exist_ok=True)
+    # The manifest includes the build time, so rebuilding the same corpus gets a new version
+    build_digest = hashlib.sha1(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+    version = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{build_digest[:8]}"
+    staging = tempfile.mkdtemp(prefix=".building-", dir=root)
+    try:
+        faiss.write_index(index, os.path.join(staging, "faiss_index"))
+        with open(os.path.join(staging, "metadata.pkl"), "wb") as file:
+            pickle.dump({"questions": [question for question, _ in corpus], "answers": dict(corpus)}, file)
+        np.save(os.path.join(staging, "embeddings.npy"), embeddings)
+        with open(os.path.join(staging, "manifest.json"), "w") as file:
+            json.dump({"version": version, **manifest}, file, indent=2)
+        os.chmod(staging, 0o755)
+        os.rename(staging, os.path.join(root, version))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return version
+
+
+def activate(model_dir: str, version: str):
+    """Point CURRENT at a version. Workers pick it up on their next check."""
+    if version != LEGACY_VERSION and version not in list_versions(model_dir):
+        raise ValueError(f"Unknown chatbot index version: {version}")
+    root = indexes_dir(model_dir)
+    os.makedirs(root, exist_ok=True)
+    descriptor, staging = tempfile.mkstemp(prefix=".current-", dir=root)
+    try:
+        with os.fdopen(descriptor, "w") as file:
+            file.write(version + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(staging, 0o644)
+        os.replace(staging, os.path.join(root, POINTER_FILE))
+    except Exception:
+        if os.path.exists(staging):
+            os.remove(staging)
+        raise
+
+
+def prune(model_dir: str, keep: int = CHATBOT_INDEX_KEEP_VERSIONS):
+    """Delete all but the newest keep versions, never the active one."""
+    active = current_version(model_dir)
+    versions = list_versions(model_dir)
+    for version in versions[:max(len(versions) - keep, 0)]:
+        if version != active:
+            shutil.rmtree(version_dir(model_dir, version), ignore_errors=True)
+            print(f"Removed chatbot index {version}")
+
+
+def build(
+    corpus_path: str, model_dir: str, index_type: Optional[str] = None, make_active: bool = True,
+    reuse: bool = True, batch_size: int = CHATBOT_INDEX_EMBED_BATCH
+) -> str:
+    """Embed a corpus, build and publish an index version for it, and optionally activate it."""
+    from utils.chatbot import ChatbotModel
+
+    corpus = load_corpus(corpus_path)
+    if not corpus:
+        raise ValueError(f"No questions found in {corpus_path}")
+    model = ChatbotModel(model_dir)
+    questions = [question for question, _ in corpus]
+    embeddings = embed_questions(
+        model, questions, batch_size, previous_embeddings(model_dir, model.dimension) if reuse else {}
+    )
+
+    index_type = index_type or choose_index_type(len(corpus))
+    print(f"Building {index_type} index over {len(corpus)} questions")
+    index, params = build_faiss_index(embeddings, index_type)
+    version = write_version(model_dir, corpus, embeddings, index, {
+        "created_at": datetime.utcnow().isoformat(),
+        "count": len(corpus),
+        "dimension": model.dimension,
+        "index_type": index_type,
+        "params": params,
+        "corpus_sha1": corpus_digest(corpus),
+    })
+    print(f"Wrote chatbot index {version}")
+    if make_active:
+        activate(model_dir, version)
+        print(f"Activated chatbot index {version}")
+        prune(model_dir)
+    return version
+
+
+def main(argv: Optional[List[str]] = None):
+    from utils.chatbot import CHATBOT_MODEL_DIR
+
+    parser = argparse.ArgumentParser(prog="python -m utils.chatbot_index", description="Build and manage chatbot FAQ indexes")
+    parser.add_argument("--model-dir", default=CHATBOT_MODEL_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Embed a question/answer corpus and publish a new index version")
+    build_parser.add_argument("corpus", help="JSON, CSV or metadata.pkl file of questions and answers")
+    build_parser.add_argument("--index-type", choices=INDEX_TYPES, help="Default: chosen by corpus size")
+    build_parser.add_argument("--batch-size", type=int, default=CHATBOT_INDEX_EMBED_BATCH)
+    build_parser.add_argument("--no-activate", action="store_true", help="Publish without switching workers to it")
+    build_parser.add_argument("--no-reuse", action="store_true", help="Re-encode every question")
+
+    commands.add_parser("list", help="List published index versions")
+
+    activate_parser = commands.add_parser("activate", help="Switch workers to a published version")
+    activate_parser.add_argument("version", help=f"A version from `list`, or {LEGACY_VERSION}")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        build(
+            args.corpus, args.model_dir, args.index_type, make_active=not args.no_activate,
+            reuse=not args.no_reuse, batch_size=args.batch_size
+        )
+    elif args.command == "list":
+        active = current_version(args.model_dir)
+        for version in [LEGACY_VERSION] + list_versions(args.model_dir):
+            print(f"{'*' if version == active else ' '} {version}")
+    elif args.command == "activate":
+        activate(args.model_dir, args.version)
+        print(f"Activated chatbot index {args.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,3 +16,55 @@ OTP_TEMPLATE_ID = str(config('OTP_TEMPLATE_ID'))
 APPOINTMENT_TEMPLATE_ID = str(config('APPOINTMENT_TEMPLATE_ID'))
 MSG91_AUTH_KEY = str(config('MSG91_AUTH_KEY'))
 
+IMPORT_MAX_WORKERS = int(config('IMPORT_MAX_WORKERS', default=3))
+IMPORT_WORKER_CONCURRENCY = int(config('IMPORT_WORKER_CONCURRENCY', default=2))
+IMPORT_WORKER_METRICS_PORT = int(config('IMPORT_WORKER_METRICS_PORT', default=9101))
+IMPORT_CHUNK_ROWS = int(config('IMPORT_CHUNK_ROWS', default=5000))
+IMPORT_CHUNK_RETRIES = int(config('IMPORT_CHUNK_RETRIES', default=2))
+IMPORT_JOB_MAX_ATTEMPTS = int(config('IMPORT_JOB_MAX_ATTEMPTS', default=3))
+IMPORT_PROGRESS_HEARTBEAT_SECONDS = int(config('IMPORT_PROGRESS_HEARTBEAT_SECONDS', default=15))
+IMPORT_DRY_RUN_ROWS_PER_SECOND = float(config('IMPORT_DRY_RUN_ROWS_PER_SECOND', default=500))
+IMPORT_MAX_UPLOAD_BYTES = int(config('IMPORT_MAX_UPLOAD_BYTES', default=500 * 1024 * 1024))
+REMINDER_POLL_SECONDS = int(config('REMINDER_POLL_SECONDS', default=5))
+REMINDER_LEADER_TTL_SECONDS = int(config('REMINDER_LEADER_TTL_SECONDS', default=30))
+REMINDER_BATCH_SIZE = int(config('REMINDER_BATCH_SIZE', default=200))
+REMINDER_LEASE_SECONDS = int(config('REMINDER_LEASE_SECONDS', default=300))
+REMINDER_RETRY_SECONDS = int(config('REMINDER_RETRY_SECONDS', default=60))
+REMINDER_MAX_ATTEMPTS = int(config('REMINDER_MAX_ATTEMPTS', default=5))
+SMTP_TIMEOUT_SECONDS = float(config('SMTP_TIMEOUT_SECONDS', default=30))
+NOTIFY_QUEUE_SIZE = int(config('NOTIFY_QUEUE_SIZE', default=1000))
+NOTIFY_WORKERS = int(config('NOTIFY_WORKERS', default=4))
+NOTIFY_MAX_ATTEMPTS = int(config('NOTIFY_MAX_ATTEMPTS', default=3))
+NOTIFY_HTTP_TIMEOUT_SECONDS = float(config('NOTIFY_HTTP_TIMEOUT_SECONDS', default=10))
+NOTIFY_SMS_BATCH_WINDOW_SECONDS = float(config('NOTIFY_SMS_BATCH_WINDOW_SECONDS', default=0.5))
+NOTIFY_SMS_BATCH_SIZE = int(config('NOTIFY_SMS_BATCH_SIZE', default=100))
+CACHE_COMPRESS_MIN_BYTES = int(config('CACHE_COMPRESS_MIN_BYTES', default=4096))
+CACHE_COMPRESS_LEVEL = int(config('CACHE_COMPRESS_LEVEL', default=3))
+ENTITY_LOCAL_CACHE_SIZE = int(config('ENTITY_LOCAL_CACHE_SIZE', default=4096))
+ENTITY_LOCAL_CACHE_TTL_SECONDS = float(config('ENTITY_LOCAL_CACHE_TTL_SECONDS', default=30))
+APPOINTMENT_MAX_DURATION_MINUTES = int(config('APPOINTMENT_MAX_DURATION_MINUTES', default=480))
+AVAILABILITY_DAY_START = str(config('AVAILABILITY_DAY_START', default="09:00"))
+AVAILABILITY_DAY_END = str(config('AVAILABILITY_DAY_END', default="18:00"))
+AVAILABILITY_CACHE_SECONDS = int(config('AVAILABILITY_CACHE_SECONDS', default=300))
+SUGGESTION_INDEX_CHECK_SECONDS = float(config('SUGGESTION_INDEX_CHECK_SECONDS', default=2))
+SUGGESTION_USAGE_REFRESH_SECONDS = float(config('SUGGESTION_USAGE_REFRESH_SECONDS', default=300))
+PATIENT_INDEX_CHECK_SECONDS = float(config('PATIENT_INDEX_CHECK_SECONDS', default=2))
+PATIENT_INDEX_MAX_DOCTORS = int(config('PATIENT_INDEX_MAX_DOCTORS', default=64))
+PATIENT_TYPEAHEAD_MAX_CANDIDATES = int(config('PATIENT_TYPEAHEAD_MAX_CANDIDATES', default=2000))
+PATIENT_SEARCH_MAX_IN_IDS = int(config('PATIENT_SEARCH_MAX_IN_IDS', default=1000))
+DEFAULT_PHONE_COUNTRY_CODE = str(config('DEFAULT_PHONE_COUNTRY_CODE', default="91"))
+CHATBOT_WARMUP_ON_STARTUP = config('CHATBOT_WARMUP_ON_STARTUP', default=False, cast=bool)
+CHATBOT_BATCH_WINDOW_SECONDS = float(config('CHATBOT_BATCH_WINDOW_SECONDS', default=0.01))
+CHATBOT_MAX_BATCH = int(config('CHATBOT_MAX_BATCH', default=32))
+CHATBOT_MAX_PENDING = int(config('CHATBOT_MAX_PENDING', default=512))
+CHATBOT_CACHE_SIZE = int(config('CHATBOT_CACHE_SIZE', default=2048))
+CHATBOT_MIN_SCORE = float(config('CHATBOT_MIN_SCORE', default=0.5))
+CHATBOT_INDEX_CHECK_SECONDS = float(config('CHATBOT_INDEX_CHECK_SECONDS', default=5))
+CHATBOT_INDEX_EMBED_BATCH = int(config('CHATBOT_INDEX_EMBED_BATCH', default=256))
+CHATBOT_INDEX_FLAT_MAX = int(config('CHATBOT_INDEX_FLAT_MAX', default=20000))
+CHATBOT_INDEX_HNSW_MAX = int(config('CHATBOT_INDEX_HNSW_MAX', default=500000))
+CHATBOT_INDEX_KEEP_VERSIONS = int(config('CHATBOT_INDEX_KEEP_VERSIONS', default=3))
+SUGGESTION_SEMANTIC_MIN_CHARS = int(config('SUGGESTION_SEMANTIC_MIN_CHARS', default=4))
+SUGGESTION_SEMANTIC_MIN_SCORE = float(config('SUGGESTION_SEMANTIC_MIN_SCORE', default=0.6))
+SUGGESTION_SEMANTIC_CACHE_SIZE = int(config('SUGGESTION_SEMANTIC_CACHE_SIZE', default=1024))
+SUGGESTION_EMBED_BATCH = int(config('SUGGESTION_EMBED_BATCH', default=256))
@@ -10,63 +10,38 @@ EMAIL_HOST = str(config('EMAIL_HOST'))
 EMAIL_PORT = int(config('EMAIL_PORT'))
 EMAIL_SEND_URL = str(config('EMAIL_SEND_URL'))
 
+# Shared session so repeated sends reuse the keep-alive connection to the email service
+_session = requests.Session()
+
+def build_email_request(receiver_emails: Union[str, List[str]], subject: str, body: str,
+                        attachments: Optional[List[Union[str, Path]]] = None) -> dict:
+    """
+    Build the keyword arguments for a POST to EMAIL_SEND_URL. Plain messages are
+    sent as JSON; messages with attachments as multipart/form-data.
+    """
+    # Convert single email to list if needed
+    if isinstance(receiver_emails, str):
+        receiver_emails = [receiver_emails]
+
+    if not attachments:
+        return {"json": {"to": receiver_emails, "subject": subject, "body": body}}
+
+    form_data = {f"to[{i}]": email for i, email in enumerate(receiver_emails)}
+    form_data["subject"] = subject
+    form_data["body"] = body
+    files = [
+        ('attachments', (Path(str(attachment)).name, Path(str(attachment)).read_bytes(), 'application/octet-stream'))
+        for attachment in attachments
+    ]
+    return {"data": form_data, "files": files}
+
 def send_email(receiver_emails: Union[str, List[str]], 
               subject: str, body: str, attachments: Optional[List[Union[str, Path]]] = None) -> bool:
     try:
-        # Convert single email to list if needed
         if isinstance(receiver_emails, str):
             receiver_emails = [receiver_emails]
-        
-        # Prepare request data
-        data = {
-            "to": receiver_emails,  # Now properly handling multiple emails
-            "subject": subject,
-            "body": body
-        }
-        
-        # Prepare files if attachments exist
-        files = []
-        if attachments:
-            for attachment in attachments:
-                attachment_path = str(attachment)
-                filename = Path(attachment_path).name
-                files.append(
-                    ('attachments', (filename, open(attachment_path, 'rb'), 'application/octet-stream'))
-                )
-        
-        # Send request to email service
-        headers = {}
-        if not files:
-            # If no attachments, use JSON content type
-            headers = {"Content-Type": "application/json"}
-            response = requests.post(
-                EMAIL_SEND_URL,
-                json=data,
-                headers=headers
-            )
-        else:
-            # If attachments exist, use multipart/form-data
-            # Convert list of emails to comma-separated string for form data
-            form_data = {}
-            if isinstance(data["to"], list):
-                for i, email in enumerate(data["to"]):
-                    form_data[f"to[{i}]"] = email
-            else:
-                form_data["to"] = data["to"]
-                
-            form_data["subject"] = data["subject"]
-            form_data["body"] = data["body"]
-            
-            response = requests.post(
-                EMAIL_SEND_URL,
-                data=form_data,
-                files=files
-            )
-        
-        # Close file handles
-        if files:
-            for _, file_tuple in files:
-                file_tuple[1].close()
+
+        response = _session.post(EMAIL_SEND_URL, timeout=30, **build_email_request(receiver_emails, subject, body, attachments))
         
         # Check response
         if response.status_code == 200:
@@ -85,34 +60,6 @@ def send_email(receiver_emails: Union[str, List[str]],
         print(f"Failed to send email: {e}")
         return False
 
-# Use the configured email credentials
-sender_email = EMAIL_SENDER
-sender_password = EMAIL_PASSWORD
-
-def send_forgot_password_email(receiver_email: str, link: str) -> bool:
-    try:    
-        subject = "Password Reset Request for Your Account"
-        body = f"""
-Dear User,
-
-We received a request to reset the password for your account. If you didn't make this request, please ignore this email.
-
-To reset your password, please click on the following link or copy and paste it into your browser:
-
-{link}
-
-This link will expire in 3 hours for security reasons.
-
-If you have any issues or need assistance, please don't hesitate to contact our support team.
-
-Best regards,
-Backup Doc
-"""
-        return send_email(receiver_email, subject, body)
-    except Exception as e:
-        print(f"Failed to send forgot password email: {e}")
-        return False
-
 def contact_us_email(first_name: str, last_name: str, email: str, topic: str, 
                     company_name: str, company_size: str, query: str) -> bool:
     try:
@@ -0,0 +1,326 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Any
+from prometheus_client import Counter
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from db.db import SessionLocal
+from auth.models import User, Clinic
+from patient.models import Patient
+from redis_client import get_redis_cache_client, get_redis_pubsub_client, get_sync_redis_client
+from utils.cache_codec import encode, decode, CacheDecodeError
+from utils.cache import guarded, submit_after_commit
+from utils.config import ENTITY_LOCAL_CACHE_SIZE, ENTITY_LOCAL_CACHE_TTL_SECONDS
+
+ENTITY_TTL_SECONDS = 1800
+
+# Bump the version when a summary's shape changes so old entries are never read
+ENTITY_KEY_PREFIX = "entity:v2"
+
+# Every worker evicts the keys published here from its in-process tier
+ENTITY_INVALIDATION_CHANNEL = "entity_cache:invalidate"
+
+# Invalidation counters outlive the entries they guard, so a lookup that started
+# before an invalidation always sees the counter move
+ENTITY_GENERATION_TTL_SECONDS = ENTITY_TTL_SECONDS * 2
+
+# Write a summary back only if its key wasn't invalidated since the lookup read
+# the generation. KEYS: entry keys, then their generation keys. ARGV: the TTL,
+# then the generation read and the encoded summary for each entry.
+WRITE_BACK_SCRIPT = """
+local count = #KEYS / 2
+for i = 1, count do
+    if (redis.call('GET', KEYS[count + i]) or '0') == ARGV[2 * i] then
+        redis.call('SETEX', KEYS[i], ARGV[1], ARGV[2 * i + 1])
+    end
+end
+"""
+
+ENTITY_CACHE_LOOKUPS = Counter(
+    "entity_cache_lookups", "Entity summary lookups per cache tier", ["tier", "outcome"]
+)
+
+
+class LocalTTLCache:
+    """
+    Small per-process LRU whose entries also expire after a fixed TTL. The TTL
+    bounds how stale an entry can get if an invalidation message is missed.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Session events can fire from threadpool workers as well as the event loop
+        self._lock = threading.Lock()
+        # Every eviction gets the next sequence number, remembered for the most
+        # recently evicted keys; anything older counts as evicted at _forgotten
+        self._sequence = 0
+        self._evicted: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0
+
+    def sequence(self) -> int:
+        """Current eviction sequence number, to pass to set() for values read after this point."""
+        with self._lock:
+            return self._sequence
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(value)
+
+    def set(self, key: str, value: Dict[str, Any], since: Optional[int] = None):
+        """Store a value, unless the key was evicted after sequence number since."""
+        with self._lock:
+            if since is not None and max(self._forgotten, self._evicted.get(key, 0)) > since:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict(self, keys: Iterable[str]):
+        with self._lock:
+            self._sequence += 1
+            for key in keys:
+                self._entries.pop(key, None)
+                self._evicted[key] = self._sequence
+                self._evicted.move_to_end(key)
+            while len(self._evicted) > self.maxsize:
+                _, sequence = self._evicted.popitem(last=False)
+                self._forgotten = max(self._forgotten, sequence)
+
+    def clear(self):
+        with self._lock:
+            self._sequence += 1
+            self._entries.clear()
+            self._evicted.clear()
+            self._forgotten = self._sequence
+
+
+local_cache = LocalTTLCache(ENTITY_LOCAL_CACHE_SIZE, ENTITY_LOCAL_CACHE_TTL_SECONDS)
+
+
+def _user_summary(user: User) -> Dict[str, Any]:
+    return {
+        "id": str(user.id),
+        "name": user.name,
+        "email": user.email,
+        "phone": user.phone,
+        "user_type": str(user.user_type),
+        "default_clinic_id": str(user.default_clinic_id) if user.default_clinic_id else None,
+        "color_code": user.color_code
+    }
+
+
+def _patient_summary(patient: Patient) -> Dict[str, Any]:
+    return {
+        "id": str(patient.id),
+        "name": patient.name,
+        "email": patient.email,
+        "mobile_number": patient.mobile_number,
+        "patient_number": patient.patient_number,
+        "date_of_birth": patient.date_of_birth.isoformat() if patient.date_of_birth else None,
+        "gender": patient.gender.value if hasattr(patient.gender, 'value') else str(patient.gender)
+    }
+
+
+def _clinic_summary(clinic: Clinic) -> Dict[str, Any]:
+    return {
+        "id": str(clinic.id),
+        "name": clinic.name
+    }
+
+
+# Entity kind -> (model, summary builder)
+ENTITIES = {
+    "user": (User, _user_summary),
+    "patient": (Patient, _patient_summary),
+    "clinic": (Clinic, _clinic_summary),
+}
+
+
+def entity_key(kind: str, entity_id: str) -> str:
+    return f"{ENTITY_KEY_PREFIX}:{kind}:{entity_id}"
+
+
+def generation_key(key: str) -> str:
+    """Counter bumped whenever the entity under key is invalidated."""
+    return f"{key}:gen"
+
+
+async def get_entities(cache_client, db, wanted: Dict[str, Iterable[Optional[str]]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Fetch cached summaries for several kinds of entity at once. Lookups go to the
+    in-process tier first, then one MGET to Redis for whatever it didn't have,
+    then one IN query per kind for the remaining misses, which are written back
+    to both tiers. Ids that don't exist are left out of the result. While Redis
+    is unavailable the Redis tier is skipped.
+
+    A summary is only written back if its entity wasn't invalidated since the
+    lookup started, so a row read just before a commit can't overwrite the
+    invalidation that commit triggers.
+
+    Example:
+        found = await get_entities(cache_client, db, {"user": [doctor_id], "patient": patient_ids})
+        found["patient"].get(patient_id)
+    """
+    ids = {kind: list(dict.fromkeys(i for i in entity_ids if i)) for kind, entity_ids in wanted.items()}
+    found = {kind: {} for kind in ids}
+    since = local_cache.sequence()
+
+    remote = []
+    for kind, entity_ids in ids.items():
+        for entity_id in entity_ids:
+            summary = local_cache.get(entity_key(kind, entity_id))
+            if summary:
+                found[kind][entity_id] = summary
+            else:
+                remote.append((kind, entity_id))
+    local_hits = sum(len(summaries) for summaries in found.values())
+    if local_hits:
+        ENTITY_CACHE_LOOKUPS.labels("local", "hit").inc(local_hits)
+    if not remote:
+        return found
+    ENTITY_CACHE_LOOKUPS.labels("local", "miss").inc(len(remote))
+
+    remote_keys = [entity_key(kind, entity_id) for kind, entity_id in remote]
+    # Generations are read with the entries, before the database is
+    cached = await guarded(
+        lambda: cache_client.mget(remote_keys + [generation_key(key) for key in remote_keys]),
+        [None] * (2 * len(remote_keys))
+    )
+    generations = dict(zip(remote_keys, cached[len(remote_keys):]))
+    missing = {}
+    for (kind, entity_id), value in zip(remote, cached):
+        try:
+            summary = decode(value)
+        except CacheDecodeError:
+            summary = None
+        if summary:
+            found[kind][entity_id] = summary
+            local_cache.set(entity_key(kind, entity_id), summary, since)
+        else:
+            missing.setdefault(kind, []).append(entity_id)
+
+    missed = sum(len(entity_ids) for entity_ids in missing.values())
+    if len(remote) > missed:
+        ENTITY_CACHE_LOOKUPS.labels("redis", "hit").inc(len(remote) - missed)
+    if missing:
+        ENTITY_CACHE_LOOKUPS.labels("redis", "miss").inc(missed)
+        loaded = {}
+        for kind, entity_ids in missing.items():
+            model, summarize = ENTITIES[kind]
+            for entity in db.query(model).filter(model.id.in_(entity_ids)).all():
+                summary = summarize(entity)
+                found[kind][summary["id"]] = summary
+                local_cache.set(entity_key(kind, summary["id"]), summary, since)
+                loaded[entity_key(kind, summary["id"])] = summary
+        if loaded:
+            keys = list(loaded)
+            args = [ENTITY_TTL_SECONDS]
+            for key in keys:
+                args += [generations.get(key) or 0, encode(loaded[key])]
+            await guarded(lambda: cache_client.eval(
+                WRITE_BACK_SCRIPT, 2 * len(keys), *keys, *[generation_key(key) for key in keys], *args
+            ))
+
+    return found
+
+
+async def get_entity(cache_client, db, kind: str, entity_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Single-entity form of get_entities."""
+    if not entity_id:
+        return None
+    return (await get_entities(cache_client, db, {kind: [entity_id]}))[kind].get(entity_id)
+
+
+async def get_authenticated_user(db, user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Summary of the user a verified token was issued to, or None when that user
+    no longer exists. Routes re-validate the caller with this on every request,
+    so it is usually answered by the in-process tier.
+    """
+    return await get_entity(await get_redis_cache_client(), db, "user", user_id)
+
+
+def invalidate_entities(keys: List[str]):
+    """
+    Drop entity keys from this worker's local tier, then, in the background,
+    from Redis, telling every other worker to drop its local copy.
+    """
+    local_cache.evict(keys)
+
+    def evict_everywhere():
+        pipe = get_sync_redis_client().pipeline(transaction=False)
+        # Bumped before the delete, so a write-back that runs in between is refused
+        for key in keys:
+            pipe.incr(generation_key(key))
+            pipe.expire(generation_key(key), ENTITY_GENERATION_TTL_SECONDS)
+        pipe.delete(*keys)
+        pipe.publish(ENTITY_INVALIDATION_CHANNEL, json.dumps(keys))
+        pipe.execute()
+
+    submit_after_commit(evict_everywhere, "evicting cached entities")
+
+
+async def listen_for_entity_invalidations():
+    """
+    Evict entities changed by other workers from this worker's local tier. Runs
+    for the life of the process; after losing the subscription it clears the
+    local tier, since messages may have been missed, and subscribes again.
+    """
+    while True:
+        try:
+            pubsub = (await get_redis_pubsub_client()).pubsub()
+            await pubsub.subscribe(ENTITY_INVALIDATION_CHANNEL)
+            try:
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message:
+                        local_cache.evict(json.loads(message["data"]))
+            finally:
+                await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except (RedisError, OSError, ValueError) as e:
+            print(f"Entity invalidation subscription lost: {str(e)}")
+            local_cache.clear()
+            await asyncio.sleep(1)
+
+
+# Drop cached summaries for users, patients and clinics changed through any
+# session once the change commits, so every router sees fresh data.
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_stale_entities(session, flush_context):
+    stale = session.info.setdefault("stale_entity_keys", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        for kind, (model, _) in ENTITIES.items():
+            if isinstance(obj, model) and obj.id:
+                stale.add(entity_key(kind, obj.id))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _evict_stale_entities(session):
+    stale = session.info.pop("stale_entity_keys", None)
+    if not stale:
+        return
+    try:
+        invalidate_entities(list(stale))
+    except Exception as e:
+        print(f"Error evicting cached entities: {e}")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_stale_entities(session):
+    session.info.pop("stale_entity_keys", None)
@@ -0,0 +1,157 @@
+import math
+import os
+import zipfile
+import pandas as pd
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, IO
+from fastapi import UploadFile
+
+# Size of each read when copying an upload to disk
+UPLOAD_READ_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size cap."""
+    pass
+
+
+async def save_upload(file: UploadFile, destination: str, max_bytes: int) -> int:
+    """
+    Copy an upload to disk in fixed-size reads so it is never held in memory
+    as a whole. The partial file is removed if it grows past max_bytes.
+
+    Returns:
+        int: Number of bytes written
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge()
+
+    written = 0
+    try:
+        with open(destination, "wb") as out:
+            while chunk := await file.read(UPLOAD_READ_BYTES):
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge()
+                out.write(chunk)
+    except UploadTooLarge:
+        os.remove(destination)
+        raise
+    return written
+
+
+def is_importable_member(info: zipfile.ZipInfo) -> bool:
+    """Only CSV files at the root of an archive are imported."""
+    return not info.is_dir() and "/" not in info.filename and info.filename.endswith(".csv")
+
+
+def list_import_csvs(file_path: str) -> List[str]:
+    """CSV names available in an uploaded CSV or ZIP, without extracting anything."""
+    if file_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(file_path) as archive:
+            return [info.filename for info in archive.infolist() if is_importable_member(info)]
+    return [os.path.basename(file_path)]
+
+
+@contextmanager
+def open_import_csv(file_path: str, name: str) -> Iterator[IO[bytes]]:
+    """Open one CSV of an upload, streaming it straight out of the ZIP when needed."""
+    if file_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(file_path) as archive, archive.open(name) as handle:
+            yield handle
+    else:
+        with open(file_path, "rb") as handle:
+            yield handle
+
+
+def read_csv_chunks(handle: IO[bytes], chunk_rows: int, **kwargs):
+    # Everything is read as text: per-chunk type inference would otherwise turn
+    # values like patient number "00123" into 123 in some chunks but not others
+    return pd.read_csv(handle, chunksize=chunk_rows, dtype=str, keep_default_na=False, **kwargs)
+
+
+def csv_text(value) -> Optional[str]:
+    """A CSV cell as text without surrounding whitespace or quotes, or None when blank."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    text = str(value).strip().strip("'").strip('"').strip()
+    return text or None
+
+
+def csv_float(value, default: Optional[float] = 0.0) -> Optional[float]:
+    """
+    A CSV cell as a number. Cells are read as text, so blanks, quoted numbers
+    and literal "nan" are handled here rather than by pandas.
+    """
+    text = csv_text(value)
+    if text is None:
+        return default
+    try:
+        number = float(text)
+    except ValueError:
+        return default
+    return number if math.isfinite(number) else default
+
+
+def csv_int(value, default: Optional[int] = 0) -> Optional[int]:
+    """A CSV cell as a whole number; "2.0", as spreadsheets often export counts, is 2."""
+    number = csv_float(value, None)
+    return default if number is None else int(number)
+
+
+def count_csv_rows(file_path: str, name: str, chunk_rows: int) -> int:
+    """Count data rows by streaming only the first column."""
+    with open_import_csv(file_path, name) as handle:
+        return sum(len(chunk) for chunk in read_csv_chunks(handle, chunk_rows, usecols=[0]))
+
+
+def _chunk_key_column(columns, chunk_key: Optional[str]) -> Optional[str]:
+    if not chunk_key:
+        return None
+    return next((column for column in columns if str(column).strip() == chunk_key), None)
+
+
+def iter_csv_chunks(file_path: str, name: str, chunk_rows: int, chunk_key: Optional[str] = None,
+                    expected_rows: int = 0, spill_dir: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a CSV from an upload as DataFrames of roughly chunk_rows rows.
+
+    When chunk_key is given, all rows sharing that key are yielded in the same
+    chunk, since processors group on it. Files larger than one chunk are then
+    hash-partitioned by key into spill files under spill_dir, so memory stays
+    bounded even when rows for a key are spread across the file.
+    """
+    partitions = max(1, -(-expected_rows // chunk_rows))
+    with open_import_csv(file_path, name) as handle:
+        reader = read_csv_chunks(handle, chunk_rows)
+        first = next(reader, None)
+        if first is None:
+            return
+
+        key_column = _chunk_key_column(first.columns, chunk_key)
+        if key_column is None or partitions == 1 or spill_dir is None:
+            yield first
+            yield from reader
+            return
+
+        os.makedirs(spill_dir, exist_ok=True)
+        spill_files = [os.path.join(spill_dir, f"{name}.{i}.csv") for i in range(partitions)]
+        _spill(first, key_column, spill_files)
+        for chunk in reader:
+            _spill(chunk, key_column, spill_files)
+
+    for spill_file in spill_files:
+        if not os.path.exists(spill_file):
+            continue
+        try:
+            yield pd.read_csv(spill_file, dtype=str, keep_default_na=False)
+        finally:
+            os.remove(spill_file)
+
+
+def _spill(chunk: pd.DataFrame, key_column: str, spill_files: List[str]):
+    keys = chunk[key_column].astype(str).str.strip().str.strip("'").str.strip('"')
+    buckets = pd.util.hash_pandas_object(keys, index=False).to_numpy() % len(spill_files)
+    for bucket, rows in chunk.groupby(buckets):
+        spill_file = spill_files[bucket]
+        rows.to_csv(spill_file, mode="a", header=not os.path.exists(spill_file), index=False)
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+from typing import Dict, Any
+from sqlalchemy import event, inspect
+from db.db import SessionLocal
+from auth.models import ImportLog
+from redis_client import get_sync_redis_client
+from utils.cache import submit_after_commit
+
+IMPORT_LOG_FIELDS = [
+    "id", "file_name", "status", "progress", "current_stage", "current_file",
+    "files_processed", "total_files", "error_message", "stage_timings", "created_at"
+]
+
+
+def import_progress_channel(user_id: str) -> str:
+    return f"import-progress:{user_id}"
+
+
+def _serialize_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "value"):
+        return value.value
+    return value
+
+
+def serialize_import_log(log: ImportLog) -> Dict[str, Any]:
+    """Client representation of an import log, shared by the REST and WebSocket endpoints."""
+    return {field: _serialize_value(getattr(log, field)) for field in IMPORT_LOG_FIELDS}
+
+
+def publish_import_progress(user_id: str, import_log_id: str, changes: Dict[str, Any]):
+    """
+    Publish changed import log fields to the user's progress channel, in the
+    background. Publishing is best effort; a Redis outage must never fail or
+    stall an import.
+    """
+    try:
+        message = json.dumps({"id": import_log_id, "changes": {k: _serialize_value(v) for k, v in changes.items()}})
+        submit_after_commit(
+            lambda: get_sync_redis_client().publish(import_progress_channel(user_id), message),
+            "publishing import progress"
+        )
+    except Exception as e:
+        print(f"Error publishing import progress: {e}")
+
+
+def diff_import_log(previous: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields in changes whose value differs from what the client last saw."""
+    return {k: v for k, v in changes.items() if k in IMPORT_LOG_FIELDS and previous.get(k) != v}
+
+
+# Track ImportLog changes per session and publish them once the transaction commits,
+# so every status/stage/timing update reaches subscribers without extra call sites.
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_import_log_changes(session, flush_context):
+    pending = session.info.setdefault("import_log_changes", {})
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, ImportLog):
+            continue
+        state = inspect(obj)
+        if obj in session.new:
+            changes = {field: getattr(obj, field) for field in IMPORT_LOG_FIELDS}
+        else:
+            changes = {
+                field: getattr(obj, field) for field in IMPORT_LOG_FIELDS
+                if state.attrs[field].history.has_changes()
+            }
+        if changes:
+            entry = pending.setdefault(obj.id, {"user_id": obj.user_id, "changes": {}})
+            entry["changes"].update(changes)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_import_log_changes(session):
+    pending = session.info.pop("import_log_changes", None)
+    if not pending:
+        return
+    for import_log_id, entry in pending.items():
+        publish_import_progress(entry["user_id"], import_log_id, entry["changes"])
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_import_log_changes(session):
+    session.info.pop("import_log_changes", None)
@@ -0,0 +1,176 @@
+import json
+import time
+from typing import Optional, Dict, Any
+
+# Redis keys used by the import job queue
+TENANT_RING_KEY = "import:tenants"
+TENANT_ACTIVE_KEY = "import:tenants:active"
+TENANT_QUEUE_PREFIX = "import:queue:"
+INFLIGHT_KEY = "import:inflight"
+CANCEL_PREFIX = "import:cancelled:"
+METRICS_KEY = "import:metrics"
+
+CANCEL_TTL_SECONDS = 86400
+
+# Push the job onto the tenant's own queue and put the tenant on the
+# round-robin ring if it isn't already waiting there.
+ENQUEUE_SCRIPT = """
+redis.call('RPUSH', ARGV[1] .. ARGV[2], ARGV[3])
+if redis.call('SADD', KEYS[2], ARGV[2]) == 1 then
+    redis.call('RPUSH', KEYS[1], ARGV[2])
+end
+return redis.call('LLEN', ARGV[1] .. ARGV[2])
+"""
+
+# Rotate the tenant ring and pop the next job from the first tenant that has one,
+# so a tenant uploading many files cannot starve the others. Tenants whose queue
+# is empty are dropped from the ring. The popped job is recorded as in-flight for
+# the worker so it can be requeued if the worker dies.
+DEQUEUE_SCRIPT = """
+local tenants = redis.call('LLEN', KEYS[1])
+for i = 1, tenants do
+    local tenant = redis.call('RPOPLPUSH', KEYS[1], KEYS[1])
+    if not tenant then
+        return false
+    end
+    local job = redis.call('LPOP', ARGV[1] .. tenant)
+    if job then
+        if redis.call('LLEN', ARGV[1] .. tenant) == 0 then
+            redis.call('LREM', KEYS[1], 0, tenant)
+            redis.call('SREM', KEYS[2], tenant)
+        end
+        redis.call('HSET', KEYS[3], ARGV[2], job)
+        return job
+    end
+    redis.call('LREM', KEYS[1], 0, tenant)
+    redis.call('SREM', KEYS[2], tenant)
+end
+return false
+"""
+
+
+class ImportCancelled(Exception):
+    """Raised inside an import when the user has cancelled it."""
+    pass
+
+
+def build_import_job(import_log_id: str, user_id: str, file_path: str, uuid: str, attempt: int = 1) -> Dict[str, Any]:
+    """Build the payload stored on the queue for one uploaded file."""
+    return {
+        "import_log_id": import_log_id,
+        "user_id": user_id,
+        "file_path": file_path,
+        "uuid": uuid,
+        "attempt": attempt,
+        "enqueued_at": time.time()
+    }
+
+
+async def enqueue_import_job(redis_client, job: Dict[str, Any]) -> int:
+    """
+    Queue an import job for the worker pool.
+
+    Returns:
+        int: Number of jobs now waiting for the same tenant
+    """
+    return await redis_client.eval(
+        ENQUEUE_SCRIPT, 2, TENANT_RING_KEY, TENANT_ACTIVE_KEY,
+        TENANT_QUEUE_PREFIX, job["user_id"], json.dumps(job)
+    )
+
+
+async def cancel_import_job(redis_client, import_log_id: str):
+    """Flag an import as cancelled. Workers skip it or stop at the next chunk."""
+    await redis_client.setex(f"{CANCEL_PREFIX}{import_log_id}", CANCEL_TTL_SECONDS, "1")
+
+
+class ImportJobQueue:
+    """Synchronous view of the import queue used by the worker processes."""
+
+    def __init__(self, redis_client, worker_id: str):
+        self.redis = redis_client
+        self.worker_id = worker_id
+
+    def enqueue(self, job: Dict[str, Any]) -> int:
+        return self.redis.eval(
+            ENQUEUE_SCRIPT, 2, TENANT_RING_KEY, TENANT_ACTIVE_KEY,
+            TENANT_QUEUE_PREFIX, job["user_id"], json.dumps(job)
+        )
+
+    def dequeue(self) -> Optional[Dict[str, Any]]:
+        """Pop the next job in tenant round-robin order, or None when idle."""
+        job = self.redis.eval(
+            DEQUEUE_SCRIPT, 3, TENANT_RING_KEY, TENANT_ACTIVE_KEY, INFLIGHT_KEY,
+            TENANT_QUEUE_PREFIX, self.worker_id
+        )
+        return json.loads(job) if job else None
+
+    def finish(self):
+        """Clear the in-flight record once the current job is done."""
+        self.redis.hdel(INFLIGHT_KEY, self.worker_id)
+
+    def requeue_inflight(self, max_attempts: int) -> Optional[Dict[str, Any]]:
+        """
+        Put back the job a dead worker was running. Jobs that have already used
+        all their attempts are dropped and returned so the caller can fail them.
+        """
+        job = self.redis.hget(INFLIGHT_KEY, self.worker_id)
+        if not job:
+            return None
+        self.redis.hdel(INFLIGHT_KEY, self.worker_id)
+        job = json.loads(job)
+        if job.get("attempt", 1) >= max_attempts:
+            return job
+        job["attempt"] = job.get("attempt", 1) + 1
+        self.enqueue(job)
+        return None
+
+    def record_job(self, status: str, rows: int, duration: float):
+        """Accumulate worker counters read by the metrics collector."""
+        pipe = self.redis.pipeline()
+        pipe.hincrby(METRICS_KEY, f"jobs_{status}_total", 1)
+        pipe.hincrby(METRICS_KEY, "rows_processed_total", rows)
+        pipe.hincrbyfloat(METRICS_KEY, "job_seconds_total", duration)
+        if duration > 0:
+            pipe.hset(METRICS_KEY, "last_rows_per_second", round(rows / duration, 2))
+        pipe.execute()
+
+
+async def observed_rows_per_second(redis_client, default: float) -> float:
+    """Average import throughput recorded by the workers, or default before any import ran."""
+    try:
+        counters = await redis_client.hgetall(METRICS_KEY)
+        rows = float(counters.get("rows_processed_total", 0))
+        seconds = float(counters.get("job_seconds_total", 0))
+        if rows > 0 and seconds > 0:
+            return rows / seconds
+    except Exception as e:
+        print(f"Error reading import metrics: {e}")
+    return default
+
+
+def is_import_cancelled(redis_client, import_log_id: str) -> bool:
+    """Synchronous cancellation check used between import chunks."""
+    try:
+        return bool(redis_client.exists(f"{CANCEL_PREFIX}{import_log_id}"))
+    except Exception as e:
+        print(f"Error checking import cancellation: {e}")
+        return False
+
+
+def record_chunk_retry(redis_client):
+    try:
+        redis_client.hincrby(METRICS_KEY, "chunks_retried_total", 1)
+    except Exception as e:
+        print(f"Error recording chunk retry: {e}")
+
+
+def queue_depths(redis_client) -> Dict[str, int]:
+    """Number of waiting jobs per tenant."""
+    tenants = redis_client.smembers(TENANT_ACTIVE_KEY)
+    if not tenants:
+        return {}
+    pipe = redis_client.pipeline()
+    for tenant in tenants:
+        pipe.llen(f"{TENANT_QUEUE_PREFIX}{tenant}")
+    return dict(zip(tenants, pipe.execute()))
@@ -0,0 +1,159 @@
+import os
+import time
+import zipfile
+import pandas as pd
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Any, Callable, Iterator, Tuple, IO
+from utils.import_files import is_importable_member
+
+# Samples of offending rows returned per problem, to keep the report small
+SAMPLE_SIZE = 10
+
+
+@contextmanager
+def csv_sources(upload: IO[bytes], filename: str) -> Iterator[Dict[str, Callable[[], IO[bytes]]]]:
+    """
+    Map each CSV in an upload to an opener. For ZIP uploads the members are read
+    straight from the archive without extracting anything to disk.
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(upload) as archive:
+            yield {
+                info.filename: (lambda info=info: archive.open(info))
+                for info in archive.infolist()
+                if is_importable_member(info)
+            }
+    else:
+        def open_upload():
+            upload.seek(0)
+            return nullcontext(upload)
+        yield {os.path.basename(filename): open_upload}
+
+
+def _clean(series: pd.Series) -> pd.Series:
+    return series.astype(str).str.strip().str.strip("'").str.strip('"')
+
+
+def _invalid_rows(mask: pd.Series) -> List[int]:
+    # Index is the 0-based data row; +2 gives the line number including the header
+    return [int(i) + 2 for i in mask[mask].index[:SAMPLE_SIZE]]
+
+
+def profile_csv(opener: Callable[[], IO[bytes]], spec: Dict[str, Any], chunk_rows: int, seen_patient_numbers: set = None) -> Dict[str, Any]:
+    """
+    Stream one CSV in chunks and check it against a stage spec: required headers,
+    parseable dates and numbers (vectorised per chunk), and duplicate patient numbers
+    when seen_patient_numbers is given. Nothing is written anywhere.
+    """
+    report = {"rows": 0, "missing_columns": [], "invalid_values": {}, "duplicate_patient_numbers": {"count": 0, "sample": []}}
+    errors, warnings = [], []
+
+    with opener() as handle:
+        reader = pd.read_csv(handle, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+        for chunk_number, chunk in enumerate(reader):
+            chunk.columns = chunk.columns.str.strip()
+
+            if chunk_number == 0:
+                report["missing_columns"] = [c for c in spec.get("required_columns", []) if c not in chunk.columns]
+                if report["missing_columns"]:
+                    errors.append(f"Missing required columns: {', '.join(report['missing_columns'])}")
+
+            report["rows"] += len(chunk)
+
+            for kind, columns in [("date", spec.get("date_columns", [])), ("number", spec.get("numeric_columns", []))]:
+                for column in columns:
+                    if column not in chunk.columns:
+                        continue
+                    values = _clean(chunk[column])
+                    present = values != ""
+                    if kind == "date":
+                        parsed = pd.to_datetime(values.where(present), errors="coerce")
+                    else:
+                        parsed = pd.to_numeric(values.where(present), errors="coerce")
+                    bad = present & parsed.isna()
+                    if bad.any():
+                        entry = report["invalid_values"].setdefault(column, {"expected": kind, "count": 0, "sample_rows": []})
+                        entry["count"] += int(bad.sum())
+                        entry["sample_rows"] = (entry["sample_rows"] + _invalid_rows(bad))[:SAMPLE_SIZE]
+
+            if seen_patient_numbers is not None and "Patient Number" in chunk.columns:
+                numbers = _clean(chunk["Patient Number"])
+                numbers = numbers[numbers != ""]
+                duplicated = numbers.duplicated() | numbers.isin(seen_patient_numbers)
+                if duplicated.any():
+                    duplicates = report["duplicate_patient_numbers"]
+                    duplicates["count"] += int(duplicated.sum())
+                    duplicates["sample"] = list(dict.fromkeys(duplicates["sample"] + numbers[duplicated].tolist()))[:SAMPLE_SIZE]
+                seen_patient_numbers.update(numbers.tolist())
+
+    for column, entry in report["invalid_values"].items():
+        warnings.append(f"{entry['count']} value(s) in '{column}' are not valid {entry['expected']}s and will be imported as empty")
+    if report["duplicate_patient_numbers"]["count"]:
+        warnings.append(f"{report['duplicate_patient_numbers']['count']} patient number(s) appear more than once")
+
+    report["errors"] = errors
+    report["warnings"] = warnings
+    return report
+
+
+def project_import_seconds(stage_rows: Dict[str, int], stages: Dict[str, Dict[str, Any]], rows_per_second: float) -> Tuple[float, Dict[str, float]]:
+    """
+    Project the wall-clock import time. Stages run as soon as their dependencies
+    finish, so the projection is the longest dependency path rather than the sum.
+    """
+    stage_seconds = {key: rows / rows_per_second for key, rows in stage_rows.items()}
+    finish = {}
+
+    def finish_time(key):
+        if key not in finish:
+            deps = [d for d in stages[key]["depends_on"] if d in stage_seconds]
+            finish[key] = max((finish_time(d) for d in deps), default=0.0) + stage_seconds[key]
+        return finish[key]
+
+    total = max((finish_time(key) for key in stage_seconds), default=0.0)
+    return round(total, 1), {key: round(seconds, 1) for key, seconds in stage_seconds.items()}
+
+
+def profile_import_upload(upload: IO[bytes], filename: str, stages: Dict[str, Dict[str, Any]],
+                          match_stage_files: Callable[[List[str]], Dict[str, List[str]]],
+                          chunk_rows: int, rows_per_second: float) -> Dict[str, Any]:
+    """Dry-run an upload: validate every CSV once and project the import time."""
+    started = time.perf_counter()
+    files, errors = [], []
+    stage_rows = {}
+
+    with csv_sources(upload, filename) as sources:
+        if not sources:
+            errors.append("No CSV files found in upload")
+
+        stage_files = match_stage_files(list(sources))
+        matched = {name for names in stage_files.values() for name in names}
+        seen_patient_numbers = set()
+        for stage_key, names in stage_files.items():
+            for name in names:
+                try:
+                    report = profile_csv(
+                        sources[name], stages[stage_key], chunk_rows,
+                        seen_patient_numbers if stage_key == "patients" else None
+                    )
+                except Exception as e:
+                    report = {"rows": 0, "errors": [f"Could not read file: {str(e)}"], "warnings": []}
+                report.update({"file_name": name, "stage": stage_key})
+                files.append(report)
+                errors.extend(f"{name}: {error}" for error in report["errors"])
+                stage_rows[stage_key] = stage_rows.get(stage_key, 0) + report["rows"]
+        unmatched = sorted(set(sources) - matched)
+
+    projected_seconds, stage_seconds = project_import_seconds(stage_rows, stages, rows_per_second)
+    return {
+        "dry_run": True,
+        "valid": not errors,
+        "errors": errors,
+        "files": files,
+        "unmatched_files": unmatched,
+        "total_rows": sum(stage_rows.values()),
+        "rows_per_second": round(rows_per_second, 1),
+        "projected_stage_seconds": stage_seconds,
+        "projected_import_seconds": projected_seconds,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    }
@@ -1 +1,328 @@
+"""
+Notification gateway.
 
+Routes queue outbound email and SMS here and return straight away. A few worker
+tasks per API process drain the queue. They share one keep-alive HTTP client
+for the email service and MSG91, and one SMTP connection for appointment emails.
+Failed sends are retried with exponential back-off, and per-channel latency and
+outcomes are exported to Prometheus.
+
+Bulk SMS (send_sms_batch) for the same MSG91 template are coalesced over a short
+window into a single flow call, so they cost one request per batch instead of
+one per patient, and every recipient gets its own outcome back. Single SMS the
+user is waiting on, such as OTPs, go out straight away through queue_sms.
+"""
+import asyncio
+import json
+import random
+import smtplib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from pathlib import Path
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from utils.config import (
+    EMAIL_HOST, EMAIL_PORT, EMAIL_SENDER, EMAIL_PASSWORD, SMTP_TIMEOUT_SECONDS,
+    NOTIFY_QUEUE_SIZE, NOTIFY_WORKERS, NOTIFY_MAX_ATTEMPTS, NOTIFY_HTTP_TIMEOUT_SECONDS,
+    NOTIFY_SMS_BATCH_WINDOW_SECONDS, NOTIFY_SMS_BATCH_SIZE
+)
+from utils.email import EMAIL_SEND_URL, build_email_request
+from utils.sms import MSG91_FLOW_URL, build_flow_payload, msg91_headers
+
+NOTIFICATION_LATENCY = Histogram(
+    "notification_send_seconds", "Time taken to deliver a notification to the provider", ["channel"]
+)
+NOTIFICATIONS = Counter(
+    "notifications", "Notifications processed by the gateway", ["channel", "outcome"]
+)
+NOTIFICATION_QUEUE_DEPTH = Gauge(
+    "notification_queue_depth", "Notifications waiting to be sent"
+)
+SMS_BATCH_SIZE = Histogram(
+    "sms_batch_recipients", "Recipients per MSG91 flow request", buckets=[1, 2, 5, 10, 25, 50, 100, 250, 500]
+)
+
+
+class NotificationFailed(Exception):
+    """A send failed. Only retryable failures (timeouts, 5xx, throttling) are tried again."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class SMTPConnection:
+    """A single authenticated SMTP connection that is kept open between messages."""
+
+    def __init__(self):
+        self.server: Optional[smtplib.SMTP] = None
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        server.starttls()
+        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+        self.server = server
+
+    def send(self, msg):
+        with self.lock:
+            if self.server is None:
+                self._connect()
+            try:
+                self.server.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Idle connections get dropped by the server; reconnect once
+                self.server = None
+                self._connect()
+                self.server.send_message(msg)
+            except (OSError, smtplib.SMTPResponseException):
+                # Don't reuse a connection left in an unknown state
+                self.server.close()
+                self.server = None
+                raise
+
+    def close(self):
+        with self.lock:
+            if self.server is not None:
+                try:
+                    self.server.quit()
+                except smtplib.SMTPException:
+                    self.server.close()
+                self.server = None
+
+
+class NotificationGateway:
+    """Bounded send queue with retrying workers. Started lazily on the running event loop."""
+
+    def __init__(self, queue_size: int, workers: int, max_attempts: int):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+        self.http: Optional[httpx.AsyncClient] = None
+        self.smtp = SMTPConnection()
+
+    def _ensure_started(self):
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.http = httpx.AsyncClient(
+            timeout=NOTIFY_HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=self.workers * 2, max_keepalive_connections=self.workers)
+        )
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def is_full(self) -> bool:
+        return self.queue is not None and self.queue.full()
+
+    def enqueue(self, channel: str, send: Callable, *args, on_done: Optional[Callable] = None) -> bool:
+        """
+        Queue a send without waiting for it. Must be called from the event loop.
+        on_done, if given, is called with (result, error) once the send succeeds
+        or finally fails.
+
+        Returns:
+            bool: False if the queue is full and the notification was dropped
+        """
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((channel, send, args, on_done))
+        except asyncio.QueueFull:
+            print(f"Notification queue full, dropping {channel} notification")
+            NOTIFICATIONS.labels(channel, "dropped").inc()
+            return False
+        NOTIFICATION_QUEUE_DEPTH.set(self.queue.qsize())
+        return True
+
+    async def _worker(self):
+        while True:
+            channel, send, args, on_done = await self.queue.get()
+            NOTIFICATION_QUEUE_DEPTH.set(self.queue.qsize())
+            try:
+                result, error = await self._deliver(channel, send, args)
+                if on_done:
+                    on_done(result, error)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, channel: str, send: Callable, args: tuple) -> Tuple[Any, Optional[Exception]]:
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                result = await send(*args)
+                NOTIFICATION_LATENCY.labels(channel).observe(time.perf_counter() - started)
+                NOTIFICATIONS.labels(channel, "sent").inc()
+                return result, None
+            except Exception as e:
+                NOTIFICATION_LATENCY.labels(channel).observe(time.perf_counter() - started)
+                retryable = getattr(e, "retryable", True)
+                if not retryable or attempt == self.max_attempts:
+                    print(f"Failed to send {channel} notification after {attempt} attempt(s): {e}")
+                    NOTIFICATIONS.labels(channel, "failed").inc()
+                    return None, e
+                NOTIFICATIONS.labels(channel, "retried").inc()
+                # Exponential back-off with jitter so a provider outage isn't hammered in lockstep
+                await asyncio.sleep(2 ** (attempt - 1) + random.random())
+
+    async def close(self, timeout: float = 10):
+        """Give queued notifications a chance to go out, then release connections."""
+        if not self.tasks:
+            return
+        sms_batcher.flush_all()
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Shutting down with {self.queue.qsize()} notification(s) unsent")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        await self.http.aclose()
+        await asyncio.to_thread(self.smtp.close)
+
+    # Channel transports
+
+    async def post_email(self, receiver_emails: Union[str, List[str]], subject: str, body: str,
+                         attachments: Optional[List[Union[str, Path]]] = None):
+        try:
+            response = await self.http.post(EMAIL_SEND_URL, **build_email_request(receiver_emails, subject, body, attachments))
+        except httpx.TransportError as e:
+            raise NotificationFailed(f"Email service unreachable: {e}")
+        if response.status_code != 200:
+            raise NotificationFailed(
+                f"Email service returned {response.status_code}: {response.text[:200]}",
+                retryable=response.status_code >= 500 or response.status_code == 429
+            )
+
+    async def post_sms(self, template_id: str, recipients: List[Tuple[str, Dict[str, str]]]) -> Optional[str]:
+        """
+        Send one MSG91 flow request for every recipient.
+
+        Returns:
+            str: MSG91 request id, used to match delivery reports to the batch
+        """
+        SMS_BATCH_SIZE.observe(len(recipients))
+        try:
+            response = await self.http.post(
+                MSG91_FLOW_URL, content=json.dumps(build_flow_payload(template_id, recipients)),
+                headers=msg91_headers()
+            )
+        except httpx.TransportError as e:
+            raise NotificationFailed(f"MSG91 unreachable: {e}")
+        if response.status_code >= 500 or response.status_code == 429:
+            raise NotificationFailed(f"MSG91 returned {response.status_code}")
+        result = response.json()
+        if result.get("type") != "success":
+            raise NotificationFailed(f"MSG91 rejected message: {result}", retryable=False)
+        return result.get("message")
+
+    async def send_appointment_email(self, appointment_id: str):
+        await asyncio.to_thread(self._send_appointment_email, appointment_id)
+
+    def _send_appointment_email(self, appointment_id: str):
+        # Imported here to keep the gateway importable without the ORM models
+        from db.db import SessionLocal
+        from utils.appointment_msg import load_appointment_details, build_appointment_email
+
+        db = SessionLocal()
+        try:
+            details = load_appointment_details(db, [appointment_id]).get(appointment_id)
+        finally:
+            db.close()
+        if not details:
+            raise NotificationFailed(f"Appointment {appointment_id} not found", retryable=False)
+        appointment, patient, doctor = details
+        if not patient.email:
+            raise NotificationFailed(f"Patient of appointment {appointment_id} has no email", retryable=False)
+        try:
+            self.smtp.send(build_appointment_email(appointment, patient, doctor))
+        except smtplib.SMTPRecipientsRefused as e:
+            raise NotificationFailed(f"Recipient refused: {e}", retryable=False)
+
+
+class SMSBatcher:
+    """
+    Collects SMS per MSG91 template and sends them as one flow request once the
+    batch window closes or the batch reaches the recipient limit. Every recipient
+    gets a future that resolves to its own outcome.
+    """
+
+    def __init__(self, gateway: NotificationGateway, window_seconds: float, max_recipients: int):
+        self.gateway = gateway
+        self.window_seconds = window_seconds
+        self.max_recipients = max_recipients
+        self.pending: Dict[str, List[Tuple[str, Dict[str, str], asyncio.Future]]] = {}
+        self.timers: Dict[str, asyncio.TimerHandle] = {}
+
+    def add(self, template_id: str, mobile: str, variables: Dict[str, str]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.pending.setdefault(template_id, [])
+        batch.append((mobile, variables, future))
+        if len(batch) >= self.max_recipients:
+            self.flush(template_id)
+        elif template_id not in self.timers:
+            self.timers[template_id] = loop.call_later(self.window_seconds, self.flush, template_id)
+        return future
+
+    def flush(self, template_id: str):
+        timer = self.timers.pop(template_id, None)
+        if timer:
+            timer.cancel()
+        batch = self.pending.pop(template_id, [])
+        if not batch:
+            return
+
+        def on_done(request_id, error):
+            for mobile, _, future in batch:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result({"mobile": mobile, "status": "sent", "request_id": request_id})
+                else:
+                    future.set_result({"mobile": mobile, "status": "failed", "error": str(error)})
+
+        recipients = [(mobile, variables) for mobile, variables, _ in batch]
+        if not self.gateway.enqueue("sms", self.gateway.post_sms, template_id, recipients, on_done=on_done):
+            on_done(None, NotificationFailed("Notification queue full", retryable=False))
+
+    def flush_all(self):
+        for template_id in list(self.pending):
+            self.flush(template_id)
+
+
+gateway = NotificationGateway(NOTIFY_QUEUE_SIZE, NOTIFY_WORKERS, NOTIFY_MAX_ATTEMPTS)
+sms_batcher = SMSBatcher(gateway, NOTIFY_SMS_BATCH_WINDOW_SECONDS, NOTIFY_SMS_BATCH_SIZE)
+
+
+def queue_email(receiver_emails: Union[str, List[str]], subject: str, body: str,
+                attachments: Optional[List[Union[str, Path]]] = None) -> bool:
+    """Queue an email through the email service."""
+    return gateway.enqueue("email", gateway.post_email, receiver_emails, subject, body, attachments)
+
+
+def queue_sms(template_id: str, mobile_numbers: List[str], variables: Dict[str, Any]) -> bool:
+    """Queue an MSG91 template SMS as one flow request, without waiting for a batch window."""
+    return gateway.enqueue("sms", gateway.post_sms, template_id, [(mobile, variables) for mobile in mobile_numbers])
+
+
+async def send_sms_batch(template_id: str, recipients: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Send one template to many recipients, each with its own variables, and wait
+    for the outcome. Large lists are split at NOTIFY_SMS_BATCH_SIZE recipients per request.
+
+    Returns:
+        list: One {"mobile", "status", "request_id" | "error"} entry per recipient, in order
+    """
+    futures = [sms_batcher.add(template_id, mobile, variables) for mobile, variables in recipients]
+    sms_batcher.flush(template_id)
+    return list(await asyncio.gather(*futures))
+
+
+def queue_appointment_email(appointment_id: str) -> bool:
+    """Queue the appointment email. The appointment is loaded on the gateway's own session."""
+    return gateway.enqueue("appointment_email", gateway.send_appointment_email, appointment_id)
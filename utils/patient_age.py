@@ -0,0 +1,95 @@
+import re
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import event, func, inspect
+from db.db import SessionLocal
+from patient.models import Patient
+
+# Ages entered as text ("35", "35.0", "35 yrs") start with their whole years
+_AGE = re.compile(r"\s*(\d{1,3})(?!\d)")
+
+MAX_AGE = 130
+
+
+def parse_age(age) -> Optional[int]:
+    """Whole years from a free-text age, or None when it holds no usable number."""
+    match = _AGE.match(str(age)) if age is not None else None
+    if not match or int(match.group(1)) > MAX_AGE:
+        return None
+    return int(match.group(1))
+
+
+def birth_year_from(date_of_birth: Optional[datetime], age, recorded_at: Optional[datetime] = None) -> Optional[int]:
+    """
+    Normalised birth year of a patient: the year of date_of_birth when known,
+    else the year the age was recorded minus the age. Ages follow
+    calculate_age, i.e. the current year minus the birth year, so this one
+    column answers every age query.
+    """
+    if date_of_birth:
+        return date_of_birth.year
+    years = parse_age(age)
+    if years is None:
+        return None
+    return (recorded_at or datetime.now()).year - years
+
+
+def current_year() -> int:
+    return datetime.now().year
+
+
+def patient_age():
+    """SQL expression for a patient's age in years; NULL when unknown."""
+    return func.year(func.curdate()) - Patient.birth_year
+
+
+def age_at_least(min_age: int):
+    """Index-friendly condition for age >= min_age."""
+    return Patient.birth_year <= current_year() - min_age
+
+
+def age_at_most(max_age: int):
+    """Index-friendly condition for age <= max_age."""
+    return Patient.birth_year >= current_year() - max_age
+
+
+def age_between(min_age: int, max_age: int):
+    return Patient.birth_year.between(current_year() - max_age, current_year() - min_age)
+
+
+# A stored generated column can't depend on the current date, so birth_year is
+# an ordinary column kept in step with date_of_birth and age on every ORM write
+@event.listens_for(Patient, "before_insert")
+def _set_birth_year_on_insert(mapper, connection, target):
+    target.birth_year = birth_year_from(target.date_of_birth, target.age, target.created_at)
+
+
+@event.listens_for(Patient, "before_update")
+def _set_birth_year_on_update(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.date_of_birth.history.has_changes() or state.attrs.age.history.has_changes():
+        target.birth_year = birth_year_from(target.date_of_birth, target.age)
+
+
+def backfill_birth_years(db, batch_size: int = 5000):
+    """Fill birth_year for patients stored before the column existed."""
+    rows = db.query(Patient.id, Patient.date_of_birth, Patient.age, Patient.created_at).filter(
+        Patient.birth_year.is_(None)
+    ).all()
+    updates = []
+    for patient_id, date_of_birth, age, created_at in rows:
+        year = birth_year_from(date_of_birth, age, created_at)
+        if year is not None:
+            updates.append({"id": patient_id, "birth_year": year})
+    for start in range(0, len(updates), batch_size):
+        db.bulk_update_mappings(Patient, updates[start:start + batch_size])
+        db.commit()
+    print(f"Backfilled birth year for {len(updates)} of {len(rows)} patients")
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        backfill_birth_years(db)
+    finally:
+        db.close()
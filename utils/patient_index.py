@@ -0,0 +1,311 @@
+import asyncio
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, inspect
+from db.db import SessionLocal
+from patient.models import Patient
+from redis_client import get_sync_redis_client
+from utils.cache import get_generations, bump_generations_sync, submit_after_commit
+from utils.config import PATIENT_INDEX_CHECK_SECONDS, PATIENT_INDEX_MAX_DOCTORS
+from utils.suggestion_store import normalize
+
+# Searchable fields. Every index key starts with one of these markers so a
+# single sorted array serves all of them.
+NAME, PHONE, PHONE_SUFFIX, PATIENT_NUMBER, EMAIL, ABHA = "n", "p", "s", "u", "e", "a"
+ALL_FIELDS = (NAME, PHONE, PHONE_SUFFIX, PATIENT_NUMBER, EMAIL, ABHA)
+
+# Match tiers per query term, best first
+EXACT, PREFIX, SUFFIX = range(3)
+
+# Session.info key listing the doctors whose patients a transaction changed
+CHANGED_DOCTORS_KEY = "changed_patient_doctors"
+
+# Phone numbers are also indexed by their last ten digits, so a number stored
+# with a country code or trunk prefix is found by its national form
+NATIONAL_DIGITS = 10
+
+_WORD = re.compile(r"\w+")
+_NON_DIGIT = re.compile(r"\D")
+_NON_ALNUM = re.compile(r"[^0-9a-z]")
+
+
+def patient_tag(doctor_id: str) -> str:
+    return f"patients:doctor:{doctor_id}"
+
+
+def phone_digits(value: Optional[str]) -> str:
+    return _NON_DIGIT.sub("", value or "")
+
+
+def _identifier(value: Optional[str]) -> str:
+    return _NON_ALNUM.sub("", normalize(value or ""))
+
+
+def _patient_keys(norm_name: str, phones, patient_number, email, abha_id) -> set:
+    keys = {NAME + word for word in _WORD.findall(norm_name)}
+    for phone in phones:
+        digits = phone_digits(phone)
+        if digits:
+            keys.add(PHONE + digits)
+            keys.add(PHONE + digits[-NATIONAL_DIGITS:])
+            keys.add(PHONE_SUFFIX + digits[::-1])
+    for field, value in ((PATIENT_NUMBER, patient_number), (ABHA, abha_id)):
+        value = _identifier(value)
+        if value:
+            keys.add(field + value)
+    if email:
+        keys.add(EMAIL + normalize(email))
+    return keys
+
+
+def _term_keys(term: str, fields: Iterable[str]) -> List[Tuple[str, int]]:
+    """Index keys to prefix-scan for one query term, with the tier a prefix match earns."""
+    keys = []
+    digits = phone_digits(term)
+    for field in fields:
+        if field == NAME:
+            keys.extend((NAME + word, PREFIX) for word in _WORD.findall(term))
+        elif field == PHONE and digits:
+            keys.append((PHONE + digits, PREFIX))
+        elif field == PHONE_SUFFIX and digits:
+            keys.append((PHONE_SUFFIX + digits[::-1], SUFFIX))
+        elif field in (PATIENT_NUMBER, ABHA) and _identifier(term):
+            keys.append((field + _identifier(term), PREFIX))
+        elif field == EMAIL:
+            keys.append((EMAIL + term, PREFIX))
+    return keys
+
+
+class PatientIndex:
+    """
+    Immutable in-memory search index over one doctor's patients.
+
+    Name words, phone digits, reversed phone digits (so the last N digits of a
+    number are a prefix), patient numbers, emails and ABHA ids all live in one
+    sorted key array. Terms are ANDed: binary searches size up the key range
+    each term prefixes, the narrowest term's range is scanned, and its
+    candidates are checked against the other terms through their own keys, so
+    a broad term next to a narrow one costs no more than the narrow one. A
+    compact summary of each patient is kept so typeahead needs no database
+    round-trip.
+    """
+
+    def __init__(self, rows: List[Any]):
+        self.entries = []
+        self.names = []
+        self.patient_keys: List[Tuple[str, ...]] = []
+        keys = []
+        for position, row in enumerate(rows):
+            self.entries.append({
+                "id": row.id,
+                "clinic_id": row.clinic_id,
+                "name": row.name,
+                "patient_number": row.patient_number,
+                "mobile_number": row.mobile_number,
+                "email": row.email,
+                "gender": row.gender.value if hasattr(row.gender, 'value') else row.gender,
+                "age": row.age,
+                "date_of_birth": row.date_of_birth.isoformat() if row.date_of_birth else None
+            })
+            norm_name = normalize(row.name or "")
+            self.names.append(norm_name)
+            phones = (row.mobile_number, row.contact_number, row.secondary_mobile)
+            patient_keys = tuple(_patient_keys(norm_name, phones, row.patient_number, row.email, row.abha_id))
+            self.patient_keys.append(patient_keys)
+            keys.extend((key, position) for key in patient_keys)
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.key_entries = [position for _, position in keys]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _key_range(self, prefix: str) -> Tuple[int, int]:
+        start = bisect_left(self.keys, prefix)
+        return start, bisect_left(self.keys, prefix + "\U0010ffff", start)
+
+    def _term_tier(self, position: int, term: List[Tuple[str, int]]) -> Optional[int]:
+        """Best tier the patient matches the term with, or None if it doesn't."""
+        best = None
+        for key in self.patient_keys[position]:
+            for prefix, tier in term:
+                if key.startswith(prefix):
+                    tier = EXACT if key == prefix else tier
+                    best = tier if best is None else min(best, tier)
+        return best
+
+    def _match_terms(self, terms: List[List[Tuple[str, int]]], limit: Optional[int]) -> Dict[int, int]:
+        """
+        Positions matching every term, mapped to the sum of the tiers they
+        matched each term with. With a limit, collection stops once that many
+        positions have matched every term. The narrowest term is scanned in
+        key order, where exact matches come before longer keys.
+        """
+        if not terms or any(not term for term in terms):
+            return {}
+        sized = []
+        for term in terms:
+            ranges = [(self._key_range(prefix), prefix, tier) for prefix, tier in term]
+            sized.append((sum(end - start for (start, end), _, _ in ranges), ranges, term))
+        sized.sort(key=lambda entry: entry[0])
+        _, narrowest, _ = sized[0]
+        others = [term for _, _, term in sized[1:]]
+
+        # Best tier for the narrowest term, and the summed tiers for the others, per position
+        narrow_tiers: Dict[int, int] = {}
+        other_tiers: Dict[int, int] = {}
+        rejected = set()
+        for (start, end), prefix, tier in narrowest:
+            for index in range(start, end):
+                position = self.key_entries[index]
+                term_tier = EXACT if self.keys[index] == prefix else tier
+                if position in narrow_tiers:
+                    narrow_tiers[position] = min(narrow_tiers[position], term_tier)
+                    continue
+                if position in rejected or (limit and len(narrow_tiers) >= limit):
+                    continue
+                total = 0
+                for term in others:
+                    other_tier = self._term_tier(position, term)
+                    if other_tier is None:
+                        rejected.add(position)
+                        break
+                    total += other_tier
+                else:
+                    narrow_tiers[position] = term_tier
+                    other_tiers[position] = total
+        return {position: tier + other_tiers[position] for position, tier in narrow_tiers.items()}
+
+    def _terms(self, query: str, fields: Iterable[str]) -> List[List[Tuple[str, int]]]:
+        fields = tuple(fields)
+        return [_term_keys(term, fields) for term in normalize(query).split()]
+
+    def match(self, query: str, fields: Iterable[str] = ALL_FIELDS, limit: Optional[int] = None) -> Dict[int, int]:
+        """
+        Positions matching every term of the query, mapped to the sum of the
+        tiers they matched each term with. A limit caps the positions returned,
+        after the terms are intersected.
+        """
+        return self._match_terms(self._terms(query, fields), limit)
+
+    def match_all(self, criteria: List[Tuple[str, Iterable[str]]], limit: Optional[int] = None) -> Dict[int, int]:
+        """Positions matching every term of every (query, fields) criterion, with their tiers summed."""
+        terms = [term for query, fields in criteria for term in self._terms(query, fields)]
+        return self._match_terms(terms, limit)
+
+    def rank(self, scores: Dict[int, int], query: str, limit: Optional[int] = None) -> List[int]:
+        """
+        Order matched positions best first: by summed tier, then patients whose
+        name starts with the query, then shorter names.
+        """
+        query = normalize(query)
+
+        def key(position: int):
+            name = self.names[position]
+            return (scores[position], 0 if name.startswith(query) else 1, len(name), name)
+
+        if limit is None:
+            return sorted(scores, key=key)
+        return heapq.nsmallest(limit, scores, key=key)
+
+    def search(self, query: str, fields: Iterable[str] = ALL_FIELDS, limit: int = 10, max_candidates: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Top matches for the query as patient summaries."""
+        scores = self.match(query, fields, max_candidates)
+        return [self.entries[position] for position in self.rank(scores, query, limit)]
+
+    def ids(self, positions: Iterable[int]) -> List[str]:
+        return [self.entries[position]["id"] for position in positions]
+
+
+class PatientIndexes:
+    """
+    Per-worker patient indexes for the most recently searched doctors, built
+    on first use and evicted least-recently-used beyond PATIENT_INDEX_MAX_DOCTORS.
+    Like the suggestion indexes, each remembers the doctor's generation counter
+    in Redis, which any worker bumps when it commits a patient change; Redis is
+    consulted at most every PATIENT_INDEX_CHECK_SECONDS per doctor, while
+    commits in this worker mark the doctor stale immediately.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._indexes: "OrderedDict[str, Tuple[int, float, PatientIndex]]" = OrderedDict()
+        self._stale = set()
+        self._lock = threading.Lock()
+
+    def mark_stale(self, doctor_ids):
+        with self._lock:
+            self._stale.update(doctor_ids)
+
+    async def get(self, redis_client, db, doctor_id: str) -> PatientIndex:
+        with self._lock:
+            current = self._indexes.get(doctor_id)
+            if current:
+                self._indexes.move_to_end(doctor_id)
+            stale = doctor_id in self._stale
+            self._stale.discard(doctor_id)
+        if current and not stale and time.monotonic() - current[1] < PATIENT_INDEX_CHECK_SECONDS:
+            return current[2]
+
+        (generation,) = await get_generations(redis_client, [patient_tag(doctor_id)])
+        if current and not stale and current[0] == generation:
+            index = current[2]
+        else:
+            rows = db.query(
+                Patient.id, Patient.clinic_id, Patient.name, Patient.patient_number, Patient.mobile_number,
+                Patient.contact_number, Patient.secondary_mobile, Patient.email, Patient.abha_id,
+                Patient.gender, Patient.age, Patient.date_of_birth
+            ).filter(Patient.doctor_id == doctor_id).all()
+            # Building takes a couple of seconds for the largest practices; keep the event loop free meanwhile
+            index = await asyncio.to_thread(PatientIndex, rows)
+
+        with self._lock:
+            self._indexes[doctor_id] = (generation, time.monotonic(), index)
+            self._indexes.move_to_end(doctor_id)
+            while len(self._indexes) > self.maxsize:
+                self._indexes.popitem(last=False)
+        return index
+
+
+patient_indexes = PatientIndexes(PATIENT_INDEX_MAX_DOCTORS)
+
+
+def patients_changed(doctor_ids):
+    """Tell every worker the given doctors' patients changed, e.g. after a bulk insert that bypasses session events."""
+    doctor_ids = [doctor_id for doctor_id in doctor_ids if doctor_id]
+    if not doctor_ids:
+        return
+    patient_indexes.mark_stale(doctor_ids)
+    tags = [patient_tag(doctor_id) for doctor_id in doctor_ids]
+    submit_after_commit(lambda: bump_generations_sync(get_sync_redis_client(), tags), "bumping patient index versions")
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_changed_doctors(session, flush_context):
+    changed = session.info.setdefault(CHANGED_DOCTORS_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Patient):
+            changed.add(obj.doctor_id)
+            # A patient moved to another doctor leaves the old doctor's index too
+            changed.update(inspect(obj).attrs.doctor_id.history.deleted or ())
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_changed_doctors(session):
+    changed = session.info.pop(CHANGED_DOCTORS_KEY, None)
+    if not changed:
+        return
+    try:
+        patients_changed(changed)
+    except Exception as e:
+        print(f"Error bumping patient index versions: {e}")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_changed_doctors(session):
+    session.info.pop(CHANGED_DOCTORS_KEY, None)
@@ -0,0 +1,48 @@
+import re
+from typing import Optional
+from utils.config import DEFAULT_PHONE_COUNTRY_CODE
+
+# E.164 allows at most 15 digits including the country code
+MAX_E164_DIGITS = 15
+NATIONAL_DIGITS = 10
+
+_NON_DIGIT = re.compile(r"\D")
+
+
+def normalize_phone(phone, country_code: str = DEFAULT_PHONE_COUNTRY_CODE) -> Optional[str]:
+    """
+    E.164 form ("+919876543210") of a phone number as users type it: with or
+    without a "+" or "00" international prefix, a trunk "0", spaces, dashes or
+    brackets. Numbers without a country code are taken to be in the default
+    country. Returns None when the input can't be a complete number.
+
+    Example:
+        normalize_phone("098765 43210") == normalize_phone("+91 98765-43210") == "+919876543210"
+    """
+    if phone is None:
+        return None
+    text = str(phone).strip()
+    digits = _NON_DIGIT.sub("", text)
+    if text.startswith("+"):
+        international = digits
+    elif digits.startswith("00"):
+        international = digits[2:]
+    elif len(digits) == NATIONAL_DIGITS:
+        international = country_code + digits
+    elif len(digits) == NATIONAL_DIGITS + 1 and digits.startswith("0"):
+        international = country_code + digits[1:]
+    elif len(digits) == len(country_code) + NATIONAL_DIGITS and digits.startswith(country_code):
+        international = digits
+    else:
+        return None
+    if not NATIONAL_DIGITS <= len(international) <= MAX_E164_DIGITS or international.startswith("0"):
+        return None
+    return "+" + international
+
+
+def msg91_mobile(phone) -> str:
+    """Recipient number as MSG91 expects it: E.164 without the "+"."""
+    normalized = normalize_phone(phone)
+    if normalized:
+        return normalized[1:]
+    return _NON_DIGIT.sub("", str(phone or ""))
@@ -0,0 +1,72 @@
+from sqlalchemy import event, inspect
+from db.db import SessionLocal
+from auth.models import User
+from patient.models import Patient
+from utils.phone import normalize_phone
+
+
+# Normalised columns follow the raw ones on every ORM write. Bulk inserts skip
+# mapper events and must set them explicitly.
+@event.listens_for(User, "before_insert")
+def _set_user_phone_on_insert(mapper, connection, target):
+    target.phone_e164 = normalize_phone(target.phone)
+
+
+@event.listens_for(User, "before_update")
+def _set_user_phone_on_update(mapper, connection, target):
+    if inspect(target).attrs.phone.history.has_changes():
+        target.phone_e164 = normalize_phone(target.phone)
+
+
+@event.listens_for(Patient, "before_insert")
+def _set_patient_mobile_on_insert(mapper, connection, target):
+    target.mobile_e164 = normalize_phone(target.mobile_number)
+
+
+@event.listens_for(Patient, "before_update")
+def _set_patient_mobile_on_update(mapper, connection, target):
+    if inspect(target).attrs.mobile_number.history.has_changes():
+        target.mobile_e164 = normalize_phone(target.mobile_number)
+
+
+def backfill_phones(db, batch_size: int = 5000):
+    """
+    Fill the normalised phone columns for rows stored before they existed. A
+    user whose number normalises to one already taken by another user is
+    left without one and reported, since phone_e164 is unique.
+    """
+    taken = set(phone for (phone,) in db.query(User.phone_e164).filter(User.phone_e164.isnot(None)).all())
+    updates, conflicts = [], []
+    for user_id, phone in db.query(User.id, User.phone).filter(User.phone_e164.is_(None), User.phone.isnot(None)).all():
+        normalized = normalize_phone(phone)
+        if not normalized:
+            continue
+        if normalized in taken:
+            conflicts.append(user_id)
+            continue
+        taken.add(normalized)
+        updates.append({"id": user_id, "phone_e164": normalized})
+    for start in range(0, len(updates), batch_size):
+        db.bulk_update_mappings(User, updates[start:start + batch_size])
+    db.commit()
+    print(f"Backfilled {len(updates)} user phones; {len(conflicts)} duplicates left unset: {conflicts}")
+
+    updates = []
+    for patient_id, mobile in db.query(Patient.id, Patient.mobile_number).filter(
+        Patient.mobile_e164.is_(None), Patient.mobile_number.isnot(None)
+    ).all():
+        normalized = normalize_phone(mobile)
+        if normalized:
+            updates.append({"id": patient_id, "mobile_e164": normalized})
+    for start in range(0, len(updates), batch_size):
+        db.bulk_update_mappings(Patient, updates[start:start + batch_size])
+        db.commit()
+    print(f"Backfilled {len(updates)} patient mobile numbers")
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        backfill_phones(db)
+    finally:
+        db.close()
@@ -0,0 +1,182 @@
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List
+from appointment.models import Appointment, AppointmentStatus
+
+# Redis keys used by the reminder scheduler
+REMINDERS_DUE_KEY = "reminders:due"
+REMINDERS_PROCESSING_KEY = "reminders:processing"
+REMINDER_ATTEMPTS_KEY = "reminders:attempts"
+REMINDER_LEADER_KEY = "reminders:leader"
+
+# Move every reminder whose fire time has passed, up to a batch limit, into the
+# processing set under a lease in one step, so a reminder can never be handed
+# out twice. Reminders whose lease ran out, because their dispatcher died before
+# acknowledging them, go back to the due set first.
+CLAIM_DUE_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(expired) do
+    redis.call('ZADD', KEYS[1], 'NX', ARGV[1], id)
+end
+if #expired > 0 then
+    redis.call('ZREM', KEYS[2], unpack(expired))
+end
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(ids) do
+    redis.call('ZADD', KEYS[2], ARGV[3], id)
+end
+if #ids > 0 then
+    redis.call('ZREM', KEYS[1], unpack(ids))
+end
+return ids
+"""
+
+# Put failed reminders back on the schedule until they run out of attempts.
+# Returns the ids that were given up on.
+RETRY_SCRIPT = """
+local dropped = {}
+for i = 3, #ARGV do
+    local id = ARGV[i]
+    if redis.call('ZREM', KEYS[2], id) == 1 then
+        local attempts = redis.call('HINCRBY', KEYS[3], id, 1)
+        if attempts < tonumber(ARGV[1]) then
+            redis.call('ZADD', KEYS[1], 'NX', ARGV[2], id)
+        else
+            redis.call('HDEL', KEYS[3], id)
+            table.insert(dropped, id)
+        end
+    end
+end
+return dropped
+"""
+
+# Extend the leader lease only if we still hold it
+RENEW_LEADER_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def reminder_time_for(appointment: Appointment) -> Optional[datetime]:
+    """When the reminder for an appointment should fire, or None if it should not."""
+    if not appointment.send_reminder or appointment.status == AppointmentStatus.CANCELLED:
+        return None
+    return appointment.appointment_date - timedelta(minutes=appointment.remind_time_before or 0)
+
+
+async def schedule_reminder(redis_client, appointment_id: str, fire_at: datetime):
+    """Schedule or reschedule the reminder for an appointment. One entry per appointment."""
+    await redis_client.zadd(REMINDERS_DUE_KEY, {appointment_id: fire_at.timestamp()})
+
+
+async def cancel_reminder(redis_client, appointment_id: str) -> int:
+    """
+    Remove the pending reminder for an appointment.
+
+    Returns:
+        int: Number of reminders removed (0 or 1)
+    """
+    return await redis_client.zrem(REMINDERS_DUE_KEY, appointment_id)
+
+
+async def sync_appointment_reminder(redis_client, appointment: Appointment):
+    """
+    Bring the scheduled reminder in line with an appointment after it changed.
+    Reminders are best effort here; the dispatcher re-checks the appointment before sending.
+    """
+    try:
+        fire_at = reminder_time_for(appointment)
+        if fire_at and fire_at > datetime.now():
+            await schedule_reminder(redis_client, appointment.id, fire_at)
+        else:
+            await cancel_reminder(redis_client, appointment.id)
+    except Exception as e:
+        print(f"Error syncing reminder for appointment {appointment.id}: {e}")
+
+
+class ReminderScheduler:
+    """Synchronous view of the reminder schedule used by the dispatcher process."""
+
+    def __init__(self, redis_client, node_id: str):
+        self.redis = redis_client
+        self.node_id = node_id
+
+    def acquire_leadership(self, ttl_seconds: int) -> bool:
+        """Take or keep the dispatcher lease. Only the leader claims due reminders."""
+        ttl_ms = ttl_seconds * 1000
+        if self.redis.set(REMINDER_LEADER_KEY, self.node_id, nx=True, px=ttl_ms):
+            return True
+        return bool(self.redis.eval(RENEW_LEADER_SCRIPT, 1, REMINDER_LEADER_KEY, self.node_id, ttl_ms))
+
+    def release_leadership(self):
+        self.redis.eval(RENEW_LEADER_SCRIPT, 1, REMINDER_LEADER_KEY, self.node_id, 1)
+
+    def schedule(self, appointment_id: str, fire_at: datetime):
+        self.redis.zadd(REMINDERS_DUE_KEY, {appointment_id: fire_at.timestamp()})
+
+    def claim_due(self, limit: int, lease_seconds: int) -> List[str]:
+        """
+        Claim up to limit appointment ids whose reminder is due now. Claimed
+        reminders must be acknowledged or retried within lease_seconds, or they
+        become due again.
+        """
+        now = time.time()
+        return self.redis.eval(
+            CLAIM_DUE_SCRIPT, 2, REMINDERS_DUE_KEY, REMINDERS_PROCESSING_KEY, now, limit, now + lease_seconds
+        ) or []
+
+    def acknowledge(self, appointment_ids: List[str]):
+        """Mark claimed reminders as handled."""
+        if appointment_ids:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zrem(REMINDERS_PROCESSING_KEY, *appointment_ids)
+            pipe.hdel(REMINDER_ATTEMPTS_KEY, *appointment_ids)
+            pipe.execute()
+
+    def retry(self, appointment_ids: List[str], delay_seconds: int, max_attempts: int) -> List[str]:
+        """
+        Reschedule claimed reminders that could not be sent, delay_seconds from
+        now. A reminder rescheduled in the meantime keeps its new time.
+
+        Returns:
+            list: Ids dropped after max_attempts failed sends
+        """
+        if not appointment_ids:
+            return []
+        return self.redis.eval(
+            RETRY_SCRIPT, 3, REMINDERS_DUE_KEY, REMINDERS_PROCESSING_KEY, REMINDER_ATTEMPTS_KEY,
+            max_attempts, time.time() + delay_seconds, *appointment_ids
+        ) or []
+
+    def pending_count(self) -> int:
+        return self.redis.zcard(REMINDERS_DUE_KEY)
+
+    def rebuild(self, db, batch_size: int = 1000) -> int:
+        """
+        Re-add every future reminder from the database, which stays the source of
+        truth, so reminders survive a Redis flush. Reminders already in the past
+        are not re-added, as they may have been sent.
+
+        Returns:
+            int: Number of reminders scheduled
+        """
+        now = datetime.now()
+        scheduled = 0
+        pipe = self.redis.pipeline(transaction=False)
+        query = db.query(Appointment.id, Appointment.appointment_date, Appointment.remind_time_before).filter(
+            Appointment.send_reminder == True,
+            Appointment.status != AppointmentStatus.CANCELLED,
+            Appointment.appointment_date > now
+        ).yield_per(batch_size)
+        for appointment_id, appointment_date, remind_time_before in query:
+            fire_at = appointment_date - timedelta(minutes=remind_time_before or 0)
+            if fire_at <= now:
+                continue
+            pipe.zadd(REMINDERS_DUE_KEY, {appointment_id: fire_at.timestamp()})
+            scheduled += 1
+            if scheduled % batch_size == 0:
+                pipe.execute()
+        pipe.execute()
+        return scheduled
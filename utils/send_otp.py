@@ -1,32 +1,24 @@
-from decouple import config
-import requests
-from utils.email import send_email, sender_email, sender_password
-from utils.config import OTP_TEMPLATE_ID, APPOINTMENT_TEMPLATE_ID, MSG91_AUTH_KEY
-from utils.sms import send_sms_template
+from utils.config import OTP_TEMPLATE_ID
+from utils.notifications import queue_email, queue_sms
     
 def send_otp(mobile_number: str, otp: str):
-    """Send OTP via MSG91 SMS API"""
+    """Queue an OTP SMS via MSG91. Returns False only if it could not be queued."""
     try:
         template_id = str(OTP_TEMPLATE_ID)
         mobile_numbers = [mobile_number]
         variables = {"otp": otp}
-        response = send_sms_template(template_id, mobile_numbers, variables)
-        if response is True:
-            return True
-        else:
-            print(f"Error sending OTP: {response}")
-            return False
+        return queue_sms(template_id, mobile_numbers, variables)
     except Exception as e:
         print(f"Error sending OTP: {e}")
         return False
     
 def send_otp_email(email: str, otp: str):
-    """Send OTP via email"""
+    """Queue an OTP email. Returns False only if it could not be queued."""
     try:
         subject = "Your OTP Code"
         body = f"Your OTP code is: {otp}\n\nThis code will expire soon. Please do not share this code with anyone."
         
-        return send_email(
+        return queue_email(
             receiver_emails=email,
             subject=subject,
             body=body
@@ -34,3 +26,28 @@ def send_otp_email(email: str, otp: str):
     except Exception as e:
         print(f"Error sending OTP email: {e}")
         return False
+
+def send_forgot_password_email(receiver_email: str, link: str) -> bool:
+    """Queue the password reset email. Returns False only if it could not be queued."""
+    try:
+        subject = "Password Reset Request for Your Account"
+        body = f"""
+Dear User,
+
+We received a request to reset the password for your account. If you didn't make this request, please ignore this email.
+
+To reset your password, please click on the following link or copy and paste it into your browser:
+
+{link}
+
+This link will expire in 3 hours for security reasons.
+
+If you have any issues or need assistance, please don't hesitate to contact our support team.
+
+Best regards,
+Backup Doc
+"""
+        return queue_email(receiver_email, subject, body)
+    except Exception as e:
+        print(f"Failed to send forgot password email: {e}")
+        return False
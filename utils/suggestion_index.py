@@ -0,0 +1,226 @@
+import asyncio
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from db.db import SessionLocal
+from redis_client import get_sync_redis_client
+from utils.cache import get_generations, bump_generations_sync, submit_after_commit
+from utils.config import SUGGESTION_INDEX_CHECK_SECONDS, SUGGESTION_USAGE_REFRESH_SECONDS
+from utils.suggestion_store import SUGGESTION_FAMILIES, CHANGED_FAMILIES_KEY, normalize, suggestion_hash
+from utils.suggestion_usage import load_usage
+
+# Match tiers, best first
+EXACT, PREFIX, WORD_PREFIX, INFIX = range(4)
+
+# Queries this short match a large share of the index, so their ranked results
+# are kept until the usage counts change
+SHORT_QUERY_CHARS = 2
+
+_WORD = re.compile(r"\w+")
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def suggestion_tag(family: str) -> str:
+    return f"suggestions:{family}"
+
+
+class AutocompleteIndex:
+    """
+    Immutable in-memory index over one suggestion table.
+
+    Word prefixes are answered from a sorted array of (word, entry) pairs with a
+    binary search; infix matches from a trigram inverted index whose smallest
+    posting lists are intersected and then confirmed with a substring check.
+    Usage counts can be swapped in with set_usage without a rebuild.
+    Every match is ranked, however short the query; results for the shortest
+    queries are memoised per usage snapshot.
+    """
+
+    def __init__(self, rows: List[Tuple[str, str, Any]]):
+        self.entries = []
+        self.normalized = []
+        words = []
+        self.postings: Dict[str, List[int]] = {}
+        self.usage: Dict[int, int] = {}
+        for position, (entry_id, text, created_at) in enumerate(rows):
+            norm = normalize(text or "")
+            self.entries.append({
+                "id": entry_id,
+                "text": text,
+                "created_at": created_at.isoformat() if created_at else None
+            })
+            self.normalized.append(norm)
+            words.extend((word, position) for word in set(_WORD.findall(norm)))
+            for gram in trigrams(norm):
+                self.postings.setdefault(gram, []).append(position)
+        words.sort()
+        self.words = [word for word, _ in words]
+        self.word_entries = [position for _, position in words]
+        self.hashes = [suggestion_hash(norm) for norm in self.normalized]
+        self.hash_positions = {text_hash: position for position, text_hash in enumerate(self.hashes)}
+        self._short_results: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+
+    def set_usage(self, counts: Dict[str, int]):
+        """Replace the usage counts, keyed by suggestion_hash of the text."""
+        self.usage = {position: counts[text_hash] for position, text_hash in enumerate(self.hashes) if text_hash in counts}
+        self._short_results = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _word_prefix_matches(self, prefix: str) -> set:
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + "\U0010ffff", start)
+        return set(self.word_entries[start:end])
+
+    def _infix_matches(self, query: str) -> set:
+        grams = sorted(trigrams(query), key=lambda gram: len(self.postings.get(gram, ())))
+        if not grams:
+            return set()
+        candidates = set(self.postings.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(self.postings.get(gram, ()))
+        return {position for position in candidates if query in self.normalized[position]}
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Top matches for the query: exact matches first, then entries starting
+        with it, then entries with a word starting with it, then other
+        substring matches. Within a tier the most used come first, then the
+        shortest.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        short = len(query) <= SHORT_QUERY_CHARS
+        if short and (query, limit) in self._short_results:
+            return self._short_results[(query, limit)]
+
+        first_word = _WORD.findall(query)
+        word_hits = self._word_prefix_matches(first_word[0]) if first_word else set()
+        if len(first_word) > 1 or not query.startswith(first_word[0] if first_word else ""):
+            word_hits = {position for position in word_hits if query in self.normalized[position]}
+        infix_hits = self._infix_matches(query) - word_hits if len(query) >= 3 else set()
+
+        usage = self.usage
+
+        def rank(position: int):
+            norm = self.normalized[position]
+            if position not in word_hits:
+                tier = INFIX
+            elif norm == query:
+                tier = EXACT
+            else:
+                tier = PREFIX if norm.startswith(query) else WORD_PREFIX
+            return (tier, -usage.get(position, 0), len(norm), norm)
+
+        best = heapq.nsmallest(limit, word_hits | infix_hits, key=rank)
+        results = [self.entries[position] for position in best]
+        if short:
+            self._short_results[(query, limit)] = results
+        return results
+
+
+class SuggestionIndexes:
+    """
+    Per-worker autocomplete indexes, one per suggestion family, built on first
+    use. Each index remembers the family's generation counter in Redis; writes
+    from any worker bump it, and an index is rebuilt when it falls behind.
+    Redis is consulted at most every SUGGESTION_INDEX_CHECK_SECONDS per family,
+    while commits in this worker mark the family stale immediately. Usage
+    counts change with every clinical note, so they are reloaded on their own
+    schedule, every SUGGESTION_USAGE_REFRESH_SECONDS, rather than on writes.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, Tuple[int, AutocompleteIndex]] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._usage_loaded_at: Dict[str, float] = {}
+        self._stale = set()
+        self._lock = threading.Lock()
+
+    def mark_stale(self, families):
+        with self._lock:
+            self._stale.update(families)
+
+    async def get(self, redis_client, db, family: str) -> AutocompleteIndex:
+        index = await self._current(redis_client, db, family)
+        loaded_at = self._usage_loaded_at.get(family)
+        if loaded_at is None or time.monotonic() - loaded_at >= SUGGESTION_USAGE_REFRESH_SECONDS:
+            index.set_usage(load_usage(db, family))
+            self._usage_loaded_at[family] = time.monotonic()
+        return index
+
+    async def _current(self, redis_client, db, family: str) -> AutocompleteIndex:
+        current = self._indexes.get(family)
+        with self._lock:
+            stale = family in self._stale
+            self._stale.discard(family)
+        if current and not stale and time.monotonic() - self._checked_at[family] < SUGGESTION_INDEX_CHECK_SECONDS:
+            return current[1]
+
+        (generation,) = await get_generations(redis_client, [suggestion_tag(family)])
+        self._checked_at[family] = time.monotonic()
+        if current and not stale and current[0] == generation:
+            return current[1]
+
+        model, column = SUGGESTION_FAMILIES[family]
+        rows = db.query(model.id, getattr(model, column), model.created_at).all()
+        # Building scans every suggestion; keep the event loop free meanwhile
+        index = await asyncio.to_thread(AutocompleteIndex, rows)
+        self._indexes[family] = (generation, index)
+        # A fresh index needs its usage counts before it is first searched
+        self._usage_loaded_at.pop(family, None)
+        return index
+
+
+suggestion_indexes = SuggestionIndexes()
+
+
+def suggestions_changed(families):
+    """Tell every worker the given families changed, e.g. after a bulk insert that bypasses session events."""
+    families = list(families)
+    suggestion_indexes.mark_stale(families)
+    tags = [suggestion_tag(family) for family in families]
+    submit_after_commit(lambda: bump_generations_sync(get_sync_redis_client(), tags), "bumping suggestion index versions")
+
+
+def _family_of(obj) -> Optional[str]:
+    for family, (model, _) in SUGGESTION_FAMILIES.items():
+        if isinstance(obj, model):
+            return family
+    return None
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_changed_families(session, flush_context):
+    changed = session.info.setdefault(CHANGED_FAMILIES_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        family = _family_of(obj)
+        if family:
+            changed.add(family)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_changed_families(session):
+    changed = session.info.pop(CHANGED_FAMILIES_KEY, None)
+    if not changed:
+        return
+    try:
+        suggestions_changed(changed)
+    except Exception as e:
+        print(f"Error bumping suggestion index versions: {e}")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_changed_families(session):
+    session.info.pop(CHANGED_FAMILIES_KEY, None)
@@ -0,0 +1,267 @@
+"""
+Semantic suggestion search.
+
+Suggestions are embedded with the chatbot's SentenceTransformer model and the
+embeddings stored in suggestion_embeddings by (family, text hash), so each
+text is encoded once across workers and restarts. Every worker keeps a FAISS
+inner-product index per family next to its lexical AutocompleteIndex. When the
+lexical index is rebuilt after a write, only suggestions the FAISS index
+hasn't seen are loaded or encoded and added to it, in the background; until
+then searches use what is already indexed.
+
+Queries shorter than SUGGESTION_SEMANTIC_MIN_CHARS are answered lexically
+alone, since a few letters carry no meaning to embed. Longer ones merge the
+lexical and semantic rankings by reciprocal rank fusion, and merged results
+are cached per query until either index changes.
+"""
+
+import asyncio
+import threading
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from db.db import SessionLocal
+from suggestion.models import SuggestionEmbedding, generate_uuid
+from utils.chatbot import chatbot, LRUCache
+from utils.config import (
+    SUGGESTION_SEMANTIC_MIN_CHARS, SUGGESTION_SEMANTIC_MIN_SCORE, SUGGESTION_SEMANTIC_CACHE_SIZE,
+    SUGGESTION_EMBED_BATCH
+)
+from utils.suggestion_index import AutocompleteIndex
+from utils.suggestion_store import SUGGESTION_FAMILIES, normalize, suggestion_hash
+
+# Reciprocal rank fusion constant; larger values flatten the difference between top ranks
+RRF_K = 60
+
+# Rebuild a family's FAISS index once this share of its vectors belongs to
+# suggestions that were deleted or renamed
+MAX_DEAD_FRACTION = 0.25
+
+# Text hashes looked up per query when loading stored embeddings
+LOAD_BATCH = 1000
+
+
+def load_embeddings(db, family: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+    """Stored embeddings of the family's suggestions among the hashes."""
+    rows = db.query(SuggestionEmbedding.text_hash, SuggestionEmbedding.embedding).filter(
+        SuggestionEmbedding.family == family, SuggestionEmbedding.text_hash.in_(hashes)
+    ).all()
+    return {text_hash: np.frombuffer(embedding, dtype="float32") for text_hash, embedding in rows}
+
+
+def store_embeddings(db, family: str, embeddings: Dict[str, np.ndarray]):
+    """Save embeddings. Another worker may have stored the same text already, so duplicates are ignored."""
+    db.connection().execute(mysql_insert(SuggestionEmbedding).prefix_with("IGNORE"), [
+        {"id": generate_uuid(), "family": family, "text_hash": text_hash, "embedding": embedding.tobytes()}
+        for text_hash, embedding in embeddings.items()
+    ])
+    db.commit()
+
+
+def embed_suggestions(db, family: str, texts: Dict[str, str], batch_size: int = SUGGESTION_EMBED_BATCH) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Embeddings of the texts, keyed by text hash: stored ones first, then the
+    rest encoded and stored batch_size at a time. Yields one dict per batch so
+    callers can use them as they arrive.
+    """
+    hashes = list(texts)
+    missing = []
+    for start in range(0, len(hashes), LOAD_BATCH):
+        chunk = hashes[start:start + LOAD_BATCH]
+        stored = load_embeddings(db, family, chunk)
+        missing.extend(text_hash for text_hash in chunk if text_hash not in stored)
+        if stored:
+            yield stored
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        encoded = dict(zip(batch, chatbot.model().encode([texts[text_hash] for text_hash in batch], batch_size)))
+        store_embeddings(db, family, encoded)
+        yield encoded
+
+
+def fuse(lexical: List[Dict[str, Any]], semantic: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Merge two rankings by reciprocal rank fusion. Entries in both rise; on ties lexical ones come first."""
+    scores: Dict[str, float] = {}
+    entries: Dict[str, Dict[str, Any]] = {}
+    for ranking in (lexical, semantic):
+        for rank, entry in enumerate(ranking):
+            scores[entry["id"]] = scores.get(entry["id"], 0) + 1 / (RRF_K + rank)
+            entries.setdefault(entry["id"], entry)
+    best = sorted(entries, key=lambda entry_id: -scores[entry_id])[:limit]
+    return [entries[entry_id] for entry_id in best]
+
+
+class SemanticIndex:
+    """FAISS inner-product index over normalised embeddings of one family's suggestions, by text hash."""
+
+    def __init__(self, dimension: int):
+        import faiss
+
+        self.index = faiss.IndexFlatIP(dimension)
+        self.hashes: List[str] = []
+        self.known = set()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, embeddings: Dict[str, np.ndarray]):
+        embeddings = {text_hash: vector for text_hash, vector in embeddings.items() if text_hash not in self.known}
+        if not embeddings:
+            return
+        self.index.add(np.stack(list(embeddings.values())).astype("float32"))
+        self.hashes.extend(embeddings)
+        self.known.update(embeddings)
+
+    def vectors(self, hashes) -> Dict[str, np.ndarray]:
+        """Indexed embeddings of the given hashes, to carry over into a rebuilt index."""
+        wanted = set(hashes)
+        indexed = self.index.reconstruct_n(0, self.index.ntotal)
+        return {text_hash: indexed[position] for position, text_hash in enumerate(self.hashes) if text_hash in wanted}
+
+    def search(self, embedding, k: int) -> List[Tuple[float, str]]:
+        """(cosine similarity, text hash) pairs, best first."""
+        if not self.hashes:
+            return []
+        scores, ids = self.index.search(embedding, min(k, len(self.hashes)))
+        return [(float(score), self.hashes[faiss_id]) for score, faiss_id in zip(scores[0], ids[0]) if faiss_id >= 0]
+
+
+class _FamilyState:
+    def __init__(self, cache_size: int):
+        self.index: Optional[SemanticIndex] = None
+        # Guards index: FAISS doesn't allow searches during an add
+        self.lock = threading.Lock()
+        # The lexical index and usage counts the cached results were ranked with
+        self.lexical: Optional[AutocompleteIndex] = None
+        self.usage = None
+        # Bumped whenever either index changes; cached results carry the version they were ranked at
+        self.version = 0
+        self.results = LRUCache(cache_size)
+        self.updating: Optional[asyncio.Task] = None
+
+
+class SemanticSuggestions:
+    """Per-worker semantic indexes, one per suggestion family, kept in step with the lexical ones."""
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._families: Dict[str, _FamilyState] = {}
+
+    async def search(self, family: str, lexical: AutocompleteIndex, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Lexical and semantic matches for the query merged, or lexical matches
+        alone for short queries or when the embedding model can't be used.
+        """
+        norm = normalize(query)
+        if len(norm) < SUGGESTION_SEMANTIC_MIN_CHARS:
+            return lexical.search(query, limit)
+
+        state = self._families.setdefault(family, _FamilyState(self.cache_size))
+        self._sync(family, state, lexical)
+        key = f"{limit}:{norm}"
+        cached = state.results.get(key)
+        if cached is not None and cached[0] == state.version:
+            return cached[1]
+
+        version = state.version
+        lexical_hits = lexical.search(query, limit)
+        try:
+            semantic_hits = await asyncio.to_thread(self._semantic_hits, state, lexical, norm, limit)
+        except Exception as e:
+            print(f"Error in semantic {family} suggestion search: {e}")
+            return lexical_hits
+        merged = fuse(lexical_hits, semantic_hits, limit)
+        state.results.set(key, (version, merged))
+        return merged
+
+    def _sync(self, family: str, state: _FamilyState, lexical: AutocompleteIndex):
+        """Start catching the semantic index up when the lexical index was rebuilt."""
+        if state.lexical is lexical and state.usage is lexical.usage:
+            return
+        rebuilt = state.lexical is not lexical
+        state.lexical, state.usage = lexical, lexical.usage
+        state.version += 1
+        if rebuilt and state.updating is None:
+            state.updating = asyncio.get_running_loop().create_task(self._update(family, state))
+
+    async def _update(self, family: str, state: _FamilyState):
+        try:
+            while True:
+                target = state.lexical
+                await asyncio.to_thread(self._catch_up, family, state, target)
+                # Rebuilt again while we were catching up
+                if state.lexical is target:
+                    break
+        except Exception as e:
+            print(f"Error updating semantic {family} suggestion index: {e}")
+        finally:
+            state.updating = None
+
+    def _catch_up(self, family: str, state: _FamilyState, lexical: AutocompleteIndex):
+        """Add the lexical index's suggestions missing from the semantic index, a batch at a time."""
+        live = lexical.hash_positions
+        if state.index is None or (
+            len(state.index) and sum(text_hash not in live for text_hash in state.index.hashes) > MAX_DEAD_FRACTION * len(state.index)
+        ):
+            index = SemanticIndex(chatbot.model().dimension)
+            if state.index is not None:
+                with state.lock:
+                    carried = state.index.vectors(live)
+                index.add(carried)
+            with state.lock:
+                state.index = index
+                state.version += 1
+
+        texts = {
+            text_hash: lexical.normalized[position]
+            for text_hash, position in live.items() if text_hash not in state.index.known
+        }
+        if not texts:
+            return
+        db = SessionLocal()
+        try:
+            for embeddings in embed_suggestions(db, family, texts):
+                with state.lock:
+                    state.index.add(embeddings)
+                    state.version += 1
+        finally:
+            db.close()
+
+    def _semantic_hits(self, state: _FamilyState, lexical: AutocompleteIndex, norm: str, limit: int) -> List[Dict[str, Any]]:
+        if state.index is None:
+            return []
+        embedding = chatbot.model().encode([norm])
+        with state.lock:
+            # Extra candidates make up for vectors of suggestions no longer in the lexical index
+            hits = state.index.search(embedding, limit * 2)
+        entries = []
+        for score, text_hash in hits:
+            position = lexical.hash_positions.get(text_hash)
+            if score >= SUGGESTION_SEMANTIC_MIN_SCORE and position is not None:
+                entries.append(lexical.entries[position])
+        return entries[:limit]
+
+
+semantic_suggestions = SemanticSuggestions(SUGGESTION_SEMANTIC_CACHE_SIZE)
+
+
+def backfill_suggestion_embeddings(db):
+    """Embed every stored suggestion not embedded yet, so workers don't have to on first use."""
+    for family, (model, column) in SUGGESTION_FAMILIES.items():
+        texts = {}
+        for (text,) in db.query(getattr(model, column)).all():
+            norm = normalize(text or "")
+            if norm:
+                texts.setdefault(suggestion_hash(norm), norm)
+        count = 0
+        for embeddings in embed_suggestions(db, family, texts):
+            count += len(embeddings)
+        print(f"{family}: {count}/{len(texts)} suggestions embedded")
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        backfill_suggestion_embeddings(db)
+    finally:
+        db.close()
@@ -0,0 +1,133 @@
+import hashlib
+import unicodedata
+from datetime import datetime
+from typing import Dict, Iterable
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from db.db import SessionLocal
+from suggestion.models import (
+    TreatmentNameSuggestion, ComplaintSuggestion, DiagnosisSuggestion,
+    VitalSignSuggestion, ObservationSuggestion, InvestigationSuggestion, generate_uuid
+)
+
+# Suggestion family -> (model, text column name)
+SUGGESTION_FAMILIES = {
+    "treatment": (TreatmentNameSuggestion, "treatment_name"),
+    "complaint": (ComplaintSuggestion, "complaint"),
+    "diagnosis": (DiagnosisSuggestion, "diagnosis"),
+    "vital_sign": (VitalSignSuggestion, "vital_sign"),
+    "observation": (ObservationSuggestion, "observation"),
+    "investigation": (InvestigationSuggestion, "investigation"),
+}
+
+# Session.info key listing the suggestion families a transaction changed; the
+# autocomplete indexes are refreshed for them once it commits
+CHANGED_FAMILIES_KEY = "changed_suggestion_families"
+
+SUGGESTION_MAX_LENGTH = 1000
+
+
+def clean_suggestion(text) -> str:
+    """Display form of a suggestion: Unicode-normalized with whitespace collapsed."""
+    if text is None:
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", str(text)).split())[:SUGGESTION_MAX_LENGTH]
+
+
+def normalize(text: str) -> str:
+    """Comparison form of a suggestion; texts differing only in case, whitespace or Unicode form are equal."""
+    return clean_suggestion(text).casefold()
+
+
+def suggestion_hash(text: str) -> str:
+    return hashlib.sha1(normalize(text).encode()).hexdigest()
+
+
+def upsert_suggestions(db, family: str, texts: Iterable, batch_size: int = 1000) -> int:
+    """
+    Add any of the texts not yet stored as suggestions of the family. Texts are
+    deduplicated by hash here and against the table's unique hash index with
+    one INSERT IGNORE per batch, so no existence lookups are needed. Runs in
+    the caller's transaction.
+
+    Returns:
+        int: Number of suggestions inserted
+    """
+    model, column = SUGGESTION_FAMILIES[family]
+    unique: Dict[str, str] = {}
+    for text in texts:
+        cleaned = clean_suggestion(text)
+        if cleaned:
+            unique.setdefault(suggestion_hash(cleaned), cleaned)
+    if not unique:
+        return 0
+
+    now = datetime.now()
+    rows = [
+        {"id": generate_uuid(), column: text, "text_hash": text_hash, "created_at": now}
+        for text_hash, text in unique.items()
+    ]
+    inserted = 0
+    connection = db.connection()
+    for start in range(0, len(rows), batch_size):
+        result = connection.execute(mysql_insert(model).prefix_with("IGNORE"), rows[start:start + batch_size])
+        inserted += result.rowcount
+    if inserted:
+        db.info.setdefault(CHANGED_FAMILIES_KEY, set()).add(family)
+    return inserted
+
+
+def upsert_suggestion_sets(db, texts_by_family: Dict[str, Iterable]) -> Dict[str, int]:
+    """upsert_suggestions for several families at once."""
+    return {family: upsert_suggestions(db, family, texts) for family, texts in texts_by_family.items()}
+
+
+def _set_text_hash(column: str):
+    def listener(mapper, connection, target):
+        target.text_hash = suggestion_hash(getattr(target, column) or "")
+    return listener
+
+
+# Suggestions added or renamed through the ORM get their hash too, so the unique
+# index also catches duplicates created one at a time
+for _model, _column in SUGGESTION_FAMILIES.values():
+    event.listen(_model, "before_insert", _set_text_hash(_column))
+    event.listen(_model, "before_update", _set_text_hash(_column))
+
+
+def backfill_suggestion_hashes(db, batch_size: int = 5000):
+    """
+    Fill text_hash for suggestions stored before the column existed. Rows whose
+    normalized text duplicates an earlier one are removed.
+
+    On an existing database, run this after adding the text_hash columns and
+    before creating their unique indexes; duplicates would make the index
+    creation fail.
+    """
+    for family, (model, column) in SUGGESTION_FAMILIES.items():
+        seen = set(
+            text_hash for (text_hash,) in db.query(model.text_hash).filter(model.text_hash.isnot(None)).all()
+        )
+        rows = db.query(model.id, getattr(model, column)).filter(model.text_hash.is_(None)).all()
+        updates, duplicates = [], []
+        for row_id, text in rows:
+            text_hash = suggestion_hash(text or "")
+            if text_hash in seen:
+                duplicates.append(row_id)
+            else:
+                seen.add(text_hash)
+                updates.append({"id": row_id, "text_hash": text_hash})
+        for start in range(0, len(duplicates), batch_size):
+            db.query(model).filter(model.id.in_(duplicates[start:start + batch_size])).delete(synchronize_session=False)
+        for start in range(0, len(updates), batch_size):
+            db.bulk_update_mappings(model, updates[start:start + batch_size])
+        db.commit()
+        print(f"Backfilled {len(updates)} {family} suggestion hashes, removed {len(duplicates)} duplicates")
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        backfill_suggestion_hashes(db)
+    finally:
+        db.close()
@@ -0,0 +1,99 @@
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from db.db import SessionLocal
+from patient.models import Complaint, Diagnosis, VitalSign, Observation, Investigation, ClinicalNoteTreatment
+from catalog.models import Treatment
+from suggestion.models import SuggestionUsage, generate_uuid
+from utils.suggestion_store import suggestion_hash
+
+# Rows whose text counts as a use of a suggestion: model -> (suggestion family, text column)
+USAGE_SOURCES = {
+    Complaint: ("complaint", "complaint"),
+    Diagnosis: ("diagnosis", "diagnosis"),
+    VitalSign: ("vital_sign", "vital_sign"),
+    Observation: ("observation", "observation"),
+    Investigation: ("investigation", "investigation"),
+    ClinicalNoteTreatment: ("treatment", "name"),
+    Treatment: ("treatment", "treatment_name"),
+}
+
+UsageCounts = Dict[Tuple[str, str], int]
+
+
+def count_usage(objects: Iterable, weight: int = 1) -> UsageCounts:
+    """Usage counts per (family, text hash) for any source rows among the objects."""
+    counts = Counter()
+    for obj in objects:
+        source = USAGE_SOURCES.get(type(obj))
+        if source:
+            family, column = source
+            text = getattr(obj, column)
+            if text:
+                counts[(family, suggestion_hash(text))] += weight
+    return counts
+
+
+def add_usage(connection, counts: UsageCounts):
+    """Add the counts to the usage table in one upsert."""
+    counts = {key: count for key, count in counts.items() if count}
+    if not counts:
+        return
+    now = datetime.now()
+    stmt = mysql_insert(SuggestionUsage).values([
+        {"id": generate_uuid(), "family": family, "text_hash": text_hash, "usage_count": count, "updated_at": now}
+        for (family, text_hash), count in counts.items()
+    ])
+    stmt = stmt.on_duplicate_key_update(
+        usage_count=SuggestionUsage.__table__.c.usage_count + stmt.inserted.usage_count,
+        updated_at=stmt.inserted.updated_at
+    )
+    connection.execute(stmt)
+
+
+def record_usage(db, objects: Iterable):
+    """Count rows written with bulk_save_objects, which the session hooks below don't see."""
+    add_usage(db.connection(), count_usage(objects))
+
+
+def load_usage(db, family: str) -> Dict[str, int]:
+    """Usage count per text hash for one family."""
+    return dict(
+        db.query(SuggestionUsage.text_hash, SuggestionUsage.usage_count)
+        .filter(SuggestionUsage.family == family, SuggestionUsage.usage_count > 0)
+        .all()
+    )
+
+
+def rebuild_usage_counts(db, batch_size: int = 5000):
+    """Recount usage from scratch, e.g. to backfill the table for existing data."""
+    counts = Counter()
+    for model, (family, column) in USAGE_SOURCES.items():
+        for (text,) in db.query(getattr(model, column)).yield_per(batch_size):
+            if text:
+                counts[(family, suggestion_hash(text))] += 1
+    db.query(SuggestionUsage).delete()
+    items = list(counts.items())
+    for start in range(0, len(items), batch_size):
+        add_usage(db.connection(), dict(items[start:start + batch_size]))
+    db.commit()
+    print(f"Rebuilt usage counts for {len(items)} suggestions")
+
+
+# Count new and deleted clinical note entries and treatments in the same
+# transaction as the write, through whichever router makes it
+@event.listens_for(SessionLocal, "after_flush")
+def _count_flushed_usage(session, flush_context):
+    counts = count_usage(session.new)
+    counts.update(count_usage(session.deleted, weight=-1))
+    add_usage(session.connection(), counts)
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        rebuild_usage_counts(db)
+    finally:
+        db.close()
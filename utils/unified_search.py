@@ -0,0 +1,195 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+from db.db import SessionLocal
+from appointment.models import Appointment
+from payment.models import Payment, Invoice
+from catalog.models import TreatmentPlan
+from utils.patient_index import PatientIndex, ALL_FIELDS
+
+# Matched patients carried into the per-entity searches, best first
+MAX_PATIENT_MATCHES = 200
+
+# Rows fetched per group before ranking, as a multiple of the group limit
+CANDIDATE_FACTOR = 4
+
+
+class SearchContext:
+    """What every backend gets: the doctor's scope, the query and the patients it matched."""
+
+    def __init__(self, doctor_id: str, clinic_id: Optional[str], query: str, patient_rank: Dict[str, int], limit: int):
+        self.doctor_id = doctor_id
+        self.clinic_id = clinic_id
+        self.query = query.strip()
+        self.patient_rank = patient_rank
+        self.patient_ids = list(patient_rank)
+        self.limit = limit
+
+    def scoped(self, model, query):
+        query = query.filter(model.doctor_id == self.doctor_id)
+        if self.clinic_id:
+            query = query.filter(model.clinic_id == self.clinic_id)
+        return query
+
+    def rank(self, rows: List[Any], identifier: Callable[[Any], Optional[str]], when: Callable[[Any], Any]) -> List[Any]:
+        """
+        Best rows first: those whose number starts with the query, then by how
+        well their patient matched, then most recent.
+        """
+        query = self.query.casefold()
+        unmatched = len(self.patient_rank)
+
+        def key(row):
+            number = (identifier(row) or "").casefold()
+            moment = when(row)
+            return (
+                0 if number and number.startswith(query) else 1,
+                self.patient_rank.get(row.patient_id, unmatched),
+                -moment.timestamp() if moment else 0
+            )
+
+        return sorted(rows, key=key)
+
+    def group(self, rows: List[Any], summarize: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+        return {"items": [summarize(row) for row in rows[:self.limit]], "has_more": len(rows) > self.limit}
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _enum_value(value) -> Optional[str]:
+    return value.value if hasattr(value, 'value') else value
+
+
+def search_appointments(db, context: SearchContext) -> Dict[str, Any]:
+    if not context.patient_ids:
+        return {"items": [], "has_more": False}
+    rows = context.scoped(Appointment, db.query(Appointment)).filter(
+        Appointment.patient_id.in_(context.patient_ids)
+    ).order_by(Appointment.start_time.desc()).limit(context.limit * CANDIDATE_FACTOR).all()
+    rows = context.rank(rows, lambda row: None, lambda row: row.start_time)
+    return context.group(rows, lambda row: {
+        "id": row.id,
+        "patient_id": row.patient_id,
+        "patient_name": row.patient_name,
+        "clinic_id": row.clinic_id,
+        "start_time": _iso(row.start_time),
+        "end_time": _iso(row.end_time),
+        "status": _enum_value(row.status)
+    })
+
+
+def _number_or_patient_rows(db, context: SearchContext, model, number_column) -> List[Any]:
+    """
+    Rows whose number starts with the query, plus recent rows of the matched
+    patients. Each comes from its own limited query, so a matched patient's
+    many recent rows can't crowd out a number match before ranking.
+    """
+    scoped = context.scoped(model, db.query(model))
+    candidates = context.limit * CANDIDATE_FACTOR
+    rows = scoped.filter(number_column.startswith(context.query, autoescape=True)).order_by(
+        model.date.desc()
+    ).limit(candidates).all()
+    if context.patient_ids:
+        seen = {row.id for row in rows}
+        rows += [
+            row for row in scoped.filter(model.patient_id.in_(context.patient_ids)).order_by(
+                model.date.desc()
+            ).limit(candidates).all()
+            if row.id not in seen
+        ]
+    return rows
+
+
+def search_invoices(db, context: SearchContext) -> Dict[str, Any]:
+    rows = _number_or_patient_rows(db, context, Invoice, Invoice.invoice_number)
+    rows = context.rank(rows, lambda row: row.invoice_number, lambda row: row.date)
+    return context.group(rows, lambda row: {
+        "id": row.id,
+        "invoice_number": row.invoice_number,
+        "patient_id": row.patient_id,
+        "patient_name": row.patient_name,
+        "date": _iso(row.date),
+        "total_amount": row.total_amount,
+        "status": _enum_value(row.status),
+        "cancelled": row.cancelled
+    })
+
+
+def search_payments(db, context: SearchContext) -> Dict[str, Any]:
+    rows = _number_or_patient_rows(db, context, Payment, Payment.receipt_number)
+    rows = context.rank(rows, lambda row: row.receipt_number, lambda row: row.date)
+    return context.group(rows, lambda row: {
+        "id": row.id,
+        "receipt_number": row.receipt_number,
+        "invoice_number": row.invoice_number,
+        "patient_id": row.patient_id,
+        "patient_name": row.patient_name,
+        "date": _iso(row.date),
+        "amount_paid": row.amount_paid,
+        "payment_mode": row.payment_mode,
+        "status": row.status,
+        "cancelled": row.cancelled
+    })
+
+
+def search_treatment_plans(db, context: SearchContext) -> Dict[str, Any]:
+    if not context.patient_ids:
+        return {"items": [], "has_more": False}
+    rows = context.scoped(TreatmentPlan, db.query(TreatmentPlan)).filter(
+        TreatmentPlan.patient_id.in_(context.patient_ids)
+    ).order_by(TreatmentPlan.date.desc()).limit(context.limit * CANDIDATE_FACTOR).all()
+    rows = context.rank(rows, lambda row: None, lambda row: row.date)
+    return context.group(rows, lambda row: {
+        "id": row.id,
+        "patient_id": row.patient_id,
+        "appointment_id": row.appointment_id,
+        "clinic_id": row.clinic_id,
+        "date": _iso(row.date)
+    })
+
+
+# Group name -> backend. Each runs in a worker thread on its own session.
+BACKENDS = {
+    "appointments": search_appointments,
+    "invoices": search_invoices,
+    "payments": search_payments,
+    "treatment_plans": search_treatment_plans,
+}
+
+GROUPS = ("patients",) + tuple(BACKENDS)
+
+
+def _run_backend(backend, context: SearchContext) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return backend(db, context)
+    finally:
+        db.close()
+
+
+async def unified_search(index: PatientIndex, doctor_id: str, clinic_id: Optional[str], query: str, limit: int, groups=GROUPS) -> Dict[str, Dict[str, Any]]:
+    """
+    Search patients, appointments, invoices, payments and treatment plans in
+    one pass. The query is matched against the doctor's patient index once;
+    the other groups are then found through the matched patient ids (and, for
+    invoices and payments, their numbers) with indexed lookups that run
+    concurrently. Each group holds at most limit items, ranked best first.
+    """
+    scores = index.match(query, ALL_FIELDS)
+    ranked = index.rank(scores, query, MAX_PATIENT_MATCHES)
+    matched = [index.entries[position] for position in ranked]
+    # Other groups are scoped to the clinic by their own clinic_id, so they
+    # look through every matched patient
+    context = SearchContext(doctor_id, clinic_id, query, {entry["id"]: rank for rank, entry in enumerate(matched)}, limit)
+    if clinic_id:
+        matched = [entry for entry in matched if entry["clinic_id"] in (clinic_id, None)]
+
+    names = [name for name in BACKENDS if name in groups]
+    results = await asyncio.gather(*(asyncio.to_thread(_run_backend, BACKENDS[name], context) for name in names))
+
+    found = {}
+    if "patients" in groups:
+        found["patients"] = {"items": matched[:limit], "has_more": len(matched) > limit}
+    found.update(zip(names, results))
+    return found